@@ -18,7 +18,8 @@ from apps.accounts.permissions import (
 )
 
 from core.models import UserAgent, CoreSettings
-from core.utils import RedisClient
+from core.utils import RedisClient, build_absolute_uri_with_port, url_builder
+from apps.output.cache import etag_matches, invalidate_output_cache
 
 from .models import (
     Stream,
@@ -31,6 +32,7 @@ from .models import (
     RecurringRecordingRule,
 )
 from .serializers import (
+    logo_channel_names,
     StreamSerializer,
     ChannelSerializer,
     ChannelGroupSerializer,
@@ -50,20 +52,19 @@ from .tasks import (
     sync_recurring_rule_impl,
     purge_recurring_rule_impl,
 )
+from . import logo_cache
+from .search import EstimatedPageNumberPagination, IndexedSearchFilter, KeysetPaginationMixin
 import django_filters
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from apps.epg.models import EPGData
 from apps.vod.models import Movie, Series
-from django.db.models import Q
-from django.http import StreamingHttpResponse, FileResponse, Http404
+from django.db.models import Count, Q
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse, Http404
 from django.utils import timezone
 import mimetypes
 from django.conf import settings
 
-from rest_framework.pagination import PageNumberPagination
-
-
 
 logger = logging.getLogger(__name__)
 
@@ -83,9 +84,7 @@ class OrInFilter(django_filters.Filter):
         return queryset
 
 
-class StreamPagination(PageNumberPagination):
-    page_size = 50  # Default page size to match frontend default
-    page_size_query_param = "page_size"  # Allow clients to specify page size
+class StreamPagination(EstimatedPageNumberPagination):
     max_page_size = 10000  # Prevent excessive page sizes
 
 
@@ -116,12 +115,12 @@ class StreamFilter(django_filters.FilterSet):
 # ─────────────────────────────────────────────────────────
 # 1) Stream API (CRUD)
 # ─────────────────────────────────────────────────────────
-class StreamViewSet(viewsets.ModelViewSet):
+class StreamViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Stream.objects.all()
     serializer_class = StreamSerializer
     pagination_class = StreamPagination
 
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
     filterset_class = StreamFilter
     search_fields = ["name", "channel_group__name"]
     ordering_fields = ["name", "channel_group__name"]
@@ -322,9 +321,7 @@ class ChannelGroupViewSet(viewsets.ModelViewSet):
 # ─────────────────────────────────────────────────────────
 # 3) Channel Management (CRUD)
 # ─────────────────────────────────────────────────────────
-class ChannelPagination(PageNumberPagination):
-    page_size = 50  # Default page size to match frontend default
-    page_size_query_param = "page_size"  # Allow clients to specify page size
+class ChannelPagination(EstimatedPageNumberPagination):
     max_page_size = 10000  # Prevent excessive page sizes
 
     def paginate_queryset(self, queryset, request, view=None):
@@ -373,12 +370,12 @@ class ChannelFilter(django_filters.FilterSet):
         ]
 
 
-class ChannelViewSet(viewsets.ModelViewSet):
+class ChannelViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Channel.objects.all()
     serializer_class = ChannelSerializer
     pagination_class = ChannelPagination
 
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
     filterset_class = ChannelFilter
     search_fields = ["name", "channel_group__name"]
     ordering_fields = ["channel_number", "name", "channel_group__name"]
@@ -523,6 +520,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
                     fields=list(validated_updates[0][1].keys()),
                     batch_size=100
                 )
+                invalidate_output_cache()
 
         # Return the updated objects (already in memory)
         serialized_channels = ChannelSerializer(
@@ -676,6 +674,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
             for channel_id in channel_ids:
                 Channel.objects.filter(id=channel_id).update(channel_number=channel_num)
                 channel_num = channel_num + 1
+            invalidate_output_cache()
 
         return Response(
             {"message": "Channels have been auto-assigned!"}, status=status.HTTP_200_OK
@@ -838,6 +837,9 @@ class ChannelViewSet(viewsets.ModelViewSet):
                     for profile in profiles
                 ])
 
+        # Memberships were bulk created after the channel's save signal fired
+        invalidate_output_cache()
+
         # Send WebSocket notification for single channel creation
         from core.utils import send_websocket_update
         send_websocket_update('updates', 'update', {
@@ -1116,6 +1118,7 @@ class ChannelViewSet(viewsets.ModelViewSet):
                     fields=["epg_data_id"],
                     batch_size=100
                 )
+            invalidate_output_cache()
 
         channels_updated = len(channels_to_update)
 
@@ -1358,9 +1361,7 @@ class CleanupUnusedLogosAPIView(APIView):
         })
 
 
-class LogoPagination(PageNumberPagination):
-    page_size = 50  # Default page size to match frontend default
-    page_size_query_param = "page_size"  # Allow clients to specify page size
+class LogoPagination(EstimatedPageNumberPagination):
     max_page_size = 1000  # Prevent excessive page sizes
 
     def paginate_queryset(self, queryset, request, view=None):
@@ -1390,9 +1391,8 @@ class LogoViewSet(viewsets.ModelViewSet):
             return [Authenticated()]
 
     def get_queryset(self):
-        """Optimize queryset with prefetch and add filtering"""
-        # Start with basic prefetch for channels
-        queryset = Logo.objects.prefetch_related('channels').order_by('name')
+        """Logos annotated with their channel count, with filtering"""
+        queryset = Logo.objects.annotate(channel_count=Count("channels")).order_by('name')
 
         # Filter by specific IDs
         ids = self.request.query_params.getlist('ids')
@@ -1410,10 +1410,10 @@ class LogoViewSet(viewsets.ModelViewSet):
         used_filter = self.request.query_params.get('used', None)
         if used_filter == 'true':
             # Logo is used if it has any channels
-            queryset = queryset.filter(channels__isnull=False).distinct()
+            queryset = queryset.filter(channel_count__gt=0)
         elif used_filter == 'false':
             # Logo is unused if it has no channels
-            queryset = queryset.filter(channels__isnull=True)
+            queryset = queryset.filter(channel_count=0)
 
         # Filter by name
         name_filter = self.request.query_params.get('name', None)
@@ -1422,6 +1422,36 @@ class LogoViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """Logo page with channel counts and the first channel names, in two queries"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        logos = list(page if page is not None else queryset)
+
+        context = self.get_serializer_context()
+        context["channel_names"] = logo_channel_names(logo.id for logo in logos if logo.channel_count)
+        data = self.get_serializer_class()(logos, many=True, context=context).data
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    @action(detail=False, methods=["get"], url_path="summary")
+    def summary(self, request):
+        """Id, name, URLs and channel count of every matching logo, for pickers"""
+        cache_url = url_builder(build_absolute_uri_with_port(request, ""), "api:channels:logo-cache")
+        logos = self.get_queryset().values_list("id", "name", "url", "channel_count")
+        return Response([
+            {
+                "id": logo_id,
+                "name": name,
+                "url": url,
+                "cache_url": cache_url(logo_id),
+                "channel_count": channel_count,
+            }
+            for logo_id, name, url, channel_count in logos
+        ])
+
     def create(self, request, *args, **kwargs):
         """Create a new logo entry"""
         serializer = self.get_serializer(data=request.data)
@@ -1545,56 +1575,69 @@ class LogoViewSet(viewsets.ModelViewSet):
             response["Content-Disposition"] = 'inline; filename="{}"'.format(
                 os.path.basename(logo_url)
             )
+            response["Cache-Control"] = f"public, max-age={settings.LOGO_CACHE_MAX_AGE}"
             return response
 
         else:  # Remote image
             try:
-                # Get the default user agent
+                entry = logo_cache.get_logo(logo_url)
+            except logo_cache.LogoTooLarge:
+                return self._stream_remote_logo(logo_url)
+            if entry is None:
+                raise Http404("Remote image not found")
+
+            if etag_matches(request, entry.etag):
+                response = HttpResponse(status=304)
+            else:
                 try:
-                    default_user_agent_id = CoreSettings.get_default_user_agent_id()
-                    user_agent_obj = UserAgent.objects.get(id=int(default_user_agent_id))
-                    user_agent = user_agent_obj.user_agent
-                except (CoreSettings.DoesNotExist, UserAgent.DoesNotExist, ValueError):
-                    # Fallback to hardcoded if default not found
-                    user_agent = 'Dispatcharr/1.0'
-
-                # Add proper timeouts to prevent hanging
-                remote_response = requests.get(
-                    logo_url,
-                    stream=True,
-                    timeout=(3, 5),  # (connect_timeout, read_timeout)
-                    headers={'User-Agent': user_agent}
+                    logo_file = open(entry.path, "rb")
+                except FileNotFoundError:
+                    # Evicted between the lookup and the open, fetch it again
+                    return self._stream_remote_logo(logo_url)
+                response = FileResponse(logo_file, content_type=entry.content_type)
+                response["Content-Length"] = str(entry.size)
+                response["Content-Disposition"] = 'inline; filename="{}"'.format(
+                    os.path.basename(logo_url)
                 )
-                if remote_response.status_code == 200:
-                    # Try to get content type from response headers first
-                    content_type = remote_response.headers.get("Content-Type")
+            response["ETag"] = entry.etag
+            response["Cache-Control"] = f"public, max-age={settings.LOGO_CACHE_MAX_AGE}"
+            return response
 
-                    # If no content type in headers or it's empty, guess based on URL
-                    if not content_type:
-                        content_type, _ = mimetypes.guess_type(logo_url)
+    def _stream_remote_logo(self, logo_url):
+        """Stream a remote logo straight from upstream, without the disk cache"""
+        try:
+            remote_response = logo_cache.open_upstream(logo_url)
+            if remote_response.status_code == 200:
+                # Try to get content type from response headers first
+                content_type = remote_response.headers.get("Content-Type")
 
-                    # If still no content type, default to common image type
-                    if not content_type:
-                        content_type = "image/jpeg"
+                # If no content type in headers or it's empty, guess based on URL
+                if not content_type:
+                    content_type, _ = mimetypes.guess_type(logo_url)
 
-                    response = StreamingHttpResponse(
-                        remote_response.iter_content(chunk_size=8192),
-                        content_type=content_type,
-                    )
-                    response["Content-Disposition"] = 'inline; filename="{}"'.format(
-                        os.path.basename(logo_url)
-                    )
-                    return response
-                raise Http404("Remote image not found")
-            except requests.exceptions.Timeout:
-                logger.warning(f"Timeout fetching logo from {logo_url}")
-                raise Http404("Logo request timed out")
-            except requests.exceptions.ConnectionError:
-                logger.warning(f"Connection error fetching logo from {logo_url}")
-                raise Http404("Unable to connect to logo server")
-            except requests.RequestException as e:
-                logger.warning(f"Error fetching logo from {logo_url}: {e}")
-                raise Http404("Error fetching remote image")
+                # If still no content type, default to common image type
+                if not content_type:
+                    content_type = "image/jpeg"
+
+                response = StreamingHttpResponse(
+                    remote_response.iter_content(chunk_size=8192),
+                    content_type=content_type,
+                )
+                response["Content-Disposition"] = 'inline; filename="{}"'.format(
+                    os.path.basename(logo_url)
+                )
+                return response
+            remote_response.close()
+            raise Http404("Remote image not found")
+        except requests.exceptions.Timeout:
+            logger.warning(f"Timeout fetching logo from {logo_url}")
+            raise Http404("Logo request timed out")
+        except requests.exceptions.ConnectionError:
+            logger.warning(f"Connection error fetching logo from {logo_url}")
+            raise Http404("Unable to connect to logo server")
+        except requests.RequestException as e:
+            logger.warning(f"Error fetching logo from {logo_url}: {e}")
+            raise Http404("Error fetching remote image")
 
 
 class ChannelProfileViewSet(viewsets.ModelViewSet):
@@ -1698,6 +1741,7 @@ class BulkUpdateChannelMembershipAPIView(APIView):
                     membership_dict[channel_id].enabled = enabled_status
 
             ChannelProfileMembership.objects.bulk_update(memberships, ["enabled"])
+            invalidate_output_cache()
 
             return Response({"status": "success"}, status=status.HTTP_200_OK)
 
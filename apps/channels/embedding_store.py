@@ -0,0 +1,165 @@
+"""
+On-disk cache of sentence-transformer embeddings for EPG matching.
+
+EPG names rarely change between refreshes, so embeddings are stored once per
+normalized name and reused by later matching runs. The store is two append-only
+files: a raw float32 matrix opened as a NumPy memmap, and a parallel array of
+64-bit name hashes that maps each hash to its row. Vectors are unit-normalized
+when stored, so cosine similarity is a plain matrix product.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Rows of channel embeddings compared against the EPG matrix per matrix product
+SIMILARITY_BLOCK_SIZE = 1024
+ENCODE_BATCH_SIZE = 256
+
+
+def name_key(name):
+    """64-bit hash of a normalized name"""
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class EmbeddingStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.keys_path = os.path.join(directory, "keys.u64")
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, ".lock")
+
+    @classmethod
+    def for_model(cls, cache_dir, model_name):
+        """Store for a model, vectors from different models never mix"""
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name)
+        return cls(os.path.join(cache_dir, "epg_embeddings", slug))
+
+    @contextmanager
+    def _locked(self):
+        # Celery workers may run matching tasks concurrently
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_dim(self):
+        try:
+            with open(self.meta_path) as f:
+                return int(json.load(f)["dim"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _reset(self, dim):
+        for path in (self.keys_path, self.vectors_path):
+            if os.path.exists(path):
+                os.unlink(path)
+        with open(self.meta_path, "w") as f:
+            json.dump({"dim": dim}, f)
+
+    def _load(self, dim):
+        """Return (row count, {key: row}, memmap of vectors or None)"""
+        import numpy as np
+
+        if not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return 0, {}, None
+
+        keys = np.fromfile(self.keys_path, dtype="<u8")
+        # An interrupted append can leave one file longer than the other, trust the shorter
+        rows = min(len(keys), os.path.getsize(self.vectors_path) // (4 * dim))
+        if rows == 0:
+            return 0, {}, None
+
+        index = {int(key): row for row, key in enumerate(keys[:rows])}
+        vectors = np.memmap(self.vectors_path, dtype="<f4", mode="r", shape=(rows, dim))
+        return rows, index, vectors
+
+    def _append(self, rows, dim, keys, vectors):
+        import numpy as np
+
+        # Drop any partially written tail before appending
+        for path, row_size in ((self.vectors_path, 4 * dim), (self.keys_path, 8)):
+            if os.path.exists(path) and os.path.getsize(path) != rows * row_size:
+                os.truncate(path, rows * row_size)
+
+        # Vectors first: a key without its vector is ignored on load, not misread
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        with open(self.keys_path, "ab") as f:
+            f.write(np.asarray(keys, dtype="<u8").tobytes())
+
+    @staticmethod
+    def _encode(encode, names):
+        import numpy as np
+
+        encoded = np.asarray(encode(names), dtype=np.float32)
+        encoded /= np.maximum(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12)
+        return encoded
+
+    def get_embeddings(self, names, encode):
+        """
+        Return a float32 matrix with one unit-normalized embedding per name.
+
+        encode(list_of_names) is only called for names not already in the store and
+        must return a 2-D array of embeddings in the same order.
+        """
+        import numpy as np
+
+        keys = [name_key(name) for name in names]
+
+        with self._locked():
+            dim = self._read_dim()
+            rows, index, vectors = self._load(dim) if dim else (0, {}, None)
+
+            missing = {}
+            for name, key in zip(names, keys):
+                if key not in index and key not in missing:
+                    missing[key] = name
+
+            if not missing:
+                logger.debug(f"All {len(keys)} EPG name embeddings served from cache")
+                return np.asarray(vectors[[index[key] for key in keys]])
+
+            logger.info(f"Encoding {len(missing)} new EPG names ({len(index)} cached)")
+            encoded = self._encode(encode, list(missing.values()))
+
+            if dim != encoded.shape[1]:
+                # First use, or a different model was stored under this name
+                if index:
+                    logger.warning("EPG embedding dimension changed, rebuilding the cache")
+                    missing = dict(zip(keys, names))
+                    encoded = self._encode(encode, list(missing.values()))
+                dim = encoded.shape[1]
+                self._reset(dim)
+                rows = 0
+
+            self._append(rows, dim, list(missing.keys()), encoded)
+            rows, index, vectors = self._load(dim)
+            return np.asarray(vectors[[index[key] for key in keys]])
+
+
+def top_cosine_matches(queries, candidates, block_size=SIMILARITY_BLOCK_SIZE):
+    """
+    For each unit-normalized query row, return (index, similarity) of the most
+    similar candidate row. Similarities are computed a block of queries at a time.
+    """
+    import numpy as np
+
+    results = []
+    candidates_t = np.ascontiguousarray(candidates.T)
+    for start in range(0, len(queries), block_size):
+        sims = queries[start:start + block_size] @ candidates_t
+        best = sims.argmax(axis=1)
+        values = sims[np.arange(len(best)), best]
+        results.extend(zip(best.tolist(), values.tolist()))
+    return results
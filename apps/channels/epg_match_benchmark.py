@@ -0,0 +1,200 @@
+"""
+Benchmark fixture for EPG auto-matching.
+
+Builds a deterministic synthetic lineup (EPG rows plus channels derived from them
+with the kind of noise real playlists have: quality tags, bracketed notes, typos,
+missing ids) and runs match_channels_to_epg against it. The previous linear-scan
+matcher is kept here as a baseline, so runtime and match quality (accuracy against
+the known source row, agreement with the baseline) can be compared.
+
+Usage (the baseline takes many minutes at the largest size, pass legacy=False to skip it):
+    python manage.py shell -c "from apps.channels.epg_match_benchmark import main; main()"
+"""
+
+import random
+import re
+import time
+
+from rapidfuzz import fuzz
+
+from .tasks import match_channels_to_epg, normalize_name
+
+SIZES = ((500, 5000), (2000, 20000), (8000, 60000))
+REGIONS = ("us", "uk", "ca", "au", "de")
+SYLLABLES = (
+    "ka", "ro", "ne", "vi", "sta", "tel", "mo", "ra", "zen", "lux",
+    "pri", "do", "qua", "fen", "tor", "bel", "ix", "nor", "sun", "val",
+)
+SUFFIXES = ("News", "Sports", "Movies", "Kids", "Music", "Cinema", "Life", "Plus", "One", "World")
+TAGS = ("HD", "FHD", "UHD", "720p", "(East)", "[Backup]", "TV", "24/7")
+
+
+def build_fixture(channel_count, epg_count, seed=42):
+    """
+    Return (channels_data, epg_data, expected) in the shapes match_epg_channels builds.
+    expected maps channel id to the EPG id it was derived from.
+    """
+    rng = random.Random(seed)
+
+    epg_data = []
+    seen = set()
+    while len(epg_data) < epg_count:
+        base = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = f"{base} {rng.choice(SUFFIXES)}"
+        region = rng.choice(REGIONS)
+        tvg_id = f"{base.lower()}{rng.randint(1, 99)}.{region}"
+        if tvg_id in seen:
+            continue
+        seen.add(tvg_id)
+        epg_data.append({
+            "id": len(epg_data) + 1,
+            "tvg_id": tvg_id,
+            "original_tvg_id": tvg_id,
+            "name": name,
+            "norm_name": normalize_name(name),
+            "epg_source_id": 1,
+        })
+
+    channels_data = []
+    expected = {}
+    for channel_id, source in enumerate(rng.sample(epg_data, channel_count), start=1):
+        name = source["name"]
+        roll = rng.random()
+        tvg_id = ""
+        gracenote_id = ""
+        if roll < 0.3:
+            tvg_id = source["tvg_id"]
+        elif roll < 0.35:
+            gracenote_id = source["tvg_id"]
+        elif roll < 0.45:
+            # Stale id that no longer exists in the guide
+            tvg_id = f"missing{channel_id}.{rng.choice(REGIONS)}"
+
+        # Playlist noise
+        if rng.random() < 0.6:
+            name = f"{name} {rng.choice(TAGS)}"
+        if rng.random() < 0.3:
+            name = name.upper()
+        if rng.random() < 0.2 and len(name) > 6:
+            pos = rng.randrange(1, len(name) - 1)
+            name = name[:pos] + name[pos + 1:]
+
+        channels_data.append({
+            "id": channel_id,
+            "name": name,
+            "tvg_id": tvg_id,
+            "original_tvg_id": tvg_id,
+            "gracenote_id": gracenote_id,
+            "original_gracenote_id": gracenote_id,
+            "fallback_name": tvg_id if tvg_id else name,
+            "norm_chan": normalize_name(name),
+        })
+        expected[channel_id] = source["id"]
+
+    return channels_data, epg_data, expected
+
+
+def legacy_best_matches(channels_data, epg_data, region_code=None):
+    """
+    Baseline: the per-channel linear scans match_channels_to_epg used before the
+    match index. Returns {channel id: (epg id or None, score)} for the candidate
+    each channel would be judged on (exact id match, else best fuzzy score).
+    """
+    results = {}
+    for chan in channels_data:
+        normalized_tvg_id = chan.get("tvg_id", "")
+        epg_by_tvg_id = next((epg for epg in epg_data if epg["tvg_id"] == normalized_tvg_id), None)
+        if normalized_tvg_id and epg_by_tvg_id:
+            results[chan["id"]] = (epg_by_tvg_id["id"], None)
+            continue
+
+        if chan["tvg_id"]:
+            epg_match = [epg["id"] for epg in epg_data if epg["tvg_id"] == chan["tvg_id"]]
+            if epg_match:
+                results[chan["id"]] = (epg_match[0], None)
+                continue
+
+        normalized_gracenote_id = chan.get("gracenote_id", "")
+        if normalized_gracenote_id:
+            epg_by_gracenote_id = next((epg for epg in epg_data if epg["tvg_id"] == normalized_gracenote_id), None)
+            if epg_by_gracenote_id:
+                results[chan["id"]] = (epg_by_gracenote_id["id"], None)
+                continue
+
+        if not chan["norm_chan"]:
+            results[chan["id"]] = (None, 0)
+            continue
+
+        best_score = 0
+        best_epg = None
+        for row in epg_data:
+            if not row.get("norm_name"):
+                continue
+            base_score = fuzz.ratio(chan["norm_chan"], row["norm_name"])
+            bonus = 0
+            if region_code and row.get("tvg_id"):
+                combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
+                dot_regions = re.findall(r'\.([a-z]{2})', combined_text)
+                if dot_regions:
+                    bonus = 15 if region_code in dot_regions else -15
+                elif region_code in combined_text:
+                    bonus = 10
+            score = base_score + bonus
+            if score > best_score:
+                best_score = score
+                best_epg = row
+        results[chan["id"]] = (best_epg["id"] if best_epg else None, best_score)
+    return results
+
+
+def run(channel_count, epg_count, region_code="us", legacy=True):
+    """Match a fixture of the given size, returns a dict of timings and quality figures"""
+    channels_data, epg_data, expected = build_fixture(channel_count, epg_count)
+
+    start = time.perf_counter()
+    result = match_channels_to_epg(
+        [dict(chan) for chan in channels_data], epg_data, region_code, use_ml=False, send_progress=False
+    )
+    elapsed = time.perf_counter() - start
+
+    matched = {chan["id"]: chan["epg_data_id"] for chan in result["channels_to_update"]}
+    correct = sum(1 for channel_id, epg_id in matched.items() if expected[channel_id] == epg_id)
+    stats = {
+        "elapsed": elapsed,
+        "matched": len(matched),
+        "correct": correct,
+        "legacy_elapsed": None,
+        "agreement": None,
+    }
+
+    if legacy:
+        start = time.perf_counter()
+        baseline = legacy_best_matches(channels_data, epg_data, region_code)
+        stats["legacy_elapsed"] = time.perf_counter() - start
+        # The bulk threshold decides acceptance in both versions, so agreement on the
+        # accepted candidate is agreement on the final result
+        baseline_matched = {
+            channel_id: epg_id for channel_id, (epg_id, score) in baseline.items()
+            if epg_id is not None and (score is None or score >= 90)
+        }
+        stats["agreement"] = sum(
+            1 for chan in channels_data
+            if baseline_matched.get(chan["id"]) == matched.get(chan["id"])
+        ) / max(1, len(channels_data))
+
+    return stats
+
+
+def main(sizes=SIZES, legacy=True):
+    print(f"{'channels':>8} {'epg':>7} {'matched':>8} {'correct':>8} {'seconds':>9} "
+          f"{'legacy s':>9} {'agreement':>10}")
+    for channel_count, epg_count in sizes:
+        stats = run(channel_count, epg_count, legacy=legacy)
+        legacy_elapsed = f"{stats['legacy_elapsed']:>9.2f}" if stats["legacy_elapsed"] is not None else f"{'-':>9}"
+        agreement = f"{stats['agreement']:>10.2%}" if stats["agreement"] is not None else f"{'-':>10}"
+        print(f"{channel_count:>8} {epg_count:>7} {stats['matched']:>8} {stats['correct']:>8} "
+              f"{stats['elapsed']:>9.2f} {legacy_elapsed} {agreement}")
+
+
+if __name__ == '__main__':
+    main()
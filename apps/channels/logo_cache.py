@@ -0,0 +1,279 @@
+"""
+Disk-backed cache for remote channel logos.
+
+Logo bodies are stored content-addressed (by SHA-256) under LOGO_CACHE_DIR/blobs, so
+providers that serve the same image under many URLs only use the space once. A
+small JSON record per URL under LOGO_CACHE_DIR/urls keeps the blob hash and the
+upstream validators (ETag / Last-Modified). Fresh entries are served straight from
+disk; stale ones are revalidated with a conditional request and served from disk on
+304 or when the upstream is unreachable. Blob mtimes are bumped on use, and the
+least recently used blobs are evicted once the cache grows past its byte budget.
+"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from core.models import CoreSettings, UserAgent
+
+logger = logging.getLogger(__name__)
+
+FETCH_TIMEOUT = (3, 5)  # (connect_timeout, read_timeout)
+MAX_LOGO_BYTES = 5 * 1024 * 1024
+DEFAULT_USER_AGENT = 'Dispatcharr/1.0'
+USER_AGENT_TTL = 60
+
+_user_agent = {"value": None, "expires": 0}
+_eviction_lock = threading.Lock()
+_bytes_since_eviction = 0
+
+
+class LogoTooLarge(Exception):
+    """The logo is bigger than MAX_LOGO_BYTES, it's served without caching"""
+
+
+class LogoEntry:
+    """A cached logo ready to be served"""
+
+    def __init__(self, path, content_type, digest, size):
+        self.path = path
+        self.content_type = content_type
+        self.etag = f'"{digest[:32]}"'
+        self.size = size
+
+
+def _cache_dir():
+    return settings.LOGO_CACHE_DIR
+
+
+def _blob_path(digest):
+    return os.path.join(_cache_dir(), "blobs", digest[:2], digest)
+
+
+def _record_path(url):
+    key = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(_cache_dir(), "urls", key[:2], f"{key}.json")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_record(url):
+    try:
+        with open(_record_path(url)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_record(url, record):
+    _write_atomic(_record_path(url), json.dumps(record).encode("utf-8"))
+
+
+def get_user_agent():
+    """Default user agent for logo fetches, looked up at most once a minute"""
+    now = time.monotonic()
+    if _user_agent["value"] is None or now >= _user_agent["expires"]:
+        try:
+            default_user_agent_id = CoreSettings.get_default_user_agent_id()
+            _user_agent["value"] = UserAgent.objects.get(id=int(default_user_agent_id)).user_agent
+        except (CoreSettings.DoesNotExist, UserAgent.DoesNotExist, ValueError):
+            # Fallback to hardcoded if default not found
+            _user_agent["value"] = DEFAULT_USER_AGENT
+        _user_agent["expires"] = now + USER_AGENT_TTL
+    return _user_agent["value"]
+
+
+def _entry_from_record(record):
+    path = _blob_path(record["sha256"])
+    try:
+        size = os.path.getsize(path)
+        # Bump mtime so eviction sees this blob as recently used
+        os.utime(path)
+    except OSError:
+        return None
+    return LogoEntry(path, record["content_type"], record["sha256"], size)
+
+
+def _store(url, content, content_type, etag, last_modified):
+    global _bytes_since_eviction
+
+    digest = hashlib.sha256(content).hexdigest()
+    path = _blob_path(digest)
+    if not os.path.exists(path):
+        _write_atomic(path, content)
+        _bytes_since_eviction += len(content)
+
+    record = {
+        "sha256": digest,
+        "content_type": content_type,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": time.time(),
+    }
+    _write_record(url, record)
+
+    # Rescanning the cache on every write would be wasteful, check once enough new data arrived
+    if _bytes_since_eviction > max_cache_bytes() // 20:
+        evict()
+    return record
+
+
+def max_cache_bytes():
+    return settings.LOGO_CACHE_MAX_MB * 1024 * 1024
+
+
+def evict(max_bytes=None):
+    """Delete least recently used blobs until the cache is under its byte budget"""
+    global _bytes_since_eviction
+
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    blobs_dir = os.path.join(_cache_dir(), "blobs")
+
+    with _eviction_lock:
+        _bytes_since_eviction = 0
+        blobs = []
+        total = 0
+        for root, _, files in os.walk(blobs_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= max_bytes:
+            return 0
+
+        # Evict down to 90% so we don't rescan on the very next write
+        target = int(max_bytes * 0.9)
+        removed = 0
+        for _, size, path in sorted(blobs):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        # URL records pointing at evicted blobs are treated as misses and refetched
+        logger.info(f"Evicted {removed} cached logos, cache now {total / 1024 / 1024:.1f} MB")
+        return removed
+
+
+def _fetch(url, record=None):
+    """Fetch (or revalidate) a logo, returns the updated record or None if unavailable"""
+    headers = {'User-Agent': get_user_agent()}
+    if record:
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+
+    with requests.get(url, stream=True, timeout=FETCH_TIMEOUT, headers=headers) as response:
+        if response.status_code == 304 and record:
+            record["fetched_at"] = time.time()
+            _write_record(url, record)
+            return record
+
+        if response.status_code != 200:
+            logger.debug(f"Logo fetch for {url} returned {response.status_code}")
+            return None
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=8192):
+            size += len(chunk)
+            if size > MAX_LOGO_BYTES:
+                logger.warning(f"Logo at {url} exceeds {MAX_LOGO_BYTES} bytes, not caching")
+                raise LogoTooLarge(url)
+            chunks.append(chunk)
+
+        # Try to get content type from response headers first, then guess from the URL
+        content_type = response.headers.get("Content-Type")
+        if not content_type:
+            content_type, _ = mimetypes.guess_type(url)
+        if not content_type:
+            content_type = "image/jpeg"
+
+        return _store(
+            url,
+            b"".join(chunks),
+            content_type,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+
+
+def get_logo(url):
+    """
+    Return a LogoEntry for a remote logo URL, fetching or revalidating as needed.
+    Returns None when the logo isn't cached and can't be fetched, raises LogoTooLarge
+    for logos too big to cache.
+    """
+    record = _read_record(url)
+    entry = _entry_from_record(record) if record else None
+
+    if entry and time.time() - record.get("fetched_at", 0) < settings.LOGO_CACHE_MAX_AGE:
+        return entry
+
+    try:
+        updated = _fetch(url, record if entry else None)
+    except requests.RequestException as e:
+        logger.warning(f"Error fetching logo from {url}: {e}")
+        updated = None
+
+    if updated:
+        return _entry_from_record(updated) or entry
+
+    # Serve the stale copy rather than failing when the upstream is down
+    return entry
+
+
+def open_upstream(url):
+    """Streaming request for a logo that isn't served from the cache"""
+    return requests.get(url, stream=True, timeout=FETCH_TIMEOUT, headers={'User-Agent': get_user_agent()})
+
+
+def is_fresh(url):
+    record = _read_record(url)
+    return bool(
+        record
+        and os.path.exists(_blob_path(record["sha256"]))
+        and time.time() - record.get("fetched_at", 0) < settings.LOGO_CACHE_MAX_AGE
+    )
+
+
+def schedule_prefetch():
+    """Queue a background prefetch of channel logos if enabled"""
+    if not settings.LOGO_PREFETCH:
+        return
+    try:
+        from .tasks import prefetch_logos
+        prefetch_logos.delay()
+    except Exception as e:
+        logger.warning(f"Could not schedule logo prefetch: {e}")
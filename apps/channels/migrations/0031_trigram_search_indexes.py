@@ -0,0 +1,53 @@
+# Trigram indexes for the name searches of the stream, channel, group and logo APIs
+
+from django.db import migrations
+
+# (model, column) pairs searched with icontains
+SEARCH_COLUMNS = [
+    ("Stream", "name"),
+    ("Channel", "name"),
+    ("ChannelGroup", "name"),
+    ("Logo", "name"),
+]
+
+
+def index_name(table, column):
+    return f"{table}_{column}_trgm"[:63]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Django compiles icontains to UPPER(column::text) LIKE UPPER(%s) on PostgreSQL,
+    a GIN trigram index on UPPER(column) serves those LIKE '%term%' scans.
+    Other databases keep plain LIKE scans.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for model_name, column in SEARCH_COLUMNS:
+        table = apps.get_model("dispatcharr_channels", model_name)._meta.db_table
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{index_name(table, column)}" '
+            f'ON "{table}" USING gin (UPPER("{column}") gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for model_name, column in SEARCH_COLUMNS:
+        table = apps.get_model("dispatcharr_channels", model_name)._meta.db_table
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{index_name(table, column)}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatcharr_channels', '0030_alter_stream_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -6,10 +6,10 @@ from core.utils import RedisClient
 import logging
 import uuid
 from datetime import datetime
-import hashlib
-import json
 from apps.epg.models import EPGData
 from apps.accounts.models import User
+from .stream_hash import StreamHasher
+from .stream_slots import candidate_slots, reserve_slot, stream_candidates, switch_slot, SWITCH_OK, SWITCH_FULL
 
 logger = logging.getLogger(__name__)
 
@@ -123,16 +123,7 @@ class Stream(models.Model):
         if keys is None:
             keys = CoreSettings.get_m3u_hash_key().split(",")
 
-        stream_parts = {"name": name, "url": url, "tvg_id": tvg_id, "m3u_id": m3u_id}
-
-        hash_parts = {key: stream_parts[key] for key in keys if key in stream_parts}
-
-        # Serialize and hash the dictionary
-        serialized_obj = json.dumps(
-            hash_parts, sort_keys=True
-        )  # sort_keys ensures consistent ordering
-        hash_object = hashlib.sha256(serialized_obj.encode())
-        return hash_object.hexdigest()
+        return StreamHasher.for_keys(keys).hash(name, url, tvg_id, m3u_id=m3u_id)
 
     @classmethod
     def update_or_create_by_hash(cls, hash_value, **fields_to_update):
@@ -171,45 +162,12 @@ class Stream(models.Model):
         Finds an available stream for the requested channel and returns the selected stream and profile.
         """
         redis_client = RedisClient.get_client()
-        profile_id = redis_client.get(f"stream_profile:{self.id}")
-        if profile_id:
-            profile_id = int(profile_id)
-            return self.id, profile_id, None
-
-        # Retrieve the M3U account associated with the stream.
-        m3u_account = self.m3u_account
-        m3u_profiles = m3u_account.profiles.all()
-        default_profile = next((obj for obj in m3u_profiles if obj.is_default), None)
-        profiles = [default_profile] + [
-            obj for obj in m3u_profiles if not obj.is_default
-        ]
 
-        for profile in profiles:
-            logger.info(profile)
-            # Skip inactive profiles
-            if profile.is_active == False:
-                continue
-
-            profile_connections_key = f"profile_connections:{profile.id}"
-            current_connections = int(redis_client.get(profile_connections_key) or 0)
-
-            # Check if profile has available slots (or unlimited connections)
-            if profile.max_streams == 0 or current_connections < profile.max_streams:
-                # Start a new stream
-                redis_client.set(f"channel_stream:{self.id}", self.id)
-                redis_client.set(
-                    f"stream_profile:{self.id}", profile.id
-                )  # Store only the matched profile
-
-                # Increment connection count for profiles with limits
-                if profile.max_streams > 0:
-                    redis_client.incr(profile_connections_key)
-
-                return (
-                    self.id,
-                    profile.id,
-                    None,
-                )  # Return newly assigned stream and matched profile
+        # Reserving reuses an existing stream_profile assignment for this stream
+        slots = candidate_slots(stream_candidates([self], require_default=False))
+        stream_id, profile_id, _ = reserve_slot(redis_client, self.id, slots, reuse="stream")
+        if profile_id is not None:
+            return self.id, profile_id, None
 
         # 4. No available streams
         return None, None, None
@@ -357,98 +315,35 @@ class Channel(models.Model):
             Tuple[Optional[int], Optional[int], Optional[str]]: (stream_id, profile_id, error_reason)
         """
         redis_client = RedisClient.get_client()
-        error_reason = None
 
         # Check if this channel has any streams
         if not self.streams.exists():
             error_reason = "No streams assigned to channel"
             return None, None, error_reason
 
-        # Check if a stream is already active for this channel
-        stream_id_bytes = redis_client.get(f"channel_stream:{self.id}")
-        if stream_id_bytes:
-            try:
-                stream_id = int(stream_id_bytes)
-                profile_id_bytes = redis_client.get(f"stream_profile:{stream_id}")
-                if profile_id_bytes:
-                    try:
-                        profile_id = int(profile_id_bytes)
-                        return stream_id, profile_id, None
-                    except (ValueError, TypeError):
-                        logger.debug(
-                            f"Invalid profile ID retrieved from Redis: {profile_id_bytes}"
-                        )
-            except (ValueError, TypeError):
-                logger.debug(
-                    f"Invalid stream ID retrieved from Redis: {stream_id_bytes}"
-                )
-
-        # No existing active stream, attempt to assign a new one
-        has_streams_but_maxed_out = False
-        has_active_profiles = False
-
-        # Iterate through channel streams and their profiles
-        for stream in self.streams.all().order_by("channelstream__order"):
-            # Retrieve the M3U account associated with the stream.
-            m3u_account = stream.m3u_account
-            if not m3u_account:
-                logger.debug(f"Stream {stream.id} has no M3U account")
-                continue
-            if m3u_account.is_active == False:
-                logger.debug(f"M3U account {m3u_account.id} is inactive, skipping.")
-                continue
-
-            m3u_profiles = m3u_account.profiles.filter(is_active=True)
-            default_profile = next(
-                (obj for obj in m3u_profiles if obj.is_default), None
-            )
-
-            if not default_profile:
-                logger.debug(f"M3U account {m3u_account.id} has no active default profile")
-                continue
-
-            profiles = [default_profile] + [
-                obj for obj in m3u_profiles if not obj.is_default
-            ]
-
-            for profile in profiles:
-                has_active_profiles = True
-
-                profile_connections_key = f"profile_connections:{profile.id}"
-                current_connections = int(
-                    redis_client.get(profile_connections_key) or 0
-                )
-
-                # Check if profile has available slots (or unlimited connections)
-                if (
-                    profile.max_streams == 0
-                    or current_connections < profile.max_streams
-                ):
-                    # Start a new stream
-                    redis_client.set(f"channel_stream:{self.id}", stream.id)
-                    redis_client.set(f"stream_profile:{stream.id}", profile.id)
-
-                    # Increment connection count for profiles with limits
-                    if profile.max_streams > 0:
-                        redis_client.incr(profile_connections_key)
-
-                    return (
-                        stream.id,
-                        profile.id,
-                        None,
-                    )  # Return newly assigned stream and matched profile
-                else:
-                    # This profile is at max connections
-                    has_streams_but_maxed_out = True
-                    logger.debug(
-                        f"Profile {profile.id} at max connections: {current_connections}/{profile.max_streams}"
-                    )
+        try:
+            # A channel that is already streaming keeps its assignment, no queries needed
+            stream_id, profile_id, _ = reserve_slot(redis_client, self.id, [])
+            if stream_id is not None:
+                return stream_id, profile_id, None
+
+            # Atomically reserve the first profile with a free slot across all streams
+            slots = candidate_slots(stream_candidates(
+                self.streams.select_related("m3u_account").order_by("channelstream__order")
+            ))
+            stream_id, profile_id, reserved = reserve_slot(redis_client, self.id, slots)
+        except (ValueError, TypeError) as e:
+            logger.debug(f"Invalid stream assignment stored in Redis for channel {self.id}: {e}")
+            return None, None, "Invalid stream assignment stored in Redis"
+
+        if stream_id is not None:
+            if reserved:
+                logger.debug(f"Reserved profile {profile_id} for stream {stream_id} on channel {self.id}")
+            return stream_id, profile_id, None
 
         # No available streams - determine specific reason
-        if has_streams_but_maxed_out:
+        if slots:
             error_reason = "All active M3U profiles have reached maximum connection limits"
-        elif has_active_profiles:
-            error_reason = "No compatible active profile found for any assigned stream"
         else:
             error_reason = "No active profiles found for any assigned stream"
 
@@ -492,52 +387,45 @@ class Channel(models.Model):
         if current_count > 0:
             redis_client.decr(profile_connections_key)
 
-    def update_stream_profile(self, new_profile_id):
+    def update_stream_profile(self, new_profile_id, stream_id=None):
         """
-        Updates the profile for the current stream and adjusts connection counts.
+        Moves the channel's connection slot to a new M3U profile, and optionally a new
+        stream, checking the new profile's capacity atomically.
 
         Args:
-            new_profile_id: The ID of the new stream profile to use
+            new_profile_id: The ID of the new M3U account profile to use
+            stream_id: The stream being switched to, defaults to the current stream
 
         Returns:
             bool: True if successful, False otherwise
         """
-        redis_client = RedisClient.get_client()
+        from apps.m3u.models import M3UAccountProfile
 
-        # Get current stream ID
-        stream_id_bytes = redis_client.get(f"channel_stream:{self.id}")
-        if not stream_id_bytes:
-            logger.debug("No active stream found for channel")
-            return False
+        redis_client = RedisClient.get_client()
 
-        stream_id = int(stream_id_bytes)
+        if stream_id is None:
+            stream_id_bytes = redis_client.get(f"channel_stream:{self.id}")
+            if not stream_id_bytes:
+                logger.debug("No active stream found for channel")
+                return False
+            stream_id = int(stream_id_bytes)
 
-        # Get current profile ID
-        current_profile_id_bytes = redis_client.get(f"stream_profile:{stream_id}")
-        if not current_profile_id_bytes:
-            logger.debug("No profile found for current stream")
+        try:
+            max_streams = M3UAccountProfile.objects.values_list("max_streams", flat=True).get(id=new_profile_id)
+        except M3UAccountProfile.DoesNotExist:
+            logger.warning(f"M3U profile {new_profile_id} not found")
             return False
 
-        current_profile_id = int(current_profile_id_bytes)
-
-        # Don't do anything if the profile is already set to the requested one
-        if current_profile_id == new_profile_id:
-            return True
-
-        # Decrement connection count for old profile
-        old_profile_connections_key = f"profile_connections:{current_profile_id}"
-        old_count = int(redis_client.get(old_profile_connections_key) or 0)
-        if old_count > 0:
-            redis_client.decr(old_profile_connections_key)
-
-        # Update the profile mapping
-        redis_client.set(f"stream_profile:{stream_id}", new_profile_id)
+        result = switch_slot(redis_client, self.id, stream_id, new_profile_id, max_streams)
+        if result == SWITCH_FULL:
+            logger.warning(f"M3U profile {new_profile_id} has no free connection slot for channel {self.id}")
+            return False
+        if result != SWITCH_OK:
+            logger.debug("No active stream found for channel")
+            return False
 
-        # Increment connection count for new profile
-        new_profile_connections_key = f"profile_connections:{new_profile_id}"
-        redis_client.incr(new_profile_connections_key)
         logger.info(
-            f"Updated stream {stream_id} profile from {current_profile_id} to {new_profile_id}"
+            f"Updated channel {self.id} to stream {stream_id} on M3U profile {new_profile_id}"
         )
         return True
 
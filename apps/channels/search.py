@@ -0,0 +1,208 @@
+"""
+Search and pagination for the large stream, channel and logo listings.
+
+On PostgreSQL the searched name columns carry pg_trgm GIN indexes (migration
+0031), which serve icontains lookups. Two things keep a search on those indexes:
+
+- IndexedSearchFilter resolves terms on related fields (channel_group__name)
+  against the related table first. The main query then ORs an indexed name match
+  with a foreign key IN (...), where a join OR would fall back to a full scan.
+- EstimatedCountPaginator takes the planner's row estimate instead of running
+  COUNT(*) when the estimate is large, and KeysetPagination gives clients that
+  only need next/previous a cursor instead of OFFSET.
+
+SQLite has no trigram indexes, the same queries run as plain LIKE scans and
+counts are always exact.
+"""
+
+import json
+import logging
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.filters import SearchFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+logger = logging.getLogger(__name__)
+
+
+class IndexedSearchFilter(SearchFilter):
+    """
+    SearchFilter that matches each term with icontains, looking up terms on
+    foreign key fields (e.g. channel_group__name) in the related table
+    """
+
+    def term_query(self, model, search_field, term):
+        relation, _, field = search_field.partition("__")
+        if field and "__" not in field:
+            model_field = model._meta.get_field(relation)
+            if model_field.many_to_one:
+                related = model_field.related_model.objects.filter(**{f"{field}__icontains": term})
+                return Q(**{f"{relation}__in": related.values("pk")})
+        return Q(**{f"{search_field}__icontains": term})
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+
+        for term in search_terms:
+            query = Q()
+            for search_field in search_fields:
+                query |= self.term_query(queryset.model, search_field, term)
+            queryset = queryset.filter(query)
+        return queryset
+
+
+def estimate_count(queryset):
+    """Planner row estimate for a queryset on PostgreSQL, None elsewhere"""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.debug(f"Could not estimate row count: {e}")
+        return None
+
+
+class EstimatedPage(Page):
+    """Page that knows whether another page follows without relying on the count"""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the planner's estimate above ESTIMATED_COUNT_THRESHOLD rows.
+    The estimate is only reported, pages are never cut short or refused because of it:
+    each page fetches one extra row to see whether another page follows.
+    """
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, "query"):
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+                self.count_is_estimate = True
+                return estimate
+        return super().count
+
+    def _set_count(self, count, is_estimate):
+        self.count = count
+        self.count_is_estimate = is_estimate
+        self.__dict__.pop("num_pages", None)
+
+    def validate_number(self, number):
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+        # Pages past the estimate may exist, page() finds out by fetching them
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        self.count  # Decides whether the count is an estimate
+        if not self.count_is_estimate:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if has_next:
+            if bottom + len(rows) >= self.count:
+                # The estimate was low, report at least what's known to exist
+                self._set_count(bottom + len(rows) + 1, True)
+        elif rows or number == 1:
+            # A short page was observed, the count is exact
+            self._set_count(bottom + len(rows), False)
+        else:
+            raise EmptyPage(self.error_messages["no_results"])
+        return EstimatedPage(rows, number, self, has_next)
+
+
+class EstimatedPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination with estimated counts for large results. The response
+    says whether "count" is an estimate in "count_is_estimate".
+    """
+
+    django_paginator_class = EstimatedCountPaginator
+    page_size = 50  # Default page size to match frontend default
+    page_size_query_param = "page_size"  # Allow clients to specify page size
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimate"] = self.page.paginator.count_is_estimate
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count_is_estimate"] = {"type": "boolean"}
+        return schema
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination ordered by the view's ordering, without a count. Orderings on
+    related fields aren't supported and fall back to the pagination's ordering.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 10000
+    ordering = "-id"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if any("__" in field for field in ordering):
+            ordering = (self.ordering,)
+        # Break ties on id so equal names page deterministically
+        if ordering[0].lstrip("-") not in ("id", "pk"):
+            ordering = (ordering[0], "-id" if ordering[0].startswith("-") else "id")
+        return ordering
+
+
+class KeysetPaginationMixin:
+    """
+    Serve a viewset's listing with KeysetPagination when the client asks for
+    pagination=cursor or sends a cursor, and with pagination_class otherwise
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "cursor" or KeysetPagination.cursor_query_param in params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
@@ -17,13 +17,42 @@ from .models import (
 from apps.epg.serializers import EPGDataSerializer
 from core.models import StreamProfile
 from apps.epg.models import EPGData
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.urls import reverse
 from rest_framework import serializers
 from django.utils import timezone
 from core.utils import validate_flexible_url
 
 
+# Channel names listed per logo
+LOGO_CHANNEL_NAMES = 5
+
+
+def logo_channel_names(logo_ids, limit=LOGO_CHANNEL_NAMES):
+    """{logo id: names of its first channels} for a page of logos, in one query per 5000 logos"""
+    logo_ids = list(logo_ids)
+    names = {}
+    for i in range(0, len(logo_ids), 5000):
+        rows = (
+            Channel.objects.filter(logo_id__in=logo_ids[i : i + 5000])
+            .annotate(position=Window(RowNumber(), partition_by=F("logo_id"), order_by=F("id").asc()))
+            .filter(position__lte=limit)
+            .order_by("logo_id", "position")
+            .values_list("logo_id", "name")
+        )
+        for logo_id, name in rows:
+            names.setdefault(logo_id, []).append(name)
+    return names
+
+
 class LogoSerializer(serializers.ModelSerializer):
+    """
+    Logo with its channel usage. Listings annotate channel_count on the queryset
+    and pass logo_channel_names() in the context as "channel_names", otherwise
+    both are queried per logo.
+    """
+
     cache_url = serializers.SerializerMethodField()
     channel_count = serializers.SerializerMethodField()
     is_used = serializers.SerializerMethodField()
@@ -65,25 +94,31 @@ class LogoSerializer(serializers.ModelSerializer):
 
     def get_channel_count(self, obj):
         """Get the number of channels using this logo"""
-        return obj.channels.count()
+        count = getattr(obj, "channel_count", None)
+        if count is None:
+            count = obj.channel_count = obj.channels.count()
+        return count
 
     def get_is_used(self, obj):
         """Check if this logo is used by any channels"""
-        return obj.channels.exists()
+        return self.get_channel_count(obj) > 0
 
     def get_channel_names(self, obj):
         """Get the names of channels using this logo (limited to first 5)"""
-        names = []
+        total_count = self.get_channel_count(obj)
+        names_by_logo = self.context.get("channel_names")
+        if names_by_logo is not None:
+            channel_names = names_by_logo.get(obj.id, [])
+        elif total_count:
+            channel_names = obj.channels.order_by("id").values_list("name", flat=True)[:LOGO_CHANNEL_NAMES]
+        else:
+            channel_names = []
 
-        # Get channel names
-        channels = obj.channels.all()[:5]
-        for channel in channels:
-            names.append(f"Channel: {channel.name}")
+        names = [f"Channel: {name}" for name in channel_names]
 
         # Calculate total count for "more" message
-        total_count = self.get_channel_count(obj)
-        if total_count > 5:
-            names.append(f"...and {total_count - 5} more")
+        if total_count > LOGO_CHANNEL_NAMES:
+            names.append(f"...and {total_count - LOGO_CHANNEL_NAMES} more")
 
         return names
 
@@ -0,0 +1,65 @@
+"""
+Stream identity hashing for M3U refreshes.
+
+A stream's hash is built from the fields selected by the M3U hash key setting
+(name, url, tvg_id, m3u_id). Current hashes are blake2b digests over the selected
+values joined into one byte string, prefixed with a version marker. Hashes without
+the marker are from the original JSON + SHA-256 scheme; refreshes look those up
+too and rewrite them in place, so existing rows migrate lazily without a rehash.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+
+HASH_VERSION = 2
+# Hashes double as TS proxy channel ids for stream previews, and the proxy splits its
+# Redis keys on ":", so the marker must not contain one
+HASH_PREFIX = f"v{HASH_VERSION}_"
+
+# Hashable fields in the order of the legacy sort_keys JSON serialization
+HASH_FIELDS = ("m3u_id", "name", "tvg_id", "url")
+# Position of each field in the (name, url, tvg_id, m3u_id) argument order
+_FIELD_POSITIONS = {"name": 0, "url": 1, "tvg_id": 2, "m3u_id": 3}
+
+# Separates field values in the hashed byte string, None is encoded as NUL so it
+# stays distinct from an empty string
+_SEPARATOR = "\x1f"
+_NONE = "\x00"
+
+
+def is_current_hash(stream_hash):
+    return bool(stream_hash) and stream_hash.startswith(HASH_PREFIX)
+
+
+class StreamHasher:
+    """Hashes streams for one hash key configuration, field selection is resolved once"""
+
+    def __init__(self, keys):
+        selected = set(keys)
+        self.fields = tuple(field for field in HASH_FIELDS if field in selected)
+        self._positions = tuple(_FIELD_POSITIONS[field] for field in self.fields)
+
+    @classmethod
+    def for_keys(cls, keys):
+        return _hasher_for_keys(tuple(keys))
+
+    def hash(self, name, url, tvg_id, m3u_id=None):
+        values = (name, url, tvg_id, m3u_id)
+        joined = _SEPARATOR.join(
+            _NONE if values[position] is None else str(values[position])
+            for position in self._positions
+        )
+        return HASH_PREFIX + hashlib.blake2b(joined.encode("utf-8"), digest_size=16).hexdigest()
+
+    def legacy_hash(self, name, url, tvg_id, m3u_id=None):
+        """The pre-versioning hash, used to find rows that haven't been migrated yet"""
+        values = (name, url, tvg_id, m3u_id)
+        hash_parts = {field: values[position] for field, position in zip(self.fields, self._positions)}
+        serialized_obj = json.dumps(hash_parts, sort_keys=True)
+        return hashlib.sha256(serialized_obj.encode()).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _hasher_for_keys(keys):
+    return StreamHasher(keys)
@@ -0,0 +1,195 @@
+"""
+Atomic connection slot allocation for M3U account profiles.
+
+A profile with max_streams > 0 may only serve that many concurrent streams, tracked
+in profile_connections:<profile_id>. Picking a profile used to be a read, a check
+and an INCR in separate round-trips, so a burst of clients could all see the same
+free slot and oversubscribe the provider. The Lua scripts below do the capacity
+check, the INCR and the channel_stream/stream_profile bookkeeping in one atomic
+call. Keys are built inside the scripts from ids, Dispatcharr always talks to a
+single Redis node.
+
+Slots are (stream_id, profile_id, max_streams) triples in preference order:
+streams in channel order, each stream's active profiles with the default first.
+"""
+
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Returns {stream_id, profile_id, 1} for a new reservation, {stream_id, profile_id, 0}
+# when an assignment already exists and {} when every candidate profile is full.
+#   ARGV[1]  id the assignment is recorded under (channel_stream:<id>)
+#   ARGV[2]  "channel" reuses an existing channel_stream:<id> assignment,
+#            "stream" reuses an existing stream_profile:<id> assignment
+#   ARGV[3:] stream_id, profile_id, max_streams triples
+RESERVE_SCRIPT = """
+local owner = ARGV[1]
+local existing = owner
+if ARGV[2] == 'channel' then
+    existing = redis.call('GET', 'channel_stream:' .. owner)
+end
+if existing then
+    local profile = redis.call('GET', 'stream_profile:' .. existing)
+    if profile then
+        return {existing, profile, 0}
+    end
+end
+for i = 3, #ARGV, 3 do
+    local limit = tonumber(ARGV[i + 2])
+    local key = 'profile_connections:' .. ARGV[i + 1]
+    if limit == 0 or tonumber(redis.call('GET', key) or '0') < limit then
+        redis.call('SET', 'channel_stream:' .. owner, ARGV[i])
+        redis.call('SET', 'stream_profile:' .. ARGV[i], ARGV[i + 1])
+        if limit > 0 then
+            redis.call('INCR', key)
+        end
+        return {ARGV[i], ARGV[i + 1], 1}
+    end
+end
+return {}
+"""
+
+# Moves a channel's slot to another stream/profile. Returns 1 on success, 0 when the
+# channel has no assignment and -1 when the target profile is full.
+#   ARGV[1] channel id, ARGV[2] stream id, ARGV[3] profile id, ARGV[4] max_streams
+SWITCH_SCRIPT = """
+local owner = ARGV[1]
+local current_stream = redis.call('GET', 'channel_stream:' .. owner)
+if not current_stream then
+    return 0
+end
+local current_profile = redis.call('GET', 'stream_profile:' .. current_stream)
+if not current_profile then
+    return 0
+end
+if current_profile ~= ARGV[3] then
+    local limit = tonumber(ARGV[4])
+    local key = 'profile_connections:' .. ARGV[3]
+    if limit > 0 and tonumber(redis.call('GET', key) or '0') >= limit then
+        return -1
+    end
+    local old_key = 'profile_connections:' .. current_profile
+    if tonumber(redis.call('GET', old_key) or '0') > 0 then
+        redis.call('DECR', old_key)
+    end
+    if limit > 0 then
+        redis.call('INCR', key)
+    end
+end
+if current_stream ~= ARGV[2] then
+    redis.call('DEL', 'stream_profile:' .. current_stream)
+end
+redis.call('SET', 'channel_stream:' .. owner, ARGV[2])
+redis.call('SET', 'stream_profile:' .. ARGV[2], ARGV[3])
+return 1
+"""
+
+SWITCH_OK = 1
+SWITCH_NO_ASSIGNMENT = 0
+SWITCH_FULL = -1
+
+
+def ordered_profiles(profiles, require_default=True):
+    """Active profiles with the default first, empty if there's no active default and one is required"""
+    active = [profile for profile in profiles if profile.is_active]
+    default_profile = next((profile for profile in active if profile.is_default), None)
+    if not default_profile:
+        return [] if require_default else active
+    return [default_profile] + [profile for profile in active if not profile.is_default]
+
+
+def stream_candidates(streams, require_default=True):
+    """
+    (stream, profile) pairs in allocation order for an ordered list of streams.
+    Profiles for every stream's account are loaded in a single query.
+    """
+    from apps.m3u.models import M3UAccountProfile
+
+    streams = [
+        stream for stream in streams
+        if stream.m3u_account_id and stream.m3u_account.is_active
+    ]
+    profiles_by_account = defaultdict(list)
+    for profile in M3UAccountProfile.objects.filter(
+        m3u_account_id__in={stream.m3u_account_id for stream in streams}
+    ):
+        profiles_by_account[profile.m3u_account_id].append(profile)
+
+    candidates = []
+    for stream in streams:
+        profiles = ordered_profiles(profiles_by_account[stream.m3u_account_id], require_default)
+        if not profiles:
+            logger.debug(f"M3U account {stream.m3u_account_id} has no active default profile")
+        candidates.extend((stream, profile) for profile in profiles)
+    return candidates
+
+
+def candidate_slots(candidates):
+    """(stream_id, profile_id, max_streams) triples for stream_candidates() pairs"""
+    return [(stream.id, profile.id, profile.max_streams) for stream, profile in candidates]
+
+
+def reserve_slot(redis_client, owner_id, slots, reuse="channel"):
+    """
+    Atomically reserve the first slot whose profile has capacity. slots are
+    (stream_id, profile_id, max_streams) triples, with no slots this only returns
+    an existing assignment.
+
+    Returns (stream_id, profile_id, reserved): reserved is False when an existing
+    assignment was returned. (None, None, False) means every profile is full.
+    """
+    args = [owner_id, reuse]
+    for slot in slots:
+        args.extend(slot)
+
+    result = redis_client.register_script(RESERVE_SCRIPT)(args=args)
+    if not result:
+        return None, None, False
+
+    stream_id, profile_id, reserved = result
+    return int(stream_id), int(profile_id), bool(int(reserved))
+
+
+def switch_slot(redis_client, channel_id, stream_id, profile_id, max_streams):
+    """Atomically move a channel's slot, returns one of the SWITCH_* results"""
+    return int(redis_client.register_script(SWITCH_SCRIPT)(
+        args=[channel_id, stream_id, profile_id, max_streams]
+    ))
+
+
+def first_available(redis_client, channel_id, candidates):
+    """
+    Read-only check used to plan a stream switch: for each stream, the first profile
+    with capacity, as {stream_id: profile}. The profile the channel currently holds
+    counts as free for it. All counters are read in one round-trip.
+    """
+    if not candidates:
+        return {}
+
+    profile_ids = list(dict.fromkeys(profile.id for _, profile in candidates))
+    pipe = redis_client.pipeline()
+    pipe.get(f"channel_stream:{channel_id}")
+    pipe.mget([f"profile_connections:{profile_id}" for profile_id in profile_ids])
+    existing_stream_id, counts = pipe.execute()
+
+    current_profile_id = None
+    if existing_stream_id:
+        existing_profile_id = redis_client.get(f"stream_profile:{existing_stream_id.decode('utf-8')}")
+        if existing_profile_id:
+            current_profile_id = int(existing_profile_id)
+
+    connections = {profile_id: int(count or 0) for profile_id, count in zip(profile_ids, counts)}
+
+    available = {}
+    for stream, profile in candidates:
+        if stream.id in available:
+            continue
+        # The channel's own slot is reused when it switches within the same profile
+        effective = connections[profile.id] - (1 if profile.id == current_profile_id else 0)
+        if profile.max_streams == 0 or effective < profile.max_streams:
+            available[stream.id] = profile
+        else:
+            logger.debug(f"Profile {profile.id} at max connections: {effective}/{profile.max_streams}")
+    return available
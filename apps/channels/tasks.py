@@ -19,6 +19,8 @@ from rapidfuzz import fuzz
 from apps.channels.models import Channel
 from apps.epg.models import EPGData
 from core.models import CoreSettings
+from apps.output.cache import invalidate_output_cache
+from .embedding_store import EmbeddingStore, ENCODE_BATCH_SIZE, top_cosine_matches
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -82,6 +84,9 @@ _ml_model_cache = {
     'sentence_transformer': None
 }
 
+ML_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ML_CACHE_DIR = "/data/models"
+
 def get_sentence_transformer():
     """Lazy load the sentence transformer model only when needed"""
     if _ml_model_cache['sentence_transformer'] is None:
@@ -89,8 +94,8 @@ def get_sentence_transformer():
             from sentence_transformers import SentenceTransformer
             from sentence_transformers import util
 
-            model_name = "sentence-transformers/all-MiniLM-L6-v2"
-            cache_dir = "/data/models"
+            model_name = ML_MODEL_NAME
+            cache_dir = ML_CACHE_DIR
 
             # Check environment variable to disable downloads
             disable_downloads = os.environ.get('DISABLE_ML_DOWNLOADS', 'false').lower() == 'true'
@@ -170,6 +175,134 @@ def normalize_name(name: str) -> str:
     norm = " ".join(tokens).strip()
     return norm
 
+# Region codes embedded in EPG ids like "cnn.us" or "bbc1.uk"
+REGION_CODE_RE = re.compile(r'\.([a-z]{2})')
+
+# Channels scored against the whole EPG list per vectorized fuzzy block
+FUZZY_BLOCK_SIZE = 128
+
+
+class EPGMatchIndex:
+    """
+    Lookup structures for match_channels_to_epg, built once per matching run.
+
+    Exact ids resolve through a dict instead of scanning the EPG list per channel,
+    and everything the fuzzy stage needs per EPG row (normalized name, region
+    bonus) is computed up front so scoring becomes a pure string comparison.
+    """
+
+    def __init__(self, epg_data, region_code=None):
+        # First row wins for duplicate tvg_ids, same as the old linear scans
+        self.by_tvg_id = {}
+        for row in epg_data:
+            if row["tvg_id"]:
+                self.by_tvg_id.setdefault(row["tvg_id"], row)
+
+        # Rows that can take part in fuzzy/ML matching, in epg_data order
+        self.named_rows = [row for row in epg_data if row.get("norm_name")]
+        self.names = [row["norm_name"] for row in self.named_rows]
+        self.bonuses = [self.region_bonus(row, region_code) for row in self.named_rows]
+
+    @staticmethod
+    def region_bonus(row, region_code):
+        """Score adjustment for an EPG row based on the preferred region"""
+        if not region_code or not row.get("tvg_id"):
+            return 0
+
+        combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
+        dot_regions = REGION_CODE_RE.findall(combined_text)
+
+        if dot_regions:
+            # Bigger bonus for matching region, penalty for a different one
+            return 15 if region_code in dot_regions else -15
+        if region_code in combined_text:
+            return 10
+        return 0
+
+    def find_exact(self, chan):
+        """Return (epg_row, id_type) for an exact tvg_id or gracenote id match, or (None, None)"""
+        # The separate "legacy" tvg_id check compared the same value, so one lookup covers both
+        tvg_id = chan.get("tvg_id")
+        if tvg_id and tvg_id in self.by_tvg_id:
+            return self.by_tvg_id[tvg_id], "tvg_id"
+
+        gracenote_id = chan.get("gracenote_id")
+        if gracenote_id and gracenote_id in self.by_tvg_id:
+            return self.by_tvg_id[gracenote_id], "gracenote_id"
+
+        return None, None
+
+    def best_fuzzy_matches(self, queries, block_size=FUZZY_BLOCK_SIZE):
+        """
+        Return a (score, epg_row) pair per normalized channel name, where score is
+        fuzz.ratio plus the region bonus. epg_row is None when nothing scored above 0.
+        Ties go to the earliest EPG row.
+        """
+        if not queries or not self.names:
+            return [(0, None)] * len(queries)
+
+        try:
+            import numpy as np
+            from rapidfuzz import process
+        except ImportError:
+            return [self._best_fuzzy_match(query) for query in queries]
+
+        bonuses = np.asarray(self.bonuses, dtype=np.float64)
+        results = []
+        for start in range(0, len(queries), block_size):
+            scores = process.cdist(
+                queries[start:start + block_size], self.names,
+                scorer=fuzz.ratio, dtype=np.float64, workers=-1,
+            )
+            scores += bonuses
+            for row_scores in scores:
+                best = int(row_scores.argmax())
+                score = float(row_scores[best])
+                results.append((score, self.named_rows[best]) if score > 0 else (0, None))
+        return results
+
+    def _best_fuzzy_match(self, query):
+        """Pure Python fallback for best_fuzzy_matches when numpy is unavailable"""
+        best_score = 0
+        best_epg = None
+        for row, name, bonus in zip(self.named_rows, self.names, self.bonuses):
+            score = fuzz.ratio(query, name) + bonus
+            if score > best_score:
+                best_score = score
+                best_epg = row
+        return best_score, best_epg
+
+
+def ml_top_matches(match_index, queries):
+    """
+    Return (EPG row index, cosine similarity) of the closest EPG name for each
+    normalized channel name, or None when the ML model is unavailable.
+
+    EPG name embeddings come from the on-disk store so only names that are new
+    since the last run get encoded, and all channels are scored in one batch.
+    """
+    if not queries or not match_index.names:
+        return None
+
+    st_model, _ = get_sentence_transformer()
+    if not st_model:
+        return None
+
+    def encode(names):
+        return st_model.encode(names, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True)
+
+    try:
+        store = EmbeddingStore.for_model(ML_CACHE_DIR, ML_MODEL_NAME)
+        epg_embeddings = store.get_embeddings(match_index.names, encode)
+        chan_embeddings = st_model.encode(
+            queries, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return top_cosine_matches(chan_embeddings, epg_embeddings)
+    except Exception as e:
+        logger.warning(f"ML matching failed: {e}")
+        return None
+
+
 def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True, send_progress=True):
     """
     EPG matching logic that finds the best EPG matches for channels using
@@ -187,9 +320,7 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
     if send_progress:
         send_epg_matching_progress(total_channels, 0, stage="starting")
 
-    # Try to get ML models if requested (but don't load yet - lazy loading)
-    st_model, util = None, None
-    epg_embeddings = None
+    # ML matching is only loaded if a channel actually needs it (lazy loading)
     ml_available = use_ml
 
     # Automatically determine matching strategy based on number of channels
@@ -211,11 +342,36 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
         ML_HIGH_CONFIDENCE = 0.65       # Original threshold
         ML_LAST_RESORT = 0.50          # Original desperate threshold
         FUZZY_LAST_RESORT_MIN = 20     # Original minimum
-        logger.info("Using aggressive thresholds for single channel matching")    # Process each channel
+        logger.info("Using aggressive thresholds for single channel matching")
+
+    match_index = EPGMatchIndex(epg_data, region_code)
+
+    # Score every channel that needs the fuzzy stage in one vectorized pass
+    fuzzy_positions = [
+        position for position, chan in enumerate(channels_data)
+        if chan["norm_chan"] and match_index.find_exact(chan)[0] is None
+    ]
+    fuzzy_results = dict(zip(
+        fuzzy_positions,
+        match_index.best_fuzzy_matches([channels_data[position]["norm_chan"] for position in fuzzy_positions]),
+    ))
+
+    # Channels that may fall through to the ML stage, embedded together on first use
+    ml_positions = [
+        position for position, (score, row) in fuzzy_results.items()
+        if row is not None and FUZZY_LAST_RESORT_MIN <= score < FUZZY_HIGH_CONFIDENCE
+    ] if ml_available else []
+    ml_results = None
+
+    def get_ml_match(position):
+        nonlocal ml_results
+        if ml_results is None:
+            matches = ml_top_matches(match_index, [channels_data[p]["norm_chan"] for p in ml_positions])
+            ml_results = dict(zip(ml_positions, matches)) if matches else {}
+        return ml_results.get(position)
+
+    # Process each channel
     for index, chan in enumerate(channels_data):
-        normalized_tvg_id = chan.get("tvg_id", "")
-        fallback_name = chan["tvg_id"].strip() if chan["tvg_id"] else chan["name"]
-
         # Send progress update every 5 channels or for the first few
         if send_progress and (index < 5 or index % 5 == 0 or index == total_channels - 1):
             send_epg_matching_progress(
@@ -224,80 +380,27 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
                 current_channel_name=chan["name"][:50],  # Truncate long names
                 stage="matching"
             )
-        normalized_tvg_id = chan.get("tvg_id", "")
         fallback_name = chan["tvg_id"].strip() if chan["tvg_id"] else chan["name"]
 
-        # Step 1: Exact TVG ID match
-        epg_by_tvg_id = next((epg for epg in epg_data if epg["tvg_id"] == normalized_tvg_id), None)
-        if normalized_tvg_id and epg_by_tvg_id:
-            chan["epg_data_id"] = epg_by_tvg_id["id"]
+        # Steps 1-2: Exact TVG ID / Gracenote ID match
+        exact_epg, id_type = match_index.find_exact(chan)
+        if exact_epg:
+            chan["epg_data_id"] = exact_epg["id"]
             channels_to_update.append(chan)
-            matched_channels.append((chan['id'], fallback_name, epg_by_tvg_id["tvg_id"]))
-            logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by exact tvg_id={epg_by_tvg_id['tvg_id']}")
+            if id_type == "tvg_id":
+                matched_channels.append((chan['id'], fallback_name, exact_epg["tvg_id"]))
+                logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by exact tvg_id={exact_epg['tvg_id']}")
+            else:
+                matched_channels.append((chan['id'], fallback_name, f"gracenote:{exact_epg['tvg_id']}"))
+                logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by exact gracenote_id={chan['gracenote_id']}")
             continue
 
-        # Step 2: Secondary TVG ID check (legacy compatibility)
-        if chan["tvg_id"]:
-            epg_match = [epg["id"] for epg in epg_data if epg["tvg_id"] == chan["tvg_id"]]
-            if epg_match:
-                chan["epg_data_id"] = epg_match[0]
-                channels_to_update.append(chan)
-                matched_channels.append((chan['id'], fallback_name, chan["tvg_id"]))
-                logger.info(f"Channel {chan['id']} '{chan['name']}' => EPG found by secondary tvg_id={chan['tvg_id']}")
-                continue
-
-        # Step 2.5: Exact Gracenote ID match
-        normalized_gracenote_id = chan.get("gracenote_id", "")
-        if normalized_gracenote_id:
-            epg_by_gracenote_id = next((epg for epg in epg_data if epg["tvg_id"] == normalized_gracenote_id), None)
-            if epg_by_gracenote_id:
-                chan["epg_data_id"] = epg_by_gracenote_id["id"]
-                channels_to_update.append(chan)
-                matched_channels.append((chan['id'], fallback_name, f"gracenote:{epg_by_gracenote_id['tvg_id']}"))
-                logger.info(f"Channel {chan['id']} '{fallback_name}' => EPG found by exact gracenote_id={normalized_gracenote_id}")
-                continue
-
         # Step 3: Name-based fuzzy matching
         if not chan["norm_chan"]:
             logger.debug(f"Channel {chan['id']} '{chan['name']}' => empty after normalization, skipping")
             continue
 
-        best_score = 0
-        best_epg = None
-
-        # Debug: show what we're matching against
-        logger.debug(f"Fuzzy matching '{chan['norm_chan']}' against EPG entries...")
-
-        # Find best fuzzy match
-        for row in epg_data:
-            if not row.get("norm_name"):
-                continue
-
-            base_score = fuzz.ratio(chan["norm_chan"], row["norm_name"])
-            bonus = 0
-
-            # Apply region-based bonus/penalty
-            if region_code and row.get("tvg_id"):
-                combined_text = row["tvg_id"].lower() + " " + row["name"].lower()
-                dot_regions = re.findall(r'\.([a-z]{2})', combined_text)
-
-                if dot_regions:
-                    if region_code in dot_regions:
-                        bonus = 15  # Bigger bonus for matching region
-                    else:
-                        bonus = -15  # Penalty for different region
-                elif region_code in combined_text:
-                    bonus = 10
-
-            score = base_score + bonus
-
-            # Debug the best few matches
-            if score > 50:  # Only show decent matches
-                logger.debug(f"  EPG '{row['name']}' (norm: '{row['norm_name']}') => score: {score} (base: {base_score}, bonus: {bonus})")
-
-            if score > best_score:
-                best_score = score
-                best_epg = row
+        best_score, best_epg = fuzzy_results[index]
 
         # Log the best score we found
         if best_epg:
@@ -315,104 +418,53 @@ def match_channels_to_epg(channels_data, epg_data, region_code=None, use_ml=True
 
         # Medium confidence - use ML if available (lazy load models here)
         elif best_score >= FUZZY_MEDIUM_CONFIDENCE and ml_available:
-            # Lazy load ML models only when we actually need them
-            if st_model is None:
-                st_model, util = get_sentence_transformer()
-
-            # Lazy generate embeddings only when we actually need them
-            if epg_embeddings is None and st_model and any(row.get("norm_name") for row in epg_data):
-                try:
-                    logger.info("Generating embeddings for EPG data using ML model (lazy loading)")
-                    epg_embeddings = st_model.encode(
-                        [row["norm_name"] for row in epg_data if row.get("norm_name")],
-                        convert_to_tensor=True
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to generate embeddings: {e}")
-                    epg_embeddings = None
-
-            if epg_embeddings is not None and st_model:
-                try:
-                    # Generate embedding for this channel
-                    chan_embedding = st_model.encode(chan["norm_chan"], convert_to_tensor=True)
-
-                    # Calculate similarity with all EPG embeddings
-                    sim_scores = util.cos_sim(chan_embedding, epg_embeddings)[0]
-                    top_index = int(sim_scores.argmax())
-                    top_value = float(sim_scores[top_index])
+            ml_match = get_ml_match(index)
+            if ml_match is not None:
+                top_index, top_value = ml_match
+
+                if top_value >= ML_HIGH_CONFIDENCE:
+                    # Find the EPG entry that corresponds to this embedding index
+                    matched_epg = match_index.named_rows[top_index]
+
+                    chan["epg_data_id"] = matched_epg["id"]
+                    channels_to_update.append(chan)
+                    matched_channels.append((chan['id'], chan['name'], matched_epg["tvg_id"]))
+                    logger.info(f"Channel {chan['id']} '{chan['name']}' => matched EPG tvg_id={matched_epg['tvg_id']} (fuzzy={best_score}, ML-sim={top_value:.2f})")
+                else:
+                    logger.info(f"Channel {chan['id']} '{chan['name']}' => fuzzy={best_score}, ML-sim={top_value:.2f} < {ML_HIGH_CONFIDENCE}, trying last resort...")
 
-                    if top_value >= ML_HIGH_CONFIDENCE:
-                        # Find the EPG entry that corresponds to this embedding index
-                        epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
-                        matched_epg = epg_with_names[top_index]
+                    # Last resort: try ML with very low fuzzy threshold
+                    if top_value >= ML_LAST_RESORT:  # Dynamic last resort threshold
+                        matched_epg = match_index.named_rows[top_index]
 
                         chan["epg_data_id"] = matched_epg["id"]
                         channels_to_update.append(chan)
                         matched_channels.append((chan['id'], chan['name'], matched_epg["tvg_id"]))
-                        logger.info(f"Channel {chan['id']} '{chan['name']}' => matched EPG tvg_id={matched_epg['tvg_id']} (fuzzy={best_score}, ML-sim={top_value:.2f})")
+                        logger.info(f"Channel {chan['id']} '{chan['name']}' => LAST RESORT match EPG tvg_id={matched_epg['tvg_id']} (fuzzy={best_score}, ML-sim={top_value:.2f})")
                     else:
-                        logger.info(f"Channel {chan['id']} '{chan['name']}' => fuzzy={best_score}, ML-sim={top_value:.2f} < {ML_HIGH_CONFIDENCE}, trying last resort...")
-
-                        # Last resort: try ML with very low fuzzy threshold
-                        if top_value >= ML_LAST_RESORT:  # Dynamic last resort threshold
-                            epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
-                            matched_epg = epg_with_names[top_index]
-
-                            chan["epg_data_id"] = matched_epg["id"]
-                            channels_to_update.append(chan)
-                            matched_channels.append((chan['id'], chan['name'], matched_epg["tvg_id"]))
-                            logger.info(f"Channel {chan['id']} '{chan['name']}' => LAST RESORT match EPG tvg_id={matched_epg['tvg_id']} (fuzzy={best_score}, ML-sim={top_value:.2f})")
-                        else:
-                            logger.info(f"Channel {chan['id']} '{chan['name']}' => even last resort ML-sim {top_value:.2f} < {ML_LAST_RESORT}, skipping")
-
-                except Exception as e:
-                    logger.warning(f"ML matching failed for channel {chan['id']}: {e}")
-                    # Fall back to non-ML decision
-                    logger.info(f"Channel {chan['id']} '{chan['name']}' => fuzzy score {best_score} below threshold, skipping")
+                        logger.info(f"Channel {chan['id']} '{chan['name']}' => even last resort ML-sim {top_value:.2f} < {ML_LAST_RESORT}, skipping")
+            else:
+                logger.info(f"Channel {chan['id']} '{chan['name']}' => fuzzy score {best_score} below threshold, skipping")
 
         # Last resort: Try ML matching even with very low fuzzy scores
         elif best_score >= FUZZY_LAST_RESORT_MIN and ml_available:
-            # Lazy load ML models for last resort attempts
-            if st_model is None:
-                st_model, util = get_sentence_transformer()
-
-            # Lazy generate embeddings for last resort attempts
-            if epg_embeddings is None and st_model and any(row.get("norm_name") for row in epg_data):
-                try:
-                    logger.info("Generating embeddings for EPG data using ML model (last resort lazy loading)")
-                    epg_embeddings = st_model.encode(
-                        [row["norm_name"] for row in epg_data if row.get("norm_name")],
-                        convert_to_tensor=True
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to generate embeddings for last resort: {e}")
-                    epg_embeddings = None
-
-            if epg_embeddings is not None and st_model:
-                try:
-                    logger.info(f"Channel {chan['id']} '{chan['name']}' => trying ML as last resort (fuzzy={best_score})")
-                    # Generate embedding for this channel
-                    chan_embedding = st_model.encode(chan["norm_chan"], convert_to_tensor=True)
-
-                    # Calculate similarity with all EPG embeddings
-                    sim_scores = util.cos_sim(chan_embedding, epg_embeddings)[0]
-                    top_index = int(sim_scores.argmax())
-                    top_value = float(sim_scores[top_index])
-
-                    if top_value >= ML_LAST_RESORT:  # Dynamic threshold for desperate attempts
-                        # Find the EPG entry that corresponds to this embedding index
-                        epg_with_names = [epg for epg in epg_data if epg.get("norm_name")]
-                        matched_epg = epg_with_names[top_index]
-
-                        chan["epg_data_id"] = matched_epg["id"]
-                        channels_to_update.append(chan)
-                        matched_channels.append((chan['id'], chan['name'], matched_epg["tvg_id"]))
-                        logger.info(f"Channel {chan['id']} '{chan['name']}' => DESPERATE LAST RESORT match EPG tvg_id={matched_epg['tvg_id']} (fuzzy={best_score}, ML-sim={top_value:.2f})")
-                    else:
-                        logger.info(f"Channel {chan['id']} '{chan['name']}' => desperate last resort ML-sim {top_value:.2f} < {ML_LAST_RESORT}, giving up")
-                except Exception as e:
-                    logger.warning(f"Last resort ML matching failed for channel {chan['id']}: {e}")
-                    logger.info(f"Channel {chan['id']} '{chan['name']}' => best fuzzy score={best_score} < {FUZZY_MEDIUM_CONFIDENCE}, giving up")
+            ml_match = get_ml_match(index)
+            if ml_match is not None:
+                top_index, top_value = ml_match
+                logger.info(f"Channel {chan['id']} '{chan['name']}' => trying ML as last resort (fuzzy={best_score})")
+
+                if top_value >= ML_LAST_RESORT:  # Dynamic threshold for desperate attempts
+                    # Find the EPG entry that corresponds to this embedding index
+                    matched_epg = match_index.named_rows[top_index]
+
+                    chan["epg_data_id"] = matched_epg["id"]
+                    channels_to_update.append(chan)
+                    matched_channels.append((chan['id'], chan['name'], matched_epg["tvg_id"]))
+                    logger.info(f"Channel {chan['id']} '{chan['name']}' => DESPERATE LAST RESORT match EPG tvg_id={matched_epg['tvg_id']} (fuzzy={best_score}, ML-sim={top_value:.2f})")
+                else:
+                    logger.info(f"Channel {chan['id']} '{chan['name']}' => desperate last resort ML-sim {top_value:.2f} < {ML_LAST_RESORT}, giving up")
+            else:
+                logger.info(f"Channel {chan['id']} '{chan['name']}' => best fuzzy score={best_score} < {FUZZY_MEDIUM_CONFIDENCE}, giving up")
         else:
             # No ML available or very low fuzzy score
             logger.info(f"Channel {chan['id']} '{chan['name']}' => best fuzzy score={best_score} < {FUZZY_MEDIUM_CONFIDENCE}, no ML fallback available")
@@ -446,11 +498,9 @@ def match_epg_channels():
         logger.info("Starting integrated EPG matching...")
 
         # Get region preference
-        try:
-            region_obj = CoreSettings.objects.get(key="preferred-region")
-            region_code = region_obj.value.strip().lower()
-        except CoreSettings.DoesNotExist:
-            region_code = None
+        region_code = CoreSettings.get_preferred_region()
+        if region_code is not None:
+            region_code = region_code.strip().lower()
 
         # Get channels that don't have EPG data assigned
         channels_without_epg = Channel.objects.filter(epg_data__isnull=True)
@@ -481,7 +531,7 @@ def match_epg_channels():
                 'original_tvg_id': epg.tvg_id,
                 'name': epg.name,
                 'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'epg_source_id': epg.epg_source_id,
             })
 
         logger.info(f"Processing {len(channels_data)} channels against {len(epg_data)} EPG entries")
@@ -512,6 +562,7 @@ def match_epg_channels():
 
             # Bulk update all channels
             Channel.objects.bulk_update(channels_list, ["epg_data"])
+            invalidate_output_cache()
 
         total_matched = len(matched_channels)
         if total_matched:
@@ -569,11 +620,9 @@ def match_selected_channels_epg(channel_ids):
         logger.info(f"Starting integrated EPG matching for {len(channel_ids)} selected channels...")
 
         # Get region preference
-        try:
-            region_obj = CoreSettings.objects.get(key="preferred-region")
-            region_code = region_obj.value.strip().lower()
-        except CoreSettings.DoesNotExist:
-            region_code = None
+        region_code = CoreSettings.get_preferred_region()
+        if region_code is not None:
+            region_code = region_code.strip().lower()
 
         # Get only the specified channels that don't have EPG data assigned
         channels_without_epg = Channel.objects.filter(
@@ -628,7 +677,7 @@ def match_selected_channels_epg(channel_ids):
                 'original_tvg_id': epg.tvg_id,
                 'name': epg.name,
                 'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'epg_source_id': epg.epg_source_id,
             })
 
         logger.info(f"Processing {len(channels_data)} selected channels against {len(epg_data)} EPG entries")
@@ -659,6 +708,7 @@ def match_selected_channels_epg(channel_ids):
 
             # Bulk update all channels
             Channel.objects.bulk_update(channels_list, ["epg_data"])
+            invalidate_output_cache()
 
         total_matched = len(matched_channels)
         if total_matched:
@@ -759,7 +809,7 @@ def match_single_channel_epg(channel_id):
                 'original_tvg_id': epg.tvg_id,
                 'name': epg.name,
                 'norm_name': normalize_name(epg.name),
-                'epg_source_id': epg.epg_source.id if epg.epg_source else None,
+                'epg_source_id': epg.epg_source_id,
             })
 
         if not epg_data_list:
@@ -1399,6 +1449,106 @@ def _build_output_paths(channel, program, start_time, end_time):
     return final_path, temp_ts_path, os.path.basename(final_path)
 
 
+def _record_via_http(channel, temp_ts_path, duration_seconds):
+    """
+    Record by streaming the channel back from our own TS proxy endpoint.
+    Only used when the in-process recorder can't attach (e.g. redirect profiles).
+    Returns (bytes_written, last_error).
+    """
+    from requests.exceptions import ReadTimeout, ConnectionError as ReqConnectionError, ChunkedEncodingError
+
+    # Determine internal base URL(s) for TS streaming
+    # Prefer explicit override, then try common ports for debug and docker
+    explicit = os.environ.get('DISPATCHARR_INTERNAL_TS_BASE_URL')
+    is_dev = (os.environ.get('DISPATCHARR_ENV', '').lower() == 'dev') or \
+             (os.environ.get('DISPATCHARR_DEBUG', '').lower() == 'true') or \
+             (os.environ.get('REDIS_HOST', 'redis') in ('localhost', '127.0.0.1'))
+    candidates = []
+    if explicit:
+        candidates.append(explicit)
+    if is_dev:
+        # Debug container typically exposes API on 5656
+        candidates.extend(['http://127.0.0.1:5656', 'http://127.0.0.1:9191'])
+    # Docker service name fallback
+    candidates.append(os.environ.get('DISPATCHARR_INTERNAL_API_BASE', 'http://web:9191'))
+    # Last-resort localhost ports
+    candidates.extend(['http://localhost:5656', 'http://localhost:9191'])
+
+    chosen_base = None
+    last_error = None
+    bytes_written = 0
+
+    # We'll attempt each base until we receive some data
+    for base in candidates:
+        try:
+            test_url = f"{base.rstrip('/')}/proxy/ts/stream/{channel.uuid}"
+            logger.info(f"DVR: trying TS base {base} -> {test_url}")
+
+            with requests.get(
+                test_url,
+                headers={
+                    'User-Agent': 'Dispatcharr-DVR',
+                },
+                stream=True,
+                timeout=(10, 15),
+            ) as response:
+                response.raise_for_status()
+
+                # Open the file and start copying; if we get any data within a short window, accept this base
+                got_any_data = False
+                test_window = 3.0  # seconds to detect first bytes
+                window_start = time.time()
+
+                with open(temp_ts_path, 'wb') as file:
+                    started_at = time.time()
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if not chunk:
+                            # keep-alives may be empty; continue
+                            if not got_any_data and (time.time() - window_start) > test_window:
+                                break
+                            continue
+                        # We have data
+                        got_any_data = True
+                        chosen_base = base
+                        # Fall through to full recording loop using this same response/connection
+                        file.write(chunk)
+                        bytes_written += len(chunk)
+                        elapsed = time.time() - started_at
+                        if elapsed > duration_seconds:
+                            break
+                        # Continue draining the stream
+                        for chunk2 in response.iter_content(chunk_size=8192):
+                            if not chunk2:
+                                continue
+                            file.write(chunk2)
+                            bytes_written += len(chunk2)
+                            elapsed = time.time() - started_at
+                            if elapsed > duration_seconds:
+                                break
+                        break  # exit outer for-loop once we switched to full drain
+
+                # If we wrote any bytes, treat as success and stop trying candidates
+                if bytes_written > 0:
+                    logger.info(f"DVR: selected TS base {base}; wrote initial {bytes_written} bytes")
+                    break
+                else:
+                    last_error = f"no_data_from_{base}"
+                    logger.warning(f"DVR: no data received from {base} within {test_window}s, trying next base")
+                    # Clean up empty temp file
+                    try:
+                        if os.path.exists(temp_ts_path) and os.path.getsize(temp_ts_path) == 0:
+                            os.remove(temp_ts_path)
+                    except Exception:
+                        pass
+        except Exception as e:
+            last_error = str(e)
+            logger.warning(f"DVR: attempt failed for base {base}: {e}")
+
+    if chosen_base is None and bytes_written == 0:
+        last_error = last_error or 'all_bases_failed'
+    return bytes_written, last_error
+
+
 @shared_task
 def run_recording(recording_id, channel_id, start_time_str, end_time_str):
     """
@@ -1687,111 +1837,21 @@ def run_recording(recording_id, channel_id, start_time_str, end_time_str):
         logger.debug(f"Unable to prime Recording metadata: {e}")
     interrupted = False
     interrupted_reason = None
-    bytes_written = 0
-
-    from requests.exceptions import ReadTimeout, ConnectionError as ReqConnectionError, ChunkedEncodingError
 
-    # Determine internal base URL(s) for TS streaming
-    # Prefer explicit override, then try common ports for debug and docker
-    explicit = os.environ.get('DISPATCHARR_INTERNAL_TS_BASE_URL')
-    is_dev = (os.environ.get('DISPATCHARR_ENV', '').lower() == 'dev') or \
-             (os.environ.get('DISPATCHARR_DEBUG', '').lower() == 'true') or \
-             (os.environ.get('REDIS_HOST', 'redis') in ('localhost', '127.0.0.1'))
-    candidates = []
-    if explicit:
-        candidates.append(explicit)
-    if is_dev:
-        # Debug container typically exposes API on 5656
-        candidates.extend(['http://127.0.0.1:5656', 'http://127.0.0.1:9191'])
-    # Docker service name fallback
-    candidates.append(os.environ.get('DISPATCHARR_INTERNAL_API_BASE', 'http://web:9191'))
-    # Last-resort localhost ports
-    candidates.extend(['http://localhost:5656', 'http://localhost:9191'])
-
-    chosen_base = None
-    last_error = None
-    bytes_written = 0
-    interrupted = False
-    interrupted_reason = None
-
-    # We'll attempt each base until we receive some data
-    for base in candidates:
-        try:
-            test_url = f"{base.rstrip('/')}/proxy/ts/stream/{channel.uuid}"
-            logger.info(f"DVR: trying TS base {base} -> {test_url}")
-
-            with requests.get(
-                test_url,
-                headers={
-                    'User-Agent': 'Dispatcharr-DVR',
-                },
-                stream=True,
-                timeout=(10, 15),
-            ) as response:
-                response.raise_for_status()
-
-                # Open the file and start copying; if we get any data within a short window, accept this base
-                got_any_data = False
-                test_window = 3.0  # seconds to detect first bytes
-                window_start = time.time()
-
-                with open(temp_ts_path, 'wb') as file:
-                    started_at = time.time()
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if not chunk:
-                            # keep-alives may be empty; continue
-                            if not got_any_data and (time.time() - window_start) > test_window:
-                                break
-                            continue
-                        # We have data
-                        got_any_data = True
-                        chosen_base = base
-                        # Fall through to full recording loop using this same response/connection
-                        file.write(chunk)
-                        bytes_written += len(chunk)
-                        elapsed = time.time() - started_at
-                        if elapsed > duration_seconds:
-                            break
-                        # Continue draining the stream
-                        for chunk2 in response.iter_content(chunk_size=8192):
-                            if not chunk2:
-                                continue
-                            file.write(chunk2)
-                            bytes_written += len(chunk2)
-                            elapsed = time.time() - started_at
-                            if elapsed > duration_seconds:
-                                break
-                        break  # exit outer for-loop once we switched to full drain
-
-                # If we wrote any bytes, treat as success and stop trying candidates
-                if bytes_written > 0:
-                    logger.info(f"DVR: selected TS base {base}; wrote initial {bytes_written} bytes")
-                    break
-                else:
-                    last_error = f"no_data_from_{base}"
-                    logger.warning(f"DVR: no data received from {base} within {test_window}s, trying next base")
-                    # Clean up empty temp file
-                    try:
-                        if os.path.exists(temp_ts_path) and os.path.getsize(temp_ts_path) == 0:
-                            os.remove(temp_ts_path)
-                    except Exception:
-                        pass
-        except Exception as e:
-            last_error = str(e)
-            logger.warning(f"DVR: attempt failed for base {base}: {e}")
-
-    if chosen_base is None and bytes_written == 0:
+    # Read the proxy buffer in-process, this worker registers as a recorder client
+    # instead of holding a web worker with an HTTP stream
+    from apps.proxy.ts_proxy.recorder import StreamRecorder
+    recorder = StreamRecorder(channel.uuid, temp_ts_path, duration_seconds, recording_id)
+    bytes_written = recorder.record()
+    last_error = recorder.error
+
+    if recorder.needs_http_fallback:
+        logger.info(f"DVR: in-process recorder unavailable ({recorder.error}), falling back to HTTP")
+        bytes_written, last_error = _record_via_http(channel, temp_ts_path, duration_seconds)
+    elif bytes_written > 0 and recorder.error:
+        # Channel stopped or went silent before the scheduled end
         interrupted = True
-        interrupted_reason = f"no_stream_data: {last_error or 'all_bases_failed'}"
-    else:
-        # If we ended before reaching planned duration, record reason
-        actual_elapsed = 0
-        try:
-            actual_elapsed = os.path.getsize(temp_ts_path) and (duration_seconds)  # Best effort; we streamed until duration or disconnect above
-        except Exception:
-            pass
-        # We cannot compute accurate elapsed here; fine to leave as is
-        pass
+        interrupted_reason = recorder.error
 
     # If no bytes were written at all, mark detail
     if bytes_written == 0 and not interrupted:
@@ -2677,6 +2737,8 @@ def bulk_create_channels_from_streams(self, stream_ids, channel_profile_ids=None
                 if channel_profile_memberships:
                     ChannelProfileMembership.objects.bulk_create(channel_profile_memberships, ignore_conflicts=True)
 
+            invalidate_output_cache()
+
         # Send completion update
         send_websocket_update('updates', 'update', {
             'type': 'bulk_channel_creation_progress',
@@ -2764,6 +2826,7 @@ def set_channels_names_from_epg(self, channel_ids):
             # Bulk update the batch
             if batch_updates:
                 Channel.objects.bulk_update(batch_updates, ['name'])
+                invalidate_output_cache()
 
             # Send progress update
             progress = min(i + batch_size, total_channels)
@@ -2890,6 +2953,7 @@ def set_channels_logos_from_epg(self, channel_ids):
             # Bulk update the batch
             if batch_updates:
                 Channel.objects.bulk_update(batch_updates, ['logo'])
+                invalidate_output_cache()
 
             # Send progress update
             progress = min(i + batch_size, total_channels)
@@ -2988,6 +3052,7 @@ def set_channels_tvg_ids_from_epg(self, channel_ids):
             # Bulk update the batch
             if batch_updates:
                 Channel.objects.bulk_update(batch_updates, ['tvg_id'])
+                invalidate_output_cache()
 
             # Send progress update
             progress = min(i + batch_size, total_channels)
@@ -3034,3 +3099,45 @@ def set_channels_tvg_ids_from_epg(self, channel_ids):
             'error': str(e)
         })
         raise
+
+
+@shared_task
+def prefetch_logos(max_workers=8):
+    """
+    Warm the on-disk logo cache with every remote logo used by a channel, so guide
+    loads in Plex/Emby are served from local files.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import connections
+    from core.utils import acquire_task_lock, release_task_lock
+    from apps.channels.models import Logo
+    from . import logo_cache
+
+    if not acquire_task_lock('prefetch_logos', 'all'):
+        logger.debug("Logo prefetch already running")
+        return "Task already running"
+
+    try:
+        urls = [
+            url for url in Logo.objects.filter(channels__isnull=False)
+            .values_list('url', flat=True).distinct()
+            if url.startswith(('http://', 'https://')) and not logo_cache.is_fresh(url)
+        ]
+        # Don't hold a connection open while fetching
+        connections.close_all()
+        logger.info(f"Prefetching {len(urls)} channel logos")
+
+        def warm(url):
+            try:
+                return logo_cache.get_logo(url)
+            except logo_cache.LogoTooLarge:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            cached = sum(1 for entry in executor.map(warm, urls) if entry)
+
+        logo_cache.evict()
+        logger.info(f"Logo prefetch complete: {cached}/{len(urls)} cached")
+        return f"{cached} logos cached"
+    finally:
+        release_task_lock('prefetch_logos', 'all')
@@ -0,0 +1,31 @@
+from django.test import SimpleTestCase
+
+from apps.channels.epg_match_benchmark import build_fixture, legacy_best_matches
+from apps.channels.tasks import EPGMatchIndex, match_channels_to_epg
+
+
+class EPGMatchIndexTests(SimpleTestCase):
+    def test_matches_agree_with_linear_scan(self):
+        channels_data, epg_data, _ = build_fixture(200, 2000)
+        baseline = legacy_best_matches(channels_data, epg_data, region_code="us")
+
+        result = match_channels_to_epg(
+            [dict(chan) for chan in channels_data], epg_data, "us", use_ml=False, send_progress=False
+        )
+        matched = {chan["id"]: chan["epg_data_id"] for chan in result["channels_to_update"]}
+
+        for chan in channels_data:
+            epg_id, score = baseline[chan["id"]]
+            expected = epg_id if epg_id is not None and (score is None or score >= 90) else None
+            self.assertEqual(matched.get(chan["id"]), expected, chan["name"])
+
+    def test_exact_ids_use_first_duplicate(self):
+        epg_data = [
+            {"id": 1, "tvg_id": "cnn.us", "name": "CNN", "norm_name": "cnn"},
+            {"id": 2, "tvg_id": "cnn.us", "name": "CNN HD", "norm_name": "cnn"},
+        ]
+        index = EPGMatchIndex(epg_data)
+
+        row, id_type = index.find_exact({"tvg_id": "", "gracenote_id": "cnn.us"})
+        self.assertEqual((row["id"], id_type), (1, "gracenote_id"))
+        self.assertEqual(index.find_exact({"tvg_id": "", "gracenote_id": ""}), (None, None))
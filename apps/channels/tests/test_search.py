@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.core.paginator import EmptyPage
+from django.test import SimpleTestCase, override_settings
+from rest_framework.filters import OrderingFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.channels.models import Stream
+from apps.channels.search import EstimatedCountPaginator, IndexedSearchFilter, KeysetPagination
+
+
+class IndexedSearchFilterTests(SimpleTestCase):
+    def test_related_terms_become_subqueries(self):
+        search = IndexedSearchFilter()
+        query = search.term_query(Stream, "name", "news") | search.term_query(
+            Stream, "channel_group__name", "news"
+        )
+        sql = str(Stream.objects.filter(query).query)
+        self.assertIn("channel_group_id\" IN (SELECT", sql)
+        self.assertNotIn("JOIN", sql)
+
+
+class StreamListView:
+    filter_backends = [OrderingFilter]
+    ordering_fields = ["name", "channel_group__name"]
+    ordering = ["-name"]
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    def ordering(self, **params):
+        request = Request(APIRequestFactory().get("/", params))
+        return KeysetPagination().get_ordering(request, Stream.objects.none(), StreamListView())
+
+    def test_ordering_ties_break_on_id(self):
+        self.assertEqual(self.ordering(), ("-name", "-id"))
+        self.assertEqual(self.ordering(ordering="name"), ("name", "id"))
+
+    def test_related_ordering_falls_back_to_id(self):
+        self.assertEqual(self.ordering(ordering="channel_group__name"), ("-id",))
+
+
+class Rows(list):
+    """List standing in for a queryset, estimate_count is patched"""
+
+    query = None
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=100)
+class EstimatedCountPaginatorTests(SimpleTestCase):
+    def paginator(self, rows, estimate):
+        patcher = mock.patch("apps.channels.search.estimate_count", return_value=estimate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return EstimatedCountPaginator(Rows(range(rows)), 50)
+
+    def test_pages_past_a_low_estimate_are_reachable(self):
+        paginator = self.paginator(rows=300, estimate=125)
+        page = paginator.page(3)
+        self.assertEqual(len(page), 50)
+        self.assertTrue(page.has_next())
+        self.assertTrue(paginator.count_is_estimate)
+        self.assertEqual(paginator.count, 151)
+
+        page = paginator.page(6)
+        self.assertEqual(list(page), list(range(250, 300)))
+        self.assertFalse(page.has_next())
+
+    def test_short_page_makes_the_count_exact(self):
+        paginator = self.paginator(rows=120, estimate=500)
+        page = paginator.page(3)
+        self.assertEqual(len(page), 20)
+        self.assertFalse(page.has_next())
+        self.assertFalse(paginator.count_is_estimate)
+        self.assertEqual(paginator.count, 120)
+
+    def test_page_past_the_end_is_empty(self):
+        paginator = self.paginator(rows=120, estimate=500)
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+        self.assertTrue(paginator.count_is_estimate)
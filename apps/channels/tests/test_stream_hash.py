@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from apps.channels.stream_hash import StreamHasher, is_current_hash
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+
+
+class StreamHashTests(SimpleTestCase):
+    def test_hash_is_versioned(self):
+        hasher = StreamHasher.for_keys(["name", "url"])
+        stream_hash = hasher.hash("News", "http://example.com/1", None)
+        self.assertTrue(is_current_hash(stream_hash))
+        self.assertFalse(is_current_hash(hasher.legacy_hash("News", "http://example.com/1", None)))
+
+    def test_preview_channel_id_survives_ts_proxy_keys(self):
+        # Stream previews use the stream hash as the TS proxy channel id
+        channel_id = StreamHasher.for_keys(["name", "url"]).hash("News", "http://example.com/1", None)
+
+        for key in (RedisKeys.channel_metadata(channel_id), RedisKeys.clients(channel_id)):
+            self.assertEqual(key.split(":")[2], channel_id)
+        self.assertEqual(RedisKeys.chunks_channel(channel_id).rsplit(":", 1)[-1], channel_id)
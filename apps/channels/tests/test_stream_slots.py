@@ -0,0 +1,93 @@
+import threading
+
+import redis
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from apps.channels.stream_slots import (
+    SWITCH_FULL,
+    SWITCH_OK,
+    reserve_slot,
+    switch_slot,
+)
+
+# Ids well outside anything a dev database would hand out
+BASE_ID = 9_900_000
+# Channel, stream and profile ids used by the tests are BASE_ID + 0..ID_RANGE-1
+ID_RANGE = 41
+
+
+def candidate(stream_id, profile_id, max_streams):
+    return (BASE_ID + stream_id, BASE_ID + profile_id, max_streams)
+
+
+class StreamSlotTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = redis.Redis(
+            host=getattr(settings, "REDIS_HOST", "localhost"),
+            port=int(getattr(settings, "REDIS_PORT", 6379)),
+            db=int(getattr(settings, "REDIS_DB", 0)),
+        )
+        try:
+            self.redis.ping()
+        except redis.exceptions.ConnectionError:
+            self.skipTest("Redis is not available")
+        self._cleanup()
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        # Delete only the keys these tests can create, never a pattern in a shared database
+        self.redis.delete(*[
+            f"{prefix}:{BASE_ID + offset}"
+            for prefix in ("channel_stream", "stream_profile", "profile_connections")
+            for offset in range(ID_RANGE)
+        ])
+
+    def test_concurrent_reservations_never_oversubscribe(self):
+        # Two limited profiles on the first stream, an unlimited fallback on the second
+        candidates = [candidate(1, 1, 3), candidate(1, 2, 2), candidate(2, 3, 0)]
+        results = []
+        barrier = threading.Barrier(40)
+
+        def tune_in(channel_id):
+            barrier.wait()
+            results.append(reserve_slot(self.redis, BASE_ID + channel_id, candidates))
+
+        threads = [threading.Thread(target=tune_in, args=(i,)) for i in range(40)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        profiles = [profile_id - BASE_ID for _, profile_id, _ in results]
+        self.assertEqual(profiles.count(1), 3)
+        self.assertEqual(profiles.count(2), 2)
+        self.assertEqual(profiles.count(3), 35)
+        self.assertEqual(int(self.redis.get(f"profile_connections:{BASE_ID + 1}")), 3)
+        self.assertEqual(int(self.redis.get(f"profile_connections:{BASE_ID + 2}")), 2)
+
+    def test_existing_assignment_is_reused(self):
+        candidates = [candidate(1, 1, 1)]
+        self.assertEqual(
+            reserve_slot(self.redis, BASE_ID, candidates),
+            (BASE_ID + 1, BASE_ID + 1, True),
+        )
+        self.assertEqual(
+            reserve_slot(self.redis, BASE_ID, candidates),
+            (BASE_ID + 1, BASE_ID + 1, False),
+        )
+        self.assertEqual(reserve_slot(self.redis, BASE_ID + 1, candidates), (None, None, False))
+        self.assertEqual(int(self.redis.get(f"profile_connections:{BASE_ID + 1}")), 1)
+
+    def test_switch_moves_slot_and_respects_capacity(self):
+        reserve_slot(self.redis, BASE_ID, [candidate(1, 1, 2)])
+        reserve_slot(self.redis, BASE_ID + 1, [candidate(3, 3, 1)])
+
+        self.assertEqual(switch_slot(self.redis, BASE_ID, BASE_ID + 2, BASE_ID + 3, 1), SWITCH_FULL)
+        self.assertEqual(switch_slot(self.redis, BASE_ID, BASE_ID + 2, BASE_ID + 2, 1), SWITCH_OK)
+
+        self.assertEqual(int(self.redis.get(f"profile_connections:{BASE_ID + 1}")), 0)
+        self.assertEqual(int(self.redis.get(f"profile_connections:{BASE_ID + 2}")), 1)
+        self.assertEqual(int(self.redis.get(f"channel_stream:{BASE_ID}")), BASE_ID + 2)
+        self.assertEqual(int(self.redis.get(f"stream_profile:{BASE_ID + 2}")), BASE_ID + 2)
+        self.assertIsNone(self.redis.get(f"stream_profile:{BASE_ID + 1}"))
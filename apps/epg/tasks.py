@@ -25,6 +25,7 @@ from channels.layers import get_channel_layer
 
 from .models import EPGSource, EPGData, ProgramData
 from core.utils import acquire_task_lock, release_task_lock, send_websocket_update, cleanup_memory
+from apps.output.cache import invalidate_output_cache, EPG
 
 logger = logging.getLogger(__name__)
 
@@ -219,6 +220,9 @@ def refresh_epg_data(source_id):
             evaluate_series_rules.delay()
         except Exception:
             pass
+        # Warm the logo cache so guide loads don't hit logo hosts
+        from apps.channels.logo_cache import schedule_prefetch
+        schedule_prefetch()
     except Exception as e:
         logger.error(f"Error in refresh_epg_data for source {source_id}: {e}", exc_info=True)
         try:
@@ -1261,42 +1265,7 @@ def parse_programs_for_tvg_id(epg_id):
             for _, elem in program_parser:
                 if elem.get('channel') == epg.tvg_id:
                     try:
-                        start_time = parse_xmltv_time(elem.get('start'))
-                        end_time = parse_xmltv_time(elem.get('stop'))
-                        title = None
-                        desc = None
-                        sub_title = None
-
-                        # Efficiently process child elements
-                        for child in elem:
-                            if child.tag == 'title':
-                                title = child.text or 'No Title'
-                            elif child.tag == 'desc':
-                                desc = child.text or ''
-                            elif child.tag == 'sub-title':
-                                sub_title = child.text or ''
-
-                        if not title:
-                            title = 'No Title'
-
-                        # Extract custom properties
-                        custom_props = extract_custom_properties(elem)
-                        custom_properties_json = None
-
-                        if custom_props:
-                            logger.trace(f"Number of custom properties: {len(custom_props)}")
-                            custom_properties_json = custom_props
-
-                        programs_to_create.append(ProgramData(
-                            epg=epg,
-                            start_time=start_time,
-                            end_time=end_time,
-                            title=title,
-                            description=desc,
-                            sub_title=sub_title,
-                            tvg_id=epg.tvg_id,
-                            custom_properties=custom_properties_json
-                        ))
+                        programs_to_create.append(build_program_data(elem, epg.id, epg.tvg_id))
                         programs_processed += 1
                         # Clear the element to free memory
                         clear_element(elem)
@@ -1360,6 +1329,8 @@ def parse_programs_for_tvg_id(epg_id):
 
         logger.info(f"Completed program parsing for tvg_id={epg.tvg_id}.")
     finally:
+        invalidate_output_cache((EPG,))
+
         # Reset internal caches and pools that lxml might be keeping
         try:
             etree.clear_error_log()
@@ -1417,8 +1388,6 @@ def parse_programs_for_source(epg_source, tvg_id=None):
         should_log_memory = False
 
     try:
-        # Process EPG entries in batches rather than all at once
-        batch_size = 20  # Process fewer channels at once to reduce memory usage
         epg_count = EPGData.objects.filter(epg_source=epg_source).count()
 
         if epg_count == 0:
@@ -1435,40 +1404,22 @@ def parse_programs_for_source(epg_source, tvg_id=None):
         program_count = 0
         channel_count = 0
         updated_count = 0
-        processed = 0
-        # Process in batches using cursor-based approach to limit memory usage
-        last_id = 0
-        while True:
-            # Get a batch of EPG entries
-            batch_entries = list(EPGData.objects.filter(
-                epg_source=epg_source,
-                id__gt=last_id
-            ).order_by('id')[:batch_size])
-
-            if not batch_entries:
-                break  # No more entries to process
 
-            # Update last_id for next iteration
-            last_id = batch_entries[-1].id
-
-            # Process this batch
-            for epg in batch_entries:
-                if epg.tvg_id:
-                    try:
-                        result = parse_programs_for_tvg_id(epg.id)
-                        if result == "Task already running":
-                            logger.info(f"Program parse for {epg.id} already in progress, skipping")
-
-                        processed += 1
-                        progress = min(95, int((processed / epg_count) * 100)) if epg_count > 0 else 50
-                        send_epg_update(epg_source.id, "parsing_programs", progress)
-                    except Exception as e:
-                        logger.error(f"Error parsing programs for tvg_id={epg.tvg_id}: {e}", exc_info=True)
-                        failed_entries.append(f"{epg.tvg_id}: {str(e)}")
-
-            # Force garbage collection after each batch
-            batch_entries = None  # Remove reference to help garbage collection
-            gc.collect()
+        if tvg_id:
+            # Single-channel refresh keeps using the per-tvg_id parser
+            epg = EPGData.objects.filter(epg_source=epg_source, tvg_id=tvg_id).first()
+            if epg:
+                try:
+                    result = parse_programs_for_tvg_id(epg.id)
+                    if result == "Task already running":
+                        logger.info(f"Program parse for {epg.id} already in progress, skipping")
+                    channel_count = 1
+                except Exception as e:
+                    logger.error(f"Error parsing programs for tvg_id={epg.tvg_id}: {e}", exc_info=True)
+                    failed_entries.append(f"{epg.tvg_id}: {str(e)}")
+        else:
+            program_count, channel_count, failed_entries = parse_programs_single_pass(epg_source)
+            updated_count = channel_count
 
         # If there were failures, include them in the message but continue
         if failed_entries:
@@ -1515,15 +1466,14 @@ def parse_programs_for_source(epg_source, tvg_id=None):
                       message=epg_source.last_message)
         return False
     finally:
-        # Final memory cleanup and tracking
-
+        # Programmes were replaced (or partially deleted on error), cached guides are stale
+        invalidate_output_cache((EPG,))
 
         # Explicitly release any remaining large data structures
         failed_entries = None
         program_count = None
         channel_count = None
         updated_count = None
-        processed = None
         gc.collect()
 
         # Add comprehensive memory cleanup at the end
@@ -1533,6 +1483,115 @@ def parse_programs_for_source(epg_source, tvg_id=None):
             logger.info(f"[parse_programs_for_source] Final memory usage: {final_memory:.2f} MB difference: {final_memory - initial_memory:.2f} MB")
             # Explicitly clear the process object to prevent potential memory leaks
             process = None
+
+
+def parse_programs_single_pass(epg_source):
+    """
+    Parse all programmes for an EPG source with a single pass over the XMLTV file.
+
+    Each <programme> is routed to its EPGData row through a tvg_id -> id map, and
+    rows are bulk-inserted per channel. Only EPG entries mapped to at least one
+    channel are refreshed, matching the behaviour of parse_programs_for_tvg_id.
+
+    Returns a tuple of (programs_processed, channels_refreshed, failed_entries).
+    """
+    tvg_id_map = dict(
+        EPGData.objects.filter(
+            epg_source=epg_source,
+            tvg_id__isnull=False,
+            channels__isnull=False,
+        ).exclude(tvg_id='').values_list('tvg_id', 'id').distinct()
+    )
+
+    if not tvg_id_map:
+        logger.info(f"No channels matched to EPG entries for source: {epg_source.name}")
+        return 0, 0, []
+
+    file_path = epg_source.extracted_file_path if epg_source.extracted_file_path else epg_source.file_path
+    if not file_path or not os.path.exists(file_path):
+        raise FileNotFoundError(f"EPG file not found at: {file_path}")
+
+    logger.info(f"Single-pass parsing programs for {len(tvg_id_map)} mapped EPG entries from {file_path}")
+
+    # Per-channel buffers, flushed in bulk when they fill up or when the total pending count grows too large
+    batch_size = 1000
+    max_pending = batch_size * 5
+    pending = {}
+    pending_count = 0
+    programs_processed = 0
+    failed = {}
+    seen_epg_ids = set()
+
+    def flush(epg_id):
+        programs = pending.pop(epg_id, None)
+        if programs:
+            ProgramData.objects.bulk_create(programs)
+        return len(programs) if programs else 0
+
+    file_size = os.path.getsize(file_path) or 1
+    last_progress = 0
+    source_file = None
+    program_parser = None
+    try:
+        # Clear existing programmes for every mapped entry before inserting fresh data
+        ProgramData.objects.filter(epg_id__in=list(tvg_id_map.values())).delete()
+
+        source_file = open(file_path, 'rb')
+        program_parser = etree.iterparse(source_file, events=('end',), tag='programme', remove_blank_text=True, recover=True)
+
+        for _, elem in program_parser:
+            channel_tvg_id = elem.get('channel')
+            epg_id = tvg_id_map.get(channel_tvg_id)
+            if epg_id is None:
+                clear_element(elem)
+                continue
+
+            try:
+                program = build_program_data(elem, epg_id, channel_tvg_id)
+            except Exception as e:
+                logger.error(f"Error processing program for {channel_tvg_id}: {e}", exc_info=True)
+                failed[channel_tvg_id] = str(e)
+                clear_element(elem)
+                continue
+
+            clear_element(elem)
+            seen_epg_ids.add(epg_id)
+            pending.setdefault(epg_id, []).append(program)
+            pending_count += 1
+            programs_processed += 1
+
+            if len(pending[epg_id]) >= batch_size:
+                pending_count -= flush(epg_id)
+            elif pending_count >= max_pending:
+                for pending_epg_id in list(pending.keys()):
+                    flush(pending_epg_id)
+                pending_count = 0
+                gc.collect()
+
+            if programs_processed % batch_size == 0:
+                progress = min(95, int((source_file.tell() / file_size) * 100))
+                if progress > last_progress:
+                    last_progress = progress
+                    send_epg_update(epg_source.id, "parsing_programs", progress)
+
+        for pending_epg_id in list(pending.keys()):
+            flush(pending_epg_id)
+    finally:
+        if source_file:
+            source_file.close()
+        source_file = None
+        program_parser = None
+        pending = None
+        try:
+            etree.clear_error_log()
+        except Exception:
+            pass
+
+    failed_entries = [f"{tvg}: {error}" for tvg, error in failed.items()]
+    logger.info(f"Single-pass parse complete for {epg_source.name}: {programs_processed} programs across {len(seen_epg_ids)} channels")
+    return programs_processed, len(seen_epg_ids), failed_entries
+
+
 def fetch_schedules_direct(source):
     logger.info(f"Fetching Schedules Direct data from source: {source.name}")
     try:
@@ -1660,6 +1719,46 @@ def parse_schedules_direct_time(time_str):
         raise
 
 
+def build_program_data(elem, epg_id, tvg_id):
+    """Build an unsaved ProgramData instance from a <programme> element."""
+    start_time = parse_xmltv_time(elem.get('start'))
+    end_time = parse_xmltv_time(elem.get('stop'))
+    title = None
+    desc = None
+    sub_title = None
+
+    # Efficiently process child elements
+    for child in elem:
+        if child.tag == 'title':
+            title = child.text or 'No Title'
+        elif child.tag == 'desc':
+            desc = child.text or ''
+        elif child.tag == 'sub-title':
+            sub_title = child.text or ''
+
+    if not title:
+        title = 'No Title'
+
+    # Extract custom properties
+    custom_props = extract_custom_properties(elem)
+    custom_properties_json = None
+
+    if custom_props:
+        logger.trace(f"Number of custom properties: {len(custom_props)}")
+        custom_properties_json = custom_props
+
+    return ProgramData(
+        epg_id=epg_id,
+        start_time=start_time,
+        end_time=end_time,
+        title=title,
+        description=desc,
+        sub_title=sub_title,
+        tvg_id=tvg_id,
+        custom_properties=custom_properties_json
+    )
+
+
 # Helper function to extract custom properties - moved to a separate function to clean up the code
 def extract_custom_properties(prog):
     # Create a new dictionary for each call
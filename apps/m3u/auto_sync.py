@@ -0,0 +1,587 @@
+"""
+Set-based reconciliation of auto-synced channels.
+
+sync_auto_channels used to walk every stream of every auto-sync group and issue
+ORM calls per row (channel streams, logos, EPG matches, memberships, saves). The
+engine here works in three phases:
+
+  load   current channels, their stream links, logos, EPG rows, profiles and
+         memberships are read with a handful of bulk queries into maps
+  diff   the channels each group should have are computed in memory into a Plan
+  apply  the plan is written with bulk_create/bulk_update/delete in one transaction
+
+The numbering, naming, logo, EPG and profile rules are the same as before. Each
+phase is timed and the timings are logged with the sync summary.
+"""
+
+import logging
+import re
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.channels.models import (
+    Channel,
+    ChannelGroup,
+    ChannelGroupM3UAccount,
+    ChannelProfile,
+    ChannelProfileMembership,
+    ChannelStream,
+    Logo,
+    Stream,
+)
+from apps.epg.models import EPGData, EPGSource
+from apps.output.cache import invalidate_output_cache
+from apps.proxy.ts_proxy.stream_resolution import invalidate_all as invalidate_stream_resolutions
+from core.models import StreamProfile
+from core.utils import natural_sort_key
+
+logger = logging.getLogger(__name__)
+
+# Values per IN (...) clause when loading rows by key
+IN_CHUNK_SIZE = 5000
+
+# Channel fields written for updated channels, updated_at is set by hand since
+# bulk_update() skips auto_now
+UPDATE_FIELDS = [
+    "channel_number", "name", "tvg_id", "tvc_guide_stationid", "channel_group",
+    "logo", "epg_data", "stream_profile", "updated_at",
+]
+
+
+def _chunks(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
+def _next_number(number):
+    """Next whole channel number after number"""
+    number += 1.0
+    if number % 1 != 0:  # Has decimal
+        number = int(number) + 1.0
+    return number
+
+
+class PhaseTimer:
+    """Wall time per named phase"""
+
+    def __init__(self):
+        self.phases = {}
+        self._phase = None
+        self._started = None
+
+    def start(self, phase):
+        self.stop()
+        self._phase = phase
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if self._phase is not None:
+            elapsed = time.perf_counter() - self._started
+            self.phases[self._phase] = self.phases.get(self._phase, 0.0) + elapsed
+            self._phase = None
+
+    def summary(self):
+        self.stop()
+        total = sum(self.phases.values())
+        phases = ", ".join(f"{phase}={elapsed * 1000:.0f}ms" for phase, elapsed in self.phases.items())
+        return f"{total:.2f}s ({phases})"
+
+
+class GroupSettings:
+    """Auto-sync options of one ChannelGroupM3UAccount"""
+
+    def __init__(self, relation):
+        props = relation.custom_properties or {}
+        self.channel_group = relation.channel_group
+        self.start_number = relation.auto_sync_channel_start or 1.0
+        self.force_dummy_epg = props.get("force_dummy_epg", False)
+        self.override_group_id = props.get("group_override")
+        self.name_regex_pattern = props.get("name_regex_pattern")
+        self.name_replace_pattern = props.get("name_replace_pattern")
+        self.name_match_regex = props.get("name_match_regex")
+        self.channel_profile_ids = props.get("channel_profile_ids")
+        self.custom_epg_id = props.get("custom_epg_id")
+        self.sort_order = props.get("channel_sort_order")
+        self.sort_reverse = props.get("channel_sort_reverse", False)
+        self.stream_profile_id = props.get("stream_profile_id")
+        self.custom_logo_id = props.get("custom_logo_id")
+
+    def profile_ids(self, all_profile_ids):
+        """Ids of the channel profiles new and synced channels belong to"""
+        ids = self.channel_profile_ids
+        if ids and isinstance(ids, list):
+            try:
+                wanted = {int(pid) for pid in ids}
+            except Exception:
+                wanted = set()
+            return wanted & all_profile_ids
+        return set(all_profile_ids)
+
+    def rename(self, name, pattern):
+        """Apply the group's find/replace to a stream name"""
+        if pattern is None:
+            return name
+        # If replace is None, treat as empty string (remove match)
+        replace = self.name_replace_pattern if self.name_replace_pattern is not None else ""
+        # Convert $1, $2, etc. to \1, \2, etc. for consistency with M3U profiles
+        replace = re.sub(r"\$(\d+)", r"\\\1", replace)
+        try:
+            return pattern.sub(replace, name)
+        except re.error as e:
+            logger.warning(f"Regex error for group '{self.channel_group.name}': {e}. Using original name.")
+            return name
+
+
+class Plan:
+    """In-memory diff between the auto channels an account has and should have"""
+
+    def __init__(self):
+        self.creates = []  # (Channel, stream_id, profile_ids)
+        self.updates = {}  # channel id -> Channel
+        self.delete_ids = set()
+        self.kept_ids = set()
+        # Channels whose logo is a stream logo URL without a Logo row yet
+        self.pending_logos = []  # (Channel, url)
+        self.new_logos = {}  # url -> name
+        self.enable_membership_ids = set()
+        self.disable_membership_ids = set()
+        self.new_memberships = []  # (channel id, profile id)
+
+    def has_changes(self):
+        return bool(self.creates or self.updates or self.delete_ids or self.enable_membership_ids
+                    or self.disable_membership_ids or self.new_memberships)
+
+
+class AutoChannelSync:
+    """Reconcile the auto-created channels of one M3U account with its streams"""
+
+    def __init__(self, account, scan_start_time):
+        self.account = account
+        self.scan_start_time = scan_start_time
+        self.timer = PhaseTimer()
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+
+    # --- load ---
+
+    def _group_streams(self, settings):
+        """Current streams of a group in the group's channel order"""
+        streams = Stream.objects.filter(
+            m3u_account=self.account,
+            channel_group=settings.channel_group,
+            last_seen__gte=self.scan_start_time,
+        ).only("id", "name", "tvg_id", "logo_url", "custom_properties", "updated_at")
+
+        if settings.name_match_regex:
+            try:
+                re.compile(settings.name_match_regex)
+                streams = streams.filter(name__iregex=settings.name_match_regex)
+            except re.error as e:
+                logger.warning(
+                    f"Invalid name_match_regex '{settings.name_match_regex}' for group '{settings.channel_group.name}': {e}. Skipping name filter."
+                )
+
+        order_prefix = "-" if settings.sort_reverse else ""
+        if settings.sort_order == "name":
+            # Use natural sorting for names to handle numbers correctly
+            return sorted(streams, key=lambda stream: natural_sort_key(stream.name), reverse=settings.sort_reverse)
+        if settings.sort_order == "tvg_id":
+            return list(streams.order_by(f"{order_prefix}tvg_id"))
+        if settings.sort_order == "updated_at":
+            return list(streams.order_by(f"{order_prefix}updated_at"))
+        if settings.sort_order:
+            logger.warning(
+                f"Unknown channel_sort_order '{settings.sort_order}' for group '{settings.channel_group.name}'. Using provider order."
+            )
+        # Provider order (default) - can still be reversed
+        return list(streams.order_by(f"{order_prefix}id"))
+
+    def load(self):
+        account = self.account
+        self.groups = [
+            GroupSettings(relation)
+            for relation in ChannelGroupM3UAccount.objects.filter(
+                m3u_account=account, enabled=True, auto_channel_sync=True
+            ).select_related("channel_group")
+        ]
+
+        override_ids = {s.override_group_id for s in self.groups if s.override_group_id}
+        self.override_groups = ChannelGroup.objects.in_bulk(override_ids) if override_ids else {}
+
+        self.streams = {s.channel_group.id: self._group_streams(s) for s in self.groups}
+
+        # Existing auto channels and the streams of this account they are linked to, by group
+        self.channels = {
+            channel.id: channel
+            for channel in Channel.objects.filter(auto_created=True, auto_created_by=account)
+        }
+        self.channel_map = {}
+        for channel_id, stream_id, group_id in ChannelStream.objects.filter(
+            channel__auto_created=True,
+            channel__auto_created_by=account,
+            stream__m3u_account=account,
+        ).values_list("channel_id", "stream_id", "stream__channel_group_id"):
+            self.channel_map.setdefault(group_id, {})[stream_id] = self.channels[channel_id]
+
+        # Channel numbers taken by channels this account doesn't manage
+        self.used_numbers = set(
+            Channel.objects.exclude(auto_created=True, auto_created_by=account).values_list(
+                "channel_number", flat=True
+            )
+        )
+
+        self.memberships = {}
+        for membership_id, channel_id, profile_id, enabled in ChannelProfileMembership.objects.filter(
+            channel__auto_created=True, channel__auto_created_by=account
+        ).values_list("id", "channel_id", "channel_profile_id", "enabled"):
+            self.memberships.setdefault(channel_id, {})[profile_id] = (membership_id, enabled)
+        self.profile_ids = set(ChannelProfile.objects.values_list("id", flat=True))
+
+        stream_profile_ids = set()
+        for s in self.groups:
+            try:
+                if s.stream_profile_id:
+                    stream_profile_ids.add(int(s.stream_profile_id))
+            except (ValueError, TypeError):
+                pass
+        self.stream_profiles = StreamProfile.objects.in_bulk(stream_profile_ids) if stream_profile_ids else {}
+
+        custom_logo_ids = {s.custom_logo_id for s in self.groups if s.custom_logo_id}
+        self.custom_logos = Logo.objects.in_bulk(custom_logo_ids) if custom_logo_ids else {}
+
+        all_streams = [stream for streams in self.streams.values() for stream in streams]
+        logo_urls = {stream.logo_url for stream in all_streams if stream.logo_url}
+        self.logos = {}
+        for urls in _chunks(logo_urls):
+            self.logos.update(Logo.objects.filter(url__in=urls).values_list("url", "id"))
+
+        # EPG candidates, the first row by id wins like .first() did
+        tvg_ids = {stream.tvg_id for stream in all_streams if stream.tvg_id}
+        self.epg_by_tvg_id = {}
+        for chunk in _chunks(tvg_ids):
+            for epg_id, tvg_id in EPGData.objects.filter(tvg_id__in=chunk).order_by("id").values_list("id", "tvg_id"):
+                self.epg_by_tvg_id.setdefault(tvg_id, epg_id)
+
+        custom_epg_ids = {s.custom_epg_id for s in self.groups if s.custom_epg_id}
+        self.epg_sources = EPGSource.objects.in_bulk(custom_epg_ids) if custom_epg_ids else {}
+        self.dummy_epg = {}
+        self.epg_by_source = {}
+        for source_id, source in self.epg_sources.items():
+            if source.source_type == "dummy":
+                self.dummy_epg[source_id] = (
+                    EPGData.objects.filter(epg_source=source).order_by("id").values_list("id", flat=True).first()
+                )
+        other_sources = [source_id for source_id, source in self.epg_sources.items() if source.source_type != "dummy"]
+        if other_sources:
+            for chunk in _chunks(tvg_ids):
+                for epg_id, source_id, tvg_id in EPGData.objects.filter(
+                    epg_source_id__in=other_sources, tvg_id__in=chunk
+                ).order_by("id").values_list("id", "epg_source_id", "tvg_id"):
+                    self.epg_by_source.setdefault((source_id, tvg_id), epg_id)
+
+    # --- diff ---
+
+    def _epg_id(self, settings, stream, new_channel):
+        """EPGData id a stream's channel should use, or None"""
+        if settings.custom_epg_id:
+            # Use the custom EPG specified in group settings (e.g., a dummy EPG)
+            source = self.epg_sources.get(settings.custom_epg_id)
+            if source is None:
+                logger.warning(
+                    f"Custom EPG source with ID {settings.custom_epg_id} not found"
+                    + (", falling back to auto-match" if new_channel else " for existing channel, falling back to auto-match")
+                )
+            elif source.source_type == "dummy":
+                epg_id = self.dummy_epg.get(source.id)
+                if epg_id is None:
+                    logger.warning(
+                        f"No EPGData found for dummy EPG source {source.name} (ID: {settings.custom_epg_id})"
+                    )
+                return epg_id
+            else:
+                # For non-dummy sources, try to find existing EPGData by tvg_id
+                return self.epg_by_source.get((source.id, stream.tvg_id)) if stream.tvg_id else None
+
+        if stream.tvg_id and not settings.force_dummy_epg:
+            # Auto-match EPG by tvg_id
+            return self.epg_by_tvg_id.get(stream.tvg_id)
+        return None
+
+    def _logo(self, settings, stream, plan):
+        """(logo id, url) for a stream's channel, url is set when the Logo row doesn't exist yet"""
+        if settings.custom_logo_id:
+            logo = self.custom_logos.get(settings.custom_logo_id)
+            if logo is not None:
+                return logo.id, None
+            logger.warning(
+                f"Custom logo with ID {settings.custom_logo_id} not found, falling back to stream logo"
+            )
+        if not stream.logo_url:
+            return None, None
+        logo_id = self.logos.get(stream.logo_url)
+        if logo_id is None:
+            plan.new_logos.setdefault(stream.logo_url, stream.name or stream.tvg_id or "Unknown")
+            return None, stream.logo_url
+        return logo_id, None
+
+    def _sync_memberships(self, channel_id, profile_ids, plan):
+        current = self.memberships.get(channel_id, {})
+        enabled = {profile_id for profile_id, (_, is_enabled) in current.items() if is_enabled}
+        # Only update if memberships have changed
+        if enabled == profile_ids:
+            return
+        for profile_id, (membership_id, is_enabled) in current.items():
+            if profile_id in profile_ids:
+                if not is_enabled:
+                    plan.enable_membership_ids.add(membership_id)
+            elif is_enabled:
+                plan.disable_membership_ids.add(membership_id)
+        for profile_id in profile_ids - current.keys():
+            plan.new_memberships.append((channel_id, profile_id))
+
+    def _diff_group(self, settings, plan):
+        group = settings.channel_group
+        target_group = group
+        if settings.override_group_id:
+            target_group = self.override_groups.get(settings.override_group_id)
+            if target_group is None:
+                target_group = group
+                logger.warning(
+                    f"Override group with ID {settings.override_group_id} not found, using original group '{group.name}'"
+                )
+            else:
+                logger.info(
+                    f"Using override group '{target_group.name}' instead of '{group.name}' for auto-created channels"
+                )
+
+        logger.info(f"Processing auto sync for group: {group.name} (start: {settings.start_number})")
+
+        streams = self.streams[group.id]
+        existing = self.channel_map.get(group.id, {})
+
+        if not streams:
+            logger.debug(f"No streams found in group {group.name}")
+            # Delete all existing auto channels if no streams
+            plan.delete_ids.update(channel.id for channel in existing.values())
+            return
+
+        profile_ids = settings.profile_ids(self.profile_ids)
+        stream_profile = None
+        if settings.stream_profile_id:
+            try:
+                stream_profile = self.stream_profiles.get(int(settings.stream_profile_id))
+            except (ValueError, TypeError):
+                stream_profile = None
+            if stream_profile is None:
+                logger.warning(
+                    f"Stream profile with ID {settings.stream_profile_id} not found for group '{group.name}', streams will use default profile"
+                )
+
+        name_pattern = None
+        if settings.name_regex_pattern is not None:
+            try:
+                name_pattern = re.compile(settings.name_regex_pattern)
+            except re.error as e:
+                logger.warning(f"Regex error for group '{group.name}': {e}. Using original name.")
+
+        # Channel numbers are per group: numbers of other accounts' and manual channels
+        # are skipped, and existing channels are renumbered to match the sort order first
+        used_numbers = set(self.used_numbers)
+        number = settings.start_number
+        for stream in streams:
+            channel = existing.get(stream.id)
+            if channel is None:
+                continue
+            target_number = number
+            while target_number in used_numbers:
+                target_number += 1
+            used_numbers.add(target_number)
+            if channel.channel_number != target_number:
+                channel.channel_number = target_number
+                plan.updates[channel.id] = channel
+            number = _next_number(number)
+
+        now = timezone.now()
+        number = settings.start_number
+        processed = set()
+        for stream in streams:
+            processed.add(stream.id)
+            try:
+                tvc_guide_stationid = (stream.custom_properties or {}).get("tvc-guide-stationid")
+                name = settings.rename(stream.name, name_pattern)
+                channel = existing.get(stream.id)
+                new_channel = channel is None
+                if new_channel:
+                    target_number = number
+                    while target_number in used_numbers:
+                        target_number += 1
+                    used_numbers.add(target_number)
+                    channel = Channel(
+                        channel_number=target_number,
+                        user_level=0,
+                        auto_created=True,
+                        auto_created_by=self.account,
+                    )
+
+                values = {
+                    "name": name,
+                    "tvg_id": stream.tvg_id,
+                    "tvc_guide_stationid": tvc_guide_stationid,
+                    "channel_group_id": target_group.id,
+                    "epg_data_id": self._epg_id(settings, stream, new_channel),
+                }
+                if stream_profile is not None or new_channel:
+                    values["stream_profile_id"] = stream_profile.id if stream_profile else None
+                logo_id, logo_url = self._logo(settings, stream, plan)
+                values["logo_id"] = logo_id
+
+                changed = logo_url is not None
+                for field, value in values.items():
+                    if getattr(channel, field) != value:
+                        if field == "channel_group_id" and not new_channel:
+                            logger.info(
+                                f"Moved auto channel '{channel.name}' from group {channel.channel_group_id} to '{target_group.name}'"
+                            )
+                        setattr(channel, field, value)
+                        changed = True
+                if logo_url is not None:
+                    plan.pending_logos.append((channel, logo_url))
+
+                if new_channel:
+                    plan.creates.append((channel, stream.id, profile_ids))
+                else:
+                    plan.kept_ids.add(channel.id)
+                    if changed:
+                        channel.updated_at = now
+                        plan.updates[channel.id] = channel
+                    self._sync_memberships(channel.id, profile_ids, plan)
+
+                number = _next_number(number)
+            except Exception as e:
+                logger.error(f"Error processing auto channel for stream {stream.name}: {str(e)}")
+                continue
+
+        # Delete channels for streams that no longer exist
+        plan.delete_ids.update(
+            channel.id for stream_id, channel in existing.items() if stream_id not in processed
+        )
+
+    def diff(self):
+        plan = Plan()
+        for settings in self.groups:
+            self._diff_group(settings, plan)
+        # A channel kept by one group isn't removed by another
+        plan.delete_ids -= plan.kept_ids
+        for channel_id in plan.delete_ids:
+            plan.updates.pop(channel_id, None)
+        return plan
+
+    # --- apply ---
+
+    def apply(self, plan):
+        from apps.epg.tasks import parse_programs_for_tvg_id
+
+        with transaction.atomic():
+            if plan.new_logos:
+                Logo.objects.bulk_create(
+                    [Logo(url=url, name=name) for url, name in plan.new_logos.items()],
+                    ignore_conflicts=True,
+                )
+                for urls in _chunks(plan.new_logos):
+                    self.logos.update(Logo.objects.filter(url__in=urls).values_list("url", "id"))
+            for channel, url in plan.pending_logos:
+                channel.logo_id = self.logos.get(url)
+
+            if plan.delete_ids:
+                for ids in _chunks(plan.delete_ids):
+                    Channel.objects.filter(id__in=ids).delete()
+                self.deleted += len(plan.delete_ids)
+
+            updates = [channel for channel in plan.updates.values() if channel.id not in plan.delete_ids]
+            if updates:
+                Channel.objects.bulk_update(updates, UPDATE_FIELDS, batch_size=1000)
+                self.updated += len(updates)
+
+            if plan.creates:
+                channels = Channel.objects.bulk_create([channel for channel, _, _ in plan.creates], batch_size=1000)
+                # Associate the stream with the channel and assign it to the group's profiles
+                ChannelStream.objects.bulk_create(
+                    [
+                        ChannelStream(channel=channel, stream_id=stream_id, order=0)
+                        for channel, (_, stream_id, _) in zip(channels, plan.creates)
+                    ],
+                    batch_size=1000,
+                )
+                ChannelProfileMembership.objects.bulk_create(
+                    [
+                        ChannelProfileMembership(channel_profile_id=profile_id, channel=channel, enabled=True)
+                        for channel, (_, _, profile_ids) in zip(channels, plan.creates)
+                        for profile_id in profile_ids
+                    ],
+                    batch_size=1000,
+                )
+                self.created += len(channels)
+
+                # Fetch programs for the guides of new channels once the rows are visible
+                epg_ids = {channel.epg_data_id for channel in channels if channel.epg_data_id}
+
+                def refresh_programs():
+                    for epg_id in epg_ids:
+                        parse_programs_for_tvg_id.delay(epg_id)
+
+                transaction.on_commit(refresh_programs)
+
+            for ids in _chunks(plan.enable_membership_ids):
+                ChannelProfileMembership.objects.filter(id__in=ids).update(enabled=True)
+            for ids in _chunks(plan.disable_membership_ids):
+                ChannelProfileMembership.objects.filter(id__in=ids).update(enabled=False)
+            if plan.new_memberships:
+                ChannelProfileMembership.objects.bulk_create(
+                    [
+                        ChannelProfileMembership(channel_id=channel_id, channel_profile_id=profile_id, enabled=True)
+                        for channel_id, profile_id in plan.new_memberships
+                    ],
+                    batch_size=1000,
+                    ignore_conflicts=True,
+                )
+
+            # Additional cleanup: Remove auto-created channels that no longer have any valid streams
+            # This handles the case where streams were deleted due to stale retention policy
+            orphaned_ids = list(
+                Channel.objects.filter(auto_created=True, auto_created_by=self.account)
+                .exclude(
+                    # Exclude channels that still have valid stream associations
+                    id__in=ChannelStream.objects.filter(
+                        stream__m3u_account=self.account, stream__isnull=False
+                    ).values_list("channel_id", flat=True)
+                )
+                .values_list("id", flat=True)
+            )
+            for ids in _chunks(orphaned_ids):
+                Channel.objects.filter(id__in=ids).delete()
+            if orphaned_ids:
+                self.deleted += len(orphaned_ids)
+                logger.info(f"Deleted {len(orphaned_ids)} orphaned auto channels with no valid streams")
+
+        if plan.has_changes() or orphaned_ids:
+            # Rows were written in bulk without signals
+            invalidate_output_cache()
+            invalidate_stream_resolutions()
+
+    def run(self):
+        """Load, diff and apply, returns the summary message"""
+        self.timer.start("load")
+        self.load()
+        self.timer.start("diff")
+        plan = self.diff()
+        self.timer.start("apply")
+        self.apply(plan)
+        logger.info(
+            f"Auto channel sync complete for account {self.account.name}: {self.created} created, "
+            f"{self.updated} updated, {self.deleted} deleted in {self.timer.summary()}"
+        )
+        return f"Auto sync: {self.created} channels created, {self.updated} updated, {self.deleted} deleted"
@@ -5,7 +5,9 @@ import requests
 import os
 import gc
 import gzip, zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import io
+import itertools
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from celery.app.control import Inspect
 from celery.result import AsyncResult
 from celery import shared_task, current_app, group
@@ -14,6 +16,8 @@ from django.core.cache import cache
 from django.db import transaction
 from .models import M3UAccount
 from apps.channels.models import Stream, ChannelGroup, ChannelGroupM3UAccount
+from apps.channels.stream_hash import StreamHasher, HASH_PREFIX
+from apps.channels.logo_cache import schedule_prefetch as schedule_logo_prefetch
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.utils import timezone
@@ -23,25 +27,61 @@ from core.utils import (
     RedisClient,
     acquire_task_lock,
     release_task_lock,
-    natural_sort_key,
 )
 from core.models import CoreSettings, UserAgent
 from asgiref.sync import async_to_sync
 from core.xtream_codes import Client as XCClient
 from core.utils import send_websocket_update
+from apps.output.cache import invalidate_output_cache
+from apps.proxy.ts_proxy.stream_resolution import invalidate_all as invalidate_stream_resolutions
 from .utils import normalize_stream_url
 
 logger = logging.getLogger(__name__)
 
 BATCH_SIZE = 1500  # Optimized batch size for threading
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Bytes from the start of a download used to check that it is an M3U playlist
+VALIDATION_SAMPLE_SIZE = 256 * 1024
 m3u_dir = os.path.join(settings.MEDIA_ROOT, "cached_m3u")
 
 
+def _iter_open_lines(f, container=None):
+    """Yield the lines of an open text file, closing it (and its container) when done"""
+    try:
+        yield from f
+    finally:
+        f.close()
+        if container is not None:
+            container.close()
+
+
+def _open_lines(f, container=None):
+    """
+    Lazily read lines from an open text file. The first line is read right away so
+    that unreadable or corrupt files (bad gzip, wrong encoding) fail here, inside
+    the caller's error handling, rather than halfway through parsing.
+    """
+    try:
+        first = f.readline()
+    except Exception:
+        f.close()
+        if container is not None:
+            container.close()
+        raise
+    return itertools.chain([first] if first else [], _iter_open_lines(f, container))
+
+
 def fetch_m3u_lines(account, use_cache=False):
+    """
+    Fetch an account's playlist and return (lines, success). lines is a lazy iterator.
+
+    Downloads are streamed to a file in m3u_dir as they arrive and only the start of
+    the file is held in memory for validation, so memory doesn't grow with playlist size.
+    """
     os.makedirs(m3u_dir, exist_ok=True)
     file_path = os.path.join(m3u_dir, f"{account.id}.m3u")
+    part_path = f"{file_path}.part"
 
-    """Fetch M3U file lines efficiently."""
     if account.server_url:
         if not use_cache or not os.path.exists(file_path):
             try:
@@ -125,15 +165,18 @@ def fetch_m3u_lines(account, use_cache=False):
                 start_time = time.time()
                 last_update_time = start_time
                 progress = 0
-                temp_content = b""  # Store content temporarily to validate before saving
-                has_content = False
+                head = b""  # Start of the playlist, kept to validate it once downloaded
 
-                # First, let's collect the content and validate it
+                # Write to a temporary file as the data arrives, it replaces the cached
+                # playlist only once validated
                 send_m3u_update(account.id, "downloading", 0)
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        temp_content += chunk
-                        has_content = True
+                with open(part_path, "wb") as part_file:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        part_file.write(chunk)
+                        if len(head) < VALIDATION_SAMPLE_SIZE:
+                            head += chunk[:VALIDATION_SAMPLE_SIZE - len(head)]
 
                         downloaded += len(chunk)
                         elapsed_time = time.time() - start_time
@@ -172,8 +215,8 @@ def fetch_m3u_lines(account, use_cache=False):
                                 )
 
                 # Check if we actually received any content
-                logger.info(f"Download completed. Has content: {has_content}, Content length: {len(temp_content)} bytes")
-                if not has_content or len(temp_content) == 0:
+                logger.info(f"Download completed. Content length: {downloaded} bytes")
+                if downloaded == 0:
                     error_msg = f"Server responded successfully (HTTP {response.status_code}) but provided empty M3U file from URL: {account.server_url}"
                     logger.error(error_msg)
                     account.status = M3UAccount.Status.ERROR
@@ -188,15 +231,14 @@ def fetch_m3u_lines(account, use_cache=False):
                     )
                     return [], False
 
-                # Basic validation: check if content looks like an M3U file
+                # Basic validation: check if the start of the content looks like an M3U file
                 try:
-                    content_str = temp_content.decode('utf-8', errors='ignore')
+                    content_str = head.decode('utf-8', errors='ignore')
                     content_lines = content_str.strip().split('\n')
 
                     # Log first few lines for debugging (be careful not to log too much)
                     preview_lines = content_lines[:5]
                     logger.info(f"Content preview (first 5 lines): {preview_lines}")
-                    logger.info(f"Total lines in content: {len(content_lines)}")
 
                     # Check if it's a valid M3U file (should start with #EXTM3U or contain M3U-like content)
                     is_valid_m3u = False
@@ -252,7 +294,7 @@ def fetch_m3u_lines(account, use_cache=False):
                         return [], False
 
                 except UnicodeDecodeError:
-                    logger.error(f"Non-text content received. First 200 bytes: {temp_content[:200]!r}")
+                    logger.error(f"Non-text content received. First 200 bytes: {head[:200]!r}")
                     error_msg = f"Server provided non-text content from URL: {account.server_url}. Unable to process as M3U file."
                     logger.error(error_msg)
                     account.status = M3UAccount.Status.ERROR
@@ -267,12 +309,11 @@ def fetch_m3u_lines(account, use_cache=False):
                     )
                     return [], False
 
-                # Content is valid, save it to file
-                with open(file_path, "wb") as file:
-                    file.write(temp_content)
+                # Content is valid, replace the cached playlist
+                os.replace(part_path, file_path)
 
                 # Final update with 100% progress
-                final_msg = f"Download complete. Size: {total_size/1024/1024:.2f} MB, Time: {time.time() - start_time:.1f}s"
+                final_msg = f"Download complete. Size: {downloaded/1024/1024:.2f} MB, Time: {time.time() - start_time:.1f}s"
                 account.last_message = final_msg
                 account.save(update_fields=["last_message"])
                 send_m3u_update(account.id, "downloading", 100, message=final_msg)
@@ -349,6 +390,13 @@ def fetch_m3u_lines(account, use_cache=False):
                     error=error_msg,
                 )
                 return [], False
+            finally:
+                # Rejected or interrupted downloads leave the previous playlist in place
+                if os.path.exists(part_path):
+                    try:
+                        os.remove(part_path)
+                    except OSError:
+                        pass
 
         # Check if the file exists and is not empty (fallback check - should not happen with new validation)
         if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
@@ -363,8 +411,7 @@ def fetch_m3u_lines(account, use_cache=False):
             return [], False  # Return empty list and False for success
 
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.readlines(), True
+            return _open_lines(open(file_path, "r", encoding="utf-8", errors="replace")), True
         except Exception as e:
             error_msg = f"Error reading M3U file: {str(e)}"
             logger.error(error_msg)
@@ -379,33 +426,31 @@ def fetch_m3u_lines(account, use_cache=False):
     elif account.file_path:
         try:
             if account.file_path.endswith(".gz"):
-                with gzip.open(account.file_path, "rt", encoding="utf-8") as f:
-                    return f.readlines(), True
+                return _open_lines(gzip.open(account.file_path, "rt", encoding="utf-8", errors="replace")), True
 
             elif account.file_path.endswith(".zip"):
-                with zipfile.ZipFile(account.file_path, "r") as zip_file:
-                    for name in zip_file.namelist():
-                        if name.endswith(".m3u"):
-                            with zip_file.open(name) as f:
-                                return [
-                                    line.decode("utf-8") for line in f.readlines()
-                                ], True
-
-                    error_msg = (
-                        f"No .m3u file found in ZIP archive: {account.file_path}"
-                    )
-                    logger.warning(error_msg)
-                    account.status = M3UAccount.Status.ERROR
-                    account.last_message = error_msg
-                    account.save(update_fields=["status", "last_message"])
-                    send_m3u_update(
-                        account.id, "downloading", 100, status="error", error=error_msg
-                    )
-                    return [], False
+                # The archive stays open until the lines have been read
+                zip_file = zipfile.ZipFile(account.file_path, "r")
+                for name in zip_file.namelist():
+                    if name.endswith(".m3u"):
+                        member = io.TextIOWrapper(zip_file.open(name), encoding="utf-8", errors="replace")
+                        return _open_lines(member, zip_file), True
+                zip_file.close()
+
+                error_msg = (
+                    f"No .m3u file found in ZIP archive: {account.file_path}"
+                )
+                logger.warning(error_msg)
+                account.status = M3UAccount.Status.ERROR
+                account.last_message = error_msg
+                account.save(update_fields=["status", "last_message"])
+                send_m3u_update(
+                    account.id, "downloading", 100, status="error", error=error_msg
+                )
+                return [], False
 
             else:
-                with open(account.file_path, "r", encoding="utf-8") as f:
-                    return f.readlines(), True
+                return _open_lines(open(account.file_path, "r", encoding="utf-8", errors="replace")), True
 
         except (IOError, OSError, zipfile.BadZipFile, gzip.BadGzipFile) as e:
             error_msg = f"Error opening file {account.file_path}: {e}"
@@ -487,6 +532,48 @@ def parse_extinf_line(line: str) -> dict:
     return {"attributes": attrs, "display_name": display_name, "name": name}
 
 
+STREAM_URL_PREFIXES = ("http", "rtsp", "rtp", "udp")
+
+
+def iter_m3u_entries(lines, stats=None):
+    """
+    Parse playlist lines into EXTINF entries one at a time. Each entry is yielded
+    once the next EXTINF (or the end of the file) is reached, with the URL that
+    followed it under "url". URLs after an unparseable EXTINF belong to the previous
+    entry. stats, when given, collects line/EXTINF/URL counts and problematic lines.
+    """
+    if stats is None:
+        stats = {}
+    stats.update(lines=0, extinf=0, urls=0, problematic=[])
+    current = None
+
+    for line_index, line in enumerate(lines):
+        stats["lines"] += 1
+        line = line.strip()
+
+        if line.startswith("#EXTINF"):
+            stats["extinf"] += 1
+            parsed = parse_extinf_line(line)
+            if parsed:
+                if current is not None:
+                    yield current
+                current = parsed
+            else:
+                # Log problematic EXTINF lines
+                logger.warning(
+                    f"Failed to parse EXTINF at line {line_index+1}: {line[:200]}"
+                )
+                stats["problematic"].append((line_index + 1, line[:200]))
+
+        elif current is not None and line.startswith(STREAM_URL_PREFIXES):
+            stats["urls"] += 1
+            # Normalize UDP URLs only (e.g., remove VLC-specific @ prefix)
+            current["url"] = normalize_stream_url(line) if line.startswith("udp") else line
+
+    if current is not None:
+        yield current
+
+
 @shared_task
 def refresh_m3u_accounts():
     """Queue background parse for all active M3UAccounts."""
@@ -888,7 +975,43 @@ def process_xc_category_direct(account_id, batch, groups, hash_keys):
     return retval
 
 
-def process_m3u_batch_direct(account_id, batch, groups, hash_keys):
+def get_existing_streams(stream_hashes, legacy_hashes=None):
+    """
+    Map stream hashes to existing Stream rows.
+
+    legacy_hashes ({hash: pre-versioning hash}) also finds rows still stored under
+    their old hash; their stream_hash is switched to the current one so the caller's
+    bulk update migrates them.
+    """
+    lookup = list(stream_hashes)
+    if legacy_hashes:
+        lookup.extend(legacy_hashes.values())
+
+    rows = {
+        s.stream_hash: s
+        for s in Stream.objects.filter(stream_hash__in=lookup).select_related('m3u_account').only(
+            'id', 'stream_hash', 'name', 'url', 'logo_url', 'tvg_id', 'custom_properties', 'last_seen', 'updated_at', 'm3u_account'
+        )
+    }
+
+    existing_streams = {}
+    for stream_hash in stream_hashes:
+        obj = rows.get(stream_hash)
+        if obj is None and legacy_hashes:
+            obj = rows.get(legacy_hashes.get(stream_hash))
+            if obj is not None:
+                obj.stream_hash = stream_hash
+        if obj is not None:
+            existing_streams[stream_hash] = obj
+    return existing_streams
+
+
+def needs_hash_migration(account_id):
+    """Whether the account still has streams stored under the pre-versioning hash"""
+    return Stream.objects.filter(m3u_account_id=account_id).exclude(stream_hash__startswith=HASH_PREFIX).exists()
+
+
+def process_m3u_batch_direct(account_id, batch, groups, hash_keys, migrate_legacy=False):
     """Processes a batch of M3U streams using bulk operations with thread-safe DB connections."""
     from django.db import connections
 
@@ -918,6 +1041,8 @@ def process_m3u_batch_direct(account_id, batch, groups, hash_keys):
     streams_to_create = []
     streams_to_update = []
     stream_hashes = {}
+    hasher = StreamHasher.for_keys(hash_keys)
+    legacy_hashes = {} if migrate_legacy else None
 
     logger.debug(f"Processing batch of {len(batch)} for M3U account {account_id}")
     if compiled_filters:
@@ -965,7 +1090,9 @@ def process_m3u_batch_direct(account_id, batch, groups, hash_keys):
                 )
                 continue
 
-            stream_hash = Stream.generate_hash_key(name, url, tvg_id, hash_keys, m3u_id=account_id)
+            stream_hash = hasher.hash(name, url, tvg_id, m3u_id=account_id)
+            if migrate_legacy:
+                legacy_hashes[stream_hash] = hasher.legacy_hash(name, url, tvg_id, m3u_id=account_id)
             stream_props = {
                 "name": name,
                 "url": url,
@@ -983,12 +1110,7 @@ def process_m3u_batch_direct(account_id, batch, groups, hash_keys):
             logger.error(f"Failed to process stream {name}: {e}")
             logger.error(json.dumps(stream_info))
 
-    existing_streams = {
-        s.stream_hash: s
-        for s in Stream.objects.filter(stream_hash__in=stream_hashes.keys()).select_related('m3u_account').only(
-            'id', 'stream_hash', 'name', 'url', 'logo_url', 'tvg_id', 'custom_properties', 'last_seen', 'updated_at', 'm3u_account'
-        )
-    }
+    existing_streams = get_existing_streams(stream_hashes, legacy_hashes)
 
     for stream_hash, stream_props in stream_hashes.items():
         if stream_hash in existing_streams:
@@ -1028,11 +1150,10 @@ def process_m3u_batch_direct(account_id, batch, groups, hash_keys):
 
             if streams_to_update:
                 # Update all streams in a single bulk operation
-                Stream.objects.bulk_update(
-                    streams_to_update,
-                    ['name', 'url', 'logo_url', 'tvg_id', 'custom_properties', 'last_seen', 'updated_at'],
-                    batch_size=200
-                )
+                update_fields = ['name', 'url', 'logo_url', 'tvg_id', 'custom_properties', 'last_seen', 'updated_at']
+                if migrate_legacy:
+                    update_fields.append('stream_hash')
+                Stream.objects.bulk_update(streams_to_update, update_fields, batch_size=200)
     except Exception as e:
         logger.error(f"Bulk operation failed: {str(e)}")
 
@@ -1049,6 +1170,80 @@ def process_m3u_batch_direct(account_id, batch, groups, hash_keys):
     return retval
 
 
+def iter_batches(items, size=BATCH_SIZE):
+    """Split an iterable into lists of at most size items"""
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def process_stream_batches(account_id, batches, total_batches, groups, hash_keys, migrate_legacy, max_workers, start_time, label="Thread"):
+    """
+    Run process_m3u_batch_direct over an iterable of batches in a thread pool and
+    return (streams_created, streams_updated). At most 2 * max_workers batches are
+    in memory at once, so batches can be produced lazily while the file is parsed.
+    """
+    streams_created = 0
+    streams_updated = 0
+    completed_batches = 0
+    batches = iter(enumerate(batches))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        for batch_idx, batch in itertools.islice(batches, max_workers * 2):
+            pending[executor.submit(process_m3u_batch_direct, account_id, batch, groups, hash_keys, migrate_legacy)] = batch_idx
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch_idx = pending.pop(future)
+                completed_batches += 1
+                try:
+                    result = future.result()
+
+                    # Extract stream counts from result
+                    if isinstance(result, str):
+                        created_match = re.search(r"(\d+) created", result)
+                        updated_match = re.search(r"(\d+) updated", result)
+                        if created_match and updated_match:
+                            streams_created += int(created_match.group(1))
+                            streams_updated += int(updated_match.group(1))
+
+                    # Send progress update
+                    progress = min(100, int((completed_batches / max(total_batches, 1)) * 100))
+                    current_elapsed = time.time() - start_time
+
+                    if progress > 0:
+                        estimated_total = (current_elapsed / progress) * 100
+                        time_remaining = max(0, estimated_total - current_elapsed)
+                    else:
+                        time_remaining = 0
+
+                    send_m3u_update(
+                        account_id,
+                        "parsing",
+                        progress,
+                        elapsed_time=current_elapsed,
+                        time_remaining=time_remaining,
+                        streams_processed=streams_created + streams_updated,
+                    )
+
+                    logger.debug(f"{label} batch {completed_batches}/{total_batches} completed")
+
+                except Exception as e:
+                    # Still counted to keep progress moving
+                    logger.error(f"Error in {label} batch {batch_idx}: {str(e)}")
+
+            # Top up with the next batches
+            for batch_idx, batch in itertools.islice(batches, len(done)):
+                pending[executor.submit(process_m3u_batch_direct, account_id, batch, groups, hash_keys, migrate_legacy)] = batch_idx
+
+    return streams_created, streams_updated
+
+
 def cleanup_streams(account_id, scan_start_time=timezone.now):
     account = M3UAccount.objects.get(id=account_id, is_active=True)
     existing_groups = ChannelGroup.objects.filter(
@@ -1101,7 +1296,7 @@ def refresh_m3u_groups(account_id, use_cache=False, full_refresh=False):
         release_task_lock("refresh_m3u_account_groups", account_id)
         return f"M3UAccount with ID={account_id} not found or inactive.", None
 
-    extinf_data = []
+    stream_count = 0
     groups = {"Default Group": {}}
 
     if account.account_type == M3UAccount.Types.XC:
@@ -1329,62 +1524,34 @@ def refresh_m3u_groups(account_id, use_cache=False, full_refresh=False):
             release_task_lock("refresh_m3u_account_groups", account_id)
             return f"Failed to fetch M3U data for account_id={account_id}.", None
 
-        # Log basic file structure for debugging
-        logger.debug(f"Processing {len(lines)} lines from M3U file")
-
-        line_count = 0
-        extinf_count = 0
-        url_count = 0
-        valid_stream_count = 0
-        problematic_lines = []
-
-        for line_index, line in enumerate(lines):
-            line_count += 1
-            line = line.strip()
-
-            if line.startswith("#EXTINF"):
-                extinf_count += 1
-                parsed = parse_extinf_line(line)
-                if parsed:
-                    group_title_attr = get_case_insensitive_attr(
-                        parsed["attributes"], "group-title", ""
-                    )
-                    if group_title_attr:
-                        group_name = group_title_attr
-                        # Log new groups as they're discovered
-                        if group_name not in groups:
-                            logger.debug(
-                                f"Found new group for M3U account {account_id}: '{group_name}'"
-                            )
-                        groups[group_name] = {}
-
-                    extinf_data.append(parsed)
-                else:
-                    # Log problematic EXTINF lines
-                    logger.warning(
-                        f"Failed to parse EXTINF at line {line_index+1}: {line[:200]}"
+        stats = {}
+        for entry in iter_m3u_entries(lines, stats):
+            group_title_attr = get_case_insensitive_attr(
+                entry["attributes"], "group-title", ""
+            )
+            if group_title_attr:
+                group_name = group_title_attr
+                # Log new groups as they're discovered
+                if group_name not in groups:
+                    logger.debug(
+                        f"Found new group for M3U account {account_id}: '{group_name}'"
                     )
-                    problematic_lines.append((line_index + 1, line[:200]))
-
-            elif extinf_data and (line.startswith("http") or line.startswith("rtsp") or line.startswith("rtp") or line.startswith("udp")):
-                url_count += 1
-                # Normalize UDP URLs only (e.g., remove VLC-specific @ prefix)
-                normalized_url = normalize_stream_url(line) if line.startswith("udp") else line
-                # Associate URL with the last EXTINF line
-                extinf_data[-1]["url"] = normalized_url
-                valid_stream_count += 1
+                groups[group_name] = {}
 
+            if "url" in entry:
+                stream_count += 1
                 # Periodically log progress for large files
-                if valid_stream_count % 1000 == 0:
+                if stream_count % 1000 == 0:
                     logger.debug(
-                        f"Processed {valid_stream_count} valid streams so far for M3U account: {account_id}"
+                        f"Processed {stream_count} valid streams so far for M3U account: {account_id}"
                     )
 
         # Log summary statistics
         logger.info(
-            f"M3U parsing complete - Lines: {line_count}, EXTINF: {extinf_count}, URLs: {url_count}, Valid streams: {valid_stream_count}"
+            f"M3U parsing complete - Lines: {stats['lines']}, EXTINF: {stats['extinf']}, URLs: {stats['urls']}, Valid streams: {stream_count}"
         )
 
+        problematic_lines = stats["problematic"]
         if problematic_lines:
             logger.warning(
                 f"Found {len(problematic_lines)} problematic lines during parsing"
@@ -1404,17 +1571,17 @@ def refresh_m3u_groups(account_id, use_cache=False, full_refresh=False):
             + ("..." if len(groups) > 20 else "")
         )
 
-        # Cache processed data
+        # Cache the groups, streams are parsed again from the cached playlist
         cache_path = os.path.join(m3u_dir, f"{account_id}.json")
         with open(cache_path, "w", encoding="utf-8") as f:
             json.dump(
                 {
-                    "extinf_data": extinf_data,
                     "groups": groups,
+                    "stream_count": stream_count,
                 },
                 f,
             )
-            logger.debug(f"Cached parsed M3U data to {cache_path}")
+            logger.debug(f"Cached parsed M3U groups to {cache_path}")
 
     send_m3u_update(account_id, "processing_groups", 0)
 
@@ -1436,7 +1603,7 @@ def refresh_m3u_groups(account_id, use_cache=False, full_refresh=False):
             message="M3U groups loaded. Please select groups or refresh M3U to complete setup.",
         )
 
-    return extinf_data, groups
+    return stream_count, groups
 
 
 def delete_m3u_refresh_task_by_id(account_id):
@@ -1513,15 +1680,7 @@ def sync_auto_channels(account_id, scan_start_time=None):
     Preserves existing channel UUIDs to maintain M3U link integrity.
     Called after M3U refresh completes successfully.
     """
-    from apps.channels.models import (
-        Channel,
-        ChannelGroup,
-        ChannelGroupM3UAccount,
-        Stream,
-        ChannelStream,
-    )
-    from apps.epg.models import EPGData
-    from django.utils import timezone
+    from .auto_sync import AutoChannelSync
 
     try:
         account = M3UAccount.objects.get(id=account_id)
@@ -1534,609 +1693,7 @@ def sync_auto_channels(account_id, scan_start_time=None):
         else:
             scan_start_time = timezone.now()
 
-        # Get groups with auto sync enabled for this account
-        auto_sync_groups = ChannelGroupM3UAccount.objects.filter(
-            m3u_account=account, enabled=True, auto_channel_sync=True
-        ).select_related("channel_group")
-
-        channels_created = 0
-        channels_updated = 0
-        channels_deleted = 0
-
-        for group_relation in auto_sync_groups:
-            channel_group = group_relation.channel_group
-            start_number = group_relation.auto_sync_channel_start or 1.0
-
-            # Get force_dummy_epg, group_override, and regex patterns from group custom_properties
-            group_custom_props = {}
-            force_dummy_epg = False  # Backward compatibility: legacy option to disable EPG
-            override_group_id = None
-            name_regex_pattern = None
-            name_replace_pattern = None
-            name_match_regex = None
-            channel_profile_ids = None
-            channel_sort_order = None
-            channel_sort_reverse = False
-            stream_profile_id = None
-            custom_logo_id = None
-            custom_epg_id = None  # New option: select specific EPG source (takes priority over force_dummy_epg)
-            if group_relation.custom_properties:
-                group_custom_props = group_relation.custom_properties
-                force_dummy_epg = group_custom_props.get("force_dummy_epg", False)
-                override_group_id = group_custom_props.get("group_override")
-                name_regex_pattern = group_custom_props.get("name_regex_pattern")
-                name_replace_pattern = group_custom_props.get(
-                    "name_replace_pattern"
-                )
-                name_match_regex = group_custom_props.get("name_match_regex")
-                channel_profile_ids = group_custom_props.get("channel_profile_ids")
-                custom_epg_id = group_custom_props.get("custom_epg_id")
-                channel_sort_order = group_custom_props.get("channel_sort_order")
-                channel_sort_reverse = group_custom_props.get(
-                    "channel_sort_reverse", False
-                )
-                stream_profile_id = group_custom_props.get("stream_profile_id")
-                custom_logo_id = group_custom_props.get("custom_logo_id")
-
-            # Determine which group to use for created channels
-            target_group = channel_group
-            if override_group_id:
-                try:
-                    target_group = ChannelGroup.objects.get(id=override_group_id)
-                    logger.info(
-                        f"Using override group '{target_group.name}' instead of '{channel_group.name}' for auto-created channels"
-                    )
-                except ChannelGroup.DoesNotExist:
-                    logger.warning(
-                        f"Override group with ID {override_group_id} not found, using original group '{channel_group.name}'"
-                    )
-
-            logger.info(
-                f"Processing auto sync for group: {channel_group.name} (start: {start_number})"
-            )
-
-            # Get all current streams in this group for this M3U account, filter out stale streams
-            current_streams = Stream.objects.filter(
-                m3u_account=account,
-                channel_group=channel_group,
-                last_seen__gte=scan_start_time,
-            )
-
-            # --- FILTER STREAMS BY NAME MATCH REGEX IF SPECIFIED ---
-            if name_match_regex:
-                try:
-                    current_streams = current_streams.filter(
-                        name__iregex=name_match_regex
-                    )
-                except re.error as e:
-                    logger.warning(
-                        f"Invalid name_match_regex '{name_match_regex}' for group '{channel_group.name}': {e}. Skipping name filter."
-                    )
-
-            # --- APPLY CHANNEL SORT ORDER ---
-            streams_is_list = False  # Track if we converted to list
-            if channel_sort_order and channel_sort_order != "":
-                if channel_sort_order == "name":
-                    # Use natural sorting for names to handle numbers correctly
-                    current_streams = list(current_streams)
-                    current_streams.sort(
-                        key=lambda stream: natural_sort_key(stream.name),
-                        reverse=channel_sort_reverse,
-                    )
-                    streams_is_list = True
-                elif channel_sort_order == "tvg_id":
-                    order_prefix = "-" if channel_sort_reverse else ""
-                    current_streams = current_streams.order_by(f"{order_prefix}tvg_id")
-                elif channel_sort_order == "updated_at":
-                    order_prefix = "-" if channel_sort_reverse else ""
-                    current_streams = current_streams.order_by(
-                        f"{order_prefix}updated_at"
-                    )
-                else:
-                    logger.warning(
-                        f"Unknown channel_sort_order '{channel_sort_order}' for group '{channel_group.name}'. Using provider order."
-                    )
-                    order_prefix = "-" if channel_sort_reverse else ""
-                    current_streams = current_streams.order_by(f"{order_prefix}id")
-            else:
-                # Provider order (default) - can still be reversed
-                order_prefix = "-" if channel_sort_reverse else ""
-                current_streams = current_streams.order_by(f"{order_prefix}id")
-
-            # Get existing auto-created channels for this account (regardless of current group)
-            # We'll find them by their stream associations instead of just group location
-            existing_channels = Channel.objects.filter(
-                auto_created=True, auto_created_by=account
-            ).select_related("logo", "epg_data")
-
-            # Create mapping of existing channels by their associated stream
-            # This approach finds channels even if they've been moved to different groups
-            existing_channel_map = {}
-            for channel in existing_channels:
-                # Get streams associated with this channel that belong to our M3U account and original group
-                channel_streams = ChannelStream.objects.filter(
-                    channel=channel,
-                    stream__m3u_account=account,
-                    stream__channel_group=channel_group,  # Match streams from the original group
-                ).select_related("stream")
-
-                # Map each of our M3U account's streams to this channel
-                for channel_stream in channel_streams:
-                    if channel_stream.stream:
-                        existing_channel_map[channel_stream.stream.id] = channel
-
-            # Track which streams we've processed
-            processed_stream_ids = set()
-
-            # Check if we have streams - handle both QuerySet and list cases
-            has_streams = (
-                len(current_streams) > 0
-                if streams_is_list
-                else current_streams.exists()
-            )
-
-            if not has_streams:
-                logger.debug(f"No streams found in group {channel_group.name}")
-                # Delete all existing auto channels if no streams
-                channels_to_delete = [ch for ch in existing_channel_map.values()]
-                if channels_to_delete:
-                    deleted_count = len(channels_to_delete)
-                    Channel.objects.filter(
-                        id__in=[ch.id for ch in channels_to_delete]
-                    ).delete()
-                    channels_deleted += deleted_count
-                    logger.debug(
-                        f"Deleted {deleted_count} auto channels (no streams remaining)"
-                    )
-                continue
-
-            # Prepare profiles to assign to new channels
-            from apps.channels.models import ChannelProfile, ChannelProfileMembership
-
-            if (
-                channel_profile_ids
-                and isinstance(channel_profile_ids, list)
-                and len(channel_profile_ids) > 0
-            ):
-                # Convert all to int (in case they're strings)
-                try:
-                    profile_ids = [int(pid) for pid in channel_profile_ids]
-                except Exception:
-                    profile_ids = []
-                profiles_to_assign = list(
-                    ChannelProfile.objects.filter(id__in=profile_ids)
-                )
-            else:
-                profiles_to_assign = list(ChannelProfile.objects.all())
-
-            # Get stream profile to assign if specified
-            from core.models import StreamProfile
-            stream_profile_to_assign = None
-            if stream_profile_id:
-                try:
-                    stream_profile_to_assign = StreamProfile.objects.get(id=int(stream_profile_id))
-                    logger.info(
-                        f"Will assign stream profile '{stream_profile_to_assign.name}' to auto-synced streams in group '{channel_group.name}'"
-                    )
-                except (StreamProfile.DoesNotExist, ValueError, TypeError):
-                    logger.warning(
-                        f"Stream profile with ID {stream_profile_id} not found for group '{channel_group.name}', streams will use default profile"
-                    )
-                    stream_profile_to_assign = None
-
-            # Process each current stream
-            current_channel_number = start_number
-
-            # Always renumber all existing channels to match current sort order
-            # This ensures channels are always in the correct sequence
-            channels_to_renumber = []
-            temp_channel_number = start_number
-
-            # Get all channel numbers that are already in use by other channels (not auto-created by this account)
-            used_numbers = set(
-                Channel.objects.exclude(
-                    auto_created=True, auto_created_by=account
-                ).values_list("channel_number", flat=True)
-            )
-
-            for stream in current_streams:
-                if stream.id in existing_channel_map:
-                    channel = existing_channel_map[stream.id]
-
-                    # Find next available number starting from temp_channel_number
-                    target_number = temp_channel_number
-                    while target_number in used_numbers:
-                        target_number += 1
-
-                    # Add this number to used_numbers so we don't reuse it in this batch
-                    used_numbers.add(target_number)
-
-                    if channel.channel_number != target_number:
-                        channel.channel_number = target_number
-                        channels_to_renumber.append(channel)
-                        logger.debug(
-                            f"Will renumber channel '{channel.name}' to {target_number}"
-                        )
-
-                    temp_channel_number += 1.0
-                    if temp_channel_number % 1 != 0:  # Has decimal
-                        temp_channel_number = int(temp_channel_number) + 1.0
-
-            # Bulk update channel numbers if any need renumbering
-            if channels_to_renumber:
-                Channel.objects.bulk_update(channels_to_renumber, ["channel_number"])
-                logger.info(
-                    f"Renumbered {len(channels_to_renumber)} channels to maintain sort order"
-                )
-
-            # Reset channel number counter for processing new channels
-            current_channel_number = start_number
-
-            for stream in current_streams:
-                processed_stream_ids.add(stream.id)
-                try:
-                    # Parse custom properties for additional info
-                    stream_custom_props = stream.custom_properties or {}
-                    tvc_guide_stationid = stream_custom_props.get("tvc-guide-stationid")
-
-                    # --- REGEX FIND/REPLACE LOGIC ---
-                    original_name = stream.name
-                    new_name = original_name
-                    if name_regex_pattern is not None:
-                        # If replace is None, treat as empty string (remove match)
-                        replace = (
-                            name_replace_pattern
-                            if name_replace_pattern is not None
-                            else ""
-                        )
-                        try:
-                            # Convert $1, $2, etc. to \1, \2, etc. for consistency with M3U profiles
-                            safe_replace_pattern = re.sub(r'\$(\d+)', r'\\\1', replace)
-                            new_name = re.sub(
-                                name_regex_pattern, safe_replace_pattern, original_name
-                            )
-                        except re.error as e:
-                            logger.warning(
-                                f"Regex error for group '{channel_group.name}': {e}. Using original name."
-                            )
-                            new_name = original_name
-
-                    # Check if we already have a channel for this stream
-                    existing_channel = existing_channel_map.get(stream.id)
-
-                    if existing_channel:
-                        # Update existing channel if needed (channel number already handled above)
-                        channel_updated = False
-
-                        # Use new_name instead of stream.name
-                        if existing_channel.name != new_name:
-                            existing_channel.name = new_name
-                            channel_updated = True
-
-                        if existing_channel.tvg_id != stream.tvg_id:
-                            existing_channel.tvg_id = stream.tvg_id
-                            channel_updated = True
-
-                        if existing_channel.tvc_guide_stationid != tvc_guide_stationid:
-                            existing_channel.tvc_guide_stationid = tvc_guide_stationid
-                            channel_updated = True
-
-                        # Check if channel group needs to be updated (in case override was added/changed)
-                        if existing_channel.channel_group != target_group:
-                            existing_channel.channel_group = target_group
-                            channel_updated = True
-                            logger.info(
-                                f"Moved auto channel '{existing_channel.name}' from '{existing_channel.channel_group.name if existing_channel.channel_group else 'None'}' to '{target_group.name}'"
-                            )
-
-                        # Handle logo updates
-                        current_logo = None
-                        if custom_logo_id:
-                            # Use the custom logo specified in group settings
-                            from apps.channels.models import Logo
-                            try:
-                                current_logo = Logo.objects.get(id=custom_logo_id)
-                            except Logo.DoesNotExist:
-                                logger.warning(
-                                    f"Custom logo with ID {custom_logo_id} not found for existing channel, falling back to stream logo"
-                                )
-                                # Fall back to stream logo if custom logo not found
-                                if stream.logo_url:
-                                    current_logo, _ = Logo.objects.get_or_create(
-                                        url=stream.logo_url,
-                                        defaults={
-                                            "name": stream.name or stream.tvg_id or "Unknown"
-                                        },
-                                    )
-                        elif stream.logo_url:
-                            # No custom logo configured, use stream logo
-                            from apps.channels.models import Logo
-
-                            current_logo, _ = Logo.objects.get_or_create(
-                                url=stream.logo_url,
-                                defaults={
-                                    "name": stream.name or stream.tvg_id or "Unknown"
-                                },
-                            )
-
-                        if existing_channel.logo != current_logo:
-                            existing_channel.logo = current_logo
-                            channel_updated = True
-
-                        # Handle EPG data updates
-                        current_epg_data = None
-                        if custom_epg_id:
-                            # Use the custom EPG specified in group settings (e.g., a dummy EPG)
-                            from apps.epg.models import EPGSource
-                            try:
-                                epg_source = EPGSource.objects.get(id=custom_epg_id)
-                                # For dummy EPGs, select the first (and typically only) EPGData entry from this source
-                                if epg_source.source_type == 'dummy':
-                                    current_epg_data = EPGData.objects.filter(
-                                        epg_source=epg_source
-                                    ).first()
-                                    if not current_epg_data:
-                                        logger.warning(
-                                            f"No EPGData found for dummy EPG source {epg_source.name} (ID: {custom_epg_id})"
-                                        )
-                                else:
-                                    # For non-dummy sources, try to find existing EPGData by tvg_id
-                                    if stream.tvg_id:
-                                        current_epg_data = EPGData.objects.filter(
-                                            tvg_id=stream.tvg_id,
-                                            epg_source=epg_source
-                                        ).first()
-                            except EPGSource.DoesNotExist:
-                                logger.warning(
-                                    f"Custom EPG source with ID {custom_epg_id} not found for existing channel, falling back to auto-match"
-                                )
-                                # Fall back to auto-match by tvg_id
-                                if stream.tvg_id and not force_dummy_epg:
-                                    current_epg_data = EPGData.objects.filter(
-                                        tvg_id=stream.tvg_id
-                                    ).first()
-                        elif stream.tvg_id and not force_dummy_epg:
-                            # Auto-match EPG by tvg_id (original behavior)
-                            current_epg_data = EPGData.objects.filter(
-                                tvg_id=stream.tvg_id
-                            ).first()
-                        # If force_dummy_epg is True and no custom_epg_id, current_epg_data stays None
-
-                        if existing_channel.epg_data != current_epg_data:
-                            existing_channel.epg_data = current_epg_data
-                            channel_updated = True
-
-                        # Handle stream profile updates for the channel
-                        if stream_profile_to_assign and existing_channel.stream_profile != stream_profile_to_assign:
-                            existing_channel.stream_profile = stream_profile_to_assign
-                            channel_updated = True
-
-                        if channel_updated:
-                            existing_channel.save()
-                            channels_updated += 1
-                            logger.debug(
-                                f"Updated auto channel: {existing_channel.channel_number} - {existing_channel.name}"
-                            )
-
-                        # Update channel profile memberships for existing channels
-                        current_memberships = set(
-                            ChannelProfileMembership.objects.filter(
-                                channel=existing_channel, enabled=True
-                            ).values_list("channel_profile_id", flat=True)
-                        )
-
-                        target_profile_ids = set(
-                            profile.id for profile in profiles_to_assign
-                        )
-
-                        # Only update if memberships have changed
-                        if current_memberships != target_profile_ids:
-                            # Disable all current memberships
-                            ChannelProfileMembership.objects.filter(
-                                channel=existing_channel
-                            ).update(enabled=False)
-
-                            # Enable/create memberships for target profiles
-                            for profile in profiles_to_assign:
-                                membership, created = (
-                                    ChannelProfileMembership.objects.get_or_create(
-                                        channel_profile=profile,
-                                        channel=existing_channel,
-                                        defaults={"enabled": True},
-                                    )
-                                )
-                                if not created and not membership.enabled:
-                                    membership.enabled = True
-                                    membership.save()
-
-                            logger.debug(
-                                f"Updated profile memberships for auto channel: {existing_channel.name}"
-                            )
-
-                    else:
-                        # Create new channel
-                        # Find next available channel number
-                        target_number = current_channel_number
-                        while target_number in used_numbers:
-                            target_number += 1
-
-                        # Add this number to used_numbers
-                        used_numbers.add(target_number)
-
-                        channel = Channel.objects.create(
-                            channel_number=target_number,
-                            name=new_name,
-                            tvg_id=stream.tvg_id,
-                            tvc_guide_stationid=tvc_guide_stationid,
-                            channel_group=target_group,
-                            user_level=0,
-                            auto_created=True,
-                            auto_created_by=account,
-                        )
-
-                        # Associate the stream with the channel
-                        ChannelStream.objects.create(
-                            channel=channel, stream=stream, order=0
-                        )
-
-                        # Assign to correct profiles
-                        memberships = [
-                            ChannelProfileMembership(
-                                channel_profile=profile, channel=channel, enabled=True
-                            )
-                            for profile in profiles_to_assign
-                        ]
-                        if memberships:
-                            ChannelProfileMembership.objects.bulk_create(memberships)
-
-                        # Try to match EPG data
-                        if custom_epg_id:
-                            # Use the custom EPG specified in group settings (e.g., a dummy EPG)
-                            from apps.epg.models import EPGSource
-                            try:
-                                epg_source = EPGSource.objects.get(id=custom_epg_id)
-                                # For dummy EPGs, select the first (and typically only) EPGData entry from this source
-                                if epg_source.source_type == 'dummy':
-                                    epg_data = EPGData.objects.filter(
-                                        epg_source=epg_source
-                                    ).first()
-                                    if epg_data:
-                                        channel.epg_data = epg_data
-                                        channel.save(update_fields=["epg_data"])
-                                    else:
-                                        logger.warning(
-                                            f"No EPGData found for dummy EPG source {epg_source.name} (ID: {custom_epg_id})"
-                                        )
-                                else:
-                                    # For non-dummy sources, try to find existing EPGData by tvg_id
-                                    if stream.tvg_id:
-                                        epg_data = EPGData.objects.filter(
-                                            tvg_id=stream.tvg_id,
-                                            epg_source=epg_source
-                                        ).first()
-                                        if epg_data:
-                                            channel.epg_data = epg_data
-                                            channel.save(update_fields=["epg_data"])
-                            except EPGSource.DoesNotExist:
-                                logger.warning(
-                                    f"Custom EPG source with ID {custom_epg_id} not found, falling back to auto-match"
-                                )
-                                # Fall back to auto-match by tvg_id
-                                if stream.tvg_id and not force_dummy_epg:
-                                    epg_data = EPGData.objects.filter(
-                                        tvg_id=stream.tvg_id
-                                    ).first()
-                                    if epg_data:
-                                        channel.epg_data = epg_data
-                                        channel.save(update_fields=["epg_data"])
-                        elif stream.tvg_id and not force_dummy_epg:
-                            # Auto-match EPG by tvg_id (original behavior)
-                            epg_data = EPGData.objects.filter(
-                                tvg_id=stream.tvg_id
-                            ).first()
-                            if epg_data:
-                                channel.epg_data = epg_data
-                                channel.save(update_fields=["epg_data"])
-                        elif force_dummy_epg:
-                            # Force dummy EPG with no custom EPG selected (set to None)
-                            channel.epg_data = None
-                            channel.save(update_fields=["epg_data"])
-
-                        # Handle logo
-                        if custom_logo_id:
-                            # Use the custom logo specified in group settings
-                            from apps.channels.models import Logo
-                            try:
-                                custom_logo = Logo.objects.get(id=custom_logo_id)
-                                channel.logo = custom_logo
-                                channel.save(update_fields=["logo"])
-                            except Logo.DoesNotExist:
-                                logger.warning(
-                                    f"Custom logo with ID {custom_logo_id} not found, falling back to stream logo"
-                                )
-                                # Fall back to stream logo if custom logo not found
-                                if stream.logo_url:
-                                    logo, _ = Logo.objects.get_or_create(
-                                        url=stream.logo_url,
-                                        defaults={
-                                            "name": stream.name or stream.tvg_id or "Unknown"
-                                        },
-                                    )
-                                    channel.logo = logo
-                                    channel.save(update_fields=["logo"])
-                        elif stream.logo_url:
-                            from apps.channels.models import Logo
-
-                            logo, _ = Logo.objects.get_or_create(
-                                url=stream.logo_url,
-                                defaults={
-                                    "name": stream.name or stream.tvg_id or "Unknown"
-                                },
-                            )
-                            channel.logo = logo
-                            channel.save(update_fields=["logo"])
-
-                        # Handle stream profile assignment
-                        if stream_profile_to_assign:
-                            channel.stream_profile = stream_profile_to_assign
-                            channel.save(update_fields=['stream_profile'])
-                        channels_created += 1
-                        logger.debug(
-                            f"Created auto channel: {channel.channel_number} - {channel.name}"
-                        )
-
-                    # Increment channel number for next iteration
-                    current_channel_number += 1.0
-                    if current_channel_number % 1 != 0:  # Has decimal
-                        current_channel_number = int(current_channel_number) + 1.0
-
-                except Exception as e:
-                    logger.error(
-                        f"Error processing auto channel for stream {stream.name}: {str(e)}"
-                    )
-                    continue
-
-            # Delete channels for streams that no longer exist
-            channels_to_delete = []
-            for stream_id, channel in existing_channel_map.items():
-                if stream_id not in processed_stream_ids:
-                    channels_to_delete.append(channel)
-
-            if channels_to_delete:
-                deleted_count = len(channels_to_delete)
-                Channel.objects.filter(
-                    id__in=[ch.id for ch in channels_to_delete]
-                ).delete()
-                channels_deleted += deleted_count
-                logger.debug(
-                    f"Deleted {deleted_count} auto channels for removed streams"
-                )
-
-        # Additional cleanup: Remove auto-created channels that no longer have any valid streams
-        # This handles the case where streams were deleted due to stale retention policy
-        orphaned_channels = Channel.objects.filter(
-            auto_created=True,
-            auto_created_by=account
-        ).exclude(
-            # Exclude channels that still have valid stream associations
-            id__in=ChannelStream.objects.filter(
-                stream__m3u_account=account,
-                stream__isnull=False
-            ).values_list('channel_id', flat=True)
-        )
-
-        orphaned_count = orphaned_channels.count()
-        if orphaned_count > 0:
-            orphaned_channels.delete()
-            channels_deleted += orphaned_count
-            logger.info(
-                f"Deleted {orphaned_count} orphaned auto channels with no valid streams"
-            )
-
-        logger.info(
-            f"Auto channel sync complete for account {account.name}: {channels_created} created, {channels_updated} updated, {channels_deleted} deleted"
-        )
-        return f"Auto sync: {channels_created} channels created, {channels_updated} updated, {channels_deleted} deleted"
+        return AutoChannelSync(account, scan_start_time).run()
 
     except Exception as e:
         logger.error(f"Error in auto channel sync for account {account_id}: {str(e)}")
@@ -2486,8 +2043,9 @@ def refresh_single_m3u_account(account_id):
         release_task_lock("refresh_single_m3u_account", account_id)
         return f"M3UAccount with ID={account_id} not found or inactive, task cleaned up"
 
-    # Fetch M3U lines and handle potential issues
-    extinf_data = []
+    # Groups and the stream count are cached by refresh_m3u_groups, the streams
+    # themselves are parsed again from the cached playlist
+    stream_count = 0
     groups = None
 
     cache_path = os.path.join(m3u_dir, f"{account_id}.json")
@@ -2496,7 +2054,7 @@ def refresh_single_m3u_account(account_id):
             with open(cache_path, "r") as file:
                 data = json.load(file)
 
-            extinf_data = data["extinf_data"]
+            stream_count = data.get("stream_count", 0)
             groups = data["groups"]
         except json.JSONDecodeError as e:
             # Handle corrupted JSON file
@@ -2515,14 +2073,14 @@ def refresh_single_m3u_account(account_id):
                 )
 
             # Reset the data to empty structures
-            extinf_data = []
+            stream_count = 0
             groups = None
         except Exception as e:
             logger.error(f"Unexpected error reading cached M3U data: {str(e)}")
-            extinf_data = []
+            stream_count = 0
             groups = None
 
-    if not extinf_data:
+    if not stream_count:
         try:
             logger.info(f"Calling refresh_m3u_groups for account {account_id}")
             result = refresh_m3u_groups(account_id, full_refresh=True)
@@ -2536,17 +2094,17 @@ def refresh_single_m3u_account(account_id):
                 release_task_lock("refresh_single_m3u_account", account_id)
                 return "Failed to update m3u account - download failed or other error"
 
-            extinf_data, groups = result
+            stream_count, groups = result
 
-            # XC accounts can have empty extinf_data but valid groups
+            # XC accounts have no stream count at this stage but valid groups
             try:
                 account = M3UAccount.objects.get(id=account_id)
                 is_xc_account = account.account_type == M3UAccount.Types.XC
             except M3UAccount.DoesNotExist:
                 is_xc_account = False
 
-            # For XC accounts, empty extinf_data is normal at this stage
-            if not extinf_data and not is_xc_account:
+            # For XC accounts, no streams is normal at this stage
+            if not stream_count and not is_xc_account:
                 logger.error(f"No streams found for non-XC account {account_id}")
                 account.status = M3UAccount.Status.ERROR
                 account.last_message = "No streams found in M3U source"
@@ -2577,7 +2135,7 @@ def refresh_single_m3u_account(account_id):
         is_xc_account = False
 
     # Modified validation logic for different account types
-    if (not groups) or (not is_xc_account and not extinf_data):
+    if (not groups) or (not is_xc_account and not stream_count):
         logger.error(f"No data to process for account {account_id}")
         account.status = M3UAccount.Status.ERROR
         account.last_message = "No data available for processing"
@@ -2593,6 +2151,10 @@ def refresh_single_m3u_account(account_id):
         return "Failed to update m3u account, no data available"
 
     hash_keys = CoreSettings.get_m3u_hash_key().split(",")
+    # Streams hashed before the hash version marker are matched by their old hash and rewritten
+    migrate_legacy = needs_hash_migration(account_id)
+    if migrate_legacy:
+        logger.info(f"Migrating stream hashes for M3U account {account_id} to hash version {HASH_PREFIX[:-1]}")
 
     existing_groups = {
         group.name: group.id
@@ -2619,72 +2181,26 @@ def refresh_single_m3u_account(account_id):
             logger.debug(
                 f"Processing Standard account ({account_id}) with groups: {existing_groups}"
             )
-            # Break into batches and process with threading - use global batch size
-            batches = [
-                extinf_data[i : i + BATCH_SIZE]
-                for i in range(0, len(extinf_data), BATCH_SIZE)
-            ]
+            lines, success = fetch_m3u_lines(account, use_cache=True)
+            if not success:
+                raise Exception("Failed to read the cached M3U file")
+
+            # Parse the playlist while earlier batches are written - use global batch size
+            total_batches = -(-stream_count // BATCH_SIZE)
+            batches = iter_batches(
+                entry for entry in iter_m3u_entries(lines) if "url" in entry
+            )
 
-            logger.info(f"Processing {len(extinf_data)} streams in {len(batches)} thread batches")
+            logger.info(f"Processing {stream_count} streams in {total_batches} thread batches")
 
             # Use 2 threads for optimal database connection handling
-            max_workers = min(2, len(batches))
+            max_workers = max(1, min(2, total_batches))
             logger.debug(f"Using {max_workers} threads for processing")
 
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit batch processing tasks using direct functions (now thread-safe)
-                future_to_batch = {
-                    executor.submit(process_m3u_batch_direct, account_id, batch, existing_groups, hash_keys): i
-                    for i, batch in enumerate(batches)
-                }
-
-                completed_batches = 0
-                total_batches = len(batches)
-
-                # Process completed batches as they finish
-                for future in as_completed(future_to_batch):
-                    batch_idx = future_to_batch[future]
-                    try:
-                        result = future.result()
-                        completed_batches += 1
-
-                        # Extract stream counts from result
-                        if isinstance(result, str):
-                            try:
-                                created_match = re.search(r"(\d+) created", result)
-                                updated_match = re.search(r"(\d+) updated", result)
-                                if created_match and updated_match:
-                                    created_count = int(created_match.group(1))
-                                    updated_count = int(updated_match.group(1))
-                                    streams_created += created_count
-                                    streams_updated += updated_count
-                            except (AttributeError, ValueError):
-                                pass
-
-                        # Send progress update
-                        progress = int((completed_batches / total_batches) * 100)
-                        current_elapsed = time.time() - start_time
-
-                        if progress > 0:
-                            estimated_total = (current_elapsed / progress) * 100
-                            time_remaining = max(0, estimated_total - current_elapsed)
-                        else:
-                            time_remaining = 0
-
-                        send_m3u_update(
-                            account_id,
-                            "parsing",
-                            progress,
-                            elapsed_time=current_elapsed,
-                            time_remaining=time_remaining,
-                            streams_processed=streams_created + streams_updated,
-                        )
-
-                        logger.debug(f"Thread batch {completed_batches}/{total_batches} completed")
-
-                    except Exception as e:
-                        logger.error(f"Error in thread batch {batch_idx}: {str(e)}")
-                        completed_batches += 1  # Still count it to avoid hanging
+            streams_created, streams_updated = process_stream_batches(
+                account_id, batches, total_batches, existing_groups, hash_keys,
+                migrate_legacy, max_workers, start_time,
+            )
 
             logger.info(f"Thread-based processing completed for account {account_id}")
         else:
@@ -2739,60 +2255,11 @@ def refresh_single_m3u_account(account_id):
                 max_workers = min(4, len(batches))
                 logger.debug(f"Using {max_workers} threads for XC stream processing")
 
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    # Submit stream batch processing tasks (reuse standard M3U processing)
-                    future_to_batch = {
-                        executor.submit(process_m3u_batch_direct, account_id, batch, existing_groups, hash_keys): i
-                        for i, batch in enumerate(batches)
-                    }
-
-                    completed_batches = 0
-                    total_batches = len(batches)
-
-                    # Process completed batches as they finish
-                    for future in as_completed(future_to_batch):
-                        batch_idx = future_to_batch[future]
-                        try:
-                            result = future.result()
-                            completed_batches += 1
-
-                            # Extract stream counts from result
-                            if isinstance(result, str):
-                                try:
-                                    created_match = re.search(r"(\d+) created", result)
-                                    updated_match = re.search(r"(\d+) updated", result)
-                                    if created_match and updated_match:
-                                        created_count = int(created_match.group(1))
-                                        updated_count = int(updated_match.group(1))
-                                        streams_created += created_count
-                                        streams_updated += updated_count
-                                except (AttributeError, ValueError):
-                                    pass
-
-                            # Send progress update
-                            progress = int((completed_batches / total_batches) * 100)
-                            current_elapsed = time.time() - start_time
-
-                            if progress > 0:
-                                estimated_total = (current_elapsed / progress) * 100
-                                time_remaining = max(0, estimated_total - current_elapsed)
-                            else:
-                                time_remaining = 0
-
-                            send_m3u_update(
-                                account_id,
-                                "parsing",
-                                progress,
-                                elapsed_time=current_elapsed,
-                                time_remaining=time_remaining,
-                                streams_processed=streams_created + streams_updated,
-                            )
-
-                            logger.debug(f"XC thread batch {completed_batches}/{total_batches} completed")
-
-                        except Exception as e:
-                            logger.error(f"Error in XC thread batch {batch_idx}: {str(e)}")
-                            completed_batches += 1  # Still count it to avoid hanging
+                # Reuse standard M3U processing
+                streams_created, streams_updated = process_stream_batches(
+                    account_id, batches, len(batches), existing_groups, hash_keys,
+                    migrate_legacy, max_workers, start_time, label="XC thread",
+                )
 
                 logger.info(f"XC thread-based processing completed for account {account_id}")
 
@@ -2824,6 +2291,11 @@ def refresh_single_m3u_account(account_id):
                 f"Error running auto channel sync for account {account_id}: {str(e)}"
             )
 
+        # Stream URLs, groups and auto-synced channels were bulk updated without signals
+        invalidate_output_cache()
+        invalidate_stream_resolutions()
+        schedule_logo_prefetch()
+
         # Calculate elapsed time
         elapsed_time = time.time() - start_time
 
@@ -2878,8 +2350,6 @@ def refresh_single_m3u_account(account_id):
     # Only delete variables if they exist
     if 'existing_groups' in locals():
         del existing_groups
-    if 'extinf_data' in locals():
-        del extinf_data
     if 'groups' in locals():
         del groups
     if 'batches' in locals():
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.channels.models import (
+    Channel,
+    ChannelGroup,
+    ChannelGroupM3UAccount,
+    ChannelProfile,
+    ChannelProfileMembership,
+    ChannelStream,
+    Stream,
+)
+from apps.m3u.auto_sync import AutoChannelSync
+from apps.m3u.models import M3UAccount
+
+
+@mock.patch("apps.m3u.auto_sync.invalidate_stream_resolutions")
+@mock.patch("apps.m3u.auto_sync.invalidate_output_cache")
+class AutoChannelSyncTests(TestCase):
+    def setUp(self):
+        # Streams created by the tests count as seen in the current refresh
+        self.scan_start_time = timezone.now() - timedelta(minutes=1)
+        # Creating an account queues a playlist refresh
+        with mock.patch("apps.m3u.signals.refresh_m3u_groups"):
+            self.account = M3UAccount.objects.create(name="Provider", server_url="http://example.com/list.m3u")
+        self.group = ChannelGroup.objects.create(name="News")
+        self.relation = ChannelGroupM3UAccount.objects.create(
+            channel_group=self.group,
+            m3u_account=self.account,
+            auto_channel_sync=True,
+            auto_sync_channel_start=100,
+        )
+        self.profile = ChannelProfile.objects.create(name="Living room")
+        # A manual channel holding a number inside the auto-sync range
+        Channel.objects.create(name="Manual", channel_number=101)
+
+    def stream(self, name, **fields):
+        return Stream.objects.create(
+            name=name,
+            url=f"http://example.com/{name}",
+            m3u_account=self.account,
+            channel_group=self.group,
+            last_seen=timezone.now(),
+            **fields,
+        )
+
+    def sync(self):
+        sync = AutoChannelSync(self.account, self.scan_start_time)
+        sync.run()
+        return sync
+
+    def auto_channels(self):
+        return {
+            channel_stream.stream.name: channel_stream.channel
+            for channel_stream in ChannelStream.objects.filter(
+                channel__auto_created_by=self.account
+            ).select_related("channel", "stream")
+        }
+
+    def test_creates_channels_numbered_around_taken_numbers(self, *_):
+        for name in ("Alpha", "Bravo", "Charlie"):
+            self.stream(name, tvg_id=name.lower())
+
+        sync = self.sync()
+
+        self.assertEqual((sync.created, sync.updated, sync.deleted), (3, 0, 0))
+        channels = self.auto_channels()
+        self.assertEqual(
+            {name: channel.channel_number for name, channel in channels.items()},
+            {"Alpha": 100, "Bravo": 102, "Charlie": 103},
+        )
+        self.assertEqual(channels["Bravo"].channel_group_id, self.group.id)
+        self.assertEqual(channels["Bravo"].tvg_id, "bravo")
+        self.assertEqual(
+            ChannelProfileMembership.objects.filter(
+                channel_profile=self.profile, channel__auto_created_by=self.account, enabled=True
+            ).count(),
+            3,
+        )
+
+    def test_updates_renumbers_and_deletes_on_the_next_sync(self, *_):
+        alpha = self.stream("Alpha")
+        bravo = self.stream("Bravo")
+        self.stream("Charlie")
+        self.sync()
+        charlie_channel = self.auto_channels()["Charlie"]
+
+        # Bravo disappeared from the provider and Alpha is renamed by a group rule
+        bravo.last_seen = self.scan_start_time - timedelta(days=1)
+        bravo.save()
+        self.relation.custom_properties = {"name_regex_pattern": "^Alpha$", "name_replace_pattern": "Alpha HD"}
+        self.relation.save()
+
+        sync = self.sync()
+
+        self.assertEqual((sync.created, sync.updated, sync.deleted), (0, 2, 1))
+        channels = self.auto_channels()
+        self.assertEqual(set(channels), {"Alpha", "Charlie"})
+        self.assertEqual(channels["Alpha"].name, "Alpha HD")
+        self.assertEqual(channels["Alpha"].channel_number, 100)
+        # Charlie keeps its channel row and moves up to the next free number
+        self.assertEqual(channels["Charlie"].id, charlie_channel.id)
+        self.assertEqual(channels["Charlie"].channel_number, 102)
+        self.assertEqual(alpha.channels.count(), 1)
+
+    def test_unchanged_streams_write_nothing(self, invalidate_output_cache, invalidate_stream_resolutions):
+        self.stream("Alpha")
+        self.sync()
+        invalidate_output_cache.reset_mock()
+
+        sync = self.sync()
+
+        self.assertEqual((sync.created, sync.updated, sync.deleted), (0, 0, 0))
+        invalidate_output_cache.assert_not_called()
@@ -0,0 +1,138 @@
+"""
+Cached Xtream Codes authentication and channel visibility.
+
+XC clients send their credentials with every request, and most requests then
+filter channels by the user's level and channel profiles. Both results are cached
+per process under the ACCESS version (see apps.output.cache). The output signals
+bump that version when users, channels, channel profiles or profile memberships
+change, so every worker drops its copy at once.
+
+Passwords are never cached, only an HMAC of the user's XC password.
+"""
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from apps.accounts.models import User
+from apps.channels.models import Channel, ChannelProfile
+from .cache import ACCESS, CACHE_TIMEOUT, get_output_version, params_digest
+
+# User fields kept in the auth cache, anything else is loaded on first access
+USER_FIELDS = ("id", "username", "user_level")
+
+
+def credential_digest(password):
+    """Keyed digest of an XC password, safe to keep in the cache"""
+    return hmac.new(
+        settings.SECRET_KEY.encode("utf-8"), str(password).encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def _cached(name, loader):
+    """Return loader() through the cache, keyed by the current ACCESS version"""
+    version = get_output_version(ACCESS)
+    if version is None:
+        return loader()
+    key = f"output:{ACCESS}:{version}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = loader()
+        cache.set(key, value, CACHE_TIMEOUT)
+    return value
+
+
+def _load_credentials(username):
+    user = User.objects.filter(username=username).values(*USER_FIELDS, "custom_properties").first()
+    if user is None:
+        return {"fields": None, "digest": None}
+    custom_properties = user.pop("custom_properties") or {}
+    password = custom_properties.get("xc_password")
+    return {
+        "fields": user,
+        "digest": credential_digest(password) if password is not None else None,
+    }
+
+
+def get_xc_user(username, password):
+    """
+    Return the user for XC credentials, or None when the password doesn't match.
+    Raises Http404 for unknown usernames.
+
+    The returned user only has USER_FIELDS loaded, other fields are deferred.
+    """
+    entry = _cached(f"user:{params_digest(username)}", lambda: _load_credentials(username))
+    if entry["fields"] is None:
+        raise Http404("No User matches the given query.")
+
+    if entry["digest"] is None or not hmac.compare_digest(entry["digest"], credential_digest(password)):
+        return None
+
+    fields = entry["fields"]
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+    return User.from_db(User.objects.db, names, [fields[name] for name in names])
+
+
+def _load_scope(user, profile_name):
+    if user is not None:
+        # Admins see everything at their level, other users are limited to their
+        # profiles when they have any
+        if user.user_level < User.UserLevel.ADMIN and user.channel_profiles.exists():
+            channels = Channel.objects.filter(
+                channelprofilemembership__enabled=True,
+                user_level__lte=user.user_level,
+                channelprofilemembership__channel_profile__in=user.channel_profiles.all(),
+            )
+            restricted = True
+        else:
+            channels = Channel.objects.filter(user_level__lte=user.user_level)
+            restricted = False
+    elif profile_name is not None:
+        channel_profile = ChannelProfile.objects.get(name=profile_name)
+        channels = Channel.objects.filter(
+            channelprofilemembership__channel_profile=channel_profile,
+            channelprofilemembership__enabled=True,
+        )
+        restricted = True
+    else:
+        channels = Channel.objects.all()
+        restricted = False
+
+    return {"restricted": restricted, "ids": frozenset(channels.values_list("id", flat=True))}
+
+
+def channel_scope(user=None, profile_name=None):
+    """
+    Channels visible to a user, or through a channel profile when no user is given.
+    Returns {"restricted": bool, "ids": frozenset}. Unrestricted scopes only filter
+    on user_level.
+    """
+    if user is not None:
+        name = f"scope:user:{user.id}:{user.user_level}"
+    elif profile_name is not None:
+        name = f"scope:profile:{params_digest(profile_name)}"
+    else:
+        name = "scope:all"
+    return _cached(name, lambda: _load_scope(user, profile_name))
+
+
+def visible_channels(user=None, profile_name=None):
+    """Unordered Channel queryset of the channels in channel_scope()"""
+    scope = channel_scope(user, profile_name)
+    if scope["restricted"]:
+        return Channel.objects.filter(id__in=scope["ids"])
+    if user is not None:
+        return Channel.objects.filter(user_level__lte=user.user_level)
+    return Channel.objects.all()
+
+
+def can_view_channel(user, channel_id):
+    """Whether a channel id (int or numeric string) is visible to the user"""
+    try:
+        channel_id = int(channel_id)
+    except (TypeError, ValueError):
+        return False
+    return channel_id in channel_scope(user)["ids"]
@@ -0,0 +1,228 @@
+"""
+Versioned cache for generated output (M3U playlists, XMLTV guides).
+
+Each output kind has a version counter in Redis that is bumped whenever the data it
+is built from changes (see apps.output.signals). Cache keys embed the current version,
+so a bump invalidates every cached variant across all workers at once; stale entries
+simply age out of the cache backend.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from django.core.cache import cache
+
+from core.utils import RedisClient
+
+logger = logging.getLogger(__name__)
+
+M3U = "m3u"
+EPG = "epg"
+# Cached XC credentials and channel visibility (apps.output.access). Anything that
+# changes the playlist's channel list can change visibility, so it is part of ALL_KINDS.
+ACCESS = "access"
+ALL_KINDS = (M3U, EPG, ACCESS)
+
+# XC VOD listings (movies, series), bumped by the VOD refresh tasks
+VOD = "vod"
+
+# Safety net for changes made without signals (raw queryset updates)
+CACHE_TIMEOUT = 3600
+# Size of the byte chunks streamed to clients
+CHUNK_SIZE = 64 * 1024
+
+
+def _version_key(kind):
+    return f"output:{kind}:version"
+
+
+def _initial_version():
+    # Versions start from the clock rather than 0 so they keep increasing across
+    # Redis restarts, which matters for caches that outlive Redis (disk cached EPG)
+    return int(time.time() * 1000)
+
+
+def get_output_version(kind):
+    """Return the current version for an output kind, or None if Redis is unavailable"""
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return None
+    try:
+        key = _version_key(kind)
+        version = redis_client.get(key)
+        if version is None:
+            redis_client.set(key, _initial_version(), nx=True)
+            version = redis_client.get(key)
+        return int(version)
+    except Exception as e:
+        logger.warning(f"Could not read {kind} output version: {e}")
+        return None
+
+
+def invalidate_output_cache(kinds=ALL_KINDS):
+    """Bump the version of the given output kinds so cached copies are rebuilt"""
+    redis_client = RedisClient.get_client()
+    if redis_client is None:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        for kind in kinds:
+            pipe.set(_version_key(kind), _initial_version(), nx=True)
+            pipe.incr(_version_key(kind))
+        pipe.execute()
+        logger.debug(f"Invalidated output cache for {', '.join(kinds)}")
+    except Exception as e:
+        logger.warning(f"Could not invalidate output cache: {e}")
+
+
+def params_digest(params):
+    """Stable digest of the parameters that select a variant of an output"""
+    return hashlib.blake2b(
+        json.dumps(params, sort_keys=True, default=str).encode(), digest_size=16
+    ).hexdigest()
+
+
+def build_cache_key(kind, version, params):
+    """Build a cache key for a variant of an output (profile, user, query options, ...)"""
+    return f"output:{kind}:{version}:{params_digest(params)}"
+
+
+def make_etag(content):
+    """Strong ETag for a rendered output"""
+    return '"%s"' % hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def get_cached_output(kind, params):
+    """
+    Return (cache_key, entry) where entry is a dict with 'etag' and 'content' or None.
+    cache_key is None when caching is unavailable.
+    """
+    version = get_output_version(kind)
+    if version is None:
+        return None, None
+    key = build_cache_key(kind, version, params)
+    return key, cache.get(key)
+
+
+def set_cached_output(cache_key, content):
+    """Store rendered bytes under cache_key, returns the stored entry"""
+    entry = {"etag": make_etag(content), "content": content}
+    if cache_key is not None:
+        cache.set(cache_key, entry, CACHE_TIMEOUT)
+    return entry
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match header matches etag"""
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Weak comparison, proxies may have downgraded the tag
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def iter_content(content, chunk_size=CHUNK_SIZE):
+    """Yield rendered output in fixed-size chunks for StreamingHttpResponse"""
+    for offset in range(0, len(content), chunk_size):
+        yield content[offset:offset + chunk_size]
+
+
+def iter_chunks(fragments, chunk_size=CHUNK_SIZE):
+    """Join rendered text fragments into utf-8 chunks of roughly chunk_size bytes"""
+    parts = []
+    size = 0
+    for fragment in fragments:
+        parts.append(fragment)
+        size += len(fragment)
+        if size >= chunk_size:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+def disk_cache_path(kind, cache_dir, prefix, suffix, params):
+    """
+    Path of a gzip'd output variant on disk, or None when Redis is unavailable.
+    The kind's version is part of the file name, so a bump points requests at a new file.
+    """
+    version = get_output_version(kind)
+    if version is None:
+        return None
+    return os.path.join(cache_dir, f"{prefix}-{version}-{params_digest(params)}{suffix}")
+
+
+def iter_cached_file(path, compressed, chunk_size=CHUNK_SIZE):
+    """Yield a cached output either as stored (gzip) or decompressed"""
+    opener = open if compressed else gzip.open
+    with opener(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield data
+
+
+def write_through(chunks, path):
+    """
+    Yield chunks unchanged while writing them to a gzip'd file at path.
+
+    The file is written under a temporary name and only moved into place once the
+    whole output has been rendered, so a client disconnecting midway (or a rendering
+    error) never leaves a truncated file behind.
+    """
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError as e:
+        logger.warning(f"Output disk cache unavailable at {cache_dir}: {e}")
+        yield from chunks
+        return
+
+    completed = False
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+            for chunk in chunks:
+                gz.write(chunk)
+                yield chunk
+        os.replace(tmp_path, path)
+        completed = True
+        logger.debug(f"Cached output at {path}")
+    finally:
+        if not completed:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    prune_disk_cache(path)
+
+
+def prune_disk_cache(current_path):
+    """Remove files cached under older versions of the same output"""
+    cache_dir, current_name = os.path.split(current_path)
+    prefix, current_version = current_name.split("-")[:2]
+    current_version = int(current_version)
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        parts = name.split("-")
+        if parts[0] != prefix or len(parts) < 3 or not parts[1].isdigit():
+            continue
+        if int(parts[1]) < current_version:
+            try:
+                os.unlink(os.path.join(cache_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,84 @@
+# apps/output/signals.py
+
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from apps.accounts.models import User
+from apps.channels.models import (
+    Channel,
+    ChannelGroup,
+    ChannelProfile,
+    ChannelProfileMembership,
+    ChannelStream,
+    Logo,
+    Stream,
+)
+from apps.epg.models import EPGData, EPGSource
+from apps.m3u.models import M3UAccount
+from .cache import invalidate_output_cache, ACCESS, EPG, M3U, VOD, ALL_KINDS
+
+# Data that ends up in both the playlist and the guide
+@receiver([post_save, post_delete], sender=Channel)
+@receiver([post_save, post_delete], sender=ChannelStream)
+@receiver([post_save, post_delete], sender=ChannelProfile)
+@receiver([post_save, post_delete], sender=ChannelProfileMembership)
+@receiver([post_save, post_delete], sender=Logo)
+def invalidate_channel_outputs(sender, **kwargs):
+    invalidate_output_cache(ALL_KINDS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_outputs(sender, update_fields=None, **kwargs):
+    # Logins only touch last_login, which doesn't affect what the user can see
+    if update_fields is None or "user_level" in update_fields:
+        invalidate_output_cache(ALL_KINDS)
+    elif {"username", "custom_properties"} & set(update_fields):
+        # Cached XC credentials
+        invalidate_output_cache((ACCESS,))
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_access(sender, **kwargs):
+    invalidate_output_cache((ACCESS,))
+
+
+@receiver(m2m_changed, sender=User.channel_profiles.through)
+def invalidate_user_profile_outputs(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_output_cache(ALL_KINDS)
+
+
+# Data only used by the playlist (group titles, direct stream URLs)
+@receiver([post_save, post_delete], sender=ChannelGroup)
+@receiver(post_save, sender=Stream)
+def invalidate_playlist_outputs(sender, **kwargs):
+    invalidate_output_cache((M3U,))
+
+
+# Guide-only data. Programme refreshes are bulk inserts and bump the version from
+# the EPG tasks instead.
+@receiver(post_save, sender=EPGSource)
+def invalidate_epg_source_outputs(sender, update_fields=None, **kwargs):
+    # Refreshes save status/progress fields constantly; only full saves (edits) matter
+    if update_fields is None:
+        invalidate_output_cache((EPG,))
+
+
+@receiver(post_delete, sender=EPGSource)
+@receiver(post_delete, sender=EPGData)
+def invalidate_guide_outputs(sender, **kwargs):
+    invalidate_output_cache((EPG,))
+
+
+# XC VOD listings only include active accounts. Content changes bump the version
+# from the VOD tasks.
+@receiver(post_save, sender=M3UAccount)
+def invalidate_account_vod_outputs(sender, update_fields=None, **kwargs):
+    # Refreshes save status fields constantly; only full saves (edits) matter
+    if update_fields is None:
+        invalidate_output_cache((VOD,))
+
+
+@receiver(post_delete, sender=M3UAccount)
+def invalidate_deleted_account_vod_outputs(sender, **kwargs):
+    invalidate_output_cache((VOD,))
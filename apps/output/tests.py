@@ -1,6 +1,13 @@
-from django.test import TestCase, Client
+import json
+
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, Client
 from django.urls import reverse
 
+from apps.accounts.models import User
+from apps.output import cache as output_cache, xc_json
+from apps.output.access import get_xc_user
+
 class OutputM3UTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -12,7 +19,7 @@ class OutputM3UTest(TestCase):
         url = reverse('output:generate_m3u')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        content = response.content.decode()
+        content = b"".join(response.streaming_content).decode()
         self.assertIn("#EXTM3U", content)
 
     def test_generate_m3u_response_post_empty_body(self):
@@ -22,11 +29,23 @@ class OutputM3UTest(TestCase):
         url = reverse('output:generate_m3u')
 
         response = self.client.post(url, data=None, content_type='application/x-www-form-urlencoded')
-        content = response.content.decode()
+        content = b"".join(response.streaming_content).decode()
 
         self.assertEqual(response.status_code, 200, "POST with empty body should return 200 OK")
         self.assertIn("#EXTM3U", content)
 
+    def test_generate_m3u_not_modified(self):
+        """
+        Test that a request with a matching If-None-Match returns 304 Not Modified.
+        """
+        url = reverse('output:generate_m3u')
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
     def test_generate_m3u_response_post_with_body(self):
         """
         Test that a POST request with a non-empty body returns 403 Forbidden.
@@ -37,3 +56,34 @@ class OutputM3UTest(TestCase):
 
         self.assertEqual(response.status_code, 403, "POST with body should return 403 Forbidden")
         self.assertIn("POST requests with body are not allowed, body is:", response.content.decode())
+
+
+class XCAccessTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="xc-user", password="unused", custom_properties={"xc_password": "secret"}
+        )
+
+    def test_xc_credentials(self):
+        self.assertEqual(get_xc_user("xc-user", "secret").id, self.user.id)
+        self.assertIsNone(get_xc_user("xc-user", "wrong"))
+        with self.assertRaises(Http404):
+            get_xc_user("missing-user", "secret")
+
+    def test_password_change_invalidates_cached_credentials(self):
+        self.assertIsNotNone(get_xc_user("xc-user", "secret"))
+
+        self.user.custom_properties = {"xc_password": "changed"}
+        self.user.save()
+
+        self.assertIsNone(get_xc_user("xc-user", "secret"))
+        self.assertIsNotNone(get_xc_user("xc-user", "changed"))
+
+
+class XCJsonTest(SimpleTestCase):
+    def test_streamed_array_matches_json(self):
+        items = [{"stream_id": i, "name": f"Movie {i} \u00e9"} for i in range(3000)]
+        chunks = list(output_cache.iter_chunks(xc_json.iter_json_array(iter(items))))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b"".join(chunks)), items)
+        self.assertEqual(json.loads(b"".join(output_cache.iter_chunks(xc_json.iter_json_array([])))), [])
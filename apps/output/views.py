@@ -1,16 +1,15 @@
 import ipaddress
-from django.http import HttpResponse, JsonResponse, Http404, HttpResponseForbidden, StreamingHttpResponse
+from django.http import HttpResponse, JsonResponse, Http404, HttpResponseForbidden, HttpResponseNotModified, StreamingHttpResponse
 from rest_framework.response import Response
 from django.urls import reverse
-from apps.channels.models import Channel, ChannelProfile, ChannelGroup
+from apps.channels.models import Channel, ChannelGroup, ChannelStream
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from apps.epg.models import ProgramData
-from apps.accounts.models import User
 from core.models import CoreSettings, NETWORK_ACCESS
+from core.utils import build_absolute_uri_with_port
 from dispatcharr.utils import network_access_allowed
 from django.utils import timezone as django_timezone
-from django.shortcuts import get_object_or_404
 from datetime import datetime, timedelta
 import html  # Add this import for XML escaping
 import json  # Add this import for JSON parsing
@@ -19,9 +18,13 @@ from tzlocal import get_localzone
 from urllib.parse import urlparse
 import base64
 import logging
+from django.db.models import OuterRef, Q, Subquery
 from django.db.models.functions import Lower
 import os
 from apps.m3u.utils import calculate_tuner_count
+from apps.output import cache as output_cache
+from apps.output import xc_json, xmltv
+from apps.output.access import can_view_channel, get_xc_user, visible_channels
 import regex
 
 logger = logging.getLogger(__name__)
@@ -53,43 +56,7 @@ def generate_m3u(request, profile_name=None, user=None):
         if request.body.decode() != '{}':
             return HttpResponseForbidden("POST requests with body are not allowed, body is: {}".format(request.body.decode()))
 
-    if user is not None:
-        if user.user_level == 0:
-            user_profile_count = user.channel_profiles.count()
-
-            # If user has ALL profiles or NO profiles, give unrestricted access
-            if user_profile_count == 0:
-                # No profile filtering - user sees all channels based on user_level
-                channels = Channel.objects.filter(user_level__lte=user.user_level).order_by("channel_number")
-            else:
-                # User has specific limited profiles assigned
-                filters = {
-                    "channelprofilemembership__enabled": True,
-                    "user_level__lte": user.user_level,
-                    "channelprofilemembership__channel_profile__in": user.channel_profiles.all()
-                }
-                channels = Channel.objects.filter(**filters).distinct().order_by("channel_number")
-        else:
-            channels = Channel.objects.filter(user_level__lte=user.user_level).order_by(
-                "channel_number"
-            )
-
-    else:
-        if profile_name is not None:
-            channel_profile = ChannelProfile.objects.get(name=profile_name)
-            channels = Channel.objects.filter(
-                channelprofilemembership__channel_profile=channel_profile,
-                channelprofilemembership__enabled=True
-            ).order_by('channel_number')
-        else:
-            if profile_name is not None:
-                channel_profile = ChannelProfile.objects.get(name=profile_name)
-                channels = Channel.objects.filter(
-                    channelprofilemembership__channel_profile=channel_profile,
-                    channelprofilemembership__enabled=True,
-                ).order_by("channel_number")
-            else:
-                channels = Channel.objects.order_by("channel_number")
+    channels = visible_channels(user, profile_name).order_by("channel_number")
 
     # Check if the request wants to use direct logo URLs instead of cache
     use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
@@ -113,11 +80,56 @@ def generate_m3u(request, profile_name=None, user=None):
     else:
         epg_url = epg_base_url
 
+    # Everything that can change the rendered playlist goes into the cache key
+    base_url = request.build_absolute_uri('/')[:-1]
+    absolute_base = build_absolute_uri_with_port(request, "")
+    cache_params = {
+        "profile": profile_name,
+        "user": user.id if user is not None else None,
+        "user_level": user.user_level if user is not None else None,
+        "cachedlogos": use_cached_logos,
+        "direct": use_direct_urls,
+        "tvg_id_source": tvg_id_source,
+        "epg_url": epg_url,
+        "base_url": base_url,
+        "absolute_base": absolute_base,
+    }
+    cache_key, entry = output_cache.get_cached_output(output_cache.M3U, cache_params)
+
+    if entry is None:
+        # Pull groups and logos in the same query, and the first stream URL only when needed
+        channels = channels.select_related("channel_group", "logo")
+        if use_direct_urls:
+            channels = channels.annotate(
+                first_stream_url=Subquery(
+                    ChannelStream.objects.filter(channel=OuterRef("pk"))
+                    .order_by("order")
+                    .values("stream__url")[:1]
+                )
+            )
+
+        lines = _iter_m3u_lines(channels, epg_url, use_cached_logos, use_direct_urls,
+                                tvg_id_source, base_url, absolute_base)
+        entry = output_cache.set_cached_output(cache_key, "".join(lines).encode("utf-8"))
+
+    if output_cache.etag_matches(request, entry["etag"]):
+        response = HttpResponseNotModified()
+        response["ETag"] = entry["etag"]
+        return response
+
+    response = StreamingHttpResponse(output_cache.iter_content(entry["content"]), content_type="audio/x-mpegurl")
+    response["Content-Disposition"] = 'attachment; filename="channels.m3u"'
+    response["Content-Length"] = str(len(entry["content"]))
+    response["ETag"] = entry["etag"]
+    return response
+
+
+def _iter_m3u_lines(channels, epg_url, use_cached_logos, use_direct_urls, tvg_id_source, base_url, absolute_base):
+    """Yield the M3U header and one EXTINF/URL pair per channel."""
     # Add x-tvg-url and url-tvg attribute for EPG URL
-    m3u_content = f'#EXTM3U x-tvg-url="{epg_url}" url-tvg="{epg_url}"\n'
+    yield f'#EXTM3U x-tvg-url="{epg_url}" url-tvg="{epg_url}"\n'
 
-    # Start building M3U content
-    for channel in channels:
+    for channel in channels.iterator(chunk_size=2000):
         group_title = channel.channel_group.name if channel.channel_group else "Default"
 
         # Format channel number as integer if it has no decimal component
@@ -142,17 +154,13 @@ def generate_m3u(request, profile_name=None, user=None):
 
         tvg_logo = ""
         if channel.logo:
+            cached_logo = f"{absolute_base}{reverse('api:channels:logo-cache', args=[channel.logo.id])}"
             if use_cached_logos:
                 # Use cached logo as before
-                tvg_logo = build_absolute_uri_with_port(request, reverse('api:channels:logo-cache', args=[channel.logo.id]))
+                tvg_logo = cached_logo
             else:
-                # Try to find direct logo URL from channel's streams
-                direct_logo = channel.logo.url if channel.logo.url.startswith(('http://', 'https://')) else None
-                # If direct logo found, use it; otherwise fall back to cached version
-                if direct_logo:
-                    tvg_logo = direct_logo
-                else:
-                    tvg_logo = build_absolute_uri_with_port(request, reverse('api:channels:logo-cache', args=[channel.logo.id]))
+                # Use the logo's direct URL when it is remote, otherwise fall back to cached version
+                tvg_logo = channel.logo.url if channel.logo.url.startswith(('http://', 'https://')) else cached_logo
 
         # create possible gracenote id insertion
         tvc_guide_stationid = ""
@@ -166,27 +174,12 @@ def generate_m3u(request, profile_name=None, user=None):
             f'tvg-chno="{formatted_channel_number}" {tvc_guide_stationid}group-title="{group_title}",{channel.name}\n'
         )
 
-        # Determine the stream URL based on the direct parameter
-        if use_direct_urls:
-            # Try to get the first stream's direct URL
-            first_stream = channel.streams.order_by('channelstream__order').first()
-            if first_stream and first_stream.url:
-                # Use the direct stream URL
-                stream_url = first_stream.url
-            else:
-                # Fall back to proxy URL if no direct URL available
-                base_url = request.build_absolute_uri('/')[:-1]
-                stream_url = f"{base_url}/proxy/ts/stream/{channel.uuid}"
-        else:
-            # Standard behavior - use proxy URL
-            base_url = request.build_absolute_uri('/')[:-1]
+        # Use the first stream's direct URL if requested and available, otherwise the proxy URL
+        stream_url = getattr(channel, "first_stream_url", None) if use_direct_urls else None
+        if not stream_url:
             stream_url = f"{base_url}/proxy/ts/stream/{channel.uuid}"
 
-        m3u_content += extinf_line + stream_url + "\n"
-
-    response = HttpResponse(m3u_content, content_type="audio/x-mpegurl")
-    response["Content-Disposition"] = 'attachment; filename="channels.m3u"'
-    return response
+        yield extinf_line + stream_url + "\n"
 
 
 def generate_fallback_programs(channel_id, channel_name, now, num_days, program_length_hours, fallback_title, fallback_description):
@@ -1121,580 +1114,242 @@ def generate_dummy_epg(
 
 def generate_epg(request, profile_name=None, user=None):
     """
-    Dynamically generate an XMLTV (EPG) file using streaming response to handle keep-alives.
+    Dynamically generate an XMLTV (EPG) file as a streaming response.
     Since the EPG data is stored independently of Channels, we group programmes
     by their associated EPGData record.
-    This version filters data based on the 'days' parameter and sends keep-alives during processing.
+    This version filters data based on the 'days' parameter. Programmes are prefetched
+    in bulk and the rendered guide is cached on disk until EPG or channel data changes.
     """
-    def epg_generator():
-        """Generator function that yields EPG data with keep-alives during processing"""        # Send initial HTTP headers as comments (these will be ignored by XML parsers but keep connection alive)
+    # Get channels based on user/profile
+    channels = visible_channels(user, profile_name).order_by("channel_number")
 
-        xml_lines = []
-        xml_lines.append('<?xml version="1.0" encoding="UTF-8"?>')
-        xml_lines.append(
-            '<tv generator-info-name="Dispatcharr" generator-info-url="https://github.com/Dispatcharr/Dispatcharr">'
+    # Check if the request wants to use direct logo URLs instead of cache
+    use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
+
+    # Get the source to use for tvg-id value
+    # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
+    tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
+
+    # Get the number of days for EPG data
+    try:
+        # Default to 0 days (everything) for real EPG if not specified
+        days_param = request.GET.get('days', '0')
+        num_days = int(days_param)
+        # Set reasonable limits
+        num_days = max(0, min(num_days, 365))  # Between 0 and 365 days
+    except ValueError:
+        num_days = 0  # Default to all data if invalid value
+
+    # For dummy EPG, use either the specified value or default to 3 days
+    dummy_days = num_days if num_days > 0 else 3
+
+    # Calculate cutoff date for EPG data filtering (only if days > 0)
+    now = django_timezone.now()
+    cutoff_date = now + timedelta(days=num_days) if num_days > 0 else None
+
+    # Dummy programmes and the days window move with the clock, so guides that contain
+    # them are only reusable within the hour they were rendered in
+    time_dependent = num_days > 0 or channels.filter(
+        Q(epg_data__isnull=True) | Q(epg_data__epg_source__source_type="dummy")
+    ).exists()
+    cache_params = {
+        "profile": profile_name,
+        "user": user.id if user is not None else None,
+        "user_level": user.user_level if user is not None else None,
+        "cachedlogos": use_cached_logos,
+        "tvg_id_source": tvg_id_source,
+        "days": num_days,
+        "absolute_base": build_absolute_uri_with_port(request, ""),
+        "hour": now.strftime("%Y%m%d%H") if time_dependent else None,
+    }
+    cache_path = xmltv.get_disk_cache_path(cache_params)
+
+    if cache_path and os.path.exists(cache_path):
+        etag = '"%s"' % os.path.basename(cache_path).split(".")[0]
+        if output_cache.etag_matches(request, etag):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        # Hand the stored gzip straight to clients that accept it
+        compressed = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+        response = StreamingHttpResponse(
+            streaming_content=output_cache.iter_cached_file(cache_path, compressed),
+            content_type="application/xml"
         )
+        if compressed:
+            response["Content-Encoding"] = "gzip"
+            response["Content-Length"] = str(os.path.getsize(cache_path))
+        response["Vary"] = "Accept-Encoding"
+        response["ETag"] = etag
+        response["Content-Disposition"] = 'attachment; filename="Dispatcharr.xml"'
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    channels = channels.select_related("logo", "epg_data__epg_source")
+    entries = [
+        _epg_channel_entry(request, channel, use_cached_logos, tvg_id_source)
+        for channel in channels.iterator(chunk_size=2000)
+    ]
 
-        # Get channels based on user/profile
-        if user is not None:
-            if user.user_level == 0:
-                user_profile_count = user.channel_profiles.count()
+    chunks = output_cache.iter_chunks(_iter_epg_fragments(entries, now, cutoff_date, dummy_days))
+    if cache_path:
+        chunks = output_cache.write_through(chunks, cache_path)
 
-                # If user has ALL profiles or NO profiles, give unrestricted access
-                if user_profile_count == 0:
-                    # No profile filtering - user sees all channels based on user_level
-                    channels = Channel.objects.filter(user_level__lte=user.user_level).order_by("channel_number")
-                else:
-                    # User has specific limited profiles assigned
-                    filters = {
-                        "channelprofilemembership__enabled": True,
-                        "user_level__lte": user.user_level,
-                        "channelprofilemembership__channel_profile__in": user.channel_profiles.all()
-                    }
-                    channels = Channel.objects.filter(**filters).distinct().order_by("channel_number")
-            else:
-                channels = Channel.objects.filter(user_level__lte=user.user_level).order_by(
-                    "channel_number"
-                )
+    response = StreamingHttpResponse(
+        streaming_content=chunks,
+        content_type="application/xml"
+    )
+    response["Content-Disposition"] = 'attachment; filename="Dispatcharr.xml"'
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def _epg_channel_entry(request, channel, use_cached_logos, tvg_id_source):
+    """Resolve everything the guide needs from a channel up front, so it is only queried once"""
+    # Format channel number as integer if it has no decimal component - same as M3U generation
+    if channel.channel_number is not None:
+        if channel.channel_number == int(channel.channel_number):
+            formatted_channel_number = int(channel.channel_number)
         else:
-            if profile_name is not None:
-                channel_profile = ChannelProfile.objects.get(name=profile_name)
-                channels = Channel.objects.filter(
-                    channelprofilemembership__channel_profile=channel_profile,
-                    channelprofilemembership__enabled=True,
-                ).order_by("channel_number")
-            else:
-                channels = Channel.objects.all().order_by("channel_number")
+            formatted_channel_number = channel.channel_number
+    else:
+        formatted_channel_number = ""
 
-        # Check if the request wants to use direct logo URLs instead of cache
-        use_cached_logos = request.GET.get('cachedlogos', 'true').lower() != 'false'
+    # Determine the channel ID based on the selected source
+    if tvg_id_source == 'tvg_id' and channel.tvg_id:
+        channel_id = channel.tvg_id
+    elif tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
+        channel_id = channel.tvc_guide_stationid
+    else:
+        # Default to channel number (original behavior)
+        channel_id = str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
 
-        # Get the source to use for tvg-id value
-        # Options: 'channel_number' (default), 'tvg_id', 'gracenote'
-        tvg_id_source = request.GET.get('tvg_id_source', 'channel_number').lower()
+    epg_source = channel.epg_data.epg_source if channel.epg_data else None
+    custom_props = epg_source.custom_properties if epg_source and epg_source.custom_properties else {}
 
-        # Get the number of days for EPG data
-        try:
-            # Default to 0 days (everything) for real EPG if not specified
-            days_param = request.GET.get('days', '0')
-            num_days = int(days_param)
-            # Set reasonable limits
-            num_days = max(0, min(num_days, 365))  # Between 0 and 365 days
-        except ValueError:
-            num_days = 0  # Default to all data if invalid value
-
-        # For dummy EPG, use either the specified value or default to 3 days
-        dummy_days = num_days if num_days > 0 else 3
-
-        # Calculate cutoff date for EPG data filtering (only if days > 0)
-        now = django_timezone.now()
-        cutoff_date = now + timedelta(days=num_days) if num_days > 0 else None
-
-        # Process channels for the <channel> section
-        for channel in channels:
-            # Format channel number as integer if it has no decimal component - same as M3U generation
-            if channel.channel_number is not None:
-                if channel.channel_number == int(channel.channel_number):
-                    formatted_channel_number = int(channel.channel_number)
-                else:
-                    formatted_channel_number = channel.channel_number
-            else:
-                formatted_channel_number = ""
+    # For dummy EPG pattern matching, determine which name to use
+    pattern_match_name = channel.name
 
-            # Determine the channel ID based on the selected source
-            if tvg_id_source == 'tvg_id' and channel.tvg_id:
-                channel_id = channel.tvg_id
-            elif tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
-                channel_id = channel.tvc_guide_stationid
-            else:
-                # Default to channel number (original behavior)
-                channel_id = str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
-
-            # Add channel logo if available
-            tvg_logo = ""
-
-            # Check if this is a custom dummy EPG with channel logo URL template
-            if channel.epg_data and channel.epg_data.epg_source and channel.epg_data.epg_source.source_type == 'dummy':
-                epg_source = channel.epg_data.epg_source
-                if epg_source.custom_properties:
-                    custom_props = epg_source.custom_properties
-                    channel_logo_url_template = custom_props.get('channel_logo_url', '')
-
-                    if channel_logo_url_template:
-                        # Determine which name to use for pattern matching (same logic as program generation)
-                        pattern_match_name = channel.name
-                        name_source = custom_props.get('name_source')
-
-                        if name_source == 'stream':
-                            stream_index = custom_props.get('stream_index', 1) - 1
-                            channel_streams = channel.streams.all().order_by('channelstream__order')
-
-                            if channel_streams.exists() and 0 <= stream_index < channel_streams.count():
-                                stream = list(channel_streams)[stream_index]
-                                pattern_match_name = stream.name
-
-                        # Try to extract groups from the channel/stream name and build the logo URL
-                        title_pattern = custom_props.get('title_pattern', '')
-                        if title_pattern:
-                            try:
-                                # Convert PCRE/JavaScript named groups to Python format
-                                title_pattern = regex.sub(r'\(\?<(?![=!])([^>]+)>', r'(?P<\1>', title_pattern)
-                                title_regex = regex.compile(title_pattern)
-                                title_match = title_regex.search(pattern_match_name)
-
-                                if title_match:
-                                    groups = title_match.groupdict()
-
-                                    # Add normalized versions of all groups for cleaner URLs
-                                    for key, value in list(groups.items()):
-                                        if value:
-                                            # Remove all non-alphanumeric characters and convert to lowercase
-                                            normalized = regex.sub(r'[^a-zA-Z0-9\s]', '', str(value))
-                                            normalized = regex.sub(r'\s+', '', normalized).lower()
-                                            groups[f'{key}_normalize'] = normalized
-
-                                    # Format the logo URL template with the matched groups (with URL encoding)
-                                    from urllib.parse import quote
-                                    for key, value in groups.items():
-                                        if value:
-                                            encoded_value = quote(str(value), safe='')
-                                            channel_logo_url_template = channel_logo_url_template.replace(f'{{{key}}}', encoded_value)
-                                        else:
-                                            channel_logo_url_template = channel_logo_url_template.replace(f'{{{key}}}', '')
-                                    tvg_logo = channel_logo_url_template
-                                    logger.debug(f"Built channel logo URL from template: {tvg_logo}")
-                            except Exception as e:
-                                logger.warning(f"Failed to build channel logo URL for {channel.name}: {e}")
-
-            # If no custom dummy logo, use regular logo logic
-            if not tvg_logo and channel.logo:
-                if use_cached_logos:
-                    # Use cached logo as before
-                    tvg_logo = build_absolute_uri_with_port(request, reverse('api:channels:logo-cache', args=[channel.logo.id]))
-                else:
-                    # Try to find direct logo URL from channel's streams
-                    direct_logo = channel.logo.url if channel.logo.url.startswith(('http://', 'https://')) else None
-                    # If direct logo found, use it; otherwise fall back to cached version
-                    if direct_logo:
-                        tvg_logo = direct_logo
-                    else:
-                        tvg_logo = build_absolute_uri_with_port(request, reverse('api:channels:logo-cache', args=[channel.logo.id]))
-            display_name = channel.name
-            xml_lines.append(f'  <channel id="{channel_id}">')
-            xml_lines.append(f'    <display-name>{html.escape(display_name)}</display-name>')
-            xml_lines.append(f'    <icon src="{html.escape(tvg_logo)}" />')
-            xml_lines.append("  </channel>")
-
-        # Send all channel definitions
-        yield '\n'.join(xml_lines) + '\n'
-        xml_lines = []  # Clear to save memory
-
-        # Process programs for each channel
-        for channel in channels:
-
-            # Use the same channel ID determination for program entries
-            if tvg_id_source == 'tvg_id' and channel.tvg_id:
-                channel_id = channel.tvg_id
-            elif tvg_id_source == 'gracenote' and channel.tvc_guide_stationid:
-                channel_id = channel.tvc_guide_stationid
-            else:
-                # Get formatted channel number
-                if channel.channel_number is not None:
-                    if channel.channel_number == int(channel.channel_number):
-                        formatted_channel_number = int(channel.channel_number)
-                    else:
-                        formatted_channel_number = channel.channel_number
-                else:
-                    formatted_channel_number = ""
-                # Default to channel number
-                channel_id = str(formatted_channel_number) if formatted_channel_number != "" else str(channel.id)
-
-            # Use EPG data name for display, but channel name for pattern matching
-            display_name = channel.epg_data.name if channel.epg_data else channel.name
-            # For dummy EPG pattern matching, determine which name to use
-            pattern_match_name = channel.name
-
-            # Check if we should use stream name instead of channel name
-            if channel.epg_data and channel.epg_data.epg_source:
-                epg_source = channel.epg_data.epg_source
-                if epg_source.custom_properties:
-                    custom_props = epg_source.custom_properties
-                    name_source = custom_props.get('name_source')
-
-                    if name_source == 'stream':
-                        stream_index = custom_props.get('stream_index', 1) - 1
-                        channel_streams = channel.streams.all().order_by('channelstream__order')
-
-                        if channel_streams.exists() and 0 <= stream_index < channel_streams.count():
-                            stream = list(channel_streams)[stream_index]
-                            pattern_match_name = stream.name
-                            logger.debug(f"Using stream name for parsing: {pattern_match_name} (stream index: {stream_index})")
-                        else:
-                            logger.warning(f"Stream index {stream_index} not found for channel {channel.name}, falling back to channel name")
-
-            if not channel.epg_data:
-                # Use the enhanced dummy EPG generation function with defaults
-                program_length_hours = 4  # Default to 4-hour program blocks
-                dummy_programs = generate_dummy_programs(
-                    channel_id, pattern_match_name,
-                    num_days=dummy_days,
-                    program_length_hours=program_length_hours,
-                    epg_source=None
-                )
+    # Check if we should use stream name instead of channel name
+    if custom_props.get('name_source') == 'stream':
+        stream_index = custom_props.get('stream_index', 1) - 1
+        channel_streams = list(channel.streams.all().order_by('channelstream__order'))
 
-                for program in dummy_programs:
-                    # Format times in XMLTV format
-                    start_str = program['start_time'].strftime("%Y%m%d%H%M%S %z")
-                    stop_str = program['end_time'].strftime("%Y%m%d%H%M%S %z")
+        if 0 <= stream_index < len(channel_streams):
+            pattern_match_name = channel_streams[stream_index].name
+            logger.debug(f"Using stream name for parsing: {pattern_match_name} (stream index: {stream_index})")
+        else:
+            logger.warning(f"Stream index {stream_index} not found for channel {channel.name}, falling back to channel name")
 
-                    # Create program entry with escaped channel name
-                    yield f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">\n'
-                    yield f"    <title>{html.escape(program['title'])}</title>\n"
-                    yield f"    <desc>{html.escape(program['description'])}</desc>\n"
+    # Add channel logo if available
+    tvg_logo = ""
 
-                    # Add custom_properties if present
-                    custom_data = program.get('custom_properties', {})
+    # Check if this is a custom dummy EPG with channel logo URL template
+    if epg_source and epg_source.source_type == 'dummy':
+        channel_logo_url_template = custom_props.get('channel_logo_url', '')
 
-                    # Categories
-                    if 'categories' in custom_data:
-                        for cat in custom_data['categories']:
-                            yield f"    <category>{html.escape(cat)}</category>\n"
+        # Try to extract groups from the channel/stream name and build the logo URL
+        title_pattern = custom_props.get('title_pattern', '')
+        if channel_logo_url_template and title_pattern:
+            try:
+                # Convert PCRE/JavaScript named groups to Python format
+                title_pattern = regex.sub(r'\(\?<(?![=!])([^>]+)>', r'(?P<\1>', title_pattern)
+                title_regex = regex.compile(title_pattern)
+                title_match = title_regex.search(pattern_match_name)
+
+                if title_match:
+                    groups = title_match.groupdict()
+
+                    # Add normalized versions of all groups for cleaner URLs
+                    for key, value in list(groups.items()):
+                        if value:
+                            # Remove all non-alphanumeric characters and convert to lowercase
+                            normalized = regex.sub(r'[^a-zA-Z0-9\s]', '', str(value))
+                            normalized = regex.sub(r'\s+', '', normalized).lower()
+                            groups[f'{key}_normalize'] = normalized
+
+                    # Format the logo URL template with the matched groups (with URL encoding)
+                    from urllib.parse import quote
+                    for key, value in groups.items():
+                        if value:
+                            encoded_value = quote(str(value), safe='')
+                            channel_logo_url_template = channel_logo_url_template.replace(f'{{{key}}}', encoded_value)
+                        else:
+                            channel_logo_url_template = channel_logo_url_template.replace(f'{{{key}}}', '')
+                    tvg_logo = channel_logo_url_template
+                    logger.debug(f"Built channel logo URL from template: {tvg_logo}")
+            except Exception as e:
+                logger.warning(f"Failed to build channel logo URL for {channel.name}: {e}")
 
-                    # Date tag
-                    if 'date' in custom_data:
-                        yield f"    <date>{html.escape(custom_data['date'])}</date>\n"
+    # If no custom dummy logo, use regular logo logic
+    if not tvg_logo and channel.logo:
+        if use_cached_logos:
+            # Use cached logo as before
+            tvg_logo = build_absolute_uri_with_port(request, reverse('api:channels:logo-cache', args=[channel.logo.id]))
+        else:
+            # Try to find direct logo URL from channel's streams
+            direct_logo = channel.logo.url if channel.logo.url.startswith(('http://', 'https://')) else None
+            # If direct logo found, use it; otherwise fall back to cached version
+            if direct_logo:
+                tvg_logo = direct_logo
+            else:
+                tvg_logo = build_absolute_uri_with_port(request, reverse('api:channels:logo-cache', args=[channel.logo.id]))
 
-                    # Live tag
-                    if custom_data.get('live', False):
-                        yield f"    <live />\n"
+    return {
+        "channel_id": channel_id,
+        "name": channel.name,
+        "logo": tvg_logo,
+        "pattern_match_name": pattern_match_name,
+        "epg_id": channel.epg_data_id,
+        "epg_source": epg_source,
+        "source_type": epg_source.source_type if epg_source else None,
+    }
 
-                    # New tag
-                    if custom_data.get('new', False):
-                        yield f"    <new />\n"
 
-                    # Icon/poster URL
-                    if 'icon' in custom_data:
-                        yield f"    <icon src=\"{html.escape(custom_data['icon'])}\" />\n"
+def _iter_epg_fragments(entries, now, cutoff_date, dummy_days):
+    """Yield the XMLTV document as text fragments, one per channel/programme"""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<tv generator-info-name="Dispatcharr" generator-info-url="https://github.com/Dispatcharr/Dispatcharr">\n'
 
-                    yield f"  </programme>\n"
+    for entry in entries:
+        yield xmltv.render_channel(entry["channel_id"], entry["name"], entry["logo"])
 
-            else:
-                # Check if this is a dummy EPG with no programs (generate on-demand)
-                if channel.epg_data.epg_source and channel.epg_data.epg_source.source_type == 'dummy':
-                    # This is a custom dummy EPG - check if it has programs
-                    if not channel.epg_data.programs.exists():
-                        # No programs stored, generate on-demand using custom patterns
-                        # Use actual channel name for pattern matching
-                        program_length_hours = 4
-                        dummy_programs = generate_dummy_programs(
-                            channel_id, pattern_match_name,
-                            num_days=dummy_days,
-                            program_length_hours=program_length_hours,
-                            epg_source=channel.epg_data.epg_source
-                        )
-
-                        for program in dummy_programs:
-                            start_str = program['start_time'].strftime("%Y%m%d%H%M%S %z")
-                            stop_str = program['end_time'].strftime("%Y%m%d%H%M%S %z")
-
-                            yield f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">\n'
-                            yield f"    <title>{html.escape(program['title'])}</title>\n"
-                            yield f"    <desc>{html.escape(program['description'])}</desc>\n"
-
-                            # Add custom_properties if present
-                            custom_data = program.get('custom_properties', {})
-
-                            # Categories
-                            if 'categories' in custom_data:
-                                for cat in custom_data['categories']:
-                                    yield f"    <category>{html.escape(cat)}</category>\n"
-
-                            # Date tag
-                            if 'date' in custom_data:
-                                yield f"    <date>{html.escape(custom_data['date'])}</date>\n"
-
-                            # Live tag
-                            if custom_data.get('live', False):
-                                yield f"    <live />\n"
-
-                            # New tag
-                            if custom_data.get('new', False):
-                                yield f"    <new />\n"
-
-                            # Icon/poster URL
-                            if 'icon' in custom_data:
-                                yield f"    <icon src=\"{html.escape(custom_data['icon'])}\" />\n"
-
-                            yield f"  </programme>\n"
-
-                        continue  # Skip to next channel
-
-                # For real EPG data - filter only if days parameter was specified
-                if num_days > 0:
-                    programs_qs = channel.epg_data.programs.filter(
-                        start_time__gte=now,
-                        start_time__lt=cutoff_date
-                    ).order_by('id')  # Explicit ordering for consistent chunking
-                else:
-                    # Return all programs if days=0 or not specified
-                    programs_qs = channel.epg_data.programs.all().order_by('id')
-
-                # Process programs in chunks to avoid cursor timeout issues
-                program_batch = []
-                batch_size = 250
-                chunk_size = 1000  # Fetch 1000 programs at a time from DB
-
-                # Fetch chunks until no more results (avoids count() query)
-                offset = 0
-                while True:
-                    # Fetch a chunk of programs - this closes the cursor after fetching
-                    program_chunk = list(programs_qs[offset:offset + chunk_size])
-
-                    # Break if no more programs
-                    if not program_chunk:
-                        break
-
-                    # Process each program in the chunk
-                    for prog in program_chunk:
-                        start_str = prog.start_time.strftime("%Y%m%d%H%M%S %z")
-                        stop_str = prog.end_time.strftime("%Y%m%d%H%M%S %z")
-
-                        program_xml = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
-                        program_xml.append(f'    <title>{html.escape(prog.title)}</title>')
-
-                        # Add subtitle if available
-                        if prog.sub_title:
-                            program_xml.append(f"    <sub-title>{html.escape(prog.sub_title)}</sub-title>")
-
-                        # Add description if available
-                        if prog.description:
-                            program_xml.append(f"    <desc>{html.escape(prog.description)}</desc>")
-
-                        # Process custom properties if available
-                        if prog.custom_properties:
-                            custom_data = prog.custom_properties or {}
-
-                            # Add categories if available
-                            if "categories" in custom_data and custom_data["categories"]:
-                                for category in custom_data["categories"]:
-                                    program_xml.append(f"    <category>{html.escape(category)}</category>")
-
-                            # Add keywords if available
-                            if "keywords" in custom_data and custom_data["keywords"]:
-                                for keyword in custom_data["keywords"]:
-                                    program_xml.append(f"    <keyword>{html.escape(keyword)}</keyword>")
-
-                            # Handle episode numbering - multiple formats supported
-                            # Prioritize onscreen_episode over standalone episode for onscreen system
-                            if "onscreen_episode" in custom_data:
-                                program_xml.append(f'    <episode-num system="onscreen">{html.escape(custom_data["onscreen_episode"])}</episode-num>')
-                            elif "episode" in custom_data:
-                                program_xml.append(f'    <episode-num system="onscreen">E{custom_data["episode"]}</episode-num>')
-
-                            # Handle dd_progid format
-                            if 'dd_progid' in custom_data:
-                                program_xml.append(f'    <episode-num system="dd_progid">{html.escape(custom_data["dd_progid"])}</episode-num>')
-
-                            # Handle external database IDs
-                            for system in ['thetvdb.com', 'themoviedb.org', 'imdb.com']:
-                                if f'{system}_id' in custom_data:
-                                    program_xml.append(f'    <episode-num system="{system}">{html.escape(custom_data[f"{system}_id"])}</episode-num>')
-
-                            # Add season and episode numbers in xmltv_ns format if available
-                            if "season" in custom_data and "episode" in custom_data:
-                                season = (
-                                    int(custom_data["season"]) - 1
-                                    if str(custom_data["season"]).isdigit()
-                                    else 0
-                                )
-                                episode = (
-                                    int(custom_data["episode"]) - 1
-                                    if str(custom_data["episode"]).isdigit()
-                                    else 0
-                                )
-                                program_xml.append(f'    <episode-num system="xmltv_ns">{season}.{episode}.</episode-num>')
-
-                            # Add language information
-                            if "language" in custom_data:
-                                program_xml.append(f'    <language>{html.escape(custom_data["language"])}</language>')
-
-                            if "original_language" in custom_data:
-                                program_xml.append(f'    <orig-language>{html.escape(custom_data["original_language"])}</orig-language>')
-
-                            # Add length information
-                            if "length" in custom_data and isinstance(custom_data["length"], dict):
-                                length_value = custom_data["length"].get("value", "")
-                                length_units = custom_data["length"].get("units", "minutes")
-                                program_xml.append(f'    <length units="{html.escape(length_units)}">{html.escape(str(length_value))}</length>')
-
-                            # Add video information
-                            if "video" in custom_data and isinstance(custom_data["video"], dict):
-                                program_xml.append("    <video>")
-                                for attr in ['present', 'colour', 'aspect', 'quality']:
-                                    if attr in custom_data["video"]:
-                                        program_xml.append(f"      <{attr}>{html.escape(custom_data['video'][attr])}</{attr}>")
-                                program_xml.append("    </video>")
-
-                            # Add audio information
-                            if "audio" in custom_data and isinstance(custom_data["audio"], dict):
-                                program_xml.append("    <audio>")
-                                for attr in ['present', 'stereo']:
-                                    if attr in custom_data["audio"]:
-                                        program_xml.append(f"      <{attr}>{html.escape(custom_data['audio'][attr])}</{attr}>")
-                                program_xml.append("    </audio>")
-
-                            # Add subtitles information
-                            if "subtitles" in custom_data and isinstance(custom_data["subtitles"], list):
-                                for subtitle in custom_data["subtitles"]:
-                                    if isinstance(subtitle, dict):
-                                        subtitle_type = subtitle.get("type", "")
-                                        type_attr = f' type="{html.escape(subtitle_type)}"' if subtitle_type else ""
-                                        program_xml.append(f"    <subtitles{type_attr}>")
-                                        if "language" in subtitle:
-                                            program_xml.append(f"      <language>{html.escape(subtitle['language'])}</language>")
-                                        program_xml.append("    </subtitles>")
-
-                            # Add rating if available
-                            if "rating" in custom_data:
-                                rating_system = custom_data.get("rating_system", "TV Parental Guidelines")
-                                program_xml.append(f'    <rating system="{html.escape(rating_system)}">')
-                                program_xml.append(f'      <value>{html.escape(custom_data["rating"])}</value>')
-                                program_xml.append(f"    </rating>")
-
-                            # Add star ratings
-                            if "star_ratings" in custom_data and isinstance(custom_data["star_ratings"], list):
-                                for star_rating in custom_data["star_ratings"]:
-                                    if isinstance(star_rating, dict) and "value" in star_rating:
-                                        system_attr = f' system="{html.escape(star_rating["system"])}"' if "system" in star_rating else ""
-                                        program_xml.append(f"    <star-rating{system_attr}>")
-                                        program_xml.append(f"      <value>{html.escape(star_rating['value'])}</value>")
-                                        program_xml.append("    </star-rating>")
-
-                            # Add reviews
-                            if "reviews" in custom_data and isinstance(custom_data["reviews"], list):
-                                for review in custom_data["reviews"]:
-                                    if isinstance(review, dict) and "content" in review:
-                                        review_type = review.get("type", "text")
-                                        attrs = [f'type="{html.escape(review_type)}"']
-                                        if "source" in review:
-                                            attrs.append(f'source="{html.escape(review["source"])}"')
-                                        if "reviewer" in review:
-                                            attrs.append(f'reviewer="{html.escape(review["reviewer"])}"')
-                                        attr_str = " ".join(attrs)
-                                        program_xml.append(f'    <review {attr_str}>{html.escape(review["content"])}</review>')
-
-                            # Add images
-                            if "images" in custom_data and isinstance(custom_data["images"], list):
-                                for image in custom_data["images"]:
-                                    if isinstance(image, dict) and "url" in image:
-                                        attrs = []
-                                        for attr in ['type', 'size', 'orient', 'system']:
-                                            if attr in image:
-                                                attrs.append(f'{attr}="{html.escape(image[attr])}"')
-                                        attr_str = " " + " ".join(attrs) if attrs else ""
-                                        program_xml.append(f'    <image{attr_str}>{html.escape(image["url"])}</image>')
-
-                            # Add enhanced credits handling
-                            if "credits" in custom_data:
-                                program_xml.append("    <credits>")
-                                credits = custom_data["credits"]
-
-                                # Handle different credit types
-                                for role in ['director', 'writer', 'adapter', 'producer', 'composer', 'editor', 'presenter', 'commentator', 'guest']:
-                                    if role in credits:
-                                        people = credits[role]
-                                        if isinstance(people, list):
-                                            for person in people:
-                                                program_xml.append(f"      <{role}>{html.escape(person)}</{role}>")
-                                        else:
-                                            program_xml.append(f"      <{role}>{html.escape(people)}</{role}>")
-
-                                # Handle actors separately to include role and guest attributes
-                                if "actor" in credits:
-                                    actors = credits["actor"]
-                                    if isinstance(actors, list):
-                                        for actor in actors:
-                                            if isinstance(actor, dict):
-                                                name = actor.get("name", "")
-                                                role_attr = f' role="{html.escape(actor["role"])}"' if "role" in actor else ""
-                                                guest_attr = ' guest="yes"' if actor.get("guest") else ""
-                                                program_xml.append(f"      <actor{role_attr}{guest_attr}>{html.escape(name)}</actor>")
-                                            else:
-                                                program_xml.append(f"      <actor>{html.escape(actor)}</actor>")
-                                    else:
-                                        program_xml.append(f"      <actor>{html.escape(actors)}</actor>")
-
-                                program_xml.append("    </credits>")
-
-                            # Add program date if available (full date, not just year)
-                            if "date" in custom_data:
-                                program_xml.append(f'    <date>{html.escape(custom_data["date"])}</date>')
-
-                            # Add country if available
-                            if "country" in custom_data:
-                                program_xml.append(f'    <country>{html.escape(custom_data["country"])}</country>')
-
-                            # Add icon if available
-                            if "icon" in custom_data:
-                                program_xml.append(f'    <icon src="{html.escape(custom_data["icon"])}" />')
-
-                            # Add special flags as proper tags with enhanced handling
-                            if custom_data.get("previously_shown", False):
-                                prev_shown_details = custom_data.get("previously_shown_details", {})
-                                attrs = []
-                                if "start" in prev_shown_details:
-                                    attrs.append(f'start="{html.escape(prev_shown_details["start"])}"')
-                                if "channel" in prev_shown_details:
-                                    attrs.append(f'channel="{html.escape(prev_shown_details["channel"])}"')
-                                attr_str = " " + " ".join(attrs) if attrs else ""
-                                program_xml.append(f"    <previously-shown{attr_str} />")
-
-                            if custom_data.get("premiere", False):
-                                premiere_text = custom_data.get("premiere_text", "")
-                                if premiere_text:
-                                    program_xml.append(f"    <premiere>{html.escape(premiere_text)}</premiere>")
-                                else:
-                                    program_xml.append("    <premiere />")
-
-                            if custom_data.get("last_chance", False):
-                                last_chance_text = custom_data.get("last_chance_text", "")
-                                if last_chance_text:
-                                    program_xml.append(f"    <last-chance>{html.escape(last_chance_text)}</last-chance>")
-                                else:
-                                    program_xml.append("    <last-chance />")
-
-                            if custom_data.get("new", False):
-                                program_xml.append("    <new />")
-
-                            if custom_data.get('live', False):
-                                program_xml.append('    <live />')
-
-                        program_xml.append("  </programme>")
-
-                        # Add to batch
-                        program_batch.extend(program_xml)
-
-                        # Send batch when full or send keep-alive
-                        if len(program_batch) >= batch_size:
-                            yield '\n'.join(program_batch) + '\n'
-                            program_batch = []
-
-                    # Move to next chunk
-                    offset += chunk_size
-
-                # Send remaining programs in batch
-                if program_batch:
-                    yield '\n'.join(program_batch) + '\n'
-
-        # Send final closing tag and completion message
-        yield "</tv>\n"    # Return streaming response
-    response = StreamingHttpResponse(
-        streaming_content=epg_generator(),
-        content_type="application/xml"
+    # Custom dummy sources only generate programmes on demand when nothing is stored for them
+    dummy_with_programs = xmltv.epg_ids_with_programs(
+        {entry["epg_id"] for entry in entries if entry["source_type"] == "dummy"}
     )
-    response["Content-Disposition"] = 'attachment; filename="Dispatcharr.xml"'
-    response["Cache-Control"] = "no-cache"
-    return response
+
+    # Walk the channels in windows, fetching the programmes of a whole window at once
+    for window_start in range(0, len(entries), xmltv.EPG_BATCH_SIZE):
+        window = entries[window_start:window_start + xmltv.EPG_BATCH_SIZE]
+        epg_ids = {
+            entry["epg_id"] for entry in window
+            if entry["epg_id"] is not None
+            and (entry["source_type"] != "dummy" or entry["epg_id"] in dummy_with_programs)
+        }
+        programs = xmltv.prefetch_programs(epg_ids, now, cutoff_date) if epg_ids else {}
+
+        for entry in window:
+            channel_id = entry["channel_id"]
+            if entry["epg_id"] in epg_ids:
+                for prog in programs.get(entry["epg_id"], ()):
+                    yield xmltv.render_programme(prog, channel_id)
+                continue
+
+            # No EPG assigned, or a custom dummy EPG without stored programmes
+            dummy_source = entry["epg_source"] if entry["source_type"] == "dummy" else None
+            program_length_hours = 4  # Default to 4-hour program blocks
+            dummy_programs = generate_dummy_programs(
+                channel_id, entry["pattern_match_name"],
+                num_days=dummy_days,
+                program_length_hours=program_length_hours,
+                epg_source=dummy_source
+            )
+            for program in dummy_programs:
+                yield xmltv.render_dummy_programme(program, channel_id)
+
+    yield "</tv>\n"
 
 
 def xc_get_user(request):
@@ -1704,16 +1359,7 @@ def xc_get_user(request):
     if not username or not password:
         return None
 
-    user = get_object_or_404(User, username=username)
-    custom_properties = user.custom_properties or {}
-
-    if "xc_password" not in custom_properties:
-        return None
-
-    if custom_properties["xc_password"] != password:
-        return None
-
-    return user
+    return get_xc_user(username, password)
 
 
 def xc_get_info(request, full=False):
@@ -1785,7 +1431,13 @@ def xc_player_api(request, full=False):
     if action == "get_live_categories":
         return JsonResponse(xc_get_live_categories(user), safe=False)
     if action == "get_live_streams":
-        return JsonResponse(xc_get_live_streams(request, user, request.GET.get("category_id")), safe=False)
+        category_id = request.GET.get("category_id")
+        return xc_json.listing_response(
+            request,
+            xc_json.LIVE_STREAMS,
+            _xc_listing_params(request, user, category_id),
+            xc_json.iter_live_streams(visible_channels(user), build_absolute_uri_with_port(request, ""), category_id),
+        )
     if action == "get_short_epg":
         return JsonResponse(xc_get_epg(request, user, short=True), safe=False)
     if action == "get_simple_data_table":
@@ -1803,11 +1455,24 @@ def xc_player_api(request, full=False):
         if action == "get_vod_categories":
             return JsonResponse(xc_get_vod_categories(user), safe=False)
         elif action == "get_vod_streams":
-            return JsonResponse(xc_get_vod_streams(request, user, request.GET.get("category_id")), safe=False)
+            # Every user sees the same VOD library, the cached listing is shared between them
+            category_id = request.GET.get("category_id")
+            return xc_json.listing_response(
+                request,
+                xc_json.VOD_STREAMS,
+                _xc_listing_params(request, None, category_id),
+                xc_json.iter_vod_streams(build_absolute_uri_with_port(request, ""), category_id),
+            )
         elif action == "get_series_categories":
             return JsonResponse(xc_get_series_categories(user), safe=False)
         elif action == "get_series":
-            return JsonResponse(xc_get_series(request, user, request.GET.get("category_id")), safe=False)
+            category_id = request.GET.get("category_id")
+            return xc_json.listing_response(
+                request,
+                xc_json.SERIES,
+                _xc_listing_params(request, None, category_id),
+                xc_json.iter_series(build_absolute_uri_with_port(request, ""), category_id),
+            )
         elif action == "get_series_info":
             return JsonResponse(xc_get_series_info(request, user, request.GET.get("series_id")), safe=False)
         elif action == "get_vod_info":
@@ -1818,6 +1483,16 @@ def xc_player_api(request, full=False):
     raise Http404()
 
 
+def _xc_listing_params(request, user, category_id):
+    """Everything that selects a variant of a cached XC listing"""
+    return {
+        "user": user.id if user is not None else None,
+        "user_level": user.user_level if user is not None else None,
+        "category_id": category_id or None,
+        "absolute_base": build_absolute_uri_with_port(request, ""),
+    }
+
+
 def xc_panel_api(request):
     if not network_access_allowed(request, 'XC_API'):
         return JsonResponse({'error': 'Forbidden'}, status=403)
@@ -1859,27 +1534,9 @@ def xc_get_live_categories(user):
     from django.db.models import Min
     response = []
 
-    if user.user_level == 0:
-        user_profile_count = user.channel_profiles.count()
-
-        # If user has ALL profiles or NO profiles, give unrestricted access
-        if user_profile_count == 0:
-            # No profile filtering - user sees all channel groups
-            channel_groups = ChannelGroup.objects.filter(
-                channels__isnull=False, channels__user_level__lte=user.user_level
-            ).distinct().annotate(min_channel_number=Min('channels__channel_number')).order_by('min_channel_number')
-        else:
-            # User has specific limited profiles assigned
-            filters = {
-                "channels__channelprofilemembership__enabled": True,
-                "channels__user_level": 0,
-                "channels__channelprofilemembership__channel_profile__in": user.channel_profiles.all()
-            }
-            channel_groups = ChannelGroup.objects.filter(**filters).distinct().annotate(min_channel_number=Min('channels__channel_number')).order_by('min_channel_number')
-    else:
-        channel_groups = ChannelGroup.objects.filter(
-            channels__isnull=False, channels__user_level__lte=user.user_level
-        ).distinct().annotate(min_channel_number=Min('channels__channel_number')).order_by('min_channel_number')
+    channel_groups = ChannelGroup.objects.filter(
+        channels__in=visible_channels(user)
+    ).distinct().annotate(min_channel_number=Min('channels__channel_number')).order_by('min_channel_number')
 
     for group in channel_groups:
         response.append(
@@ -1894,64 +1551,7 @@ def xc_get_live_categories(user):
 
 
 def xc_get_live_streams(request, user, category_id=None):
-    streams = []
-
-    if user.user_level == 0:
-        user_profile_count = user.channel_profiles.count()
-
-        # If user has ALL profiles or NO profiles, give unrestricted access
-        if user_profile_count == 0:
-            # No profile filtering - user sees all channels based on user_level
-            filters = {"user_level__lte": user.user_level}
-            if category_id is not None:
-                filters["channel_group__id"] = category_id
-            channels = Channel.objects.filter(**filters).order_by("channel_number")
-        else:
-            # User has specific limited profiles assigned
-            filters = {
-                "channelprofilemembership__enabled": True,
-                "user_level__lte": user.user_level,
-                "channelprofilemembership__channel_profile__in": user.channel_profiles.all()
-            }
-            if category_id is not None:
-                filters["channel_group__id"] = category_id
-            channels = Channel.objects.filter(**filters).distinct().order_by("channel_number")
-    else:
-        if not category_id:
-            channels = Channel.objects.filter(user_level__lte=user.user_level).order_by("channel_number")
-        else:
-            channels = Channel.objects.filter(
-                channel_group__id=category_id, user_level__lte=user.user_level
-            ).order_by("channel_number")
-
-    for channel in channels:
-        streams.append(
-            {
-                "num": int(channel.channel_number) if channel.channel_number.is_integer() else channel.channel_number,
-                "name": channel.name,
-                "stream_type": "live",
-                "stream_id": channel.id,
-                "stream_icon": (
-                    None
-                    if not channel.logo
-                    else build_absolute_uri_with_port(
-                        request,
-                        reverse("api:channels:logo-cache", args=[channel.logo.id])
-                    )
-                ),
-                "epg_channel_id": str(int(channel.channel_number)) if channel.channel_number.is_integer() else str(channel.channel_number),
-                "added": int(channel.created_at.timestamp()),
-                "is_adult": 0,
-                "category_id": str(channel.channel_group.id),
-                "category_ids": [channel.channel_group.id],
-                "custom_sid": None,
-                "tv_archive": 0,
-                "direct_source": "",
-                "tv_archive_duration": 0,
-            }
-        )
-
-    return streams
+    return list(xc_json.iter_live_streams(visible_channels(user), build_absolute_uri_with_port(request, ""), category_id))
 
 
 def xc_get_epg(request, user, short=False):
@@ -1959,32 +1559,9 @@ def xc_get_epg(request, user, short=False):
     if not channel_id:
         raise Http404()
 
-    channel = None
-    if user.user_level < 10:
-        user_profile_count = user.channel_profiles.count()
-
-        # If user has ALL profiles or NO profiles, give unrestricted access
-        if user_profile_count == 0:
-            # No profile filtering - user sees all channels based on user_level
-            channel = Channel.objects.filter(
-                id=channel_id,
-                user_level__lte=user.user_level
-            ).first()
-        else:
-            # User has specific limited profiles assigned
-            filters = {
-                "id": channel_id,
-                "channelprofilemembership__enabled": True,
-                "user_level__lte": user.user_level,
-                "channelprofilemembership__channel_profile__in": user.channel_profiles.all()
-            }
-            channel = Channel.objects.filter(**filters).distinct().first()
-
-        if not channel:
-            raise Http404()
-    else:
-        channel = get_object_or_404(Channel, id=channel_id)
-
+    if not can_view_channel(user, channel_id):
+        raise Http404()
+    channel = Channel.objects.select_related("epg_data__epg_source").filter(id=channel_id).first()
     if not channel:
         raise Http404()
 
@@ -2076,66 +1653,8 @@ def xc_get_vod_categories(user):
 
 def xc_get_vod_streams(request, user, category_id=None):
     """Get VOD streams (movies) for XtreamCodes API"""
-    from apps.vod.models import Movie, M3UMovieRelation
-    from django.db.models import Prefetch
-
-    streams = []
-
     # All authenticated users get access to VOD from all active M3U accounts
-    filters = {"m3u_relations__m3u_account__is_active": True}
-
-    if category_id:
-        filters["m3u_relations__category_id"] = category_id
-
-    # Optimize with prefetch_related to eliminate N+1 queries
-    # This loads all relations in a single query instead of one per movie
-    movies = Movie.objects.filter(**filters).select_related('logo').prefetch_related(
-        Prefetch(
-            'm3u_relations',
-            queryset=M3UMovieRelation.objects.filter(
-                m3u_account__is_active=True
-            ).select_related('m3u_account', 'category').order_by('-m3u_account__priority', 'id'),
-            to_attr='active_relations'
-        )
-    ).distinct()
-
-    for movie in movies:
-        # Get the first (highest priority) relation from prefetched data
-        # This avoids the N+1 query problem entirely
-        if hasattr(movie, 'active_relations') and movie.active_relations:
-            relation = movie.active_relations[0]
-        else:
-            # Fallback - should rarely be needed with proper prefetching
-            continue
-
-        streams.append({
-            "num": movie.id,
-            "name": movie.name,
-            "stream_type": "movie",
-            "stream_id": movie.id,
-            "stream_icon": (
-                None if not movie.logo
-                else build_absolute_uri_with_port(
-                    request,
-                    reverse("api:vod:vodlogo-cache", args=[movie.logo.id])
-                )
-            ),
-            #'stream_icon': movie.logo.url if movie.logo else '',
-            "rating": movie.rating or "0",
-            "rating_5based": round(float(movie.rating or 0) / 2, 2) if movie.rating else 0,
-            "added": str(int(movie.created_at.timestamp())),
-            "is_adult": 0,
-            "tmdb_id": movie.tmdb_id or "",
-            "imdb_id": movie.imdb_id or "",
-            "trailer": (movie.custom_properties or {}).get('trailer') or "",
-            "category_id": str(relation.category.id) if relation.category else "0",
-            "category_ids": [int(relation.category.id)] if relation.category else [],
-            "container_extension": relation.container_extension or "mp4",
-            "custom_sid": None,
-            "direct_source": "",
-        })
-
-    return streams
+    return list(xc_json.iter_vod_streams(build_absolute_uri_with_port(request, ""), category_id))
 
 
 def xc_get_series_categories(user):
@@ -2162,51 +1681,8 @@ def xc_get_series_categories(user):
 
 def xc_get_series(request, user, category_id=None):
     """Get series list for XtreamCodes API"""
-    from apps.vod.models import M3USeriesRelation
-
-    series_list = []
-
     # All authenticated users get access to series from all active M3U accounts
-    filters = {"m3u_account__is_active": True}
-
-    if category_id:
-        filters["category_id"] = category_id
-
-    # Get series relations instead of series directly
-    series_relations = M3USeriesRelation.objects.filter(**filters).select_related(
-        'series', 'series__logo', 'category', 'm3u_account'
-    )
-
-    for relation in series_relations:
-        series = relation.series
-        series_list.append({
-            "num": relation.id,  # Use relation ID
-            "name": series.name,
-            "series_id": relation.id,  # Use relation ID
-            "cover": (
-                None if not series.logo
-                else build_absolute_uri_with_port(
-                    request,
-                    reverse("api:vod:vodlogo-cache", args=[series.logo.id])
-                )
-            ),
-            "plot": series.description or "",
-            "cast": series.custom_properties.get('cast', '') if series.custom_properties else "",
-            "director": series.custom_properties.get('director', '') if series.custom_properties else "",
-            "genre": series.genre or "",
-            "release_date": series.custom_properties.get('release_date', str(series.year) if series.year else "") if series.custom_properties else (str(series.year) if series.year else ""),
-            "releaseDate": series.custom_properties.get('release_date', str(series.year) if series.year else "") if series.custom_properties else (str(series.year) if series.year else ""),
-            "last_modified": str(int(relation.updated_at.timestamp())),
-            "rating": str(series.rating or "0"),
-            "rating_5based": str(round(float(series.rating or 0) / 2, 2)) if series.rating else "0",
-            "backdrop_path": series.custom_properties.get('backdrop_path', []) if series.custom_properties else [],
-            "youtube_trailer": series.custom_properties.get('youtube_trailer', '') if series.custom_properties else "",
-            "episode_run_time": series.custom_properties.get('episode_run_time', '') if series.custom_properties else "",
-            "category_id": str(relation.category.id) if relation.category else "0",
-            "category_ids": [int(relation.category.id)] if relation.category else [],
-        })
-
-    return series_list
+    return list(xc_json.iter_series(build_absolute_uri_with_port(request, ""), category_id))
 
 
 def xc_get_series_info(request, user, series_id):
@@ -2556,14 +2032,8 @@ def xc_movie_stream(request, username, password, stream_id, extension):
     """Handle XtreamCodes movie streaming requests"""
     from apps.vod.models import M3UMovieRelation
 
-    user = get_object_or_404(User, username=username)
-
-    custom_properties = user.custom_properties or {}
-
-    if "xc_password" not in custom_properties:
-        return JsonResponse({"error": "Invalid credentials"}, status=401)
-
-    if custom_properties["xc_password"] != password:
+    user = get_xc_user(username, password)
+    if user is None:
         return JsonResponse({"error": "Invalid credentials"}, status=401)
 
     # All authenticated users get access to VOD from all active M3U accounts
@@ -2593,14 +2063,8 @@ def xc_series_stream(request, username, password, stream_id, extension):
     """Handle XtreamCodes series/episode streaming requests"""
     from apps.vod.models import M3UEpisodeRelation
 
-    user = get_object_or_404(User, username=username)
-
-    custom_properties = user.custom_properties or {}
-
-    if "xc_password" not in custom_properties:
-        return JsonResponse({"error": "Invalid credentials"}, status=401)
-
-    if custom_properties["xc_password"] != password:
+    user = get_xc_user(username, password)
+    if user is None:
         return JsonResponse({"error": "Invalid credentials"}, status=401)
 
     # All authenticated users get access to series/episodes from all active M3U accounts
@@ -2623,84 +2087,6 @@ def xc_series_stream(request, username, password, stream_id, extension):
     return HttpResponseRedirect(vod_url)
 
 
-def get_host_and_port(request):
-    """
-    Returns (host, port) for building absolute URIs.
-    - Prefers X-Forwarded-Host/X-Forwarded-Port (nginx).
-    - Falls back to Host header.
-    - Returns None for port if using standard ports (80/443) to omit from URLs.
-    - In dev, uses 5656 as a guess if port cannot be determined.
-    """
-    # Determine the scheme first - needed for standard port detection
-    scheme = request.META.get("HTTP_X_FORWARDED_PROTO", request.scheme)
-    standard_port = "443" if scheme == "https" else "80"
-
-    # 1. Try X-Forwarded-Host (may include port) - set by our nginx
-    xfh = request.META.get("HTTP_X_FORWARDED_HOST")
-    if xfh:
-        if ":" in xfh:
-            host, port = xfh.split(":", 1)
-            # Omit standard ports from URLs, or omit if port doesn't match standard for scheme
-            # (e.g., HTTPS but port is 9191 = behind external reverse proxy)
-            if port == standard_port:
-                return host, None
-            # If port doesn't match standard and X-Forwarded-Proto is set, likely behind external RP
-            if request.META.get("HTTP_X_FORWARDED_PROTO"):
-                host = xfh.split(":")[0]  # Strip port, will check for proper port below
-            else:
-                return host, port
-        else:
-            host = xfh
-
-        # Check for X-Forwarded-Port header (if we didn't already find a valid port)
-        port = request.META.get("HTTP_X_FORWARDED_PORT")
-        if port:
-            # Omit standard ports from URLs
-            return host, None if port == standard_port else port
-        # If X-Forwarded-Proto is set but no valid port, assume standard
-        if request.META.get("HTTP_X_FORWARDED_PROTO"):
-            return host, None
-
-    # 2. Try Host header
-    raw_host = request.get_host()
-    if ":" in raw_host:
-        host, port = raw_host.split(":", 1)
-        # Omit standard ports from URLs
-        return host, None if port == standard_port else port
-    else:
-        host = raw_host
-
-    # 3. Check if we're behind a reverse proxy (X-Forwarded-Proto or X-Forwarded-For present)
-    # If so, assume standard port for the scheme (don't trust SERVER_PORT in this case)
-    if request.META.get("HTTP_X_FORWARDED_PROTO") or request.META.get("HTTP_X_FORWARDED_FOR"):
-        return host, None
-
-    # 4. Try SERVER_PORT from META (only if NOT behind reverse proxy)
-    port = request.META.get("SERVER_PORT")
-    if port:
-        # Omit standard ports from URLs
-        return host, None if port == standard_port else port
-
-    # 5. Dev fallback: guess port 5656
-    if os.environ.get("DISPATCHARR_ENV") == "dev" or host in ("localhost", "127.0.0.1"):
-        return host, "5656"
-
-    # 6. Final fallback: assume standard port for scheme (omit from URL)
-    return host, None
-
-def build_absolute_uri_with_port(request, path):
-    """
-    Build an absolute URI with optional port.
-    Port is omitted from URL if None (standard port for scheme).
-    """
-    host, port = get_host_and_port(request)
-    scheme = request.META.get("HTTP_X_FORWARDED_PROTO", request.scheme)
-
-    if port:
-        return f"{scheme}://{host}:{port}{path}"
-    else:
-        return f"{scheme}://{host}{path}"
-
 def format_duration_hms(seconds):
     """
     Format a duration in seconds as HH:MM:SS zero-padded string.
@@ -0,0 +1,231 @@
+"""
+Streaming JSON rendering for the large XC listings (get_live_streams,
+get_vod_streams, get_series).
+
+Rows are read with keyset-paginated .values() queries and encoded one array
+element at a time, so memory stays flat no matter how many movies or series the
+library holds. The first bytes go out as soon as the first page is encoded.
+Rendered listings can be written through to a gzip'd file per variant (user,
+category, host). Clients that accept gzip are served that file as is until the
+output version changes: M3U for live streams, VOD for movies and series.
+"""
+
+import json
+import os
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+
+from apps.output import cache as output_cache
+from core.utils import url_builder
+
+# Rows fetched per keyset page
+PAGE_SIZE = 2000
+
+LIVE_STREAMS = "live_streams"
+VOD_STREAMS = "vod_streams"
+SERIES = "series"
+
+# Output version each listing is cached under
+LISTING_KINDS = {
+    LIVE_STREAMS: output_cache.M3U,
+    VOD_STREAMS: output_cache.VOD,
+    SERIES: output_cache.VOD,
+}
+
+
+def iter_keyset(queryset, fields, order, page_size=PAGE_SIZE):
+    """
+    Yield .values(*fields) rows ordered by (order, id), one keyset page at a time.
+    Every page is an index range scan, no server-side cursor stays open between pages.
+    """
+    if order == "id":
+        queryset = queryset.order_by("id").values(*fields)
+    else:
+        queryset = queryset.order_by(order, "id").values(*fields)
+    last = None
+    while True:
+        page = queryset
+        if last is not None and order == "id":
+            page = page.filter(id__gt=last[1])
+        elif last is not None:
+            page = page.filter(Q(**{f"{order}__gt": last[0]}) | Q(**{order: last[0], "id__gt": last[1]}))
+        rows = list(page[:page_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last = (rows[-1][order], rows[-1]["id"])
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def iter_live_streams(channels, absolute_base, category_id=None):
+    """Yield get_live_streams entries for a Channel queryset"""
+    if category_id:
+        channels = channels.filter(channel_group_id=category_id)
+    logo_url = url_builder(absolute_base, "api:channels:logo-cache")
+    fields = ("id", "name", "channel_number", "logo_id", "created_at", "channel_group_id")
+
+    for rows in iter_keyset(channels, fields, "channel_number"):
+        for channel in rows:
+            number = _number(channel["channel_number"])
+            yield {
+                "num": number,
+                "name": channel["name"],
+                "stream_type": "live",
+                "stream_id": channel["id"],
+                "stream_icon": logo_url(channel["logo_id"]) if channel["logo_id"] else None,
+                "epg_channel_id": str(number),
+                "added": int(channel["created_at"].timestamp()),
+                "is_adult": 0,
+                "category_id": str(channel["channel_group_id"]),
+                "category_ids": [channel["channel_group_id"]],
+                "custom_sid": None,
+                "tv_archive": 0,
+                "direct_source": "",
+                "tv_archive_duration": 0,
+            }
+
+
+def iter_vod_streams(absolute_base, category_id=None):
+    """Yield get_vod_streams entries, one per movie with an active provider"""
+    from apps.vod.models import Movie, M3UMovieRelation
+
+    active = M3UMovieRelation.objects.filter(movie=OuterRef("pk"), m3u_account__is_active=True)
+    if category_id:
+        active = active.filter(category_id=category_id)
+    movies = Movie.objects.filter(Exists(active))
+    logo_url = url_builder(absolute_base, "api:vod:vodlogo-cache")
+    fields = ("id", "name", "logo_id", "rating", "created_at", "tmdb_id", "imdb_id", "custom_properties")
+
+    for rows in iter_keyset(movies, fields, "name"):
+        # Highest priority active relation per movie, for the whole page at once
+        relations = {}
+        for relation in M3UMovieRelation.objects.filter(
+            movie_id__in=[movie["id"] for movie in rows], m3u_account__is_active=True
+        ).order_by("movie_id", "-m3u_account__priority", "id").values(
+            "movie_id", "category_id", "container_extension"
+        ):
+            relations.setdefault(relation["movie_id"], relation)
+
+        for movie in rows:
+            relation = relations.get(movie["id"])
+            if relation is None:
+                continue
+            rating = movie["rating"]
+            yield {
+                "num": movie["id"],
+                "name": movie["name"],
+                "stream_type": "movie",
+                "stream_id": movie["id"],
+                "stream_icon": logo_url(movie["logo_id"]) if movie["logo_id"] else None,
+                "rating": rating or "0",
+                "rating_5based": round(float(rating or 0) / 2, 2) if rating else 0,
+                "added": str(int(movie["created_at"].timestamp())),
+                "is_adult": 0,
+                "tmdb_id": movie["tmdb_id"] or "",
+                "imdb_id": movie["imdb_id"] or "",
+                "trailer": (movie["custom_properties"] or {}).get("trailer") or "",
+                "category_id": str(relation["category_id"]) if relation["category_id"] else "0",
+                "category_ids": [int(relation["category_id"])] if relation["category_id"] else [],
+                "container_extension": relation["container_extension"] or "mp4",
+                "custom_sid": None,
+                "direct_source": "",
+            }
+
+
+def iter_series(absolute_base, category_id=None):
+    """Yield get_series entries, one per provider relation"""
+    from apps.vod.models import M3USeriesRelation
+
+    relations = M3USeriesRelation.objects.filter(m3u_account__is_active=True)
+    if category_id:
+        relations = relations.filter(category_id=category_id)
+    logo_url = url_builder(absolute_base, "api:vod:vodlogo-cache")
+    fields = (
+        "id", "category_id", "updated_at", "series__name", "series__logo", "series__description",
+        "series__genre", "series__year", "series__rating", "series__custom_properties",
+    )
+
+    for rows in iter_keyset(relations, fields, "id"):
+        for relation in rows:
+            props = relation["series__custom_properties"] or {}
+            year = str(relation["series__year"]) if relation["series__year"] else ""
+            rating = relation["series__rating"]
+            logo_id = relation["series__logo"]
+            yield {
+                "num": relation["id"],  # Use relation ID
+                "name": relation["series__name"],
+                "series_id": relation["id"],  # Use relation ID
+                "cover": logo_url(logo_id) if logo_id else None,
+                "plot": relation["series__description"] or "",
+                "cast": props.get("cast", ""),
+                "director": props.get("director", ""),
+                "genre": relation["series__genre"] or "",
+                "release_date": props.get("release_date", year),
+                "releaseDate": props.get("release_date", year),
+                "last_modified": str(int(relation["updated_at"].timestamp())),
+                "rating": str(rating or "0"),
+                "rating_5based": str(round(float(rating or 0) / 2, 2)) if rating else "0",
+                "backdrop_path": props.get("backdrop_path", []),
+                "youtube_trailer": props.get("youtube_trailer", ""),
+                "episode_run_time": props.get("episode_run_time", ""),
+                "category_id": str(relation["category_id"]) if relation["category_id"] else "0",
+                "category_ids": [int(relation["category_id"])] if relation["category_id"] else [],
+            }
+
+
+def iter_json_array(items):
+    """Encode items as the text fragments of one JSON array"""
+    yield "["
+    separator = ""
+    for item in items:
+        yield separator
+        yield json.dumps(item, separators=(",", ":"))
+        separator = ","
+    yield "]"
+
+
+def get_disk_cache_path(listing, params):
+    """Path of the gzip'd listing for a variant, or None when the disk cache is disabled"""
+    if not getattr(settings, "XC_OUTPUT_DISK_CACHE", False):
+        return None
+    return output_cache.disk_cache_path(
+        LISTING_KINDS[listing], settings.XC_OUTPUT_CACHE_DIR, listing.replace("_", ""), ".json.gz", params
+    )
+
+
+def listing_response(request, listing, params, items):
+    """
+    StreamingHttpResponse with items as a JSON array. It is served from, or
+    written through to, the listing's disk cache. items is only iterated on a cache miss.
+    """
+    cache_path = get_disk_cache_path(listing, {"listing": listing, **params})
+
+    if cache_path and os.path.exists(cache_path):
+        etag = '"%s"' % os.path.basename(cache_path).split(".")[0]
+        if output_cache.etag_matches(request, etag):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        compressed = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+        response = StreamingHttpResponse(
+            output_cache.iter_cached_file(cache_path, compressed), content_type="application/json"
+        )
+        if compressed:
+            response["Content-Encoding"] = "gzip"
+            response["Content-Length"] = str(os.path.getsize(cache_path))
+        response["Vary"] = "Accept-Encoding"
+        response["ETag"] = etag
+        return response
+
+    chunks = output_cache.iter_chunks(iter_json_array(items))
+    if cache_path:
+        chunks = output_cache.write_through(chunks, cache_path)
+    return StreamingHttpResponse(chunks, content_type="application/json")
@@ -0,0 +1,341 @@
+"""
+XMLTV rendering for generate_epg.
+
+Programmes are prefetched for many EPGData rows at a time with keyset-paginated
+queries instead of one query per channel, rendered into ~64 KB byte chunks for the
+streaming response, and optionally written through to a gzip'd file on disk so the
+next request for the same guide variant is served from that file. A cached request
+only runs the version lookup and one EXISTS query on the visible channels.
+"""
+
+import html
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
+
+from apps.epg.models import ProgramData
+from apps.output import cache as output_cache
+
+logger = logging.getLogger(__name__)
+
+# Keyset page size for the programme prefetch
+PROGRAM_PAGE_SIZE = 5000
+# Number of EPGData rows whose programmes are held in memory at once
+EPG_BATCH_SIZE = 100
+
+PROGRAM_FIELDS = (
+    "id", "epg_id", "start_time", "end_time", "title", "sub_title", "description", "custom_properties",
+)
+
+
+def iter_programs(epg_ids, start=None, end=None, page_size=PROGRAM_PAGE_SIZE):
+    """
+    Yield programme rows (dicts of PROGRAM_FIELDS) for epg_ids ordered by (epg_id, id).
+
+    Pages are fetched with a (epg_id, id) keyset rather than OFFSET, so every page is
+    an index range scan and no server-side cursor is held open between pages.
+    """
+    queryset = ProgramData.objects.filter(epg_id__in=epg_ids)
+    if start is not None and end is not None:
+        queryset = queryset.filter(start_time__gte=start, start_time__lt=end)
+    queryset = queryset.order_by("epg_id", "id").values(*PROGRAM_FIELDS)
+
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(epg_id__gt=last[0]) | Q(epg_id=last[0], id__gt=last[1]))
+        rows = list(page[:page_size])
+        if not rows:
+            return
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = (rows[-1]["epg_id"], rows[-1]["id"])
+
+
+def prefetch_programs(epg_ids, start=None, end=None):
+    """Return {epg_id: [programme rows]} for a batch of EPGData ids"""
+    programs = defaultdict(list)
+    for row in iter_programs(epg_ids, start, end):
+        programs[row["epg_id"]].append(row)
+    return programs
+
+
+def epg_ids_with_programs(epg_ids):
+    """Subset of epg_ids that have at least one stored programme"""
+    if not epg_ids:
+        return set()
+    return set(
+        ProgramData.objects.filter(epg_id__in=epg_ids).values_list("epg_id", flat=True).distinct()
+    )
+
+
+def render_channel(channel_id, display_name, tvg_logo):
+    return (
+        f'  <channel id="{channel_id}">\n'
+        f'    <display-name>{html.escape(display_name)}</display-name>\n'
+        f'    <icon src="{html.escape(tvg_logo)}" />\n'
+        "  </channel>\n"
+    )
+
+
+def render_dummy_programme(program, channel_id):
+    """Render a programme dict produced by generate_dummy_programs"""
+    start_str = program['start_time'].strftime("%Y%m%d%H%M%S %z")
+    stop_str = program['end_time'].strftime("%Y%m%d%H%M%S %z")
+
+    lines = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
+    lines.append(f"    <title>{html.escape(program['title'])}</title>")
+    lines.append(f"    <desc>{html.escape(program['description'])}</desc>")
+
+    custom_data = program.get('custom_properties', {})
+
+    if 'categories' in custom_data:
+        for cat in custom_data['categories']:
+            lines.append(f"    <category>{html.escape(cat)}</category>")
+
+    if 'date' in custom_data:
+        lines.append(f"    <date>{html.escape(custom_data['date'])}</date>")
+
+    if custom_data.get('live', False):
+        lines.append("    <live />")
+
+    if custom_data.get('new', False):
+        lines.append("    <new />")
+
+    if 'icon' in custom_data:
+        lines.append(f"    <icon src=\"{html.escape(custom_data['icon'])}\" />")
+
+    lines.append("  </programme>\n")
+    return "\n".join(lines)
+
+
+def render_programme(prog, channel_id):
+    """Render a ProgramData row (see PROGRAM_FIELDS) as a <programme> element"""
+    start_str = prog["start_time"].strftime("%Y%m%d%H%M%S %z")
+    stop_str = prog["end_time"].strftime("%Y%m%d%H%M%S %z")
+
+    program_xml = [f'  <programme start="{start_str}" stop="{stop_str}" channel="{channel_id}">']
+    program_xml.append(f'    <title>{html.escape(prog["title"])}</title>')
+
+    # Add subtitle if available
+    if prog["sub_title"]:
+        program_xml.append(f"    <sub-title>{html.escape(prog['sub_title'])}</sub-title>")
+
+    # Add description if available
+    if prog["description"]:
+        program_xml.append(f"    <desc>{html.escape(prog['description'])}</desc>")
+
+    custom_data = prog["custom_properties"]
+    if custom_data:
+        # Add categories if available
+        if "categories" in custom_data and custom_data["categories"]:
+            for category in custom_data["categories"]:
+                program_xml.append(f"    <category>{html.escape(category)}</category>")
+
+        # Add keywords if available
+        if "keywords" in custom_data and custom_data["keywords"]:
+            for keyword in custom_data["keywords"]:
+                program_xml.append(f"    <keyword>{html.escape(keyword)}</keyword>")
+
+        # Handle episode numbering - multiple formats supported
+        # Prioritize onscreen_episode over standalone episode for onscreen system
+        if "onscreen_episode" in custom_data:
+            program_xml.append(f'    <episode-num system="onscreen">{html.escape(custom_data["onscreen_episode"])}</episode-num>')
+        elif "episode" in custom_data:
+            program_xml.append(f'    <episode-num system="onscreen">E{custom_data["episode"]}</episode-num>')
+
+        # Handle dd_progid format
+        if 'dd_progid' in custom_data:
+            program_xml.append(f'    <episode-num system="dd_progid">{html.escape(custom_data["dd_progid"])}</episode-num>')
+
+        # Handle external database IDs
+        for system in ['thetvdb.com', 'themoviedb.org', 'imdb.com']:
+            if f'{system}_id' in custom_data:
+                program_xml.append(f'    <episode-num system="{system}">{html.escape(custom_data[f"{system}_id"])}</episode-num>')
+
+        # Add season and episode numbers in xmltv_ns format if available
+        if "season" in custom_data and "episode" in custom_data:
+            season = (
+                int(custom_data["season"]) - 1
+                if str(custom_data["season"]).isdigit()
+                else 0
+            )
+            episode = (
+                int(custom_data["episode"]) - 1
+                if str(custom_data["episode"]).isdigit()
+                else 0
+            )
+            program_xml.append(f'    <episode-num system="xmltv_ns">{season}.{episode}.</episode-num>')
+
+        # Add language information
+        if "language" in custom_data:
+            program_xml.append(f'    <language>{html.escape(custom_data["language"])}</language>')
+
+        if "original_language" in custom_data:
+            program_xml.append(f'    <orig-language>{html.escape(custom_data["original_language"])}</orig-language>')
+
+        # Add length information
+        if "length" in custom_data and isinstance(custom_data["length"], dict):
+            length_value = custom_data["length"].get("value", "")
+            length_units = custom_data["length"].get("units", "minutes")
+            program_xml.append(f'    <length units="{html.escape(length_units)}">{html.escape(str(length_value))}</length>')
+
+        # Add video information
+        if "video" in custom_data and isinstance(custom_data["video"], dict):
+            program_xml.append("    <video>")
+            for attr in ['present', 'colour', 'aspect', 'quality']:
+                if attr in custom_data["video"]:
+                    program_xml.append(f"      <{attr}>{html.escape(custom_data['video'][attr])}</{attr}>")
+            program_xml.append("    </video>")
+
+        # Add audio information
+        if "audio" in custom_data and isinstance(custom_data["audio"], dict):
+            program_xml.append("    <audio>")
+            for attr in ['present', 'stereo']:
+                if attr in custom_data["audio"]:
+                    program_xml.append(f"      <{attr}>{html.escape(custom_data['audio'][attr])}</{attr}>")
+            program_xml.append("    </audio>")
+
+        # Add subtitles information
+        if "subtitles" in custom_data and isinstance(custom_data["subtitles"], list):
+            for subtitle in custom_data["subtitles"]:
+                if isinstance(subtitle, dict):
+                    subtitle_type = subtitle.get("type", "")
+                    type_attr = f' type="{html.escape(subtitle_type)}"' if subtitle_type else ""
+                    program_xml.append(f"    <subtitles{type_attr}>")
+                    if "language" in subtitle:
+                        program_xml.append(f"      <language>{html.escape(subtitle['language'])}</language>")
+                    program_xml.append("    </subtitles>")
+
+        # Add rating if available
+        if "rating" in custom_data:
+            rating_system = custom_data.get("rating_system", "TV Parental Guidelines")
+            program_xml.append(f'    <rating system="{html.escape(rating_system)}">')
+            program_xml.append(f'      <value>{html.escape(custom_data["rating"])}</value>')
+            program_xml.append("    </rating>")
+
+        # Add star ratings
+        if "star_ratings" in custom_data and isinstance(custom_data["star_ratings"], list):
+            for star_rating in custom_data["star_ratings"]:
+                if isinstance(star_rating, dict) and "value" in star_rating:
+                    system_attr = f' system="{html.escape(star_rating["system"])}"' if "system" in star_rating else ""
+                    program_xml.append(f"    <star-rating{system_attr}>")
+                    program_xml.append(f"      <value>{html.escape(star_rating['value'])}</value>")
+                    program_xml.append("    </star-rating>")
+
+        # Add reviews
+        if "reviews" in custom_data and isinstance(custom_data["reviews"], list):
+            for review in custom_data["reviews"]:
+                if isinstance(review, dict) and "content" in review:
+                    review_type = review.get("type", "text")
+                    attrs = [f'type="{html.escape(review_type)}"']
+                    if "source" in review:
+                        attrs.append(f'source="{html.escape(review["source"])}"')
+                    if "reviewer" in review:
+                        attrs.append(f'reviewer="{html.escape(review["reviewer"])}"')
+                    attr_str = " ".join(attrs)
+                    program_xml.append(f'    <review {attr_str}>{html.escape(review["content"])}</review>')
+
+        # Add images
+        if "images" in custom_data and isinstance(custom_data["images"], list):
+            for image in custom_data["images"]:
+                if isinstance(image, dict) and "url" in image:
+                    attrs = []
+                    for attr in ['type', 'size', 'orient', 'system']:
+                        if attr in image:
+                            attrs.append(f'{attr}="{html.escape(image[attr])}"')
+                    attr_str = " " + " ".join(attrs) if attrs else ""
+                    program_xml.append(f'    <image{attr_str}>{html.escape(image["url"])}</image>')
+
+        # Add enhanced credits handling
+        if "credits" in custom_data:
+            program_xml.append("    <credits>")
+            credits = custom_data["credits"]
+
+            # Handle different credit types
+            for role in ['director', 'writer', 'adapter', 'producer', 'composer', 'editor', 'presenter', 'commentator', 'guest']:
+                if role in credits:
+                    people = credits[role]
+                    if isinstance(people, list):
+                        for person in people:
+                            program_xml.append(f"      <{role}>{html.escape(person)}</{role}>")
+                    else:
+                        program_xml.append(f"      <{role}>{html.escape(people)}</{role}>")
+
+            # Handle actors separately to include role and guest attributes
+            if "actor" in credits:
+                actors = credits["actor"]
+                if isinstance(actors, list):
+                    for actor in actors:
+                        if isinstance(actor, dict):
+                            name = actor.get("name", "")
+                            role_attr = f' role="{html.escape(actor["role"])}"' if "role" in actor else ""
+                            guest_attr = ' guest="yes"' if actor.get("guest") else ""
+                            program_xml.append(f"      <actor{role_attr}{guest_attr}>{html.escape(name)}</actor>")
+                        else:
+                            program_xml.append(f"      <actor>{html.escape(actor)}</actor>")
+                else:
+                    program_xml.append(f"      <actor>{html.escape(actors)}</actor>")
+
+            program_xml.append("    </credits>")
+
+        # Add program date if available (full date, not just year)
+        if "date" in custom_data:
+            program_xml.append(f'    <date>{html.escape(custom_data["date"])}</date>')
+
+        # Add country if available
+        if "country" in custom_data:
+            program_xml.append(f'    <country>{html.escape(custom_data["country"])}</country>')
+
+        # Add icon if available
+        if "icon" in custom_data:
+            program_xml.append(f'    <icon src="{html.escape(custom_data["icon"])}" />')
+
+        # Add special flags as proper tags with enhanced handling
+        if custom_data.get("previously_shown", False):
+            prev_shown_details = custom_data.get("previously_shown_details", {})
+            attrs = []
+            if "start" in prev_shown_details:
+                attrs.append(f'start="{html.escape(prev_shown_details["start"])}"')
+            if "channel" in prev_shown_details:
+                attrs.append(f'channel="{html.escape(prev_shown_details["channel"])}"')
+            attr_str = " " + " ".join(attrs) if attrs else ""
+            program_xml.append(f"    <previously-shown{attr_str} />")
+
+        if custom_data.get("premiere", False):
+            premiere_text = custom_data.get("premiere_text", "")
+            if premiere_text:
+                program_xml.append(f"    <premiere>{html.escape(premiere_text)}</premiere>")
+            else:
+                program_xml.append("    <premiere />")
+
+        if custom_data.get("last_chance", False):
+            last_chance_text = custom_data.get("last_chance_text", "")
+            if last_chance_text:
+                program_xml.append(f"    <last-chance>{html.escape(last_chance_text)}</last-chance>")
+            else:
+                program_xml.append("    <last-chance />")
+
+        if custom_data.get("new", False):
+            program_xml.append("    <new />")
+
+        if custom_data.get('live', False):
+            program_xml.append('    <live />')
+
+    program_xml.append("  </programme>\n")
+    return "\n".join(program_xml)
+
+
+def get_disk_cache_path(params):
+    """
+    Path of the gzip'd guide for a variant, or None when the disk cache is disabled.
+    The EPG output version is part of the file name, so any EPG or channel change
+    points requests at a new file.
+    """
+    if not getattr(settings, "EPG_OUTPUT_DISK_CACHE", False):
+        return None
+    return output_cache.disk_cache_path(output_cache.EPG, settings.EPG_OUTPUT_CACHE_DIR, "epg", ".xml.gz", params)
@@ -8,6 +8,9 @@ class ProxyConfig(AppConfig):
 
     def ready(self):
         """Initialize proxy servers when Django starts"""
+        # Signal handlers that invalidate cached stream resolutions
+        from .ts_proxy import stream_resolution  # noqa: F401
+
         if 'manage.py' not in sys.argv:
             from .hls_proxy.server import ProxyServer as HLSProxyServer
             from .ts_proxy.server import ProxyServer as TSProxyServer
@@ -1,4 +1,5 @@
 """Shared configuration between proxy types"""
+import os
 import time
 from django.db import connection
 
@@ -74,6 +75,9 @@ class HLSConfig(BaseConfig):
     INITIAL_BUFFER_SECONDS = 25.0
     MAX_INITIAL_SEGMENTS = 10
     BUFFER_READY_TIMEOUT = 30.0
+    SEGMENT_FETCH_CONCURRENCY = 4  # Segments downloaded in parallel, still committed to the buffer in order
+    SEGMENT_METRICS_WINDOW = 30  # Recent segment downloads used for latency/throughput metrics
+    MAX_BUFFER_BYTES = int(os.environ.get('DISPATCHARR_HLS_BUFFER_MB', 512)) * 1024 * 1024  # Segment memory cap shared by all HLS channels
 
 class TSConfig(BaseConfig):
     """Configuration settings for TS proxy"""
@@ -81,7 +85,13 @@ class TSConfig(BaseConfig):
     # Buffer settings
     INITIAL_BEHIND_CHUNKS = 4  # How many chunks behind to start a client (4 chunks = ~1MB)
     CHUNK_BATCH_SIZE = 5       # How many chunks to fetch in one batch
+    # Chunk storage backend: 'redis' (default), 'memory' (local ring + Redis mirror) or 'shm' (mmap ring shared by workers on the host)
+    BUFFER_BACKEND = os.environ.get('DISPATCHARR_TS_BUFFER_BACKEND', 'redis')
+    BUFFER_RING_SLOTS = int(os.environ.get('DISPATCHARR_TS_BUFFER_RING_SLOTS', 128))  # Chunks kept per channel (128 x ~256KB = ~32MB)
+    BUFFER_RING_DIR = os.environ.get('DISPATCHARR_TS_BUFFER_RING_DIR')  # Defaults to /dev/shm when writable
+    BUFFER_RING_REDIS_MIRROR = os.environ.get('DISPATCHARR_TS_BUFFER_RING_REDIS_MIRROR', 'false').lower() == 'true'  # Also store shm chunks in Redis for workers on other hosts
     KEEPALIVE_INTERVAL = 0.5   # Seconds between keepalive packets when at buffer head
+    CHUNK_WAIT_TIMEOUT = 1.0   # Max seconds a client at buffer head waits for a chunk notification before polling
     # Chunk read timeout
     CHUNK_TIMEOUT = 5        # Seconds to wait for each chunk read
 
@@ -97,6 +107,7 @@ class TSConfig(BaseConfig):
     CLIENT_RECORD_TTL = 60  # How long client records persist in Redis (seconds). Client will be considered MIA after this time.
     CLEANUP_CHECK_INTERVAL = 1  # How often to check for disconnected clients (seconds)
     CLIENT_HEARTBEAT_INTERVAL = 5  # How often to send client heartbeats (seconds)
+    CLIENT_STATS_FLUSH_INTERVAL = 1.0  # How often buffered client stats are written to Redis in one pipeline (seconds)
     GHOST_CLIENT_MULTIPLIER = 6.0  # How many heartbeat intervals before client considered ghost (6 would mean 36 seconds if heartbeat interval is 6)
     CLIENT_WAIT_TIMEOUT = 30  # Seconds to wait for client to connect
 
@@ -107,6 +118,13 @@ class TSConfig(BaseConfig):
     FAILOVER_GRACE_PERIOD = 20           # Extra time (seconds) to allow for stream switching before disconnecting clients
     URL_SWITCH_TIMEOUT = 20   # Max time allowed for a stream switch operation
 
+    # DVR recording settings
+    RECORDING_WRITE_BUFFER = 4 * 1024 * 1024  # File buffer for recordings, chunks reach disk in large sequential writes
+    RECORDING_POLL_INTERVAL = 0.25  # Seconds a recorder at the buffer head waits before checking for new chunks
+
+    # Channel start settings
+    STREAM_RESOLUTION_TTL = 600  # Seconds a channel's resolved streams/URLs stay cached in Redis
+
 
 
     # Database-dependent settings with fallbacks
@@ -17,6 +17,8 @@ import argparse
 from typing import Optional, Dict, List, Set, Deque
 import sys
 import os
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from apps.proxy.config import HLSConfig as Config
 
 # Global state management
@@ -24,23 +26,71 @@ manifest_buffer = None  # Stores current manifest content
 segment_buffers = {}   # Maps sequence numbers to segment data
 buffer_lock = threading.Lock()  # Synchronizes access to buffers
 
+class SegmentMemoryBudget:
+    """
+    Global byte cap shared by the StreamBuffers of every channel.
+
+    Every stored segment is tracked in one OrderedDict, oldest first, so the
+    least recently stored segment across all channels can be evicted in O(1)
+    once the total goes over the cap. All buffer mutations happen under this
+    budget's lock, which keeps cross-channel eviction consistent.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.segments: "OrderedDict[tuple, int]" = OrderedDict()  # (buffer, sequence) -> size
+        self.evictions = 0
+
+    def track(self, buffer: "StreamBuffer", sequence: int, size: int):
+        """Account for a newly stored segment (lock held)"""
+        self.segments[(buffer, sequence)] = size
+        self.total_bytes += size
+
+    def untrack(self, buffer: "StreamBuffer", sequence: int):
+        """Forget a removed segment (lock held)"""
+        self.total_bytes -= self.segments.pop((buffer, sequence), 0)
+
+    def enforce(self, keep: tuple):
+        """Evict the oldest segments until under the cap, never the one just stored (lock held)"""
+        evicted = 0
+        while self.total_bytes > self.max_bytes and self.segments:
+            buffer, sequence = next(iter(self.segments))
+            if (buffer, sequence) == keep:
+                break
+            buffer._discard(sequence)
+            evicted += 1
+
+        if evicted:
+            self.evictions += evicted
+            logging.debug(f"Segment budget evicted {evicted} segments "
+                          f"({self.total_bytes / 1024 / 1024:.1f} of {self.max_bytes / 1024 / 1024:.0f} MB used)")
+
+# Shared by every channel in this process
+segment_budget = SegmentMemoryBudget(Config.MAX_BUFFER_BYTES)
+
 class StreamBuffer:
     """
     Manages buffering of stream segments with thread-safe access.
     
     Attributes:
-        buffer (Dict[int, bytes]): Maps sequence numbers to segment data
+        buffer (OrderedDict[int, bytes]): Maps sequence numbers to segment data, oldest first
         lock (threading.Lock): Thread safety for buffer access
+        bytes_used (int): Total size of the segments currently held
         
     Features:
         - Thread-safe segment storage and retrieval
-        - Automatic cleanup of old segments
+        - O(1) eviction of the oldest segments by count (MAX_SEGMENTS) and by
+          the process-wide byte budget (MAX_BUFFER_BYTES)
         - Sequence number based indexing
     """
     
-    def __init__(self):
-        self.buffer: Dict[int, bytes] = {}  # Maps sequence numbers to segment data
+    def __init__(self, budget: SegmentMemoryBudget = None):
+        self.buffer: "OrderedDict[int, bytes]" = OrderedDict()  # Maps sequence numbers to segment data
         self.lock: threading.Lock = threading.Lock()
+        self.budget = budget or segment_budget
+        self.bytes_used = 0
 
     def __getitem__(self, key: int) -> Optional[bytes]:
         """Get segment data by sequence number"""
@@ -48,14 +98,25 @@ class StreamBuffer:
 
     def __setitem__(self, key: int, value: bytes):
         """Store segment data by sequence number"""
-        self.buffer[key] = value
-        # Cleanup old segments if we exceed MAX_SEGMENTS
-        if len(self.buffer) > Config.MAX_SEGMENTS:
-            keys = sorted(self.buffer.keys())
-            # Keep the most recent MAX_SEGMENTS
-            to_remove = keys[:-Config.MAX_SEGMENTS]
-            for k in to_remove:
-                del self.buffer[k]
+        with self.budget.lock:
+            if key in self.buffer:
+                self._discard(key)
+            self.buffer[key] = value
+            self.bytes_used += len(value)
+            self.budget.track(self, key, len(value))
+
+            # Keep the most recent MAX_SEGMENTS, sequences are stored in increasing order
+            while len(self.buffer) > Config.MAX_SEGMENTS:
+                self._discard(next(iter(self.buffer)))
+
+            self.budget.enforce(keep=(self, key))
+
+    def _discard(self, key: int):
+        """Drop one segment (budget lock held)"""
+        data = self.buffer.pop(key, None)
+        if data is not None:
+            self.bytes_used -= len(data)
+            self.budget.untrack(self, key)
 
     def __contains__(self, key: int) -> bool:
         """Check if sequence number exists in buffer"""
@@ -67,9 +128,20 @@ class StreamBuffer:
 
     def cleanup(self, keep_sequences: List[int]):
         """Remove segments not in keep list"""
-        for seq in list(self.buffer.keys()):
-            if seq not in keep_sequences:
-                del self.buffer[seq]
+        keep = set(keep_sequences)
+        with self.budget.lock:
+            for seq in [seq for seq in self.buffer if seq not in keep]:
+                self._discard(seq)
+
+    def clear(self):
+        """Release every segment, used when the channel stops"""
+        with self.budget.lock:
+            for seq in list(self.buffer):
+                self._discard(seq)
+
+    def memory_usage(self) -> dict:
+        """Segments and bytes held by this buffer"""
+        return {'segments': len(self.buffer), 'bytes': self.bytes_used}
 
 class ClientManager:
     """Manages client connections and activity tracking"""
@@ -112,6 +184,58 @@ class ClientManager:
             
             return len(active_clients) == 0
 
+class SegmentFetchMetrics:
+    """
+    Tracks segment download latency and throughput for a channel.
+
+    Keeps the most recent SEGMENT_METRICS_WINDOW downloads plus running totals.
+    Throughput is bytes over time spent downloading, so it reflects upstream
+    speed rather than how often the manifest produces new segments.
+    """
+
+    def __init__(self, window: int = None):
+        self.lock = threading.Lock()
+        self.samples: Deque[tuple] = deque(maxlen=window or Config.SEGMENT_METRICS_WINDOW)
+        self.segments_fetched = 0
+        self.bytes_fetched = 0
+        self.failures = 0
+        self.last_fetch_time = None
+
+    def record(self, latency: float, size: int):
+        """Record a successful segment download"""
+        with self.lock:
+            self.samples.append((latency, size))
+            self.segments_fetched += 1
+            self.bytes_fetched += size
+            self.last_fetch_time = time.time()
+
+    def record_failure(self):
+        """Record a segment that could not be downloaded or validated"""
+        with self.lock:
+            self.failures += 1
+
+    def snapshot(self) -> dict:
+        """Current metrics as a JSON-serializable dict"""
+        with self.lock:
+            samples = list(self.samples)
+            totals = {
+                'segments_fetched': self.segments_fetched,
+                'bytes_fetched': self.bytes_fetched,
+                'failures': self.failures,
+                'last_fetch_time': self.last_fetch_time,
+            }
+
+        latencies = [latency for latency, _ in samples]
+        download_time = sum(latencies)
+        totals.update({
+            'window': len(samples),
+            'last_latency_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+            'avg_latency_ms': round(download_time / len(latencies) * 1000, 1) if latencies else None,
+            'max_latency_ms': round(max(latencies) * 1000, 1) if latencies else None,
+            'throughput_kbps': round(sum(size for _, size in samples) / download_time / 1024, 1) if download_time else None,
+        })
+        return totals
+
 class StreamManager:
     """
     Manages HLS stream state and switching logic.
@@ -180,6 +304,9 @@ class StreamManager:
         self.buffered_duration = 0.0
         self.initial_buffering = True
 
+        # Segment download metrics, kept across fetcher restarts
+        self.fetch_metrics = SegmentFetchMetrics()
+
     def update_url(self, new_url: str) -> bool:
         """
         Handle stream URL changes with proper discontinuity marking.
@@ -368,10 +495,14 @@ class StreamFetcher:
             'Connection': 'keep-alive'
         })
         
+        # Segments are downloaded in parallel by a small worker pool
+        self.concurrency = max(1, Config.SEGMENT_FETCH_CONCURRENCY)
+        self.executor = None
+
         # Set up connection pooling
         adapter = requests.adapters.HTTPAdapter(
             pool_connections=2,    # Number of connection pools
-            pool_maxsize=4,       # Connections per pool
+            pool_maxsize=max(4, self.concurrency),  # Connections per pool, enough for every download worker
             max_retries=3,        # Auto-retry failed requests
             pool_block=False      # Don't block when pool is full
         )
@@ -382,7 +513,8 @@ class StreamFetcher:
         
         # Request optimization
         self.last_request_time = 0
-        self.min_request_interval = 0.05  # Minimum time between requests
+        self.request_lock = threading.Lock()  # Serializes request start slots across download workers
+        self.min_request_interval = 0.05  # Minimum time between request starts
         self.last_host = None            # Cache last successful host
         self.redirect_cache = {}         # Cache redirect responses
         self.redirect_cache_limit = 1000
@@ -431,11 +563,15 @@ class StreamFetcher:
             - Host fallback on failure
             - Automatic retries
         """
-        now = time.time()
-        wait_time = self.last_request_time + self.min_request_interval - now
-        if (wait_time > 0):
-            time.sleep(wait_time)
-            
+        # Reserve a start slot so parallel downloads stay min_request_interval apart
+        # without waiting for each other's responses
+        with self.request_lock:
+            now = time.time()
+            start_time = max(now, self.last_request_time + self.min_request_interval)
+            self.last_request_time = start_time
+        if start_time > now:
+            time.sleep(start_time - now)
+
         try:
             # Use cached redirect if available
             if url in self.redirect_cache:
@@ -447,9 +583,7 @@ class StreamFetcher:
                 if response.history:  # Cache redirects
                     logging.debug(f"Caching redirect for {url} -> {response.url}")
                     self.redirect_cache[url] = response.url
-                    
-            self.last_request_time = time.time()
-            
+
             if response.status_code == 200:
                 self.last_host = self.get_base_host(response.url)
             
@@ -464,8 +598,80 @@ class StreamFetcher:
                 return self.download(new_url)
             raise
 
+    def fetch_segment(self, url: str) -> Optional[bytes]:
+        """
+        Download and validate a single segment, retrying invalid data.
+
+        Returns:
+            bytes: Verified segment data
+            None: If the segment could not be downloaded or validated
+        """
+        max_retries = 3
+        try:
+            for attempt in range(max_retries + 1):
+                start = time.time()
+                segment_data, _ = self.download(url)
+                latency = time.time() - start
+
+                verification = verify_segment(segment_data)
+                if verification.get('valid', False):
+                    self.manager.fetch_metrics.record(latency, len(segment_data))
+                    return segment_data
+
+                if attempt < max_retries:
+                    logging.warning(f"Invalid segment, retry {attempt + 1}/{max_retries}: {verification.get('error')}")
+                    time.sleep(0.5)  # Short delay before retry
+
+            logging.error(f"Segment validation failed after {max_retries} retries")
+        except Exception as e:
+            logging.error(f"Segment download error: {e}")
+
+        self.manager.fetch_metrics.record_failure()
+        return None
+
+    def fetch_segments(self, segment_urls: List[str]):
+        """
+        Download segments in parallel and yield them in the order given.
+
+        At most `concurrency` downloads run at once. Results are yielded as
+        (index, data) in list order, so a slow segment holds back the ones after
+        it and the caller can commit them to the buffer in sequence order.
+        data is None for segments that failed.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix=f"SegmentFetcher-{self.manager.channel_id}"
+            )
+
+        futures = [self.executor.submit(self.fetch_segment, url) for url in segment_urls]
+        for index, future in enumerate(futures):
+            yield index, future.result()
+
+    def pending_segments(self, segments: list, downloaded_segments: Set[str]) -> list:
+        """Manifest segments after the newest one already stored, at most one parallel batch"""
+        pending = []
+        for segment in reversed(segments):
+            if segment.uri in downloaded_segments:
+                break
+            pending.append(segment)
+        pending.reverse()
+        return pending[-self.concurrency:]
+
+    def close(self):
+        """Release the download workers"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
     def fetch_loop(self):
         """Main fetch loop for stream data"""
+        try:
+            self._fetch_loop()
+        finally:
+            self.close()
+
+    def _fetch_loop(self):
         retry_delay = 1
         max_retry_delay = 8
         last_manifest_time = 0
@@ -513,25 +719,23 @@ class StreamFetcher:
                     # Reverse back to chronological order
                     segments_to_fetch.reverse()
                     
-                    # Download initial segments
-                    for segment in segments_to_fetch:
-                        try:
-                            segment_url = urljoin(final_url, segment.uri)
-                            segment_data, _ = self.download(segment_url)
-                            
-                            validation = verify_segment(segment_data)
-                            if validation.get('valid', False):
-                                with self.buffer.lock:
-                                    seq = self.manager.next_sequence
-                                    self.buffer[seq] = segment_data
-                                    duration = float(segment.duration)
-                                    self.manager.segment_durations[seq] = duration
-                                    self.manager.buffered_duration += duration
-                                    self.manager.next_sequence += 1
-                                    successful_downloads += 1
-                                    logging.debug(f"Buffered initial segment {seq} (source: {segment.uri}, duration: {duration}s)")
-                        except Exception as e:
-                            logging.error(f"Initial segment download error: {e}")
+                    # Download initial segments in parallel, buffering them in manifest order
+                    segment_urls = [urljoin(final_url, segment.uri) for segment in segments_to_fetch]
+                    for index, segment_data in self.fetch_segments(segment_urls):
+                        if segment_data is None:
+                            continue
+
+                        segment = segments_to_fetch[index]
+                        with self.buffer.lock:
+                            seq = self.manager.next_sequence
+                            self.buffer[seq] = segment_data
+                            duration = float(segment.duration)
+                            self.manager.segment_durations[seq] = duration
+                            self.manager.buffered_duration += duration
+                            self.manager.next_sequence += 1
+                            successful_downloads += 1
+                            downloaded_segments.add(segment.uri)
+                            logging.debug(f"Buffered initial segment {seq} (source: {segment.uri}, duration: {duration}s)")
                     
                     # Only mark buffer ready if we got some segments
                     if successful_downloads > 0:
@@ -541,53 +745,38 @@ class StreamFetcher:
                                    f"({self.manager.buffered_duration:.1f}s of content)")
                     continue
 
-                # Normal operation - get latest segment if we haven't already
-                latest_segment = manifest.segments[-1]
-                if (latest_segment.uri in downloaded_segments):
+                # Normal operation - get every segment newer than the last one we stored
+                new_segments = self.pending_segments(manifest.segments, downloaded_segments)
+                if not new_segments:
                     # Wait for next manifest update
                     time.sleep(self.manager.target_duration * 0.5)
                     continue
 
-                try:
-                    segment_url = urljoin(final_url, latest_segment.uri)
-                    segment_data, _ = self.download(segment_url)
-                    
-                    # Try several times if segment validation fails
-                    max_retries = 3
-                    retry_count = 0
-                    while retry_count < max_retries:
-                        verification = verify_segment(segment_data)
-                        if verification.get('valid', False):
-                            break
-                        logging.warning(f"Invalid segment, retry {retry_count + 1}/{max_retries}: {verification.get('error')}")
-                        time.sleep(0.5)  # Short delay before retry
-                        segment_data, _ = self.download(segment_url)
-                        retry_count += 1
+                stored = 0
+                segment_urls = [urljoin(final_url, segment.uri) for segment in new_segments]
+                for index, segment_data in self.fetch_segments(segment_urls):
+                    if segment_data is None:
+                        continue
 
-                    if verification.get('valid', False):
-                        with self.buffer.lock:
-                            seq = self.manager.next_sequence
-                            self.buffer[seq] = segment_data
-                            self.manager.segment_durations[seq] = float(latest_segment.duration)
-                            self.manager.next_sequence += 1
-                            downloaded_segments.add(latest_segment.uri)
-                            logging.debug(f"Stored segment {seq} (source: {latest_segment.uri}, "
-                                       f"duration: {latest_segment.duration}s, "
-                                       f"size: {len(segment_data)})")
-
-                        # Update timing
-                        last_manifest_time = time.time()
-                        retry_delay = 1  # Reset retry delay on success
-                    else:
-                        logging.error(f"Segment validation failed after {max_retries} retries")
+                    segment = new_segments[index]
+                    with self.buffer.lock:
+                        seq = self.manager.next_sequence
+                        self.buffer[seq] = segment_data
+                        self.manager.segment_durations[seq] = float(segment.duration)
+                        self.manager.next_sequence += 1
+                        downloaded_segments.add(segment.uri)
+                        logging.debug(f"Stored segment {seq} (source: {segment.uri}, "
+                                   f"duration: {segment.duration}s, "
+                                   f"size: {len(segment_data)})")
+                    stored += 1
 
-                except Exception as e:
-                    logging.error(f"Segment download error: {e}")
-                    continue
+                if stored:
+                    # Update timing
+                    last_manifest_time = time.time()
+                    retry_delay = 1  # Reset retry delay on success
 
-                # Cleanup old segment URIs from tracking
-                if len(downloaded_segments) > 100:
-                    downloaded_segments.clear()
+                # Only URIs still in the manifest can come up again
+                downloaded_segments.intersection_update(segment.uri for segment in manifest.segments)
 
             except Exception as e:
                 logging.error(f"Fetch error: {e}")
@@ -859,10 +1048,44 @@ class ProxyServer:
 
     def _cleanup_channel(self, channel_id: str) -> None:
         """Remove channel resources"""
+        buffer = self.stream_buffers.get(channel_id)
+        if buffer:
+            # Give the channel's bytes back to the shared budget
+            buffer.clear()
         for collection in [self.stream_managers, self.stream_buffers, 
                          self.client_managers, self.fetch_threads]:
             collection.pop(channel_id, None)
 
+    def get_channel_metrics(self, channel_id: str) -> Optional[dict]:
+        """Segment fetch and buffer metrics for a channel, None if it isn't running"""
+        manager = self.stream_managers.get(channel_id)
+        if not manager:
+            return None
+
+        metrics = manager.fetch_metrics.snapshot()
+        buffer = self.stream_buffers.get(channel_id)
+        buffer_usage = buffer.memory_usage() if buffer else {'segments': 0, 'bytes': 0}
+        metrics.update({
+            'channel_id': channel_id,
+            'concurrency': Config.SEGMENT_FETCH_CONCURRENCY,
+            'buffered_segments': buffer_usage['segments'],
+            'buffer_bytes': buffer_usage['bytes'],
+            'target_duration': manager.target_duration,
+        })
+        return metrics
+
+    def get_memory_usage(self) -> dict:
+        """Segment memory held per channel and against the shared byte budget"""
+        return {
+            'channels': {
+                channel_id: buffer.memory_usage()
+                for channel_id, buffer in list(self.stream_buffers.items())
+            },
+            'total_bytes': segment_budget.total_bytes,
+            'max_bytes': segment_budget.max_bytes,
+            'evictions': segment_budget.evictions,
+        }
+
     def shutdown(self) -> None:
         """Stop all channels and cleanup"""
         for channel_id in list(self.stream_managers.keys()):
@@ -8,4 +8,6 @@ urlpatterns = [
     path('initialize/<str:channel_id>', views.initialize_stream, name='initialize'),
     path('segments/<path:segment_name>', views.get_segment, name='segment'),
     path('change_stream/<str:channel_id>', views.change_stream, name='change_stream'),
+    path('metrics/<str:channel_id>', views.channel_metrics, name='metrics'),
+    path('memory', views.memory_usage, name='memory'),
 ]
\ No newline at end of file
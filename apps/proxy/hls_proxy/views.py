@@ -96,4 +96,19 @@ def initialize_stream(request, channel_id):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
     except Exception as e:
         logger.error(f"Failed to initialize stream: {e}")
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def channel_metrics(request, channel_id):
+    """Segment fetch latency/throughput and buffer state for a channel"""
+    metrics = proxy_server.get_channel_metrics(channel_id)
+    if metrics is None:
+        return JsonResponse({'error': 'Channel not found'}, status=404)
+    return JsonResponse(metrics)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def memory_usage(request):
+    """Segment buffer memory per channel and against the shared byte budget"""
+    return JsonResponse(proxy_server.get_memory_usage())
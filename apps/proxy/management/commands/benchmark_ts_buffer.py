@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.proxy.ts_proxy.buffer_backends import create_buffer_backend
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+
+BACKENDS = ['redis', 'memory', 'shm']
+READ_SIZE = 188 * 350  # ~64KB, roughly what the stream manager reads from upstream
+
+
+class Command(BaseCommand):
+    help = 'Benchmark TS proxy buffer backends (Redis traffic and per-client CPU)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=BACKENDS + ['all'], default='all',
+                            help='Backend to benchmark')
+        parser.add_argument('--clients', type=int, default=10,
+                            help='Number of concurrent readers')
+        parser.add_argument('--seconds', type=float, default=10.0,
+                            help='Duration of each run')
+        parser.add_argument('--bitrate', type=float, default=8.0,
+                            help='Simulated upstream bitrate in Mbps')
+
+    def handle(self, *args, **options):
+        redis_client = redis.Redis(
+            host=os.environ.get("REDIS_HOST", getattr(settings, 'REDIS_HOST', 'localhost')),
+            port=int(os.environ.get("REDIS_PORT", getattr(settings, 'REDIS_PORT', 6379))),
+            db=int(os.environ.get("REDIS_DB", getattr(settings, 'REDIS_DB', 0))),
+        )
+        redis_client.ping()
+
+        backends = BACKENDS if options['backend'] == 'all' else [options['backend']]
+        self.stdout.write("Redis counters are server-wide, run this against an otherwise idle instance.")
+        self.stdout.write(f"{'backend':<8} {'clients':>7} {'ingest MB/s':>12} {'redis in KB/s':>14} "
+                          f"{'redis out KB/s':>15} {'client CPU ms/s':>16} {'client MB/s':>12}")
+
+        for backend in backends:
+            result = self.run_backend(redis_client, backend, options['clients'],
+                                      options['seconds'], options['bitrate'])
+            self.stdout.write(
+                f"{backend:<8} {options['clients']:>7} {result['ingest_mbps']:>12.2f} "
+                f"{result['redis_in_kbps']:>14.1f} {result['redis_out_kbps']:>15.1f} "
+                f"{result['client_cpu_ms']:>16.2f} {result['client_mbps']:>12.2f}"
+            )
+
+    def run_backend(self, redis_client, backend, clients, seconds, bitrate):
+        channel_id = f"benchmark-{uuid.uuid4()}"
+        writer = self.make_buffer(channel_id, redis_client, backend)
+        stop_event = threading.Event()
+        client_stats = []
+
+        def reader():
+            # Clients on the owner worker share its buffer with the in-process ring,
+            # otherwise each client behaves like one attached to another worker
+            buffer = writer if backend == 'memory' else self.make_buffer(channel_id, redis_client, backend)
+            local_index = 0
+            received = 0
+            cpu_start = time.thread_time()
+            while not stop_event.is_set():
+                chunks, next_index = buffer.get_optimized_client_data(local_index)
+                if chunks:
+                    received += sum(len(c) for c in chunks)
+                    local_index = next_index
+                else:
+                    buffer.index = int(redis_client.get(RedisKeys.buffer_index(channel_id)) or 0)
+                    time.sleep(0.01)
+            client_stats.append((time.thread_time() - cpu_start, received))
+            if buffer is not writer:
+                buffer.backend.close()
+
+        before = redis_client.info('stats')
+        threads = [threading.Thread(target=reader, daemon=True) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+
+        payload = os.urandom(READ_SIZE)
+        bytes_per_second = bitrate * 1_000_000 / 8
+        written = 0
+        start = time.time()
+        while time.time() - start < seconds:
+            writer.add_chunk(payload)
+            written += len(payload)
+            # Pace the writer to the simulated bitrate
+            ahead = written / bytes_per_second - (time.time() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+        elapsed = time.time() - start
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        after = redis_client.info('stats')
+
+        writer.stop()
+        self.cleanup(redis_client, channel_id)
+
+        total_cpu = sum(cpu for cpu, _ in client_stats)
+        total_received = sum(received for _, received in client_stats)
+        reader_count = max(1, len(client_stats))
+        return {
+            'ingest_mbps': written / elapsed / 1_000_000,
+            'redis_in_kbps': (after['total_net_input_bytes'] - before['total_net_input_bytes']) / elapsed / 1024,
+            'redis_out_kbps': (after['total_net_output_bytes'] - before['total_net_output_bytes']) / elapsed / 1024,
+            'client_cpu_ms': total_cpu / reader_count / elapsed * 1000,
+            'client_mbps': total_received / reader_count / elapsed / 1_000_000,
+        }
+
+    @staticmethod
+    def make_buffer(channel_id, redis_client, backend):
+        buffer = StreamBuffer(channel_id=channel_id, redis_client=redis_client)
+        buffer.backend = create_buffer_backend(
+            channel_id, redis_client, buffer.chunk_ttl, buffer.target_chunk_size, backend_name=backend
+        )
+        return buffer
+
+    @staticmethod
+    def cleanup(redis_client, channel_id):
+        cursor = 0
+        while True:
+            cursor, keys = redis_client.scan(cursor, match=f"ts_proxy:channel:{channel_id}:*", count=500)
+            if keys:
+                redis_client.delete(*keys)
+            if cursor == 0:
+                break
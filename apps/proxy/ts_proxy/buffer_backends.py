@@ -0,0 +1,355 @@
+"""
+Pluggable chunk storage backends for the TS proxy StreamBuffer.
+
+The buffer index (``ts_proxy:channel:<id>:buffer:index``) always lives in Redis so
+every worker agrees on chunk numbering. Backends only decide where chunk payloads
+are stored:
+
+* ``redis``  - every chunk is stored with SETEX and fetched back with GET (default).
+* ``memory`` - chunks are kept in an in-process ring so clients attached to the
+  owner worker read locally; chunks are still mirrored to Redis for other workers.
+* ``shm``    - chunks are kept in an mmap'd ring file (``/dev/shm`` by default) that
+  every worker on the owner host maps. Redis only carries the index and the ring
+  metadata, unless ``BUFFER_RING_REDIS_MIRROR`` is enabled for multi-host setups.
+"""
+
+import mmap
+import os
+import socket
+import struct
+import tempfile
+import time
+
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+RING_MAGIC = b'DTSRING1'
+# magic, slot_count, slot_size
+RING_HEADER = struct.Struct('<8sII')
+RING_HEADER_SIZE = 64
+# chunk index stored in the slot, payload length
+SLOT_HEADER = struct.Struct('<QI')
+SLOT_HEADER_SIZE = 16
+
+# Minimum seconds between ring metadata refreshes on readers
+METADATA_REFRESH_INTERVAL = 1.0
+
+
+class RedisChunkBackend:
+    """Stores every chunk as its own Redis key with a TTL"""
+
+    name = 'redis'
+
+    def __init__(self, channel_id, redis_client, chunk_ttl):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
+        self.chunk_ttl = chunk_ttl
+
+    def write_chunk(self, chunk_index, data):
+        """Store a chunk (bytes or memoryview) under its index"""
+        if not self.redis_client:
+            return
+        chunk_key = RedisKeys.buffer_chunk(self.channel_id, chunk_index)
+        self.redis_client.setex(chunk_key, self.chunk_ttl, data)
+
+    def read_chunks(self, start_id, end_id):
+        """Return chunks start_id..end_id-1, with None for missing ones"""
+        if not self.redis_client or start_id >= end_id:
+            return []
+
+        pipe = self.redis_client.pipeline()
+        for idx in range(start_id, end_id):
+            pipe.get(RedisKeys.buffer_chunk(self.channel_id, idx))
+        return pipe.execute()
+
+    def close(self):
+        """Nothing to release, chunk keys expire on their own"""
+        pass
+
+
+class ChunkRing:
+    """
+    Fixed-size ring of chunk slots on top of an mmap.
+
+    Slot ``i % slot_count`` holds chunk ``i``. Writers invalidate the slot header,
+    copy the payload and then publish the chunk index, so readers can detect a slot
+    that was overwritten while they were copying it (seqlock style).
+    """
+
+    def __init__(self, mapping, slot_count, slot_size):
+        self.mapping = mapping
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.slot_stride = SLOT_HEADER_SIZE + slot_size
+
+    @staticmethod
+    def total_size(slot_count, slot_size):
+        return RING_HEADER_SIZE + slot_count * (SLOT_HEADER_SIZE + slot_size)
+
+    @classmethod
+    def create(cls, slot_count, slot_size, fileno=-1):
+        """Create a ring, anonymous when no file descriptor is given"""
+        size = cls.total_size(slot_count, slot_size)
+        mapping = mmap.mmap(fileno, size)
+        RING_HEADER.pack_into(mapping, 0, RING_MAGIC, slot_count, slot_size)
+        return cls(mapping, slot_count, slot_size)
+
+    @classmethod
+    def attach(cls, fileno):
+        """Map an existing ring file read-only, returns None if it is not a valid ring"""
+        mapping = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        magic, slot_count, slot_size = RING_HEADER.unpack_from(mapping, 0)
+        if magic != RING_MAGIC or len(mapping) < cls.total_size(slot_count, slot_size):
+            mapping.close()
+            return None
+        return cls(mapping, slot_count, slot_size)
+
+    def _slot_offset(self, chunk_index):
+        return RING_HEADER_SIZE + (chunk_index % self.slot_count) * self.slot_stride
+
+    def write(self, chunk_index, data):
+        """Copy a chunk into its slot, returns False if it does not fit"""
+        length = len(data)
+        if length > self.slot_size:
+            return False
+
+        offset = self._slot_offset(chunk_index)
+        payload_start = offset + SLOT_HEADER_SIZE
+        SLOT_HEADER.pack_into(self.mapping, offset, 0, 0)
+        self.mapping[payload_start:payload_start + length] = data
+        SLOT_HEADER.pack_into(self.mapping, offset, chunk_index, length)
+        return True
+
+    def read(self, chunk_index):
+        """Return a copy of a chunk, or None if its slot holds another chunk"""
+        offset = self._slot_offset(chunk_index)
+        stored_index, length = SLOT_HEADER.unpack_from(self.mapping, offset)
+        if stored_index != chunk_index or length == 0:
+            return None
+
+        payload_start = offset + SLOT_HEADER_SIZE
+        data = self.mapping[payload_start:payload_start + length]
+
+        # The writer may have lapped us while copying
+        if SLOT_HEADER.unpack_from(self.mapping, offset)[0] != chunk_index:
+            return None
+        return data
+
+    def close(self):
+        try:
+            self.mapping.close()
+        except Exception:
+            pass
+
+
+class SharedMemoryRingBackend:
+    """Keeps chunks in a fixed-size ring and uses Redis only for ring metadata"""
+
+    def __init__(self, channel_id, redis_client, chunk_ttl, slot_size, slot_count,
+                 shared=True, directory=None, mirror_to_redis=False):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
+        self.chunk_ttl = chunk_ttl
+        self.slot_size = slot_size
+        self.slot_count = slot_count
+        self.shared = shared
+        self.directory = directory or default_ring_directory()
+        self.mirror_to_redis = mirror_to_redis or not shared
+        self.name = 'shm' if shared else 'memory'
+
+        self.hostname = socket.gethostname()
+        self.redis_backend = RedisChunkBackend(channel_id, redis_client, chunk_ttl)
+
+        self._writer_ring = None
+        self._writer_path = None
+        self._reader_ring = None
+        self._reader_inode = None
+        self._reader_mirrored = False
+        self._last_metadata_check = 0
+
+    @property
+    def ring_path(self):
+        return os.path.join(self.directory, f"dispatcharr_ts_{self.channel_id}.ring")
+
+    def _ensure_writer(self):
+        """Create the ring the first time this buffer writes a chunk"""
+        if self._writer_ring is not None:
+            return self._writer_ring
+
+        if self.shared:
+            path = self.ring_path
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_CREAT | os.O_RDWR | os.O_TRUNC, 0o600)
+            try:
+                os.ftruncate(fd, ChunkRing.total_size(self.slot_count, self.slot_size))
+                ring = ChunkRing.create(self.slot_count, self.slot_size, fileno=fd)
+            finally:
+                os.close(fd)
+            # Atomically replace any ring left by a previous owner so readers remap cleanly
+            os.replace(tmp_path, path)
+            self._writer_path = path
+        else:
+            ring = ChunkRing.create(self.slot_count, self.slot_size)
+
+        self._writer_ring = ring
+        self._publish_metadata()
+        logger.info(f"Created {self.name} chunk ring for channel {self.channel_id} "
+                    f"({self.slot_count} slots x {self.slot_size} bytes)")
+        return ring
+
+    def _publish_metadata(self):
+        if not self.redis_client:
+            return
+        try:
+            key = RedisKeys.buffer_backend(self.channel_id)
+            self.redis_client.hset(key, mapping={
+                "backend": self.name,
+                "host": self.hostname,
+                "path": self._writer_path or "",
+                "slot_count": str(self.slot_count),
+                "slot_size": str(self.slot_size),
+                "mirror": "1" if self.mirror_to_redis else "0",
+            })
+            self.redis_client.expire(key, 3600)
+        except Exception as e:
+            logger.warning(f"Could not publish ring metadata for channel {self.channel_id}: {e}")
+
+    def write_chunk(self, chunk_index, data):
+        """Store a chunk in the ring, mirroring or falling back to Redis when needed"""
+        ring = self._ensure_writer()
+        stored = ring.write(chunk_index, data)
+        if not stored:
+            logger.warning(f"Chunk {chunk_index} ({len(data)} bytes) exceeds ring slot size "
+                           f"{self.slot_size}, storing in Redis")
+        if self.mirror_to_redis or not stored:
+            self.redis_backend.write_chunk(chunk_index, data)
+
+    def _refresh_reader(self, force=False):
+        """(Re)map the owner's ring file when it lives on this host"""
+        now = time.time()
+        if not force and now - self._last_metadata_check < METADATA_REFRESH_INTERVAL:
+            return self._reader_ring
+        self._last_metadata_check = now
+
+        if not self.redis_client:
+            return None
+
+        try:
+            metadata = self.redis_client.hgetall(RedisKeys.buffer_backend(self.channel_id))
+        except Exception as e:
+            logger.debug(f"Could not read ring metadata for channel {self.channel_id}: {e}")
+            return self._reader_ring
+
+        host = metadata.get(b'host', b'').decode('utf-8')
+        path = metadata.get(b'path', b'').decode('utf-8')
+        self._reader_mirrored = metadata.get(b'mirror', b'0') == b'1'
+
+        if not path or host != self.hostname:
+            self._close_reader()
+            return None
+
+        try:
+            inode = os.stat(path).st_ino
+            if self._reader_ring is not None and inode == self._reader_inode:
+                return self._reader_ring
+
+            self._close_reader()
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                self._reader_ring = ChunkRing.attach(fd)
+            finally:
+                os.close(fd)
+            self._reader_inode = inode
+        except (OSError, ValueError) as e:
+            logger.debug(f"Ring for channel {self.channel_id} not available at {path}: {e}")
+            self._close_reader()
+
+        return self._reader_ring
+
+    def _close_reader(self):
+        if self._reader_ring is not None:
+            self._reader_ring.close()
+        self._reader_ring = None
+        self._reader_inode = None
+
+    def read_chunks(self, start_id, end_id):
+        """Return chunks start_id..end_id-1, with None for missing ones"""
+        if start_id >= end_id:
+            return []
+
+        ring = self._writer_ring
+        if ring is None:
+            ring = self._reader_ring if self._reader_ring is not None else self._refresh_reader()
+        if ring is None:
+            # Owner ring lives on another host (or is not created yet), only Redis can help
+            return self.redis_backend.read_chunks(start_id, end_id)
+
+        results = [ring.read(idx) for idx in range(start_id, end_id)]
+
+        if None in results and ring is not self._writer_ring:
+            # The owner may have been replaced, remap before giving up on these chunks
+            refreshed = self._refresh_reader()
+            if refreshed is not None and refreshed is not ring:
+                results = [refreshed.read(idx) for idx in range(start_id, end_id)]
+
+        mirrored = self.mirror_to_redis if self._writer_ring is not None else self._reader_mirrored
+        if None in results and mirrored:
+            missing = [i for i, chunk in enumerate(results) if chunk is None]
+            fallback = self.redis_backend.read_chunks(start_id + missing[0], start_id + missing[-1] + 1)
+            for i in missing:
+                results[i] = fallback[i - missing[0]]
+
+        return results
+
+    def close(self):
+        """Release mappings, removing the ring file if this buffer created it"""
+        self._close_reader()
+        if self._writer_ring is not None:
+            self._writer_ring.close()
+            self._writer_ring = None
+            if self._writer_path:
+                try:
+                    os.unlink(self._writer_path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Could not remove ring file {self._writer_path}: {e}")
+                self._writer_path = None
+            if self.redis_client:
+                try:
+                    self.redis_client.delete(RedisKeys.buffer_backend(self.channel_id))
+                except Exception:
+                    pass
+
+
+def default_ring_directory():
+    """Prefer tmpfs so ring pages never hit disk"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def create_buffer_backend(channel_id, redis_client, chunk_ttl, slot_size, backend_name=None):
+    """Build the chunk backend selected through ConfigHelper"""
+    from .config_helper import ConfigHelper
+
+    backend_name = (backend_name or ConfigHelper.buffer_backend()).lower()
+
+    if backend_name in ('shm', 'memory') and channel_id:
+        return SharedMemoryRingBackend(
+            channel_id,
+            redis_client,
+            chunk_ttl,
+            slot_size=slot_size,
+            slot_count=ConfigHelper.buffer_ring_slots(),
+            shared=backend_name == 'shm',
+            directory=ConfigHelper.buffer_ring_dir(),
+            mirror_to_redis=ConfigHelper.buffer_ring_redis_mirror(),
+        )
+
+    if backend_name != 'redis':
+        logger.warning(f"Unknown TS buffer backend '{backend_name}', using redis")
+
+    return RedisChunkBackend(channel_id, redis_client, chunk_ttl)
@@ -137,6 +137,7 @@ class ChannelStatus:
                     'client_id': client_id_str,
                     'user_agent': client_data.get(b'user_agent', b'unknown').decode('utf-8'),
                     'worker_id': client_data.get(b'worker_id', b'unknown').decode('utf-8'),
+                    'client_type': client_data.get(b'client_type', b'viewer').decode('utf-8'),
                 }
 
                 if b'connected_at' in client_data:
@@ -450,6 +451,9 @@ class ChannelStatus:
                     if ip_address_bytes:
                         client_info['ip_address'] = safe_decode(ip_address_bytes)
 
+                    client_type_bytes = proxy_server.redis_client.hget(client_key, 'client_type')
+                    client_info['client_type'] = safe_decode(client_type_bytes, 'viewer')
+
                     # Just get connected_at for client age
                     connected_at_bytes = proxy_server.redis_client.hget(client_key, 'connected_at')
                     if connected_at_bytes:
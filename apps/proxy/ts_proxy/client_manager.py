@@ -8,7 +8,7 @@ import gevent
 from typing import Set, Optional
 from apps.proxy.config import TSConfig as Config
 from redis.exceptions import ConnectionError, TimeoutError
-from .constants import EventType, ChannelState, ChannelMetadataField
+from .constants import EventType, ChannelState, ChannelMetadataField, ClientType
 from .config_helper import ConfigHelper
 from .redis_keys import RedisKeys
 from .utils import get_logger
@@ -220,7 +220,7 @@ class ClientManager:
         except Exception as e:
             logger.error(f"Error notifying owner of client activity: {e}")
 
-    def add_client(self, client_id, client_ip, user_agent=None):
+    def add_client(self, client_id, client_ip, user_agent=None, client_type=ClientType.VIEWER):
         """Add a client with duplicate prevention"""
         if client_id in self._registered_clients:
             logger.debug(f"Client {client_id} already registered, skipping")
@@ -238,7 +238,8 @@ class ClientManager:
             "ip_address": client_ip,
             "connected_at": current_time,
             "last_active": current_time,
-            "worker_id": self.worker_id or "unknown"
+            "worker_id": self.worker_id or "unknown",
+            ChannelMetadataField.CLIENT_TYPE: client_type,
         }
 
         try:
@@ -267,6 +268,7 @@ class ClientManager:
                         "event": EventType.CLIENT_CONNECTED,  # Use constant instead of string
                         "channel_id": self.channel_id,
                         "client_id": client_id,
+                        "client_type": client_type,
                         "worker_id": self.worker_id or "unknown",
                         "timestamp": time.time()
                     }
@@ -0,0 +1,91 @@
+"""Per-worker aggregation of TS client statistics"""
+
+import threading
+import time
+
+from apps.proxy.config import TSConfig as Config
+from .config_helper import ConfigHelper
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+
+class ClientStatsAggregator:
+    """
+    Coalesces per-client stats in process and flushes them to Redis on an interval.
+
+    Stream generators call record() for every chunk they send; only the latest values
+    per client are kept, and a background thread writes all pending clients in a single
+    pipeline. Fields are written to the same client metadata hash the dashboard reads,
+    and the client key / client set TTLs are refreshed for clients that were active
+    since the last flush.
+    """
+
+    def __init__(self, redis_client=None, flush_interval=None):
+        self.redis_client = redis_client
+        self.flush_interval = flush_interval or ConfigHelper.client_stats_flush_interval()
+        self.client_ttl = ConfigHelper.get('CLIENT_RECORD_TTL', 60)
+        self.lock = threading.Lock()
+        self._pending = {}
+        self._running = False
+        self._thread = None
+
+    def record(self, channel_id, client_id, stats):
+        """Store the latest stats for a client, to be written on the next flush"""
+        with self.lock:
+            self._pending[(channel_id, client_id)] = stats
+            if not self._running:
+                self._start_flush_thread()
+
+    def discard(self, channel_id, client_id):
+        """Drop pending stats for a client that disconnected so its key isn't recreated"""
+        with self.lock:
+            self._pending.pop((channel_id, client_id), None)
+
+    def flush(self):
+        """Write all pending stats in one pipeline, returns the number of clients written"""
+        with self.lock:
+            pending = self._pending
+            self._pending = {}
+
+        if not pending or not self.redis_client:
+            return 0
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            channels = set()
+            for (channel_id, client_id), stats in pending.items():
+                client_key = RedisKeys.client_metadata(channel_id, client_id)
+                pipe.hset(client_key, mapping=stats)
+                # Proof-of-life for actively streaming clients, independent of the heartbeat thread
+                pipe.expire(client_key, self.client_ttl)
+                channels.add(channel_id)
+
+            for channel_id in channels:
+                pipe.expire(RedisKeys.clients(channel_id), self.client_ttl)
+
+            pipe.execute()
+            logger.trace(f"Flushed stats for {len(pending)} clients across {len(channels)} channels")
+            return len(pending)
+        except Exception as e:
+            logger.warning(f"Failed to flush client stats to Redis: {e}")
+            return 0
+
+    def stop(self):
+        """Stop the flush thread after writing any pending stats"""
+        self._running = False
+        self.flush()
+
+    def _start_flush_thread(self):
+        """Start the background flush loop (called with the lock held)"""
+        self._running = True
+
+        def flush_task():
+            while self._running:
+                time.sleep(self.flush_interval)
+                self.flush()
+
+        self._thread = threading.Thread(target=flush_task, daemon=True)
+        self._thread.name = "client-stats-flush"
+        self._thread.start()
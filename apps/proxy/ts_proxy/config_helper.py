@@ -46,6 +46,16 @@ class ConfigHelper:
         """Get keepalive interval in seconds"""
         return ConfigHelper.get('KEEPALIVE_INTERVAL', 0.5)
 
+    @staticmethod
+    def chunk_wait_timeout():
+        """Get max seconds a client at the buffer head waits for a chunk notification"""
+        return ConfigHelper.get('CHUNK_WAIT_TIMEOUT', 1.0)
+
+    @staticmethod
+    def client_stats_flush_interval():
+        """Get seconds between batched client stats writes to Redis"""
+        return ConfigHelper.get('CLIENT_STATS_FLUSH_INTERVAL', 1.0)
+
     @staticmethod
     def cleanup_check_interval():
         """Get cleanup check interval in seconds"""
@@ -56,6 +66,41 @@ class ConfigHelper:
         """Get Redis chunk TTL in seconds"""
         return Config.get_redis_chunk_ttl()
 
+    @staticmethod
+    def buffer_backend():
+        """Get the chunk storage backend name ('redis', 'memory' or 'shm')"""
+        return ConfigHelper.get('BUFFER_BACKEND', 'redis')
+
+    @staticmethod
+    def buffer_ring_slots():
+        """Get number of chunk slots kept per channel by ring backends"""
+        return ConfigHelper.get('BUFFER_RING_SLOTS', 128)
+
+    @staticmethod
+    def buffer_ring_dir():
+        """Get directory for shared memory ring files (None for the default)"""
+        return ConfigHelper.get('BUFFER_RING_DIR', None)
+
+    @staticmethod
+    def buffer_ring_redis_mirror():
+        """Whether shared memory ring chunks are also written to Redis"""
+        return ConfigHelper.get('BUFFER_RING_REDIS_MIRROR', False)
+
+    @staticmethod
+    def recording_write_buffer():
+        """Get file buffer size in bytes used by DVR recorders"""
+        return ConfigHelper.get('RECORDING_WRITE_BUFFER', 4 * 1024 * 1024)
+
+    @staticmethod
+    def recording_poll_interval():
+        """Get seconds a recorder at the buffer head waits before checking for new chunks"""
+        return ConfigHelper.get('RECORDING_POLL_INTERVAL', 0.25)
+
+    @staticmethod
+    def stream_resolution_ttl():
+        """Get seconds a channel's resolved streams/URLs stay cached"""
+        return ConfigHelper.get('STREAM_RESOLUTION_TTL', 600)
+
     @staticmethod
     def chunk_size():
         """Get chunk size in bytes"""
@@ -38,6 +38,11 @@ class StreamType:
     TS = "ts"
     UNKNOWN = "unknown"
 
+# Client types registered with the ClientManager
+class ClientType:
+    VIEWER = "viewer"
+    RECORDER = "recorder"
+
 # Channel metadata field names stored in Redis
 class ChannelMetadataField:
     # Basic fields
@@ -102,6 +107,7 @@ class ChannelMetadataField:
     IP_ADDRESS = "ip_address"
     WORKER_ID = "worker_id"
     CHUNKS_SENT = "chunks_sent"
+    CLIENT_TYPE = "client_type"
     STATS_UPDATED_AT = "stats_updated_at"
 
 # TS packet constants
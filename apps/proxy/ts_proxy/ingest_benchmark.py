@@ -0,0 +1,105 @@
+"""
+Microbenchmark for the StreamBuffer ingest path.
+
+Feeds synthetic upstream reads into StreamBuffer.add_chunk for several channels at
+once (interleaved, like the stream manager greenlets) and reports ingest MB/s. Chunks
+are handed to a null Redis client so only the alignment/copy work is measured. The
+previous concatenate-and-slice implementation is included as a baseline.
+
+Usage:
+    python manage.py shell -c "from apps.proxy.ts_proxy.ingest_benchmark import main; main()"
+"""
+
+import os
+import time
+
+from .constants import TS_PACKET_SIZE
+from .stream_buffer import StreamBuffer
+
+CHANNEL_COUNTS = (1, 10, 50)
+# Socket reads are rarely packet aligned, so use an odd size like a real recv()
+READ_SIZE = 8192 + 61
+MB_PER_CHANNEL = 32
+
+
+class NullRedis:
+    """Just enough of a Redis client for StreamBuffer writes, payloads are discarded"""
+
+    def __init__(self):
+        self.counters = {}
+
+    def get(self, key):
+        return None
+
+    def incr(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return self.counters[key]
+
+    def setex(self, key, ttl, value):
+        # Touch the payload the way a socket send would
+        len(value)
+
+    def publish(self, channel, message):
+        return 0
+
+
+class LegacyAlignmentBuffer:
+    """Baseline: the concatenate/slice/bytes() ingest path StreamBuffer used before"""
+
+    def __init__(self, redis_client, target_chunk_size):
+        self.redis_client = redis_client
+        self.target_chunk_size = target_chunk_size
+        self._partial_packet = bytearray()
+        self._write_buffer = bytearray()
+
+    def add_chunk(self, chunk):
+        combined_data = bytearray(self._partial_packet) + bytearray(chunk)
+        complete_packets_size = (len(combined_data) // TS_PACKET_SIZE) * TS_PACKET_SIZE
+        if complete_packets_size == 0:
+            self._partial_packet = combined_data
+            return True
+
+        self._partial_packet = combined_data[complete_packets_size:]
+        self._write_buffer.extend(combined_data[:complete_packets_size])
+
+        while len(self._write_buffer) >= self.target_chunk_size:
+            chunk_data = self._write_buffer[:self.target_chunk_size]
+            self._write_buffer = self._write_buffer[self.target_chunk_size:]
+            index = self.redis_client.incr('legacy')
+            self.redis_client.setex(f'legacy:{index}', 60, bytes(chunk_data))
+        return True
+
+
+def run(channel_count, legacy=False, mb_per_channel=MB_PER_CHANNEL):
+    """Ingest mb_per_channel MB into each of channel_count buffers, returns aggregate MB/s"""
+    redis_client = NullRedis()
+    buffers = []
+    for i in range(channel_count):
+        buffer = StreamBuffer(channel_id=f"ingest-benchmark-{i}", redis_client=redis_client)
+        if legacy:
+            buffer = LegacyAlignmentBuffer(redis_client, buffer.target_chunk_size)
+        buffers.append(buffer)
+
+    payload = os.urandom(READ_SIZE)
+    reads_per_channel = (mb_per_channel * 1024 * 1024) // READ_SIZE
+
+    start = time.perf_counter()
+    for _ in range(reads_per_channel):
+        for buffer in buffers:
+            buffer.add_chunk(payload)
+    elapsed = time.perf_counter() - start
+
+    total_mb = channel_count * reads_per_channel * READ_SIZE / (1024 * 1024)
+    return total_mb / elapsed
+
+
+def main(channel_counts=CHANNEL_COUNTS, mb_per_channel=MB_PER_CHANNEL):
+    print(f"{'channels':>8} {'current MB/s':>14} {'legacy MB/s':>13}")
+    for channel_count in channel_counts:
+        current = run(channel_count, mb_per_channel=mb_per_channel)
+        legacy = run(channel_count, legacy=True, mb_per_channel=mb_per_channel)
+        print(f"{channel_count:>8} {current:>14.1f} {legacy:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
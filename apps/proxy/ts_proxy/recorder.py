@@ -0,0 +1,306 @@
+"""
+In-process DVR recording for TS channels.
+
+A StreamRecorder attaches to a channel the same way stream_ts does for an HTTP
+client, but instead of streaming chunks over a response it reads them from the
+channel's chunk backend by index and appends them to a file. Recordings run in
+the Celery worker that executes run_recording, so they don't hold a web worker or
+an HTTP connection. The recorder is registered with the channel's ClientManager
+as a recorder client, which keeps the channel alive and shows it in channel stats.
+"""
+
+import random
+import time
+
+from apps.channels.models import Channel
+from .config_helper import ConfigHelper
+from .constants import ChannelMetadataField, ChannelState, ClientType
+from .redis_keys import RedisKeys
+from .server import ProxyServer
+from .services.channel_service import ChannelService
+from .url_utils import generate_stream_url
+from .utils import get_logger
+
+logger = get_logger()
+
+RECORDER_USER_AGENT = "Dispatcharr-DVR"
+RECORDER_IP = "127.0.0.1"
+
+# Most chunks fetched from the backend in one read
+MAX_CHUNKS_PER_READ = 20
+# Seconds between channel/client stop checks while recording
+STATUS_CHECK_INTERVAL = 1.0
+
+RUNNING_STATES = (
+    ChannelState.ACTIVE,
+    ChannelState.WAITING_FOR_CLIENTS,
+    ChannelState.BUFFERING,
+    ChannelState.INITIALIZING,
+    ChannelState.CONNECTING,
+)
+
+
+class StreamRecorder:
+    """Records a channel's TS buffer straight to disk"""
+
+    def __init__(self, channel_id, output_path, duration, recording_id=None):
+        self.channel_id = str(channel_id)
+        self.output_path = output_path
+        self.duration = duration
+        self.client_id = f"recorder_{recording_id or int(time.time() * 1000)}_{random.randint(1000, 9999)}"
+
+        self.attached = False
+        self.error = None
+        self.bytes_written = 0
+        self.chunks_written = 0
+        self.chunks_missed = 0
+        self.local_index = 0
+
+    @property
+    def needs_http_fallback(self):
+        """Whether the recording has to go through the HTTP stream endpoint instead"""
+        return not self.attached and self.error in ("redirect_profile", "redis_unavailable")
+
+    def record(self):
+        """
+        Record until the duration elapses or the channel goes away.
+        Returns the number of bytes written; self.error holds the reason if the
+        recording could not start or ended early.
+        """
+        proxy_server = ProxyServer.get_instance()
+        if not proxy_server.redis_client:
+            self.error = "redis_unavailable"
+            return 0
+
+        if not self._attach(proxy_server):
+            return 0
+
+        try:
+            self._copy_chunks(proxy_server)
+        except Exception as e:
+            logger.error(f"[{self.client_id}] Recording error: {e}", exc_info=True)
+            self.error = str(e)
+        finally:
+            self._detach(proxy_server)
+
+        return self.bytes_written
+
+    def _channel_running(self, proxy_server):
+        """Same liveness rules stream_ts uses before deciding to (re)initialize"""
+        redis_client = proxy_server.redis_client
+        metadata = redis_client.hgetall(RedisKeys.channel_metadata(self.channel_id))
+        state = metadata.get(ChannelMetadataField.STATE.encode('utf-8'), b'').decode('utf-8')
+
+        if state in RUNNING_STATES:
+            return proxy_server.check_if_channel_exists(self.channel_id)
+        if state in (ChannelState.ERROR, ChannelState.STOPPED, ChannelState.STOPPING):
+            # A stopping channel would end the recording right away, clean up and start fresh
+            ChannelService.stop_channel(self.channel_id)
+            return False
+
+        owner = metadata.get(ChannelMetadataField.OWNER.encode('utf-8'))
+        if owner and redis_client.exists(RedisKeys.worker_heartbeat(owner.decode('utf-8'))):
+            return proxy_server.check_if_channel_exists(self.channel_id)
+        return False
+
+    def _start_channel(self, proxy_server):
+        """Allocate a stream and start the channel with this process as its owner"""
+        channel = Channel.objects.get(uuid=self.channel_id)
+
+        # Wait a little for a connection slot, recordings often start on the hour
+        wait_until = time.time() + ConfigHelper.connection_timeout()
+        while True:
+            stream_url, stream_user_agent, transcode, profile_value = generate_stream_url(self.channel_id)
+            if stream_url is not None:
+                break
+            _, _, error_reason = channel.get_stream()
+            if time.time() >= wait_until or (error_reason and "maximum connection limits" not in error_reason):
+                self.error = error_reason or "No available streams for this channel"
+                return False
+            time.sleep(0.5)
+
+        stream_id, m3u_profile_id, _ = channel.get_stream()
+        if channel.get_stream_profile().is_redirect():
+            # Redirect profiles never pass through the proxy buffer
+            channel.release_stream()
+            self.error = "redirect_profile"
+            return False
+
+        if not ChannelService.initialize_channel(
+            self.channel_id,
+            stream_url,
+            stream_user_agent,
+            transcode,
+            profile_value,
+            stream_id,
+            m3u_profile_id,
+        ):
+            self.error = "Failed to initialize channel"
+            return False
+
+        manager = proxy_server.stream_managers.get(self.channel_id)
+        if not manager or not proxy_server.am_i_owner(self.channel_id):
+            return True
+
+        wait_start = time.time()
+        while not manager.connected:
+            if getattr(manager, 'url_switching', False):
+                # Give a stream switch the chance to complete
+                wait_start = time.time()
+            elif time.time() - wait_start > ConfigHelper.connection_timeout() or self._connect_failed(proxy_server, manager):
+                logger.warning(f"[{self.client_id}] Channel {self.channel_id} failed to connect for recording")
+                proxy_server.stop_channel(self.channel_id)
+                self.error = "Failed to connect"
+                return False
+            time.sleep(0.1)
+
+        return True
+
+    def _connect_failed(self, proxy_server, manager):
+        """The manager gave up and the channel isn't in a transitional state"""
+        if manager.should_retry():
+            return False
+        state = proxy_server.redis_client.hget(
+            RedisKeys.channel_metadata(self.channel_id), ChannelMetadataField.STATE
+        )
+        return not state or state.decode('utf-8') not in (ChannelState.INITIALIZING, ChannelState.CONNECTING)
+
+    def _attach(self, proxy_server):
+        """Make sure the channel is running locally and register as a recorder client"""
+        if not self._channel_running(proxy_server):
+            logger.info(f"[{self.client_id}] Starting channel {self.channel_id} for recording")
+            if not self._start_channel(proxy_server):
+                logger.warning(f"[{self.client_id}] Could not start channel {self.channel_id}: {self.error}")
+                return False
+
+        if (
+            self.channel_id not in proxy_server.stream_buffers
+            or self.channel_id not in proxy_server.client_managers
+        ):
+            # Channel is owned by another worker, read its buffer from here
+            if not proxy_server.initialize_channel(None, self.channel_id):
+                self.error = "Failed to initialize channel locally"
+                return False
+
+        buffer = proxy_server.stream_buffers[self.channel_id]
+        client_manager = proxy_server.client_managers[self.channel_id]
+        client_manager.add_client(
+            self.client_id, RECORDER_IP, RECORDER_USER_AGENT, client_type=ClientType.RECORDER
+        )
+
+        # Recordings start live, at the newest chunk
+        self.local_index = int(proxy_server.redis_client.get(buffer.buffer_index_key) or 0)
+        self.attached = True
+        logger.info(f"[{self.client_id}] Recording channel {self.channel_id} from index {self.local_index}")
+        return True
+
+    def _stop_reason(self, proxy_server):
+        """Return why recording should stop early, or None to keep going"""
+        redis_client = proxy_server.redis_client
+
+        if self.channel_id not in proxy_server.stream_buffers:
+            return "channel_stopped"
+        if redis_client.exists(RedisKeys.channel_stopping(self.channel_id)):
+            return "channel_stopped"
+        if redis_client.exists(RedisKeys.client_stop(self.channel_id, self.client_id)):
+            return "stopped_by_user"
+
+        state = redis_client.hget(RedisKeys.channel_metadata(self.channel_id), ChannelMetadataField.STATE)
+        if state and state.decode('utf-8') in (ChannelState.ERROR, ChannelState.STOPPED):
+            return f"channel_{state.decode('utf-8')}"
+
+        client_manager = proxy_server.client_managers.get(self.channel_id)
+        if not client_manager or self.client_id not in client_manager.clients:
+            return "client_removed"
+        return None
+
+    def _copy_chunks(self, proxy_server):
+        """Append chunks to the output file as the owner publishes them"""
+        redis_client = proxy_server.redis_client
+        buffer = proxy_server.stream_buffers[self.channel_id]
+        poll_interval = ConfigHelper.recording_poll_interval()
+        idle_timeout = ConfigHelper.stream_timeout() + ConfigHelper.failover_grace_period()
+
+        started_at = time.time()
+        deadline = started_at + self.duration
+        last_data = started_at
+        last_check = 0
+
+        # A large file buffer turns ~1MB chunks into a few big sequential writes
+        with open(self.output_path, 'wb', buffering=ConfigHelper.recording_write_buffer()) as output:
+            while time.time() < deadline:
+                now = time.time()
+                if now - last_check >= STATUS_CHECK_INTERVAL:
+                    last_check = now
+                    reason = self._stop_reason(proxy_server)
+                    if reason:
+                        logger.info(f"[{self.client_id}] Recording ended early: {reason}")
+                        self.error = reason
+                        break
+
+                current_index = int(redis_client.get(buffer.buffer_index_key) or 0)
+                if current_index < self.local_index:
+                    # Buffer index was reset (channel restarted), follow it
+                    logger.info(f"[{self.client_id}] Buffer index reset from {self.local_index} to {current_index}")
+                    self.local_index = current_index
+
+                if current_index == self.local_index:
+                    if now - last_data > idle_timeout:
+                        logger.warning(f"[{self.client_id}] No data for {idle_timeout}s, ending recording")
+                        self.error = "no_data_timeout"
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                end_index = min(current_index, self.local_index + MAX_CHUNKS_PER_READ)
+                chunks = buffer.backend.read_chunks(self.local_index + 1, end_index + 1)
+                for chunk in chunks:
+                    if chunk is None:
+                        # Expired before we got to it, the recording will have a gap
+                        self.chunks_missed += 1
+                        continue
+                    output.write(chunk)
+                    self.bytes_written += len(chunk)
+                    self.chunks_written += 1
+
+                self.local_index = end_index
+                last_data = time.time()
+
+                proxy_server.client_stats.record(self.channel_id, self.client_id, {
+                    ChannelMetadataField.CHUNKS_SENT: str(self.chunks_written),
+                    ChannelMetadataField.BYTES_SENT: str(self.bytes_written),
+                    ChannelMetadataField.AVG_RATE_KBPS: str(round(self.bytes_written / max(last_data - started_at, 1) / 1024, 1)),
+                    ChannelMetadataField.STATS_UPDATED_AT: str(last_data),
+                })
+
+        if self.chunks_missed:
+            logger.warning(f"[{self.client_id}] Recording skipped {self.chunks_missed} expired chunks")
+        logger.info(f"[{self.client_id}] Recorded {self.chunks_written} chunks ({self.bytes_written / 1024 / 1024:.1f} MB) "
+                    f"in {time.time() - started_at:.0f}s")
+
+    def _detach(self, proxy_server):
+        """Unregister the recorder and stop the channel if nobody else is using it"""
+        proxy_server.client_stats.discard(self.channel_id, self.client_id)
+
+        client_manager = proxy_server.client_managers.get(self.channel_id)
+        if client_manager:
+            client_manager.remove_client(self.client_id)
+
+        if not proxy_server.am_i_owner(self.channel_id):
+            # The owner's cleanup handles shutdown, our local resources are released by
+            # this process's cleanup thread once it sees no local clients
+            return
+
+        # The provider connection lives in this process. Keep serving viewers that joined
+        # during the recording rather than leaving the channel to a Celery process that
+        # may be recycled once the task returns.
+        while (
+            client_manager
+            and client_manager.get_total_client_count() > 0
+            and proxy_server.am_i_owner(self.channel_id)
+        ):
+            time.sleep(ConfigHelper.cleanup_check_interval())
+
+        if proxy_server.am_i_owner(self.channel_id):
+            logger.info(f"[{self.client_id}] Recording finished, stopping channel {self.channel_id}")
+            proxy_server.stop_channel(self.channel_id)
@@ -24,6 +24,11 @@ class RedisKeys:
         """Prefix for buffer chunks"""
         return f"ts_proxy:channel:{channel_id}:buffer:chunk:"
 
+    @staticmethod
+    def buffer_backend(channel_id):
+        """Key for chunk ring backend metadata (host, path, slot layout)"""
+        return f"ts_proxy:channel:{channel_id}:buffer:backend"
+
     @staticmethod
     def channel_stopping(channel_id):
         """Key indicating channel is stopping"""
@@ -39,11 +44,26 @@ class RedisKeys:
         """PubSub channel for events"""
         return f"ts_proxy:events:{channel_id}"
 
+    @staticmethod
+    def chunks_channel(channel_id):
+        """PubSub channel announcing new buffer chunks"""
+        return f"ts_proxy:chunks:{channel_id}"
+
     @staticmethod
     def switch_request(channel_id):
         """Key for stream switch request"""
         return f"ts_proxy:channel:{channel_id}:switch_request"
 
+    @staticmethod
+    def stream_resolution(channel_id):
+        """Hash caching a channel's stream candidates and resolved URLs"""
+        return f"ts_proxy:resolution:{channel_id}"
+
+    @staticmethod
+    def stream_resolution_version():
+        """Version counter, bumping it invalidates every cached resolution"""
+        return "ts_proxy:resolution:version"
+
     @staticmethod
     def channel_owner(channel_id):
         """Key for storing channel owner worker ID"""
@@ -24,6 +24,7 @@ from redis.exceptions import ConnectionError, TimeoutError
 from .stream_manager import StreamManager
 from .stream_buffer import StreamBuffer
 from .client_manager import ClientManager
+from .client_stats import ClientStatsAggregator
 from .redis_keys import RedisKeys
 from .constants import ChannelState, EventType, StreamType
 from .config_helper import ConfigHelper
@@ -80,6 +81,9 @@ class ProxyServer:
             logger.error(f"Failed to initialize Redis: {e}")
             self.redis_client = None
 
+        # Per-worker batching of client stats writes
+        self.client_stats = ClientStatsAggregator(self.redis_client)
+
         # Start cleanup thread
         self.cleanup_interval = getattr(Config, 'CLEANUP_INTERVAL', 60)
         self._start_cleanup_thread()
@@ -87,12 +91,17 @@ class ProxyServer:
         # Start event listener for Redis pubsub messages
         self._start_event_listener()
 
+        # Start listener for chunk notifications from channel owners
+        self._start_chunk_listener()
+
     def _setup_redis_connection(self):
         """Setup Redis connection with retry logic"""
         # Try to use get_redis_client utility instead of direct connection
         self.redis_client = RedisClient.get_client(max_retries=self.redis_max_retries,
                                             retry_interval=self.redis_retry_interval)
         if self.redis_client:
+            if hasattr(self, 'client_stats'):
+                self.client_stats.redis_client = self.redis_client
             logger.info(f"Successfully connected to Redis using utility function")
             logger.info(f"Worker ID: {self.worker_id}")
         else:
@@ -366,6 +375,48 @@ class ProxyServer:
         thread.name = "redis-event-listener"
         thread.start()
 
+    def _start_chunk_listener(self):
+        """Wake local clients as soon as the owner of a channel publishes a new chunk"""
+        if not self.redis_client:
+            return
+
+        def chunk_listener():
+            pubsub = None
+            while True:
+                try:
+                    pubsub_client = RedisClient.get_pubsub_client() or self.redis_client
+                    pubsub = pubsub_client.pubsub()
+                    pubsub.psubscribe(RedisKeys.chunks_channel("*"))
+                    logger.info("Started Redis chunk notification listener")
+
+                    for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+
+                        try:
+                            channel_id = message["channel"].decode("utf-8").rsplit(":", 1)[-1]
+                            buffer = self.stream_buffers.get(channel_id)
+                            if buffer:
+                                buffer.notify_chunk(int(message["data"]))
+                        except Exception as e:
+                            logger.debug(f"Error processing chunk notification: {e}")
+
+                except Exception as e:
+                    logger.error(f"Error in chunk listener: {e}")
+                    gevent.sleep(5)
+
+                finally:
+                    try:
+                        if pubsub:
+                            pubsub.close()
+                            pubsub = None
+                    except Exception as e:
+                        logger.debug(f"Error closing chunk pubsub: {e}")
+
+        thread = threading.Thread(target=chunk_listener, daemon=True)
+        thread.name = "redis-chunk-listener"
+        thread.start()
+
     def get_channel_owner(self, channel_id):
         """Get the worker ID that owns this channel with proper error handling"""
         if not self.redis_client:
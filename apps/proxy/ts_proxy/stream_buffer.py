@@ -10,6 +10,7 @@ from apps.proxy.config import TSConfig as Config
 from .redis_keys import RedisKeys
 from .config_helper import ConfigHelper
 from .constants import TS_PACKET_SIZE
+from .buffer_backends import create_buffer_backend
 from .utils import get_logger
 import gevent.event
 import gevent  # Make sure this import is at the top
@@ -42,8 +43,18 @@ class StreamBuffer:
             except Exception as e:
                 logger.error(f"Error initializing buffer from Redis: {e}")
 
-        self._write_buffer = bytearray()
-        self.target_chunk_size = ConfigHelper.get('BUFFER_CHUNK_SIZE', TS_PACKET_SIZE * 5644)  # ~1MB default
+        # Chunks are always whole TS packets, so keep the target size packet aligned
+        target_chunk_size = ConfigHelper.get('BUFFER_CHUNK_SIZE', TS_PACKET_SIZE * 5644)  # ~1MB default
+        self.target_chunk_size = max(TS_PACKET_SIZE, (target_chunk_size // TS_PACKET_SIZE) * TS_PACKET_SIZE)
+
+        # Preallocated staging buffer: upstream bytes are copied in once and handed to the
+        # backend as a memoryview when full, instead of being re-sliced on every read
+        self._write_buffer = bytearray(self.target_chunk_size)
+        self._write_view = memoryview(self._write_buffer)
+        self._write_pos = 0
+
+        # Chunk payload storage (Redis keys or a ring buffer), selected through ConfigHelper
+        self.backend = create_buffer_backend(channel_id, redis_client, self.chunk_ttl, self.target_chunk_size)
 
         # Track timers for proper cleanup
         self.stopping = False
@@ -56,51 +67,28 @@ class StreamBuffer:
             return False
 
         try:
-            # Accumulate partial packets between chunks
-            if not hasattr(self, '_partial_packet'):
-                self._partial_packet = bytearray()
-
-            # Combine with any previous partial packet
-            combined_data = bytearray(self._partial_packet) + bytearray(chunk)
-
-            # Calculate complete packets
-            complete_packets_size = (len(combined_data) // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
-
-            if complete_packets_size == 0:
-                # Not enough data for a complete packet
-                self._partial_packet = combined_data
-                return True
-
-            # Split into complete packets and remainder
-            complete_packets = combined_data[:complete_packets_size]
-            self._partial_packet = combined_data[complete_packets_size:]
-
-            # Add completed packets to write buffer
-            self._write_buffer.extend(complete_packets)
-
-            # Only write to Redis when we have enough data for an optimized chunk
             writes_done = 0
-            with self.lock:
-                while len(self._write_buffer) >= self.target_chunk_size:
-                    # Extract a full chunk
-                    chunk_data = self._write_buffer[:self.target_chunk_size]
-                    self._write_buffer = self._write_buffer[self.target_chunk_size:]
-
-                    # Write optimized chunk to Redis
-                    if self.redis_client:
-                        chunk_index = self.redis_client.incr(self.buffer_index_key)
-                        chunk_key = RedisKeys.buffer_chunk(self.channel_id, chunk_index)
-                        self.redis_client.setex(chunk_key, self.chunk_ttl, bytes(chunk_data))
-
-                        # Update local tracking
-                        self.index = chunk_index
-                        writes_done += 1
+            with self.lock, memoryview(chunk) as incoming:
+                offset = 0
+                remaining = len(incoming)
+                while remaining:
+                    # Copy as much as fits into the staging buffer
+                    take = min(self.target_chunk_size - self._write_pos, remaining)
+                    self._write_view[self._write_pos:self._write_pos + take] = incoming[offset:offset + take]
+                    self._write_pos += take
+                    offset += take
+                    remaining -= take
+
+                    # Staging buffer is a whole number of TS packets, so a full buffer is an aligned chunk
+                    if self._write_pos == self.target_chunk_size:
+                        if self._store_chunk(self._write_view):
+                            writes_done += 1
+                        self._write_pos = 0
 
             if writes_done > 0:
                 logger.debug(f"Added {writes_done} chunks ({self.target_chunk_size} bytes each) to Redis for channel {self.channel_id} at index {self.index}")
-
-            self.chunk_available.set()  # Signal that new data is available
-            self.chunk_available.clear()  # Reset for next notification
+                self._wake_waiters()
+                self._publish_chunk_available()
 
             return True
 
@@ -108,6 +96,49 @@ class StreamBuffer:
             logger.error(f"Error adding chunk to buffer: {e}")
             return False
 
+    def _store_chunk(self, data):
+        """Assign the next index to a chunk and hand it to the backend (called with the lock held)"""
+        if not self.redis_client:
+            return False
+
+        # Index always comes from Redis, payload goes to the configured backend.
+        # The backend must consume data before returning since the staging buffer is reused.
+        chunk_index = self.redis_client.incr(self.buffer_index_key)
+        self.backend.write_chunk(chunk_index, data)
+
+        # Update local tracking
+        self.index = chunk_index
+        return True
+
+    def _wake_waiters(self):
+        """Wake every local client waiting for a chunk"""
+        # Swap in a fresh event first so clients that go back to waiting block on the next chunk
+        event = self.chunk_available
+        self.chunk_available = gevent.event.Event()
+        event.set()
+
+    def _publish_chunk_available(self):
+        """Tell other workers a new chunk landed so their clients don't have to poll"""
+        try:
+            self.redis_client.publish(RedisKeys.chunks_channel(self.channel_id), self.index)
+        except Exception as e:
+            logger.debug(f"Failed to publish chunk notification for channel {self.channel_id}: {e}")
+
+    def notify_chunk(self, chunk_index):
+        """Handle a chunk notification from the owner worker"""
+        if chunk_index > self.index:
+            self.index = chunk_index
+            self._wake_waiters()
+
+    def wait_for_chunk(self, after_index, timeout):
+        """
+        Block until a chunk newer than after_index is available or timeout expires.
+        Returns True if new data is available.
+        """
+        if self.index > after_index:
+            return True
+        return self.chunk_available.wait(timeout)
+
     def get_chunks(self, start_index=None):
         """Get chunks from the buffer with detailed logging"""
         try:
@@ -153,13 +184,8 @@ class StreamBuffer:
             # Log the range we're retrieving
             logger.debug(f"[{request_id}] Retrieving chunks {start_id} to {end_id-1} (total: {end_id-start_id})")
 
-            # Directly fetch from Redis using pipeline for efficiency
-            pipe = self.redis_client.pipeline()
-            for idx in range(start_id, end_id):
-                chunk_key = RedisKeys.buffer_chunk(self.channel_id, idx)
-                pipe.get(chunk_key)
-
-            results = pipe.execute()
+            # Fetch the whole range from the chunk backend in one go
+            results = self.backend.read_chunks(start_id, end_id)
 
             # Process results
             chunks = [result for result in results if result is not None]
@@ -207,13 +233,8 @@ class StreamBuffer:
             # Cap end at current buffer position
             end_id = min(end_id, current_index + 1)
 
-            # Directly fetch from Redis using pipeline
-            pipe = self.redis_client.pipeline()
-            for idx in range(start_id, end_id):
-                chunk_key = RedisKeys.buffer_chunk(self.channel_id, idx)
-                pipe.get(chunk_key)
-
-            results = pipe.execute()
+            # Fetch the whole range from the chunk backend in one go
+            results = self.backend.read_chunks(start_id, end_id)
 
             # Filter out None results
             chunks = [result for result in results if result is not None]
@@ -251,33 +272,29 @@ class StreamBuffer:
 
         try:
             # Flush any remaining data in the write buffer
-            if hasattr(self, '_write_buffer') and len(self._write_buffer) > 0:
-                # Ensure remaining data is aligned to TS packets
-                complete_size = (len(self._write_buffer) // 188) * 188
+            if self._write_pos > 0:
+                # Ensure remaining data is aligned to TS packets, a trailing partial packet is dropped
+                complete_size = (self._write_pos // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
 
                 if complete_size > 0:
-                    final_chunk = self._write_buffer[:complete_size]
-
-                    # Write final chunk to Redis
+                    # Write final chunk to the backend
                     with self.lock:
-                        if self.redis_client:
-                            try:
-                                chunk_index = self.redis_client.incr(self.buffer_index_key)
-                                chunk_key = f"{self.buffer_prefix}{chunk_index}"
-                                self.redis_client.setex(chunk_key, self.chunk_ttl, bytes(final_chunk))
-                                self.index = chunk_index
-                                logger.info(f"Flushed final chunk of {len(final_chunk)} bytes to Redis")
-                            except Exception as e:
-                                logger.error(f"Error flushing final chunk: {e}")
-
-                # Clear buffers
-                self._write_buffer = bytearray()
-                if hasattr(self, '_partial_packet'):
-                    self._partial_packet = bytearray()
+                        try:
+                            if self._store_chunk(self._write_view[:complete_size]):
+                                logger.info(f"Flushed final chunk of {complete_size} bytes to {self.backend.name} buffer")
+                        except Exception as e:
+                            logger.error(f"Error flushing final chunk: {e}")
+
+                self._write_pos = 0
 
         except Exception as e:
             logger.error(f"Error during buffer stop: {e}")
 
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.error(f"Error closing {self.backend.name} buffer backend: {e}")
+
     def get_optimized_client_data(self, client_index):
         """Get optimal amount of data for client streaming based on position and target size"""
         # Define limits
@@ -23,7 +23,7 @@ class StreamGenerator:
     data delivery, and cleanup.
     """
 
-    def __init__(self, channel_id, client_id, client_ip, client_user_agent, channel_initializing=False):
+    def __init__(self, channel_id, client_id, client_ip, client_user_agent, channel_initializing=False, startup_timer=None):
         """
         Initialize the stream generator with client and channel details.
 
@@ -33,12 +33,14 @@ class StreamGenerator:
             client_ip: Client's IP address
             client_user_agent: User agent string from client
             channel_initializing: Whether the channel is still initializing
+            startup_timer: Optional StartupTimer, its breakdown is logged with the first chunk
         """
         self.channel_id = channel_id
         self.client_id = client_id
         self.client_ip = client_ip
         self.client_user_agent = client_user_agent
         self.channel_initializing = channel_initializing
+        self.startup_timer = startup_timer
 
         # Performance and state tracking
         self.stream_start_time = time.time()
@@ -52,10 +54,6 @@ class StreamGenerator:
         self.last_stats_bytes = 0
         self.current_rate = 0.0
 
-        # TTL refresh tracking
-        self.last_ttl_refresh = time.time()
-        self.ttl_refresh_interval = 3  # Refresh TTL every 3 seconds of active streaming
-
     def generate(self):
         """
         Generator function that produces the stream content for the client.
@@ -228,8 +226,11 @@ class StreamGenerator:
                     self.last_yield_time = time.time()
                     self.consecutive_empty = 0  # Reset consecutive counter but keep total empty_reads
                     gevent.sleep(Config.KEEPALIVE_INTERVAL)  # Replace time.sleep
+                elif self.local_index >= self.buffer.index and self._stream_healthy():
+                    # At buffer head - sleep until the next chunk is announced instead of polling
+                    self.buffer.wait_for_chunk(self.local_index, ConfigHelper.chunk_wait_timeout())
                 else:
-                    # Standard wait with backoff
+                    # Data should exist but couldn't be read, retry with backoff
                     sleep_time = min(0.1 * self.consecutive_empty, 1.0)
                     gevent.sleep(sleep_time)  # Replace time.sleep
 
@@ -305,6 +306,9 @@ class StreamGenerator:
                 yield chunk
                 self.bytes_sent += len(chunk)
                 self.chunks_sent += 1
+                if self.chunks_sent == 1 and self.startup_timer:
+                    self.startup_timer.mark("first_chunk")
+                    logger.info(f"[{self.client_id}] Time to first byte: {self.startup_timer.summary()}")
                 logger.debug(f"[{self.client_id}] Sent chunk {self.chunks_sent} ({len(chunk)} bytes) for channel {self.channel_id} to client")
 
                 current_time = time.time()
@@ -328,47 +332,30 @@ class StreamGenerator:
                     logger.debug(f"[{self.client_id}] Stats: {self.chunks_sent} chunks, {self.bytes_sent/1024:.1f} KB, "
                                 f"avg: {avg_rate:.1f} KB/s, current: {self.current_rate:.1f} KB/s")
 
-                # Store stats in Redis client metadata
-                if proxy_server.redis_client:
-                    try:
-                        client_key = RedisKeys.client_metadata(self.channel_id, self.client_id)
-                        stats = {
-                            ChannelMetadataField.CHUNKS_SENT: str(self.chunks_sent),
-                            ChannelMetadataField.BYTES_SENT: str(self.bytes_sent),
-                            ChannelMetadataField.AVG_RATE_KBPS: str(round(avg_rate, 1)),
-                            ChannelMetadataField.CURRENT_RATE_KBPS: str(round(self.current_rate, 1)),
-                            ChannelMetadataField.STATS_UPDATED_AT: str(current_time)
-                        }
-                        proxy_server.redis_client.hset(client_key, mapping=stats)
-
-                        # Refresh TTL periodically while actively streaming
-                        # This provides proof-of-life independent of heartbeat thread
-                        if current_time - self.last_ttl_refresh > self.ttl_refresh_interval:
-                            try:
-                                # Refresh TTL on client key
-                                proxy_server.redis_client.expire(client_key, Config.CLIENT_RECORD_TTL)
-                                # Also refresh the client set TTL
-                                client_set_key = f"ts_proxy:channel:{self.channel_id}:clients"
-                                proxy_server.redis_client.expire(client_set_key, Config.CLIENT_RECORD_TTL)
-                                self.last_ttl_refresh = current_time
-                                logger.debug(f"[{self.client_id}] Refreshed client TTL (active streaming)")
-                            except Exception as ttl_error:
-                                logger.debug(f"[{self.client_id}] Failed to refresh TTL: {ttl_error}")
-                    except Exception as e:
-                        logger.warning(f"[{self.client_id}] Failed to store stats in Redis: {e}")
+                # Queue stats for the next batched write to the client metadata hash
+                proxy_server.client_stats.record(self.channel_id, self.client_id, {
+                    ChannelMetadataField.CHUNKS_SENT: str(self.chunks_sent),
+                    ChannelMetadataField.BYTES_SENT: str(self.bytes_sent),
+                    ChannelMetadataField.AVG_RATE_KBPS: str(round(avg_rate, 1)),
+                    ChannelMetadataField.CURRENT_RATE_KBPS: str(round(self.current_rate, 1)),
+                    ChannelMetadataField.STATS_UPDATED_AT: str(current_time)
+                })
 
             except Exception as e:
                 logger.error(f"[{self.client_id}] Error sending chunk to client: {e}")
                 raise  # Re-raise to exit the generator
 
+    def _stream_healthy(self):
+        """Whether the upstream is healthy (assumed healthy on non-owner workers)."""
+        return self.stream_manager.healthy if self.stream_manager else True
+
     def _should_send_keepalive(self, local_index):
         """Determine if a keepalive packet should be sent."""
         # Check if we're caught up to buffer head
         at_buffer_head = local_index >= self.buffer.index
 
         # If we're at buffer head and no data is coming, send keepalive
-        stream_healthy = self.stream_manager.healthy if self.stream_manager else True
-        return at_buffer_head and not stream_healthy and self.consecutive_empty >= 5
+        return at_buffer_head and not self._stream_healthy() and self.consecutive_empty >= 5
 
     def _is_ghost_client(self, local_index):
         """Check if this appears to be a ghost client (stuck but buffer advancing)."""
@@ -433,6 +420,9 @@ class StreamGenerator:
             except Exception as e:
                 logger.error(f"[{self.client_id}] Error checking stream data for release: {e}")
 
+        # Drop queued stats so a late flush doesn't recreate the client's metadata
+        proxy_server.client_stats.discard(self.channel_id, self.client_id)
+
         if self.channel_id in proxy_server.client_managers:
             client_manager = proxy_server.client_managers[self.channel_id]
             local_clients = client_manager.remove_client(self.client_id)
@@ -470,10 +460,10 @@ class StreamGenerator:
 
             gevent.spawn(delayed_shutdown)
 
-def create_stream_generator(channel_id, client_id, client_ip, client_user_agent, channel_initializing=False):
+def create_stream_generator(channel_id, client_id, client_ip, client_user_agent, channel_initializing=False, startup_timer=None):
     """
     Factory function to create a new stream generator.
     Returns a function that can be passed to StreamingHttpResponse.
     """
-    generator = StreamGenerator(channel_id, client_id, client_ip, client_user_agent, channel_initializing)
+    generator = StreamGenerator(channel_id, client_id, client_ip, client_user_agent, channel_initializing, startup_timer)
     return generator.generate
\ No newline at end of file
@@ -949,13 +949,15 @@ class StreamManager:
                 # Get stream to find its profile
                 #new_stream = Stream.objects.get(pk=stream_id)
 
-                # Use the new method to update the profile and manage connection counts
+                # Move the channel's connection slot, this fails if the profile filled up
+                # since the switch was planned
                 if m3u_profile_id:
-                    success = channel.update_stream_profile(m3u_profile_id)
+                    success = channel.update_stream_profile(m3u_profile_id, stream_id)
                     if success:
                         logger.debug(f"Updated m3u profile for channel {self.channel_id} to use profile from stream {stream_id}")
                     else:
-                        logger.warning(f"Failed to update stream profile for channel {self.channel_id}")
+                        logger.warning(f"Failed to update stream profile for channel {self.channel_id}, not switching to stream {stream_id}")
+                        return False
 
             except Exception as e:
                 logger.error(f"Error updating stream profile for channel {self.channel_id}: {e}")
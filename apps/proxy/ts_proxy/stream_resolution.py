@@ -0,0 +1,231 @@
+"""
+Cached channel -> stream resolution for stream_ts.
+
+Starting a channel needs its ordered stream/profile candidates, the channel's
+stream profile and, once a slot is reserved, the transformed URL and user agent
+for that stream and M3U profile. Working those out touches Channel, Stream,
+M3UAccountProfile, M3UAccount, UserAgent/CoreSettings and StreamProfile. The
+results are kept in one Redis hash per channel UUID, so a client tuning to a
+recently resolved channel only needs Redis. The connection slot itself is still
+reserved atomically on every start.
+
+Entries are dropped per channel by the Channel/Stream signals below. Changes that
+can affect many channels (accounts, profiles, defaults, M3U refreshes that bulk
+update streams) bump a version key instead, which invalidates every entry at once.
+"""
+
+import json
+from uuid import UUID
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.shortcuts import get_object_or_404
+
+from apps.channels.models import Channel, ChannelStream, Stream
+from apps.channels.stream_slots import candidate_slots, reserve_slot, stream_candidates
+from apps.m3u.models import M3UAccount, M3UAccountProfile
+from core.models import CoreSettings, StreamProfile, UserAgent
+from core.utils import RedisClient
+from .config_helper import ConfigHelper
+from .redis_keys import RedisKeys
+from .url_utils import generate_stream_url, transform_url
+from .utils import get_logger
+
+logger = get_logger()
+
+
+class StreamResolution:
+    """Everything stream_ts needs to start a channel on a reserved stream"""
+
+    def __init__(self, url, user_agent, transcode, stream_profile_id, stream_id, m3u_profile_id, redirect):
+        self.url = url
+        self.user_agent = user_agent
+        self.transcode = transcode
+        self.stream_profile_id = stream_profile_id
+        self.stream_id = stream_id
+        self.m3u_profile_id = m3u_profile_id
+        self.redirect = redirect
+
+
+def _load_channel(channel_id):
+    channel = get_object_or_404(Channel, uuid=channel_id)
+    streams = list(channel.streams.select_related("m3u_account").order_by("channelstream__order"))
+    stream_profile = channel.get_stream_profile()
+    return {
+        "id": channel.id,
+        "has_streams": bool(streams),
+        "slots": candidate_slots(stream_candidates(streams)),
+        "stream_profile_id": stream_profile.id,
+        "transcode": not stream_profile.is_proxy(),
+        "redirect": stream_profile.is_redirect(),
+    }
+
+
+def _load_stream(stream_id, m3u_profile_id):
+    stream = Stream.objects.get(id=stream_id)
+    profile = M3UAccountProfile.objects.select_related("m3u_account").get(id=m3u_profile_id)
+
+    user_agent = profile.m3u_account.get_user_agent().user_agent
+    if user_agent is None:
+        user_agent = UserAgent.objects.get(id=CoreSettings.get_default_user_agent_id()).user_agent
+        logger.debug(f"No user agent found for account, using default: {user_agent}")
+
+    return {
+        "url": transform_url(stream.url, profile.search_pattern, profile.replace_pattern),
+        "user_agent": user_agent,
+    }
+
+
+def _store(redis_client, key, version, fields, reset=False):
+    pipe = redis_client.pipeline()
+    if reset:
+        pipe.delete(key)
+    pipe.hset(key, mapping={"version": version, **{name: json.dumps(value) for name, value in fields.items()}})
+    pipe.expire(key, ConfigHelper.stream_resolution_ttl())
+    pipe.execute()
+
+
+def resolve_stream(channel_id):
+    """
+    Reserve a stream for a channel and return (StreamResolution, None), or
+    (None, error_reason) when no stream is available.
+    """
+    redis_client = RedisClient.get_client()
+    key = RedisKeys.stream_resolution(channel_id)
+
+    pipe = redis_client.pipeline()
+    pipe.get(RedisKeys.stream_resolution_version())
+    pipe.hgetall(key)
+    version, cached = pipe.execute()
+    version = (version or b"0").decode("utf-8")
+
+    if cached.get(b"version", b"").decode("utf-8") == version and b"channel" in cached:
+        info = json.loads(cached[b"channel"])
+    else:
+        cached = {}
+        info = _load_channel(channel_id)
+        _store(redis_client, key, version, {"channel": info}, reset=True)
+
+    if not info["has_streams"]:
+        return None, "No streams assigned to channel"
+
+    stream_id, m3u_profile_id, _ = reserve_slot(redis_client, info["id"], info["slots"])
+    if stream_id is None:
+        if info["slots"]:
+            return None, "All active M3U profiles have reached maximum connection limits"
+        return None, "No active profiles found for any assigned stream"
+
+    field = f"stream:{stream_id}:{m3u_profile_id}"
+    if field.encode("utf-8") in cached:
+        stream_info = json.loads(cached[field.encode("utf-8")])
+    else:
+        try:
+            stream_info = _load_stream(stream_id, m3u_profile_id)
+        except (Stream.DoesNotExist, M3UAccountProfile.DoesNotExist) as e:
+            logger.error(f"Error getting stream or profile: {e}")
+            # Give the slot back and drop the stale entry
+            Channel(id=info["id"]).release_stream()
+            invalidate_channels([channel_id])
+            return None, "Assigned stream is no longer available"
+        _store(redis_client, key, version, {field: stream_info})
+
+    return StreamResolution(
+        stream_info["url"],
+        stream_info["user_agent"],
+        info["transcode"],
+        info["stream_profile_id"],
+        stream_id,
+        m3u_profile_id,
+        info["redirect"],
+    ), None
+
+
+def _resolve_preview(stream_hash):
+    """Direct stream previews are rare, resolve them without the cache"""
+    stream = get_object_or_404(Stream, stream_hash=stream_hash)
+    stream_url, user_agent, transcode, stream_profile_id = generate_stream_url(stream_hash)
+    if stream_url is None:
+        return None, "No available streams for this channel"
+
+    stream_id, m3u_profile_id, _ = stream.get_stream()
+    if stream_id is None:
+        return None, "All active M3U profiles have reached maximum connection limits"
+
+    return StreamResolution(
+        stream_url,
+        user_agent,
+        transcode,
+        stream_profile_id,
+        stream_id,
+        m3u_profile_id,
+        stream.get_stream_profile().is_redirect(),
+    ), None
+
+
+def resolve_stream_for_start(channel_id):
+    """resolve_stream() for channel UUIDs, stream hashes are resolved as previews"""
+    try:
+        UUID(channel_id)
+    except ValueError:
+        return _resolve_preview(channel_id)
+    return resolve_stream(channel_id)
+
+
+def invalidate_channels(channel_uuids):
+    """Drop the cached resolution of specific channels"""
+    keys = [RedisKeys.stream_resolution(channel_uuid) for channel_uuid in channel_uuids]
+    if not keys:
+        return
+    try:
+        redis_client = RedisClient.get_client()
+        if redis_client:
+            redis_client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Could not invalidate stream resolution cache: {e}")
+
+
+def invalidate_all():
+    """Invalidate every cached resolution"""
+    try:
+        redis_client = RedisClient.get_client()
+        if redis_client:
+            redis_client.incr(RedisKeys.stream_resolution_version())
+    except Exception as e:
+        logger.warning(f"Could not invalidate stream resolution cache: {e}")
+
+
+@receiver([post_save, post_delete], sender=Channel)
+def channel_changed(sender, instance, **kwargs):
+    invalidate_channels([instance.uuid])
+
+
+@receiver([post_save, post_delete], sender=ChannelStream)
+def channel_stream_changed(sender, instance, **kwargs):
+    invalidate_channels(Channel.objects.filter(id=instance.channel_id).values_list("uuid", flat=True))
+
+
+@receiver(m2m_changed, sender=Channel.streams.through)
+def channel_streams_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # Streams side of the relation, the affected channels are already detached
+        invalidate_all()
+    else:
+        invalidate_channels([instance.uuid])
+
+
+@receiver(post_save, sender=Stream)
+@receiver(pre_delete, sender=Stream)
+def stream_changed(sender, instance, **kwargs):
+    # Before delete, while the channel links still exist
+    invalidate_channels(Channel.objects.filter(streams=instance).values_list("uuid", flat=True))
+
+
+@receiver([post_save, post_delete], sender=M3UAccount)
+@receiver([post_save, post_delete], sender=M3UAccountProfile)
+@receiver([post_save, post_delete], sender=StreamProfile)
+@receiver([post_save, post_delete], sender=UserAgent)
+@receiver([post_save, post_delete], sender=CoreSettings)
+def defaults_changed(sender, **kwargs):
+    invalidate_all()
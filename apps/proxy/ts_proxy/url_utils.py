@@ -7,6 +7,7 @@ import re
 from typing import Optional, Tuple, List
 from django.shortcuts import get_object_or_404
 from apps.channels.models import Channel, Stream
+from apps.channels.stream_slots import first_available, stream_candidates
 from apps.m3u.models import M3UAccount, M3UAccountProfile
 from core.models import UserAgent, CoreSettings, StreamProfile
 from .utils import get_logger
@@ -193,48 +194,15 @@ def get_stream_info_for_switch(channel_id: str, target_stream_id: Optional[int]
             if not m3u_account:
                 return {'error': 'Stream has no M3U account'}
 
-            m3u_profiles = m3u_account.profiles.filter(is_active=True)
-            default_profile = next((obj for obj in m3u_profiles if obj.is_default), None)
-
-            if not default_profile:
+            candidates = stream_candidates([stream])
+            if not candidates:
                 return {'error': 'M3U account has no default profile'}
 
-            # Check profiles in order: default first, then others
-            profiles = [default_profile] + [obj for obj in m3u_profiles if not obj.is_default]
-
-            selected_profile = None
-            for profile in profiles:
-
-                # Check connection availability
-                if redis_client:
-                    profile_connections_key = f"profile_connections:{profile.id}"
-                    current_connections = int(redis_client.get(profile_connections_key) or 0)
-
-                    # Check if this channel is already using this profile
-                    channel_using_profile = False
-                    existing_stream_id = redis_client.get(f"channel_stream:{channel.id}")
-                    if existing_stream_id:
-                        # Decode bytes to string/int for proper Redis key lookup
-                        existing_stream_id = existing_stream_id.decode('utf-8')
-                        existing_profile_id = redis_client.get(f"stream_profile:{existing_stream_id}")
-                        if existing_profile_id and int(existing_profile_id.decode('utf-8')) == profile.id:
-                            channel_using_profile = True
-                            logger.debug(f"Channel {channel.id} already using profile {profile.id}")
-
-                    # Calculate effective connections (subtract 1 if channel already using this profile)
-                    effective_connections = current_connections - (1 if channel_using_profile else 0)
-
-                    # Check if profile has available slots
-                    if profile.max_streams == 0 or effective_connections < profile.max_streams:
-                        selected_profile = profile
-                        logger.debug(f"Selected profile {profile.id} with {effective_connections}/{profile.max_streams} effective connections (current: {current_connections}, already using: {channel_using_profile})")
-                        break
-                    else:
-                        logger.debug(f"Profile {profile.id} at max connections: {effective_connections}/{profile.max_streams} (current: {current_connections}, already using: {channel_using_profile})")
-                else:
-                    # No Redis available, assume first active profile is okay
-                    selected_profile = profile
-                    break
+            if redis_client:
+                selected_profile = first_available(redis_client, channel.id, candidates).get(stream.id)
+            else:
+                # No Redis available, assume first active profile is okay
+                selected_profile = candidates[0][1]
 
             if not selected_profile:
                 return {'error': 'No profiles available with connection capacity'}
@@ -304,88 +272,38 @@ def get_alternate_streams(channel_id: str, current_stream_id: Optional[int] = No
         logger.debug(f"Looking for alternate streams for channel {channel_id}, current stream ID: {current_stream_id}")
 
         # Get all assigned streams for this channel using the correct ordering
-        streams = channel.streams.all().order_by('channelstream__order')
-        logger.debug(f"Channel {channel_id} has {streams.count()} total assigned streams")
+        streams = list(
+            channel.streams.select_related('m3u_account').order_by('channelstream__order')
+        )
+        logger.debug(f"Channel {channel_id} has {len(streams)} total assigned streams")
 
-        if not streams.exists():
+        if not streams:
             logger.warning(f"No streams assigned to channel {channel_id}")
             return []
 
-        alternate_streams = []
-
-        # Process each stream in the user-defined order
-        for stream in streams:
-            logger.debug(f"Checking stream ID {stream.id} ({stream.name}) for channel {channel_id}")
-
-            # Skip the current failing stream
-            if current_stream_id and stream.id == current_stream_id:
-                logger.debug(f"Skipping current stream ID {current_stream_id}")
-                continue
-
-            # Find compatible profiles for this stream with connection checking
-            try:
-                m3u_account = stream.m3u_account
-                if not m3u_account:
-                    logger.debug(f"Stream {stream.id} has no M3U account")
-                    continue
-                if m3u_account.is_active == False:
-                    logger.debug(f"M3U account {m3u_account.id} is inactive, skipping.")
-                    continue
-                m3u_profiles = m3u_account.profiles.filter(is_active=True)
-                default_profile = next((obj for obj in m3u_profiles if obj.is_default), None)
-
-                if not default_profile:
-                    logger.debug(f"M3U account {m3u_account.id} has no default profile")
-                    continue
-
-                # Check profiles in order with connection availability
-                profiles = [default_profile] + [obj for obj in m3u_profiles if not obj.is_default]
-
-                selected_profile = None
-                for profile in profiles:
-                    # Check connection availability
-                    if redis_client:
-                        profile_connections_key = f"profile_connections:{profile.id}"
-                        current_connections = int(redis_client.get(profile_connections_key) or 0)
-
-                        # Check if this channel is already using this profile
-                        channel_using_profile = False
-                        existing_stream_id = redis_client.get(f"channel_stream:{channel.id}")
-                        if existing_stream_id:
-                            # Decode bytes to string/int for proper Redis key lookup
-                            existing_stream_id = existing_stream_id.decode('utf-8')
-                            existing_profile_id = redis_client.get(f"stream_profile:{existing_stream_id}")
-                            if existing_profile_id and int(existing_profile_id.decode('utf-8')) == profile.id:
-                                channel_using_profile = True
-                                logger.debug(f"Channel {channel.id} already using profile {profile.id}")
-
-                        # Calculate effective connections (subtract 1 if channel already using this profile)
-                        effective_connections = current_connections - (1 if channel_using_profile else 0)
-
-                        # Check if profile has available slots
-                        if profile.max_streams == 0 or effective_connections < profile.max_streams:
-                            selected_profile = profile
-                            logger.debug(f"Found available profile {profile.id} for stream {stream.id}: {effective_connections}/{profile.max_streams} effective (current: {current_connections}, already using: {channel_using_profile})")
-                            break
-                        else:
-                            logger.debug(f"Profile {profile.id} at max connections: {effective_connections}/{profile.max_streams} (current: {current_connections}, already using: {channel_using_profile})")
-                    else:
-                        # No Redis available, assume first active profile is okay
-                        selected_profile = profile
-                        break
-
-                if selected_profile:
-                    alternate_streams.append({
-                        'stream_id': stream.id,
-                        'profile_id': selected_profile.id,
-                        'name': stream.name
-                    })
-                else:
-                    logger.debug(f"No available profiles for stream ID {stream.id}")
-
-            except Exception as inner_e:
-                logger.error(f"Error finding profiles for stream {stream.id}: {inner_e}")
-                continue
+        # Skip the current failing stream
+        if current_stream_id:
+            streams = [stream for stream in streams if stream.id != current_stream_id]
+
+        # Profiles for all streams come from one query, capacity from one Redis round-trip
+        candidates = stream_candidates(streams)
+        if redis_client:
+            available = first_available(redis_client, channel.id, candidates)
+        else:
+            # No Redis available, assume first active profile is okay
+            available = {}
+            for stream, profile in candidates:
+                available.setdefault(stream.id, profile)
+
+        alternate_streams = [
+            {
+                'stream_id': stream.id,
+                'profile_id': available[stream.id].id,
+                'name': stream.name
+            }
+            for stream in streams
+            if stream.id in available
+        ]
 
         if alternate_streams:
             stream_ids = ', '.join([str(s['stream_id']) for s in alternate_streams])
@@ -1,5 +1,6 @@
 import logging
 import re
+import time
 from urllib.parse import urlparse
 import inspect
 
@@ -57,6 +58,26 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
+class StartupTimer:
+    """
+    Breakdown of a client's time to first byte. Each mark() records the time spent
+    since the previous mark under a phase name.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.last_mark = self.start
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.time()
+        self.phases.append((phase, now - self.last_mark))
+        self.last_mark = now
+
+    def summary(self):
+        phases = ", ".join(f"{phase}={duration * 1000:.0f}ms" for phase, duration in self.phases)
+        return f"{(self.last_mark - self.start) * 1000:.0f}ms ({phases})"
+
 def create_ts_packet(packet_type='null', message=None):
     """
     Create a Transport Stream (TS) packet for various purposes.
@@ -4,19 +4,17 @@ import time
 import random
 import re
 import pathlib
-from django.http import StreamingHttpResponse, JsonResponse, HttpResponseRedirect, HttpResponse
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponseRedirect, HttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
-from django.shortcuts import get_object_or_404
 from apps.proxy.config import TSConfig as Config
 from .server import ProxyServer
 from .channel_status import ChannelStatus
 from .stream_generator import create_stream_generator
-from .utils import get_client_ip
+from .utils import get_client_ip, StartupTimer
 from .redis_keys import RedisKeys
 import logging
 from apps.channels.models import Channel, Stream
 from apps.m3u.models import M3UAccount, M3UAccountProfile
-from apps.accounts.models import User
 from core.models import UserAgent, CoreSettings, PROXY_PROFILE_NAME
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -28,6 +26,8 @@ from apps.accounts.permissions import (
 from .constants import ChannelState, EventType, StreamType, ChannelMetadataField
 from .config_helper import ConfigHelper
 from .services.channel_service import ChannelService
+from .stream_resolution import resolve_stream_for_start
+from apps.output.access import can_view_channel, get_xc_user
 from core.utils import send_websocket_update
 from .url_utils import (
     generate_stream_url,
@@ -50,8 +50,7 @@ def stream_ts(request, channel_id):
         return JsonResponse({"error": "Forbidden"}, status=403)
 
     """Stream TS data to client with immediate response and keep-alive packets during initialization"""
-    channel = get_stream_object(channel_id)
-
+    startup_timer = StartupTimer()
     client_user_agent = None
     proxy_server = ProxyServer.get_instance()
 
@@ -135,6 +134,8 @@ def stream_ts(request, channel_id):
                                     f"[{client_id}] Channel {channel_id} owner {owner} is dead, will reinitialize"
                                 )
 
+        startup_timer.mark("state")
+
         # Start initialization if needed
         if needs_initialization or not proxy_server.check_if_channel_exists(channel_id):
             logger.info(f"[{client_id}] Starting channel {channel_id} initialization")
@@ -154,10 +155,7 @@ def stream_ts(request, channel_id):
             retry_interval = 0.1  # 100ms between attempts
             wait_start_time = time.time()
 
-            stream_url = None
-            stream_user_agent = None
-            transcode = False
-            profile_value = None
+            resolution = None
             error_reason = None
             attempt = 0
             should_retry = True
@@ -165,11 +163,9 @@ def stream_ts(request, channel_id):
             # Try to get a stream with fixed interval retries
             while should_retry and time.time() - wait_start_time < retry_timeout:
                 attempt += 1
-                stream_url, stream_user_agent, transcode, profile_value = (
-                    generate_stream_url(channel_id)
-                )
+                resolution, error_reason = resolve_stream_for_start(channel_id)
 
-                if stream_url is not None:
+                if resolution is not None:
                     logger.info(
                         f"[{client_id}] Successfully obtained stream for channel {channel_id} after {attempt} attempts"
                     )
@@ -177,7 +173,6 @@ def stream_ts(request, channel_id):
 
                 # On first failure, check if the error is retryable
                 if attempt == 1:
-                    _, _, error_reason = channel.get_stream()
                     if error_reason and "maximum connection limits" not in error_reason:
                         logger.warning(
                             f"[{client_id}] Can't retry - error not related to connection limits: {error_reason}"
@@ -205,20 +200,18 @@ def stream_ts(request, channel_id):
                 retry_interval += 0.025  # Increase wait time by 25ms for next attempt
 
             # Make one final attempt if we still don't have a stream, should retry, and haven't exceeded timeout
-            if stream_url is None and should_retry and time.time() - wait_start_time < retry_timeout:
+            if resolution is None and should_retry and time.time() - wait_start_time < retry_timeout:
                 attempt += 1
                 logger.info(
                     f"[{client_id}] Making final attempt {attempt} at timeout boundary"
                 )
-                stream_url, stream_user_agent, transcode, profile_value = (
-                    generate_stream_url(channel_id)
-                )
-                if stream_url is not None:
+                resolution, error_reason = resolve_stream_for_start(channel_id)
+                if resolution is not None:
                     logger.info(
                         f"[{client_id}] Successfully obtained stream on final attempt for channel {channel_id}"
                     )
 
-            if stream_url is None:
+            if resolution is None:
                 # Release the channel's stream lock if one was acquired
                 # Note: Only call this if get_stream() actually assigned a stream
                 # In our case, if stream_url is None, no stream was ever assigned, so don't release
@@ -237,15 +230,18 @@ def stream_ts(request, channel_id):
                     {"error": error_msg, "waited": wait_duration}, status=503
                 )  # 503 Service Unavailable is appropriate here
 
-            # Get the stream ID from the channel
-            stream_id, m3u_profile_id, _ = channel.get_stream()
+            stream_url = resolution.url
+            stream_user_agent = resolution.user_agent
+            transcode = resolution.transcode
+            profile_value = resolution.stream_profile_id
+            stream_id = resolution.stream_id
+            m3u_profile_id = resolution.m3u_profile_id
             logger.info(
                 f"Channel {channel_id} using stream ID {stream_id}, m3u account profile ID {m3u_profile_id}"
             )
+            startup_timer.mark("resolve")
 
-            # Generate transcode command if needed
-            stream_profile = channel.get_stream_profile()
-            if stream_profile.is_redirect():
+            if resolution.redirect:
                 # Validate the stream URL before redirecting
                 from .url_utils import (
                     validate_stream_url,
@@ -308,7 +304,7 @@ def stream_ts(request, channel_id):
                                 f"[{client_id}] Alternate stream #{alt['stream_id']} failed validation: {message}"
                             )
                 # Release stream lock before redirecting
-                channel.release_stream()
+                get_stream_object(channel_id).release_stream()
                 # Final decision based on validation results
                 if is_valid:
                     logger.info(
@@ -347,6 +343,7 @@ def stream_ts(request, channel_id):
                 return JsonResponse(
                     {"error": "Failed to initialize channel"}, status=500
                 )
+            startup_timer.mark("initialize")
 
             # If we're the owner, wait for connection to establish
             if proxy_server.am_i_owner(channel_id):
@@ -419,6 +416,7 @@ def stream_ts(request, channel_id):
                             0.1
                         )  # FIXED: Using gevent.sleep instead of time.sleep
 
+            startup_timer.mark("connect")
             logger.info(f"[{client_id}] Successfully initialized channel {channel_id}")
             channel_initializing = True
 
@@ -492,10 +490,11 @@ def stream_ts(request, channel_id):
         client_manager = proxy_server.client_managers[channel_id]
         client_manager.add_client(client_id, client_ip, client_user_agent)
         logger.info(f"[{client_id}] Client registered with channel {channel_id}")
+        startup_timer.mark("register")
 
         # Create a stream generator for this client
         generate = create_stream_generator(
-            channel_id, client_id, client_ip, client_user_agent, channel_initializing
+            channel_id, client_id, client_ip, client_user_agent, channel_initializing, startup_timer
         )
 
         # Return the StreamingHttpResponse from the main function
@@ -505,6 +504,9 @@ def stream_ts(request, channel_id):
         response["Cache-Control"] = "no-cache"
         return response
 
+    except Http404:
+        # Unknown channel, only discovered once it has to be started
+        raise
     except Exception as e:
         logger.error(f"Error in stream_ts: {e}", exc_info=True)
         return JsonResponse({"error": str(e)}, status=500)
@@ -512,48 +514,22 @@ def stream_ts(request, channel_id):
 
 @api_view(["GET"])
 def stream_xc(request, username, password, channel_id):
-    user = get_object_or_404(User, username=username)
+    user = get_xc_user(username, password)
 
     extension = pathlib.Path(channel_id).suffix
     channel_id = pathlib.Path(channel_id).stem
 
-    custom_properties = user.custom_properties or {}
-
-    if "xc_password" not in custom_properties:
-        return Response({"error": "Invalid credentials"}, status=401)
-
-    if custom_properties["xc_password"] != password:
+    if user is None:
         return Response({"error": "Invalid credentials"}, status=401)
 
-    print(f"Fetchin channel with ID: {channel_id}")
-    if user.user_level < 10:
-        user_profile_count = user.channel_profiles.count()
-
-        # If user has ALL profiles or NO profiles, give unrestricted access
-        if user_profile_count == 0:
-            # No profile filtering - user sees all channels based on user_level
-            filters = {
-                "id": int(channel_id),
-                "user_level__lte": user.user_level
-            }
-            channel = Channel.objects.filter(**filters).first()
-        else:
-            # User has specific limited profiles assigned
-            filters = {
-                "id": int(channel_id),
-                "channelprofilemembership__enabled": True,
-                "user_level__lte": user.user_level,
-                "channelprofilemembership__channel_profile__in": user.channel_profiles.all()
-            }
-            channel = Channel.objects.filter(**filters).distinct().first()
-
-        if not channel:
-            return JsonResponse({"error": "Not found"}, status=404)
-    else:
-        channel = get_object_or_404(Channel, id=channel_id)
+    channel_uuid = None
+    if can_view_channel(user, channel_id):
+        channel_uuid = Channel.objects.filter(id=int(channel_id)).values_list("uuid", flat=True).first()
+    if channel_uuid is None:
+        return JsonResponse({"error": "Not found"}, status=404)
 
     # @TODO: we've got the  file 'type' via extension, support this when we support multiple outputs
-    return stream_ts(request._request, str(channel.uuid))
+    return stream_ts(request._request, str(channel_uuid))
 
 
 @csrf_exempt
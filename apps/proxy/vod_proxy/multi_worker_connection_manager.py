@@ -20,6 +20,7 @@ from django.http import StreamingHttpResponse, HttpResponse
 from core.utils import RedisClient
 from apps.vod.models import Movie, Episode
 from apps.m3u.models import M3UAccountProfile
+from .range_cache import BLOCK_SIZE, CachedRangeResponse, RangeCacheEntry, parse_range
 
 logger = logging.getLogger("vod_proxy")
 
@@ -332,8 +333,18 @@ class RedisBackedVODConnection:
             if not self.local_session:
                 self.local_session = requests.Session()
 
-            # Prepare headers
-            headers = state.headers.copy()
+            # Bytes already read from the provider for this file are kept in the range cache
+            cache_entry = RangeCacheEntry.open(
+                state.content_uuid,
+                state.stream_url,
+                int(state.content_length) if state.content_length else None,
+                state.content_type,
+            )
+            if cache_entry and not state.content_length:
+                state.content_length = str(cache_entry.content_length)
+                if not state.content_type:
+                    state.content_type = cache_entry.content_type
+
             if range_header:
                 # Validate range against content length if available
                 if state.content_length:
@@ -343,24 +354,14 @@ class RedisBackedVODConnection:
                         return None
                     range_header = validated_range
 
-                headers['Range'] = range_header
-                logger.info(f"[{self.session_id}] Setting Range header: {range_header}")
-
-            # Use final URL if available, otherwise original URL
-            target_url = state.final_url if state.final_url else state.stream_url
-            allow_redirects = not state.final_url  # Only follow redirects if we don't have final URL
-
-            logger.info(f"[{self.session_id}] Making request #{state.request_count} to {'final' if state.final_url else 'original'} URL")
+            span = parse_range(range_header, cache_entry.content_length) if cache_entry else None
+            if span and cache_entry.has_block(span[0] // BLOCK_SIZE):
+                logger.info(f"[{self.session_id}] Serving bytes {span[0]}-{span[1]} from the VOD range cache")
+                self._save_connection_state(state)
+                self.local_response = CachedRangeResponse(cache_entry, *span, self._open_cached_range_upstream)
+                return self.local_response
 
-            # Make request
-            response = self.local_session.get(
-                target_url,
-                headers=headers,
-                stream=True,
-                timeout=(10, 30),
-                allow_redirects=allow_redirects
-            )
-            response.raise_for_status()
+            response = self._request_upstream(state, range_header)
 
             # Update state with response info on first request
             if state.request_count == 1:
@@ -414,6 +415,16 @@ class RedisBackedVODConnection:
             # Save updated state
             self._save_connection_state(state)
 
+            if not cache_entry and state.content_length:
+                cache_entry = RangeCacheEntry.open(
+                    state.content_uuid, state.stream_url, int(state.content_length), state.content_type
+                )
+                span = parse_range(range_header, cache_entry.content_length) if cache_entry else None
+            if span and self._response_starts_at(response, range_header, span[0]):
+                response = CachedRangeResponse(
+                    cache_entry, *span, self._open_cached_range_upstream, upstream=response
+                )
+
             self.local_response = response
             return response
 
@@ -422,6 +433,54 @@ class RedisBackedVODConnection:
             self.cleanup()
             raise
 
+    def _request_upstream(self, state, range_header: str = None):
+        """Open a streaming request to the provider for the whole file or a byte range"""
+        headers = state.headers.copy()
+        if range_header:
+            headers['Range'] = range_header
+            logger.info(f"[{self.session_id}] Setting Range header: {range_header}")
+
+        # Use final URL if available, otherwise original URL
+        target_url = state.final_url if state.final_url else state.stream_url
+        allow_redirects = not state.final_url  # Only follow redirects if we don't have final URL
+
+        logger.info(f"[{self.session_id}] Making request #{state.request_count} to {'final' if state.final_url else 'original'} URL")
+
+        response = self.local_session.get(
+            target_url,
+            headers=headers,
+            stream=True,
+            timeout=(10, 30),
+            allow_redirects=allow_redirects
+        )
+        response.raise_for_status()
+        return response
+
+    def _open_cached_range_upstream(self, start: int, end: int):
+        """Fetch the part of a range-cache read that isn't cached yet"""
+        state = self._get_connection_state()
+        if not state:
+            raise RuntimeError("No connection state found in Redis")
+
+        range_header = f"bytes={start}-{end}"
+        response = self._request_upstream(state, range_header)
+        if not self._response_starts_at(response, range_header, start):
+            response.close()
+            raise RuntimeError(f"Provider did not honor Range {range_header}")
+
+        if not state.final_url:
+            state.final_url = response.url
+            self._save_connection_state(state)
+        return response
+
+    @staticmethod
+    def _response_starts_at(response, range_header: str, start: int):
+        """Whether a provider response body starts at byte start of the file"""
+        if not range_header:
+            return response.status_code == 200
+        content_range = response.headers.get('content-range', '')
+        return response.status_code == 206 and content_range.startswith(f"bytes {start}-")
+
     def _validate_range_header(self, range_header: str, content_length: int):
         """Validate range header against content length"""
         try:
@@ -0,0 +1,307 @@
+"""
+On-disk, block-aligned cache of VOD byte ranges.
+
+Players seek constantly and keep re-reading the file head and the MP4 moov atom
+(often at the end of the file), and every such Range request used to open a new
+provider connection. Bytes read from the provider are now stored in fixed-size
+blocks under VOD_RANGE_CACHE_DIR, one directory per content UUID and provider URL.
+Requests start from the cached blocks and only go upstream from the first missing
+byte.
+
+Only the first BLOCKS_PER_REQUEST blocks of each upstream read are stored, so a
+full playback doesn't churn the whole cache. The head and trailer blocks are
+pinned: they are always stored and are only evicted once every unpinned block is
+gone. Block mtimes are bumped on use, and the least recently used blocks are
+evicted once the cache grows past VOD_RANGE_CACHE_MAX_MB.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger("vod_proxy")
+
+BLOCK_SIZE = 1024 * 1024
+# Blocks at the start and end of a file kept ahead of everything else (ftyp/moov, index)
+PINNED_HEAD_BLOCKS = 2
+PINNED_TAIL_BLOCKS = 2
+# Blocks stored from the start of each upstream read, beyond the pinned ones
+BLOCKS_PER_REQUEST = 8
+
+BLOCK_SUFFIX = ".blk"
+PINNED_SUFFIX = ".pin"
+
+_eviction_lock = threading.Lock()
+_bytes_since_eviction = 0
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def is_enabled():
+    return getattr(settings, "VOD_RANGE_CACHE", False)
+
+
+def max_cache_bytes():
+    return settings.VOD_RANGE_CACHE_MAX_MB * 1024 * 1024
+
+
+def parse_range(range_header, content_length):
+    """(start, end) of a validated "bytes=start-end" header, None for anything else"""
+    if not range_header:
+        return 0, content_length - 1
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start, _, end = range_header[len("bytes="):].partition("-")
+    try:
+        start = int(start) if start else 0
+        end = int(end) if end else content_length - 1
+    except ValueError:
+        return None
+    if start > end or end >= content_length:
+        return None
+    return start, end
+
+
+class RangeCacheEntry:
+    """Cached blocks of one provider file"""
+
+    def __init__(self, content_uuid, stream_url, content_length):
+        key = hashlib.blake2b(f"{content_uuid}\n{stream_url}".encode("utf-8"), digest_size=16).hexdigest()
+        self.path = os.path.join(settings.VOD_RANGE_CACHE_DIR, key[:2], key)
+        self.content_length = content_length
+        self.block_count = (content_length + BLOCK_SIZE - 1) // BLOCK_SIZE
+
+    @classmethod
+    def open(cls, content_uuid, stream_url, content_length=None, content_type=None):
+        """
+        Entry for a file, or None when the cache is disabled or the length isn't known.
+        A cached entry with a different length is dropped, the provider file changed.
+        """
+        if not is_enabled() or not content_uuid or not stream_url:
+            return None
+
+        probe = cls(content_uuid, stream_url, 0)
+        meta = probe.read_meta()
+        if content_length is None:
+            if meta is None:
+                return None
+            content_length = meta["content_length"]
+        elif meta is not None and meta["content_length"] != content_length:
+            logger.info(f"VOD range cache entry {probe.path} changed size, dropping it")
+            probe.clear()
+            meta = None
+        if content_length <= 0:
+            return None
+
+        entry = cls(content_uuid, stream_url, content_length)
+        if meta is None:
+            entry.write_meta(content_type)
+            entry.content_type = content_type
+        else:
+            entry.content_type = meta.get("content_type") or content_type
+        return entry
+
+    def read_meta(self):
+        try:
+            with open(os.path.join(self.path, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_meta(self, content_type):
+        try:
+            _write_atomic(
+                os.path.join(self.path, "meta.json"),
+                json.dumps({"content_length": self.content_length, "content_type": content_type}).encode("utf-8"),
+            )
+        except OSError as e:
+            logger.warning(f"Could not write VOD range cache metadata: {e}")
+
+    def clear(self):
+        try:
+            for name in os.listdir(self.path):
+                os.unlink(os.path.join(self.path, name))
+        except OSError:
+            pass
+
+    def is_pinned(self, index):
+        return index < PINNED_HEAD_BLOCKS or index >= self.block_count - PINNED_TAIL_BLOCKS
+
+    def block_length(self, index):
+        return min(BLOCK_SIZE, self.content_length - index * BLOCK_SIZE)
+
+    def block_path(self, index):
+        suffix = PINNED_SUFFIX if self.is_pinned(index) else BLOCK_SUFFIX
+        return os.path.join(self.path, f"{index}{suffix}")
+
+    def has_block(self, index):
+        return os.path.exists(self.block_path(index))
+
+    def read_block(self, index):
+        """Block contents, None when not cached"""
+        path = self.block_path(index)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Bump mtime so eviction sees this block as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        if len(data) != self.block_length(index):
+            return None
+        return data
+
+    def store_block(self, index, data):
+        global _bytes_since_eviction
+
+        if len(data) != self.block_length(index):
+            return
+        try:
+            _write_atomic(self.block_path(index), bytes(data))
+        except OSError as e:
+            logger.warning(f"Could not store VOD range cache block: {e}")
+            return
+
+        _bytes_since_eviction += len(data)
+        # Rescanning the cache on every write would be wasteful, check once enough new data arrived
+        if _bytes_since_eviction > max_cache_bytes() // 20:
+            evict()
+
+
+class CachedRangeResponse:
+    """
+    Stand-in for the upstream requests.Response of a byte range. iter_content()
+    yields the cached blocks first and opens the upstream at the first missing byte,
+    storing complete blocks as they stream past.
+    """
+
+    def __init__(self, entry, start, end, open_upstream, upstream=None):
+        self.entry = entry
+        self.start = start
+        self.end = end
+        self._open_upstream = open_upstream
+        self.upstream = upstream
+        self.bytes_from_cache = 0
+
+    @property
+    def headers(self):
+        return self.upstream.headers if self.upstream is not None else {}
+
+    def iter_content(self, chunk_size=8192):
+        position = self.start
+        if self.upstream is None:
+            while position <= self.end:
+                index = position // BLOCK_SIZE
+                data = self.entry.read_block(index)
+                if data is None:
+                    break
+                block_start = index * BLOCK_SIZE
+                piece = memoryview(data)[position - block_start : self.end - block_start + 1]
+                for offset in range(0, len(piece), chunk_size):
+                    yield bytes(piece[offset : offset + chunk_size])
+                position += len(piece)
+                self.bytes_from_cache += len(piece)
+
+            if position > self.end:
+                return
+            self.upstream = self._open_upstream(position, self.end)
+
+        yield from self._iter_upstream(position, chunk_size)
+
+    def _iter_upstream(self, position, chunk_size):
+        first_index = position // BLOCK_SIZE
+        buffer_index = None
+        buffer = bytearray()
+
+        for chunk in self.upstream.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            yield chunk
+
+            # Split the chunk at block boundaries and collect the blocks worth keeping
+            offset = 0
+            while offset < len(chunk):
+                index = position // BLOCK_SIZE
+                block_offset = position - index * BLOCK_SIZE
+                take = min(len(chunk) - offset, BLOCK_SIZE - block_offset)
+
+                if block_offset == 0 and buffer_index is None and (
+                    self.entry.is_pinned(index) or index - first_index < BLOCKS_PER_REQUEST
+                ) and not self.entry.has_block(index):
+                    buffer_index = index
+                if buffer_index == index:
+                    buffer += chunk[offset : offset + take]
+                    if len(buffer) == self.entry.block_length(index):
+                        self.entry.store_block(index, buffer)
+                        buffer_index = None
+                        buffer = bytearray()
+
+                offset += take
+                position += take
+
+    def close(self):
+        if self.upstream is not None:
+            self.upstream.close()
+
+
+def evict(max_bytes=None):
+    """
+    Delete least recently used blocks until the cache is under its byte budget.
+    Pinned blocks are only removed once no unpinned block is left.
+    """
+    global _bytes_since_eviction
+
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+
+    with _eviction_lock:
+        _bytes_since_eviction = 0
+        blocks = []
+        total = 0
+        for root, _, files in os.walk(settings.VOD_RANGE_CACHE_DIR):
+            for name in files:
+                if not name.endswith((BLOCK_SUFFIX, PINNED_SUFFIX)):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blocks.append((name.endswith(PINNED_SUFFIX), stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= max_bytes:
+            return 0
+
+        # Evict down to 90% so we don't rescan on the very next write
+        target = int(max_bytes * 0.9)
+        removed = 0
+        for _, _, size, path in sorted(blocks):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        logger.info(f"Evicted {removed} VOD range cache blocks, cache now {total / 1024 / 1024:.1f} MB")
+        return removed
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.proxy.vod_proxy import range_cache
+from apps.proxy.vod_proxy.range_cache import (
+    BLOCK_SIZE,
+    CachedRangeResponse,
+    RangeCacheEntry,
+    evict,
+    parse_range,
+)
+
+CONTENT_LENGTH = 6 * BLOCK_SIZE + 1234
+CONTENT = bytes(i % 251 for i in range(CONTENT_LENGTH))
+
+
+class FakeUpstream:
+    """Provider response body for bytes start-end of CONTENT"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.headers = {}
+
+    def iter_content(self, chunk_size=8192):
+        # An odd chunk size so chunks straddle block boundaries
+        for offset in range(self.start, self.end + 1, 7001):
+            yield CONTENT[offset : min(offset + 7001, self.end + 1)]
+
+    def close(self):
+        pass
+
+
+class RangeCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        overrides = override_settings(
+            VOD_RANGE_CACHE=True, VOD_RANGE_CACHE_DIR=cache_dir, VOD_RANGE_CACHE_MAX_MB=1024
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.opened = []
+
+    def open_upstream(self, start, end):
+        self.opened.append((start, end))
+        return FakeUpstream(start, end)
+
+    def entry(self, content_length=CONTENT_LENGTH):
+        return RangeCacheEntry.open("uuid", "http://provider/movie.mp4", content_length, "video/mp4")
+
+    def read(self, start, end, upstream=None):
+        response = CachedRangeResponse(self.entry(), start, end, self.open_upstream, upstream=upstream)
+        return response, b"".join(response.iter_content(chunk_size=8192))
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range(None, 1000), (0, 999))
+        self.assertEqual(parse_range("bytes=100-199", 1000), (100, 199))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertIsNone(parse_range("bytes=0-1000", 1000))
+        self.assertIsNone(parse_range("bytes=500-100", 1000))
+        self.assertIsNone(parse_range("bytes=0-1,5-9", 1000))
+        self.assertIsNone(parse_range("items=0-1", 1000))
+
+    def test_cached_prefix_resumes_upstream_at_block_boundary(self):
+        # The first read caches the leading blocks of the file
+        _, body = self.read(0, 3 * BLOCK_SIZE - 1, upstream=FakeUpstream(0, 3 * BLOCK_SIZE - 1))
+        self.assertEqual(body, CONTENT[: 3 * BLOCK_SIZE])
+
+        start, end = 100, 4 * BLOCK_SIZE + 50
+        response, body = self.read(start, end)
+        self.assertEqual(body, CONTENT[start : end + 1])
+        self.assertEqual(response.bytes_from_cache, 3 * BLOCK_SIZE - start)
+        self.assertEqual(self.opened, [(3 * BLOCK_SIZE, end)])
+
+        # Block 3 was stored by the resumed read, the range is now served locally
+        self.opened.clear()
+        _, body = self.read(start, end - 51)
+        self.assertEqual(body, CONTENT[start : end - 50])
+        self.assertEqual(self.opened, [])
+
+    def test_size_change_drops_entry(self):
+        self.read(0, BLOCK_SIZE - 1, upstream=FakeUpstream(0, BLOCK_SIZE - 1))
+        self.assertTrue(self.entry().has_block(0))
+
+        entry = self.entry(CONTENT_LENGTH + 1)
+        self.assertFalse(entry.has_block(0))
+        self.assertEqual(entry.read_meta()["content_length"], CONTENT_LENGTH + 1)
+
+    def test_evict_removes_unpinned_blocks_first(self):
+        self.read(0, CONTENT_LENGTH - 1, upstream=FakeUpstream(0, CONTENT_LENGTH - 1))
+        entry = self.entry()
+        cached = [index for index in range(entry.block_count) if entry.has_block(index)]
+        self.assertEqual(cached, list(range(entry.block_count)))
+
+        # Make the pinned head blocks the least recently used
+        for index in range(range_cache.PINNED_HEAD_BLOCKS):
+            os.utime(entry.block_path(index), (0, 0))
+
+        evict(max_bytes=4 * BLOCK_SIZE)
+
+        remaining = [index for index in range(entry.block_count) if entry.has_block(index)]
+        self.assertEqual(remaining, [index for index in cached if entry.is_pinned(index)])
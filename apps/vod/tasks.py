@@ -1,9 +1,12 @@
 from celery import shared_task, current_app, group
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction, IntegrityError
 from django.db.models import Q
 from apps.m3u.models import M3UAccount
 from core.xtream_codes import Client as XtreamCodesClient
+from apps.output.cache import invalidate_output_cache, VOD
 from .models import (
     VODCategory, Series, Movie, Episode, VODLogo,
     M3USeriesRelation, M3UMovieRelation, M3UEpisodeRelation, M3UVODCategoryRelation
@@ -65,6 +68,7 @@ def refresh_vod_content(account_id):
         logger.info(f"Starting cleanup of orphaned VOD content for account {account.name}")
         cleanup_result = cleanup_orphaned_vod_content(account_id=account_id, scan_start_time=start_time)
         logger.info(f"VOD cleanup completed: {cleanup_result}")
+        invalidate_output_cache((VOD,))
 
         # Send completion notification
         send_m3u_update(account_id, "vod_refresh", 100, status="success",
@@ -74,6 +78,8 @@ def refresh_vod_content(account_id):
 
     except Exception as e:
         logger.error(f"Error refreshing VOD for account {account_id}: {str(e)}")
+        # Part of the library may already have been updated
+        invalidate_output_cache((VOD,))
 
         # Send error notification
         send_m3u_update(account_id, "vod_refresh", 100, status="error",
@@ -1082,72 +1088,89 @@ def parse_date(date_string):
 
 # Episode processing and other advanced features
 
-def refresh_series_episodes(account, series, external_series_id, episodes_data=None):
-    """Refresh episodes for a series - only called on-demand"""
+def refresh_series_episodes(account, series, external_series_id, episodes_data=None, client=None, series_relation=None):
+    """
+    Refresh episodes for a series - called on-demand and by batch_refresh_series_episodes.
+    Pass an authenticated client to reuse its connections instead of opening a new one.
+    """
     try:
         if not episodes_data:
             # Fetch detailed series info including episodes
-            with XtreamCodesClient(
-                account.server_url,
-                account.username,
-                account.password,
-                account.get_user_agent().user_agent
-            ) as client:
+            if client is None:
+                with XtreamCodesClient(
+                    account.server_url,
+                    account.username,
+                    account.password,
+                    account.get_user_agent().user_agent
+                ) as client:
+                    series_info = client.get_series_info(external_series_id)
+            else:
                 series_info = client.get_series_info(external_series_id)
-                if series_info:
-                    # Update series with detailed info
-                    info = series_info.get('info', {})
-                    if info:
-                        # Only update fields if new value is non-empty and either no existing value or existing value is empty
-                        updated = False
-                        if should_update_field(series.description, info.get('plot')):
-                            series.description = extract_string_from_array_or_string(info.get('plot'))
-                            updated = True
-                        normalized_rating = normalize_rating(info.get('rating'))
-                        if normalized_rating and (not series.rating or not str(series.rating).strip()):
-                            series.rating = normalized_rating
-                            updated = True
-                        if should_update_field(series.genre, info.get('genre')):
-                            series.genre = extract_string_from_array_or_string(info.get('genre'))
-                            updated = True
+            episodes_data = apply_series_info(series, series_info)
 
-                        year = extract_year_from_data(info)
-                        if year and not series.year:
-                            series.year = year
-                            updated = True
+        store_series_episodes(account, series, episodes_data, series_relation)
 
-                        if updated:
-                            series.save()
+    except Exception as e:
+        logger.error(f"Error refreshing episodes for series {series.name}: {str(e)}")
 
-                    episodes_data = series_info.get('episodes', {})
-                else:
-                    episodes_data = {}
 
-        # Clear existing episodes for this account to handle deletions
-        Episode.objects.filter(
-            series=series,
-            m3u_relations__m3u_account=account
-        ).delete()
+def apply_series_info(series, series_info):
+    """Fill empty series fields from a get_series_info response, returns its episodes"""
+    if not series_info:
+        return {}
+
+    # Update series with detailed info
+    info = series_info.get('info', {})
+    if info:
+        # Only update fields if new value is non-empty and either no existing value or existing value is empty
+        updated = False
+        if should_update_field(series.description, info.get('plot')):
+            series.description = extract_string_from_array_or_string(info.get('plot'))
+            updated = True
+        normalized_rating = normalize_rating(info.get('rating'))
+        if normalized_rating and (not series.rating or not str(series.rating).strip()):
+            series.rating = normalized_rating
+            updated = True
+        if should_update_field(series.genre, info.get('genre')):
+            series.genre = extract_string_from_array_or_string(info.get('genre'))
+            updated = True
+
+        year = extract_year_from_data(info)
+        if year and not series.year:
+            series.year = year
+            updated = True
+
+        if updated:
+            series.save()
+
+    return series_info.get('episodes', {})
+
 
-        # Process all episodes in batch
-        batch_process_episodes(account, series, episodes_data)
+def store_series_episodes(account, series, episodes_data, series_relation=None):
+    """Replace the account's episodes of a series and mark its relation as fetched"""
+    # Clear existing episodes for this account to handle deletions
+    Episode.objects.filter(
+        series=series,
+        m3u_relations__m3u_account=account
+    ).delete()
 
-        # Update the series relation to mark episodes as fetched
+    # Process all episodes in batch
+    batch_process_episodes(account, series, episodes_data)
+
+    # Update the series relation to mark episodes as fetched
+    if series_relation is None:
         series_relation = M3USeriesRelation.objects.filter(
             series=series,
             m3u_account=account
         ).first()
 
-        if series_relation:
-            custom_props = series_relation.custom_properties or {}
-            custom_props['episodes_fetched'] = True
-            custom_props['detailed_fetched'] = True
-            series_relation.custom_properties = custom_props
-            series_relation.last_episode_refresh = timezone.now()
-            series_relation.save()
-
-    except Exception as e:
-        logger.error(f"Error refreshing episodes for series {series.name}: {str(e)}")
+    if series_relation:
+        custom_props = series_relation.custom_properties or {}
+        custom_props['episodes_fetched'] = True
+        custom_props['detailed_fetched'] = True
+        series_relation.custom_properties = custom_props
+        series_relation.last_episode_refresh = timezone.now()
+        series_relation.save()
 
 
 def batch_process_episodes(account, series, episodes_data, scan_start_time=None):
@@ -1339,6 +1362,9 @@ def batch_refresh_series_episodes(account_id, series_ids=None):
     Batch refresh episodes for multiple series.
     If series_ids is None, refresh all series that haven't been refreshed recently.
     """
+    # Import here to avoid circular import
+    from apps.m3u.tasks import send_m3u_update
+
     try:
         account = M3UAccount.objects.get(id=account_id, is_active=True)
 
@@ -1360,35 +1386,101 @@ def batch_refresh_series_episodes(account_id, series_ids=None):
                 last_episode_refresh__lt=cutoff_time
             ).select_related('series')
 
-        logger.info(f"Batch refreshing episodes for {series_relations.count()} series")
+        # Loaded up front, episode writes commit while the relations are being consumed
+        series_relations = list(series_relations)
+        total = len(series_relations)
+        workers = episode_refresh_workers(account)
+        logger.info(f"Batch refreshing episodes for {total} series with {workers} concurrent requests")
+        send_m3u_update(account_id, "vod_episodes", 0, status="processing")
 
+        # One client for the whole batch, its connection pool is sized for the workers
         with XtreamCodesClient(
             account.server_url,
             account.username,
             account.password,
-            account.get_user_agent().user_agent
+            account.get_user_agent().user_agent,
+            pool_size=workers,
         ) as client:
+            # Authenticate once up front rather than racing from every worker
+            client.authenticate()
 
             refreshed_count = 0
-            for relation in series_relations:
-                try:
-                    refresh_series_episodes(
-                        account,
-                        relation.series,
-                        relation.external_series_id
+            processed = 0
+            last_progress = 0
+            # Only the provider requests run in the workers. Responses are stored from
+            # this thread, so all database writes stay on the task's connection.
+            for relation, series_info, error in fetch_series_info_concurrently(
+                client, series_relations, workers
+            ):
+                processed += 1
+                if error is not None:
+                    logger.error(f"Error refreshing episodes for series {relation.series.name}: {str(error)}")
+                else:
+                    try:
+                        episodes_data = apply_series_info(relation.series, series_info)
+                        store_series_episodes(account, relation.series, episodes_data, relation)
+                        refreshed_count += 1
+                    except Exception as e:
+                        logger.error(f"Error refreshing episodes for series {relation.series.name}: {str(e)}")
+
+                progress = int(processed / total * 100) if total else 100
+                if progress > last_progress:
+                    last_progress = progress
+                    send_m3u_update(
+                        account_id, "vod_episodes", progress, status="processing",
+                        message=f"Refreshed episodes for {processed} of {total} series",
                     )
-                    refreshed_count += 1
-                except Exception as e:
-                    logger.error(f"Error refreshing episodes for series {relation.series.name}: {str(e)}")
 
         logger.info(f"Batch episode refresh completed for {refreshed_count} series")
+        invalidate_output_cache((VOD,))
+        send_m3u_update(account_id, "vod_episodes", 100, status="success",
+                        message=f"Refreshed episodes for {refreshed_count} series")
         return f"Batch episode refresh completed for {refreshed_count} series"
 
     except Exception as e:
         logger.error(f"Error in batch episode refresh for account {account_id}: {str(e)}")
+        send_m3u_update(account_id, "vod_episodes", 100, status="error",
+                        message=f"Episode refresh failed: {str(e)}")
         return f"Batch episode refresh failed: {str(e)}"
 
 
+def episode_refresh_workers(account):
+    """Concurrent provider requests for an account, never more than its connection limit"""
+    workers = max(1, getattr(settings, "XC_EPISODE_REFRESH_WORKERS", 4))
+    if account.max_streams:
+        workers = min(workers, account.max_streams)
+    return workers
+
+
+def fetch_series_info_concurrently(client, series_relations, workers):
+    """
+    Yield (relation, series_info, error) for each relation, fetching get_series_info
+    with up to `workers` requests in flight. At most 2 x workers responses are held
+    at once, so memory stays bounded on large accounts.
+    """
+    relations = iter(series_relations)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def submit_next():
+            relation = next(relations, None)
+            if relation is not None:
+                pending[executor.submit(client.get_series_info, relation.external_series_id)] = relation
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                relation = pending.pop(future)
+                try:
+                    yield relation, future.result(), None
+                except Exception as e:
+                    yield relation, None, e
+                submit_next()
+
+
 @shared_task
 def cleanup_orphaned_vod_content(stale_days=0, scan_start_time=None, account_id=None):
     """Clean up VOD content that has no M3U relations or has stale relations"""
@@ -1448,6 +1540,7 @@ def cleanup_orphaned_vod_content(stale_days=0, scan_start_time=None, account_id=
               f"{orphaned_series_count} orphaned series")
 
     logger.info(result)
+    invalidate_output_cache((VOD,))
     return result
 
 
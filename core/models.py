@@ -1,9 +1,13 @@
 # core/models.py
+import json
+
 from django.conf import settings
 from django.db import models
 from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 
+from .settings_cache import settings_cache
+
 
 class UserAgent(models.Model):
     name = models.CharField(
@@ -180,43 +184,47 @@ class CoreSettings(models.Model):
     def __str__(self):
         return "Core Settings"
 
+    @classmethod
+    def _cached_value(cls, key):
+        """Setting value from the process-local cache, DoesNotExist if the row is missing"""
+        try:
+            return settings_cache.get(key)
+        except KeyError:
+            raise cls.DoesNotExist(f"CoreSettings matching key {key!r} does not exist.")
+
     @classmethod
     def get_default_user_agent_id(cls):
         """Retrieve a system profile by name (or return None if not found)."""
-        return cls.objects.get(key=DEFAULT_USER_AGENT_KEY).value
+        return cls._cached_value(DEFAULT_USER_AGENT_KEY)
 
     @classmethod
     def get_default_stream_profile_id(cls):
-        return cls.objects.get(key=DEFAULT_STREAM_PROFILE_KEY).value
+        return cls._cached_value(DEFAULT_STREAM_PROFILE_KEY)
 
     @classmethod
     def get_m3u_hash_key(cls):
-        return cls.objects.get(key=STREAM_HASH_KEY).value
+        return cls._cached_value(STREAM_HASH_KEY)
 
     @classmethod
     def get_preferred_region(cls):
         """Retrieve the preferred region setting (or return None if not found)."""
-        try:
-            return cls.objects.get(key=PREFERRED_REGION_KEY).value
-        except cls.DoesNotExist:
-            return None
+        return settings_cache.get(PREFERRED_REGION_KEY, None)
 
     @classmethod
     def get_auto_import_mapped_files(cls):
         """Retrieve the preferred region setting (or return None if not found)."""
-        try:
-            return cls.objects.get(key=AUTO_IMPORT_MAPPED_FILES).value
-        except cls.DoesNotExist:
-            return None
+        return settings_cache.get(AUTO_IMPORT_MAPPED_FILES, None)
+
+    @classmethod
+    def get_network_access(cls):
+        """Network access CIDRs per area as a dict"""
+        return json.loads(cls._cached_value(NETWORK_ACCESS))
 
     @classmethod
     def get_proxy_settings(cls):
         """Retrieve proxy settings as dict (or return defaults if not found)."""
-        try:
-            import json
-            settings_json = cls.objects.get(key=PROXY_SETTINGS_KEY).value
-            return json.loads(settings_json)
-        except (cls.DoesNotExist, json.JSONDecodeError):
+        proxy_settings = settings_cache.get_json(PROXY_SETTINGS_KEY)
+        if proxy_settings is None:
             # Return defaults if not found or invalid JSON
             return {
                 "buffering_timeout": 15,
@@ -225,65 +233,44 @@ class CoreSettings(models.Model):
                 "channel_shutdown_delay": 0,
                 "channel_init_grace_period": 5,
             }
+        return proxy_settings
 
     @classmethod
     def get_dvr_tv_template(cls):
-        try:
-            return cls.objects.get(key=DVR_TV_TEMPLATE_KEY).value
-        except cls.DoesNotExist:
-            # Default: relative to recordings root (/data/recordings)
-            return "TV_Shows/{show}/S{season:02d}E{episode:02d}.mkv"
+        # Default: relative to recordings root (/data/recordings)
+        return settings_cache.get(DVR_TV_TEMPLATE_KEY, "TV_Shows/{show}/S{season:02d}E{episode:02d}.mkv")
 
     @classmethod
     def get_dvr_movie_template(cls):
-        try:
-            return cls.objects.get(key=DVR_MOVIE_TEMPLATE_KEY).value
-        except cls.DoesNotExist:
-            return "Movies/{title} ({year}).mkv"
+        return settings_cache.get(DVR_MOVIE_TEMPLATE_KEY, "Movies/{title} ({year}).mkv")
 
     @classmethod
     def get_dvr_tv_fallback_dir(cls):
         """Folder name to use when a TV episode has no season/episode information.
         Defaults to 'TV_Show' to match existing behavior but can be overridden in settings.
         """
-        try:
-            return cls.objects.get(key=DVR_TV_FALLBACK_DIR_KEY).value or "TV_Shows"
-        except cls.DoesNotExist:
-            return "TV_Shows"
+        return settings_cache.get(DVR_TV_FALLBACK_DIR_KEY, None) or "TV_Shows"
 
     @classmethod
     def get_dvr_tv_fallback_template(cls):
         """Full path template used when season/episode are missing for a TV airing."""
-        try:
-            return cls.objects.get(key=DVR_TV_FALLBACK_TEMPLATE_KEY).value
-        except cls.DoesNotExist:
-            # default requested by user
-            return "TV_Shows/{show}/{start}.mkv"
+        # default requested by user
+        return settings_cache.get(DVR_TV_FALLBACK_TEMPLATE_KEY, "TV_Shows/{show}/{start}.mkv")
 
     @classmethod
     def get_dvr_movie_fallback_template(cls):
         """Full path template used when movie metadata is incomplete."""
-        try:
-            return cls.objects.get(key=DVR_MOVIE_FALLBACK_TEMPLATE_KEY).value
-        except cls.DoesNotExist:
-            return "Movies/{start}.mkv"
+        return settings_cache.get(DVR_MOVIE_FALLBACK_TEMPLATE_KEY, "Movies/{start}.mkv")
 
     @classmethod
     def get_dvr_comskip_enabled(cls):
         """Return boolean-like string value ('true'/'false') for comskip enablement."""
-        try:
-            val = cls.objects.get(key=DVR_COMSKIP_ENABLED_KEY).value
-            return str(val).lower() in ("1", "true", "yes", "on")
-        except cls.DoesNotExist:
-            return False
+        return settings_cache.get_bool(DVR_COMSKIP_ENABLED_KEY, False)
 
     @classmethod
     def get_dvr_comskip_custom_path(cls):
         """Return configured comskip.ini path or empty string if unset."""
-        try:
-            return cls.objects.get(key=DVR_COMSKIP_CUSTOM_PATH_KEY).value
-        except cls.DoesNotExist:
-            return ""
+        return settings_cache.get_str(DVR_COMSKIP_CUSTOM_PATH_KEY, "")
 
     @classmethod
     def set_dvr_comskip_custom_path(cls, path: str | None):
@@ -301,40 +288,19 @@ class CoreSettings(models.Model):
     @classmethod
     def get_dvr_pre_offset_minutes(cls):
         """Minutes to start recording before scheduled start (default 0)."""
-        try:
-            val = cls.objects.get(key=DVR_PRE_OFFSET_MINUTES_KEY).value
-            return int(val)
-        except cls.DoesNotExist:
-            return 0
-        except Exception:
-            try:
-                return int(float(val))
-            except Exception:
-                return 0
+        return settings_cache.get_int(DVR_PRE_OFFSET_MINUTES_KEY, 0)
 
     @classmethod
     def get_dvr_post_offset_minutes(cls):
         """Minutes to stop recording after scheduled end (default 0)."""
-        try:
-            val = cls.objects.get(key=DVR_POST_OFFSET_MINUTES_KEY).value
-            return int(val)
-        except cls.DoesNotExist:
-            return 0
-        except Exception:
-            try:
-                return int(float(val))
-            except Exception:
-                return 0
+        return settings_cache.get_int(DVR_POST_OFFSET_MINUTES_KEY, 0)
 
     @classmethod
     def get_system_time_zone(cls):
         """Return configured system time zone or fall back to Django settings."""
-        try:
-            value = cls.objects.get(key=SYSTEM_TIME_ZONE_KEY).value
-            if value:
-                return value
-        except cls.DoesNotExist:
-            pass
+        value = settings_cache.get(SYSTEM_TIME_ZONE_KEY, None)
+        if value:
+            return value
         return getattr(settings, "TIME_ZONE", "UTC") or "UTC"
 
     @classmethod
@@ -353,9 +319,8 @@ class CoreSettings(models.Model):
     @classmethod
     def get_dvr_series_rules(cls):
         """Return list of series recording rules. Each: {tvg_id, title, mode: 'all'|'new'}"""
-        import json
         try:
-            raw = cls.objects.get(key=DVR_SERIES_RULES_KEY).value
+            raw = cls._cached_value(DVR_SERIES_RULES_KEY)
             rules = json.loads(raw) if raw else []
             if isinstance(rules, list):
                 return rules
@@ -367,7 +332,6 @@ class CoreSettings(models.Model):
 
     @classmethod
     def set_dvr_series_rules(cls, rules):
-        import json
         try:
             obj, _ = cls.objects.get_or_create(key=DVR_SERIES_RULES_KEY, defaults={"name": "DVR Series Rules", "value": "[]"})
             obj.value = json.dumps(rules)
@@ -0,0 +1,119 @@
+"""
+Process-local cache of CoreSettings rows.
+
+CoreSettings getters are read on hot paths (every stream request checks network
+access, stream starts look up the default user agent and stream profile), and
+each read used to be its own query. The cache loads every row with one query and
+keeps them in the process. Saving or deleting a row bumps a version key in Redis.
+A process compares its loaded version against Redis at most once every
+VERSION_CHECK_INTERVAL seconds and reloads when another worker changed a setting.
+"""
+
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "core_settings:version"
+# Seconds between version checks, the longest another worker can serve a stale value
+VERSION_CHECK_INTERVAL = 2.0
+
+_MISSING = object()
+
+
+class SettingsCache:
+    def __init__(self):
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _remote_version(self):
+        from core.utils import RedisClient
+
+        try:
+            redis_client = RedisClient.get_client()
+            return redis_client.get(VERSION_KEY) if redis_client else None
+        except Exception as e:
+            logger.debug(f"Could not read settings version from Redis: {e}")
+            # Without Redis, reload on every check interval
+            return object()
+
+    def _load(self):
+        from core.models import CoreSettings
+
+        return dict(CoreSettings.objects.values_list("key", "value"))
+
+    def values(self):
+        """All settings as {key: value}, reloaded when stale"""
+        now = time.monotonic()
+        if self._values is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return self._values
+
+        with self._lock:
+            if self._values is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+                return self._values
+
+            version = self._remote_version()
+            if self._values is None or version != self._version:
+                self._values = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._values
+
+    def invalidate(self):
+        """Drop this process's copy and tell the other workers to reload"""
+        from core.utils import RedisClient
+
+        with self._lock:
+            self._values = None
+        try:
+            redis_client = RedisClient.get_client()
+            if redis_client:
+                redis_client.incr(VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Could not publish settings change: {e}")
+
+    def get(self, key, default=_MISSING):
+        """Raw string value, KeyError if missing and no default is given"""
+        value = self.values().get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return value
+
+    def get_str(self, key, default=""):
+        return self.get(key, default)
+
+    def get_int(self, key, default=0):
+        value = self.get(key, None)
+        if value is None:
+            return default
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            try:
+                return int(float(value))
+            except (TypeError, ValueError):
+                return default
+
+    def get_bool(self, key, default=False):
+        value = self.get(key, None)
+        if value is None:
+            return default
+        return str(value).lower() in ("1", "true", "yes", "on")
+
+    def get_json(self, key, default=None):
+        value = self.get(key, None)
+        if value is None:
+            return default
+        try:
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return default
+
+
+settings_cache = SettingsCache()
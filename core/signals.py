@@ -1,9 +1,17 @@
-from django.db.models.signals import pre_delete
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
-from .models import StreamProfile
+from .models import CoreSettings, StreamProfile
+from .settings_cache import settings_cache
 
 @receiver(pre_delete, sender=StreamProfile)
 def prevent_deletion_if_locked(sender, instance, **kwargs):
     if instance.locked:
         raise ValidationError("This profile is locked and cannot be deleted.")
+
+
+@receiver([post_save, post_delete], sender=CoreSettings)
+def invalidate_settings_cache(sender, **kwargs):
+    # After commit, so other workers don't reload the old value
+    transaction.on_commit(settings_cache.invalidate)
@@ -439,6 +439,7 @@ def rehash_streams(keys):
     This task checks for and blocks M3U refresh tasks to prevent conflicts.
     """
     from apps.channels.models import Stream
+    from apps.channels.stream_hash import StreamHasher
     from apps.m3u.models import M3UAccount
 
     logger.info("Starting stream rehash process")
@@ -481,6 +482,7 @@ def rehash_streams(keys):
     try:
         batch_size = 1000
         queryset = Stream.objects.all()
+        hasher = StreamHasher.for_keys(keys)
 
         # Track statistics
         total_processed = 0
@@ -513,7 +515,13 @@ def rehash_streams(keys):
 
                 for obj in batch:
                     # Generate new hash
-                    new_hash = Stream.generate_hash_key(obj.name, obj.url, obj.tvg_id, keys, m3u_id=obj.m3u_account_id)
+                    new_hash = hasher.hash(obj.name, obj.url, obj.tvg_id, m3u_id=obj.m3u_account_id)
+
+                    # Unchanged hashes are unique already (DB constraint), nothing to merge or save
+                    if obj.stream_hash == new_hash and new_hash not in hash_keys:
+                        hash_keys[new_hash] = obj.id
+                        batch_processed += 1
+                        continue
 
                     # Check if this hash already exists in our tracking dict or in database
                     if new_hash in hash_keys:
@@ -1,3 +1,35 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from core.settings_cache import SettingsCache
+
+
+class SettingsCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SettingsCache()
+        self.rows = {"proxy-settings": '{"buffering_timeout": 20}', "dvr-pre-offset-minutes": "2.0"}
+        self.version = b"1"
+        load = mock.patch.object(SettingsCache, "_load", side_effect=lambda: dict(self.rows))
+        remote = mock.patch.object(SettingsCache, "_remote_version", side_effect=lambda: self.version)
+        self.load = load.start()
+        remote.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_rows_load_once_until_version_changes(self):
+        self.assertEqual(self.cache.get_json("proxy-settings"), {"buffering_timeout": 20})
+        self.assertEqual(self.cache.get_int("dvr-pre-offset-minutes"), 2)
+        self.assertEqual(self.load.call_count, 1)
+
+        self.rows["proxy-settings"] = '{"buffering_timeout": 30}'
+        self.version = b"2"
+        self.cache._checked_at = 0
+        self.assertEqual(self.cache.get_json("proxy-settings"), {"buffering_timeout": 30})
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_typed_defaults(self):
+        self.assertEqual(self.cache.get_str("missing", "x"), "x")
+        self.assertFalse(self.cache.get_bool("missing"))
+        self.assertIsNone(self.cache.get_json("missing"))
+        with self.assertRaises(KeyError):
+            self.cache.get("missing")
@@ -11,6 +11,7 @@ from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
+from django.urls import reverse
 import gc
 
 logger = logging.getLogger(__name__)
@@ -388,3 +389,91 @@ def validate_flexible_url(value):
 
         # If it doesn't match our flexible patterns, raise the original error
         raise ValidationError("Enter a valid URL.")
+
+
+def get_host_and_port(request):
+    """
+    Returns (host, port) for building absolute URIs.
+    - Prefers X-Forwarded-Host/X-Forwarded-Port (nginx).
+    - Falls back to Host header.
+    - Returns None for port if using standard ports (80/443) to omit from URLs.
+    - In dev, uses 5656 as a guess if port cannot be determined.
+    """
+    # Determine the scheme first - needed for standard port detection
+    scheme = request.META.get("HTTP_X_FORWARDED_PROTO", request.scheme)
+    standard_port = "443" if scheme == "https" else "80"
+
+    # 1. Try X-Forwarded-Host (may include port) - set by our nginx
+    xfh = request.META.get("HTTP_X_FORWARDED_HOST")
+    if xfh:
+        if ":" in xfh:
+            host, port = xfh.split(":", 1)
+            # Omit standard ports from URLs, or omit if port doesn't match standard for scheme
+            # (e.g., HTTPS but port is 9191 = behind external reverse proxy)
+            if port == standard_port:
+                return host, None
+            # If port doesn't match standard and X-Forwarded-Proto is set, likely behind external RP
+            if request.META.get("HTTP_X_FORWARDED_PROTO"):
+                host = xfh.split(":")[0]  # Strip port, will check for proper port below
+            else:
+                return host, port
+        else:
+            host = xfh
+
+        # Check for X-Forwarded-Port header (if we didn't already find a valid port)
+        port = request.META.get("HTTP_X_FORWARDED_PORT")
+        if port:
+            # Omit standard ports from URLs
+            return host, None if port == standard_port else port
+        # If X-Forwarded-Proto is set but no valid port, assume standard
+        if request.META.get("HTTP_X_FORWARDED_PROTO"):
+            return host, None
+
+    # 2. Try Host header
+    raw_host = request.get_host()
+    if ":" in raw_host:
+        host, port = raw_host.split(":", 1)
+        # Omit standard ports from URLs
+        return host, None if port == standard_port else port
+    else:
+        host = raw_host
+
+    # 3. Check if we're behind a reverse proxy (X-Forwarded-Proto or X-Forwarded-For present)
+    # If so, assume standard port for the scheme (don't trust SERVER_PORT in this case)
+    if request.META.get("HTTP_X_FORWARDED_PROTO") or request.META.get("HTTP_X_FORWARDED_FOR"):
+        return host, None
+
+    # 4. Try SERVER_PORT from META (only if NOT behind reverse proxy)
+    port = request.META.get("SERVER_PORT")
+    if port:
+        # Omit standard ports from URLs
+        return host, None if port == standard_port else port
+
+    # 5. Dev fallback: guess port 5656
+    if os.environ.get("DISPATCHARR_ENV") == "dev" or host in ("localhost", "127.0.0.1"):
+        return host, "5656"
+
+    # 6. Final fallback: assume standard port for scheme (omit from URL)
+    return host, None
+
+
+def build_absolute_uri_with_port(request, path):
+    """
+    Build an absolute URI with optional port.
+    Port is omitted from URL if None (standard port for scheme).
+    """
+    host, port = get_host_and_port(request)
+    scheme = request.META.get("HTTP_X_FORWARDED_PROTO", request.scheme)
+
+    if port:
+        return f"{scheme}://{host}:{port}{path}"
+    else:
+        return f"{scheme}://{host}{path}"
+
+
+def url_builder(absolute_base, viewname):
+    """Return id -> absolute URL for a view taking a single id, reversing it only once"""
+    marker = 2147483647
+    prefix, suffix = reverse(viewname, args=[marker]).split(str(marker), 1)
+    prefix = absolute_base + prefix
+    return lambda object_id: f"{prefix}{object_id}{suffix}"
@@ -8,7 +8,7 @@ logger = logging.getLogger(__name__)
 class Client:
     """Xtream Codes API Client with robust error handling"""
 
-    def __init__(self, server_url, username, password, user_agent=None):
+    def __init__(self, server_url, username, password, user_agent=None, pool_size=2):
         self.server_url = self._normalize_url(server_url)
         self.username = username
         self.password = password
@@ -30,10 +30,11 @@ class Client:
         self.session = requests.Session()
         self.session.headers.update({'User-Agent': user_agent_string})
 
-        # Configure connection pooling
+        # Configure connection pooling. Callers sharing one client between threads pass
+        # their thread count as pool_size so every thread reuses a kept-alive connection.
         adapter = requests.adapters.HTTPAdapter(
             pool_connections=1,
-            pool_maxsize=2,
+            pool_maxsize=max(2, pool_size),
             max_retries=3,
             pool_block=False
         )
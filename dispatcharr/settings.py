@@ -51,10 +51,34 @@ EPG_BATCH_SIZE = 1000  # Number of records to process in a batch
 EPG_MEMORY_LIMIT = 512  # Memory limit in MB before forcing garbage collection
 EPG_ENABLE_MEMORY_MONITORING = True  # Whether to monitor memory usage during processing
 
+# XMLTV output cache - gzip'd guides kept on disk until EPG or channel data changes
+EPG_OUTPUT_DISK_CACHE = os.environ.get("DISPATCHARR_EPG_DISK_CACHE", "true").lower() == "true"
+EPG_OUTPUT_CACHE_DIR = os.environ.get("DISPATCHARR_EPG_CACHE_DIR", "/data/cache/epg")
+# XC listings (live streams, movies, series) - gzip'd JSON kept on disk until channel or VOD data changes
+XC_OUTPUT_DISK_CACHE = os.environ.get("DISPATCHARR_XC_DISK_CACHE", "true").lower() == "true"
+XC_OUTPUT_CACHE_DIR = os.environ.get("DISPATCHARR_XC_CACHE_DIR", "/data/cache/xc")
+
+# API listings report the planner's row estimate instead of COUNT(*) above this many rows (PostgreSQL)
+ESTIMATED_COUNT_THRESHOLD = int(os.environ.get("DISPATCHARR_ESTIMATED_COUNT_THRESHOLD", "10000"))
+
+# Remote logo cache - served from disk, revalidated upstream after LOGO_CACHE_MAX_AGE seconds
+LOGO_CACHE_DIR = os.environ.get("DISPATCHARR_LOGO_CACHE_DIR", "/data/cache/logos")
+LOGO_CACHE_MAX_MB = int(os.environ.get("DISPATCHARR_LOGO_CACHE_MAX_MB", "512"))
+LOGO_CACHE_MAX_AGE = int(os.environ.get("DISPATCHARR_LOGO_CACHE_MAX_AGE", "86400"))
+# Warm the logo cache in the background after M3U/EPG refreshes
+LOGO_PREFETCH = os.environ.get("DISPATCHARR_LOGO_PREFETCH", "false").lower() == "true"
+
+# VOD range cache - provider bytes kept on disk in 1 MiB blocks so seeks don't always go upstream
+VOD_RANGE_CACHE = os.environ.get("DISPATCHARR_VOD_RANGE_CACHE", "true").lower() == "true"
+VOD_RANGE_CACHE_DIR = os.environ.get("DISPATCHARR_VOD_RANGE_CACHE_DIR", "/data/cache/vod")
+VOD_RANGE_CACHE_MAX_MB = int(os.environ.get("DISPATCHARR_VOD_RANGE_CACHE_MAX_MB", "1024"))
+
 # XtreamCodes Rate Limiting Settings
 # Delay between profile authentications when refreshing multiple profiles
 # This prevents providers from temporarily banning users with many profiles
 XC_PROFILE_REFRESH_DELAY = float(os.environ.get('XC_PROFILE_REFRESH_DELAY', '2.5'))  # seconds between profile refreshes
+# Concurrent get_series_info requests during batch episode refreshes, further capped by the account's max_streams
+XC_EPISODE_REFRESH_WORKERS = int(os.environ.get('XC_EPISODE_REFRESH_WORKERS', '4'))
 
 # Database optimization settings
 DATABASE_STATEMENT_TIMEOUT = 300  # Seconds before timing out long-running queries
@@ -1,9 +1,8 @@
 # dispatcharr/utils.py
-import json
 import ipaddress
 from django.http import JsonResponse
 from django.core.exceptions import ValidationError
-from core.models import CoreSettings, NETWORK_ACCESS
+from core.models import CoreSettings
 
 
 def json_error_response(message, status=400):
@@ -39,7 +38,7 @@ def get_client_ip(request):
 
 
 def network_access_allowed(request, settings_key):
-    network_access = json.loads(CoreSettings.objects.get(key=NETWORK_ACCESS).value)
+    network_access = CoreSettings.get_network_access()
 
     cidrs = (
         network_access[settings_key].split(",")